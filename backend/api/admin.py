@@ -29,7 +29,8 @@ class AppUserAdmin(admin.ModelAdmin):
     list_filter = ("role", "status")
     search_fields = ("email", "name")
     ordering = ("-created_at",)
-    readonly_fields = ("created_at", "updated_at", "last_login")
+    # Balance moves only through api.loyalty_services so it stays in step with LoyaltyLedger
+    readonly_fields = ("credit_points", "created_at", "updated_at", "last_login")
 
 
 @admin.register(AccessRequest)
@@ -5,3 +5,13 @@ class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .emails import precompile_templates
+
+        precompile_templates()
+
+        # Warm DeepFace in the background so the first face request skips model load
+        from .face_inference import preload_face_models
+
+        preload_face_models()
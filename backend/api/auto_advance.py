@@ -0,0 +1,284 @@
+"""Order auto-advance scheduler.
+
+Orders move to their next phase when ``auto_advance_at`` passes. Instead of
+waiting for a 10 s poll, every armed timer schedules a Celery task for its
+due time:
+
+- ``schedule_auto_advance(at)`` rounds ``at`` up to an ``AUTO_ADVANCE_TICK_MS``
+  slot and, after commit, enqueues ``api.tasks.advance_auto_flow`` with that
+  ETA. A slot is armed at most once (``cache.add``), so a burst of orders due
+  in the same tick costs one task, not one per order.
+- ``advance_due`` processes every due order as one set (up to
+  ``AUTO_ADVANCE_BATCH_SIZE``). It locks rows with SKIP LOCKED, prefetches
+  items once, writes orders with ``bulk_update`` and events with
+  ``bulk_create``, and applies station-load changes once.
+- Timers are never revoked. Pausing, clearing or rescheduling only changes
+  ``auto_advance_at``, so a stale slot finds nothing due and does nothing.
+- ``rearm_pending`` runs after every timer. Rows skipped because another
+  transaction held them, or not yet due by the worker's clock (the ETA was
+  computed on the web host), get a retry timer ``RETRY_SECONDS`` later
+  instead of waiting for the sweep.
+- The ``auto-advance-orders`` beat task still sweeps every
+  ``DJANGO_AUTO_ADVANCE_SWEEP_SECONDS``. It catches timers lost with a
+  broker or a worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SLOT_CACHE_PREFIX = "auto_advance:slot:"
+# Retry delay for rows a timer could not advance, and how far ahead of the
+# worker's clock an order still counts as missed (clock skew between hosts)
+RETRY_SECONDS = 1.0
+SKEW_SECONDS = 5.0
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def scheduler_enabled() -> bool:
+    from .tasks import CELERY_AVAILABLE
+
+    return CELERY_AVAILABLE and bool(_setting("AUTO_ADVANCE_SCHEDULER", True))
+
+
+def _slot_for(at: datetime) -> int:
+    tick_ms = max(1, int(_setting("AUTO_ADVANCE_TICK_MS", 500)))
+    return int(math.ceil(at.timestamp() * 1000.0 / tick_ms))
+
+
+def schedule_auto_advance(at: Optional[datetime]) -> None:
+    """Arm a timer for ``at`` once the current transaction commits."""
+    if at is None or not scheduler_enabled():
+        return
+    slot = _slot_for(at)
+
+    def _arm():
+        tick_ms = max(1, int(_setting("AUTO_ADVANCE_TICK_MS", 500)))
+        key = f"{SLOT_CACHE_PREFIX}{tick_ms}:{slot}"
+        eta = datetime.fromtimestamp(slot * tick_ms / 1000.0, tz=dt_timezone.utc)
+        ttl = max(60, int((eta - timezone.now()).total_seconds()) + 60)
+        try:
+            if not cache.add(key, 1, ttl):
+                return
+        except Exception:
+            pass
+        try:
+            from .tasks import advance_auto_flow
+
+            advance_auto_flow.apply_async(eta=eta)
+        except Exception as exc:
+            # The beat sweep still picks the order up
+            logger.warning(f"Failed to schedule auto advance for {eta.isoformat()}: {exc}")
+            try:
+                cache.delete(key)
+            except Exception:
+                pass
+
+    try:
+        transaction.on_commit(_arm)
+    except Exception:
+        logger.exception("Failed to schedule auto advance")
+
+
+def _due_queryset(now, order_ids: Optional[Iterable] = None):
+    from .models import Order
+    from .views_orders import ORDER_TERMINAL_STATUSES
+
+    qs = Order.objects.filter(
+        auto_advance_paused=False,
+        auto_advance_at__isnull=False,
+        auto_advance_at__lte=now,
+    ).exclude(status__in=ORDER_TERMINAL_STATUSES)
+    if order_ids is not None:
+        qs = qs.filter(id__in=list(order_ids))
+    return qs
+
+
+def advance_due(*, limit: Optional[int] = None, order_ids: Optional[Iterable] = None, now=None) -> Dict[str, int]:
+    """Advance up to ``limit`` due orders in one transaction; returns counts."""
+    from .events import publish_events
+    from .models import Order, OrderEvent
+    from .views_orders import (
+        ORDER_COUNTER_FIELDS,
+        _apply_station_load_deltas,
+        _auto_next_status,
+        _clear_auto_flow,
+        _safe_order,
+        _start_auto_flow,
+        _station_load_deltas,
+        can_transition,
+        canonical_status,
+        recalc_order_counters,
+        schedule_order_event_sequencing,
+    )
+
+    limit = max(1, int(limit or _setting("AUTO_ADVANCE_BATCH_SIZE", 200)))
+    stats = {"due": 0, "advanced": 0, "cleared": 0}
+    with transaction.atomic():
+        now = now or timezone.now()
+        ids = list(
+            _due_queryset(now, order_ids)
+            .select_for_update(skip_locked=True)
+            .order_by("auto_advance_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return stats
+        orders = list(
+            Order.objects.filter(id__in=ids)
+            .select_related("placed_by")
+            .prefetch_related("items__menu_item")
+            .order_by("auto_advance_at")
+        )
+        stats["due"] = len(orders)
+
+        fields = {"status", "completed_at", "updated_at", *ORDER_COUNTER_FIELDS}
+        event_rows = []
+        station_deltas = defaultdict(lambda: [0, 0, 0])
+        advanced = []
+        for order in orders:
+            order.updated_at = now
+            target = order.auto_advance_target or _auto_next_status(order.status)
+            current = canonical_status(order.status)
+            if not target or not can_transition(current, canonical_status(target)):
+                reason = "auto_invalid_transition" if target else "auto_no_target"
+                fields.update(_clear_auto_flow(order, reason=reason))
+                stats["cleared"] += 1
+                continue
+
+            previous_status = order.status
+            order.status = target
+            if canonical_status(target) == "completed":
+                order.completed_at = now
+            fields.update(_start_auto_flow(order, now=now))
+            items = list(order.items.all())
+            recalc_order_counters(order, items, save=False)
+
+            to_state = canonical_status(order.status)
+            event_rows.append(
+                OrderEvent(
+                    order=order,
+                    event_type="order.auto_advanced",
+                    from_state=current,
+                    to_state=to_state,
+                    payload={
+                        "previousStatus": previous_status,
+                        "nextStatus": order.status,
+                        "autoAdvanceAt": order.auto_advance_at.isoformat() if order.auto_advance_at else None,
+                    },
+                )
+            )
+            for code, delta in _station_load_deltas(
+                order, items=items, event_type="order.auto_advanced", from_state=current, to_state=to_state
+            ).items():
+                for i, value in enumerate(delta):
+                    station_deltas[code][i] += value
+            advanced.append((order, items))
+
+        Order.objects.bulk_update(orders, sorted(fields), batch_size=200)
+        if event_rows:
+            OrderEvent.objects.bulk_create(event_rows, batch_size=500)
+            schedule_order_event_sequencing()
+            _apply_station_load_deltas(station_deltas)
+        publish_events(
+            (
+                "order.status_changed",
+                {"order": _safe_order(order, items=items), "status": canonical_status(order.status)},
+                {
+                    "roles": {"admin", "manager", "staff"},
+                    "user_ids": [str(order.placed_by_id)] if getattr(order, "placed_by_id", None) else None,
+                },
+            )
+            for order, items in advanced
+        )
+        _refresh_rollups_on_commit(order for order, _ in advanced)
+        stats["advanced"] = len(advanced)
+    return stats
+
+
+def _refresh_rollups_on_commit(orders) -> None:
+    """bulk_update skips post_save, so re-roll closed sales hours here (once per hour)."""
+    from .report_rollups import ROLLUP_TRIGGER_STATUSES, floor_hour, refresh_order_rollup
+
+    by_hour = {}
+    for order in orders:
+        if str(order.status or "").lower() in ROLLUP_TRIGGER_STATUSES and order.created_at:
+            by_hour.setdefault(floor_hour(order.created_at), order)
+    if not by_hour:
+        return
+
+    def _refresh():
+        for order in by_hour.values():
+            try:
+                refresh_order_rollup(order)
+            except Exception:
+                logger.exception("Failed to refresh sales rollup for order %s", order.pk)
+
+    transaction.on_commit(_refresh)
+
+
+def rearm_pending(now=None) -> Optional[datetime]:
+    """Arm a retry timer if an order is still due (or nearly due) after a run.
+
+    Returns the retry time, or None when nothing is pending.
+    """
+    from .models import Order
+    from .views_orders import ORDER_TERMINAL_STATUSES
+
+    if not scheduler_enabled():
+        return None
+    now = now or timezone.now()
+    next_at = (
+        Order.objects.filter(
+            auto_advance_paused=False,
+            auto_advance_at__isnull=False,
+            auto_advance_at__lte=now + timedelta(seconds=SKEW_SECONDS),
+        )
+        .exclude(status__in=ORDER_TERMINAL_STATUSES)
+        .order_by("auto_advance_at")
+        .values_list("auto_advance_at", flat=True)
+        .first()
+    )
+    if next_at is None:
+        return None
+    # At least two ticks out so the retry never lands in the slot that just fired
+    tick = max(1, int(_setting("AUTO_ADVANCE_TICK_MS", 500))) / 1000.0
+    retry_at = max(next_at, now) + timedelta(seconds=max(RETRY_SECONDS, 2 * tick))
+    schedule_auto_advance(retry_at)
+    return retry_at
+
+
+def drain_due(*, limit: Optional[int] = None, max_batches: int = 10) -> Dict[str, float]:
+    """Run ``advance_due`` until fewer than ``limit`` orders were due."""
+    limit = max(1, int(limit or _setting("AUTO_ADVANCE_BATCH_SIZE", 200)))
+    totals = {"batches": 0, "due": 0, "advanced": 0, "cleared": 0}
+    started = time.perf_counter()
+    while totals["batches"] < max(1, max_batches):
+        stats = advance_due(limit=limit)
+        if not stats["due"]:
+            break
+        totals["batches"] += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if stats["due"] < limit:
+            break
+    totals["seconds"] = round(time.perf_counter() - started, 3)
+    return totals
+
+
+__all__ = ["advance_due", "drain_due", "rearm_pending", "schedule_auto_advance", "scheduler_enabled"]
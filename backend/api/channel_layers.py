@@ -0,0 +1,106 @@
+"""Channel layer extensions.
+
+``GroupBatchRedisChannelLayer`` adds ``group_send_many(groups, message)`` to the
+channels_redis layer. ``api.events`` uses it to send one event to several
+groups at once:
+
+- group memberships for all target groups are read in one pipeline per Redis
+  shard, instead of one ZRANGE round trip per group;
+- a socket that belongs to more than one target group (for example
+  ``broadcast`` plus its ``role_*`` group) receives the event once, not once
+  per group;
+- the message is delivered with one Lua script per shard. The script also
+  prunes expired messages, which ``group_send`` does in a separate pipeline.
+
+Capacity and expiry semantics match ``RedisChannelLayer.group_send``.
+``GroupBatchInMemoryChannelLayer`` offers the same call (with the same
+de-duplication) for single-process development and tests.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from typing import Iterable
+
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from channels_redis.core import RedisChannelLayer
+
+logger = logging.getLogger(__name__)
+
+_SEND_MANY_LUA = """
+    local over_capacity = 0
+    local current_time = ARGV[#ARGV - 1]
+    local expiry = ARGV[#ARGV]
+    for i=1,#KEYS do
+        redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, current_time - expiry)
+        if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+            redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+            redis.call('EXPIRE', KEYS[i], expiry)
+        else
+            over_capacity = over_capacity + 1
+        end
+    end
+    return over_capacity
+"""
+
+
+class GroupBatchRedisChannelLayer(RedisChannelLayer):
+    async def group_send_many(self, groups: Iterable[str], message: dict) -> int:
+        """Send ``message`` once to every channel in any of ``groups``; returns channels reached."""
+        groups = sorted(set(groups))
+        for group in groups:
+            assert self.require_valid_group_name(group), "Group name not valid"
+
+        by_shard = defaultdict(list)
+        for group in groups:
+            by_shard[self.consistent_hash(group)].append(group)
+
+        stale_before = int(time.time()) - self.group_expiry
+        channel_names = set()
+        for index, shard_groups in by_shard.items():
+            pipe = self.connection(index).pipeline(transaction=False)
+            for group in shard_groups:
+                key = self._group_key(group)
+                pipe.zremrangebyscore(key, min=0, max=stale_before)
+                pipe.zrange(key, 0, -1)
+            results = await pipe.execute()
+            for members in results[1::2]:
+                channel_names.update(name.decode("utf8") for name in members)
+        if not channel_names:
+            return 0
+
+        connection_to_keys, key_to_message, key_to_capacity = self._map_channel_keys_to_connection(
+            sorted(channel_names), message
+        )
+        for index, keys in connection_to_keys.items():
+            args = [key_to_message[key] for key in keys]
+            args += [key_to_capacity[key] for key in keys]
+            args += [time.time(), self.expiry]
+            over_capacity = await self.connection(index).eval(_SEND_MANY_LUA, len(keys), *keys, *args)
+            if over_capacity > 0:
+                logger.info(
+                    "%s of %s channels over capacity for groups %s", over_capacity, len(channel_names), groups
+                )
+        return len(channel_names)
+
+
+class GroupBatchInMemoryChannelLayer(InMemoryChannelLayer):
+    async def group_send_many(self, groups: Iterable[str], message: dict) -> int:
+        """Send ``message`` once to every channel in any of ``groups``; returns channels reached."""
+        self._clean_expired()
+        channels = set()
+        for group in set(groups):
+            assert self.require_valid_group_name(group), "Group name not valid"
+            channels.update(self.groups.get(group, {}).keys())
+        for channel in channels:
+            try:
+                await self.send(channel, message)
+            except ChannelFull:
+                pass
+        return len(channels)
+
+
+__all__ = ["GroupBatchInMemoryChannelLayer", "GroupBatchRedisChannelLayer"]
@@ -7,15 +7,34 @@ from urllib.parse import parse_qs
 from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
+from .events import BROADCAST_GROUP, FIREHOSE_GROUP, latest_event_id, order_group, replay_events, station_group
 from .views_common import _actor_from_token, _safe_user_from_db
 
 logger = logging.getLogger(__name__)
 
+STAFF_ROLES = {"admin", "manager", "staff"}
+FIREHOSE_ROLES = {"admin", "manager"}
+MODES = {"full", "delta"}
+MAX_TOPICS = 50
+
+
+def _actor_with_profile(token: str):
+    # Same cached resolution as HTTP requests; the profile is built here because
+    # it may touch the database, which the async connect() cannot do directly
+    actor = _actor_from_token(token)
+    profile = None
+    if actor is not None and not isinstance(actor, dict):
+        try:
+            profile = _safe_user_from_db(actor)
+        except Exception:
+            logger.exception("Failed to serialize websocket actor")
+    return actor, profile
+
 
 async def _resolve_actor(token: str):
     if not token:
-        return None
-    return await sync_to_async(_actor_from_token, thread_sensitive=True)(token)
+        return None, None
+    return await sync_to_async(_actor_with_profile, thread_sensitive=True)(token)
 
 
 def _role_group(role: str) -> str:
@@ -34,21 +53,87 @@ def _sanitize_group(name: str) -> str:
     return safe[:100] or "broadcast"
 
 
+def default_feed(role: str) -> set[str]:
+    """Groups a socket listens to until it subscribes to explicit topics."""
+    role = (role or "").lower()
+    if role in FIREHOSE_ROLES:
+        return {FIREHOSE_GROUP}
+    if role in STAFF_ROLES:
+        return {_sanitize_group(_role_group(role))}
+    return set()
+
+
+def resolve_topic(topic: str, role: str) -> tuple[Optional[str], Optional[str], str]:
+    """Map a client topic to ``(group, order_id_needing_ownership_check, error)``.
+
+    Topics: ``firehose`` (admin/manager), ``station:<code>`` (staff),
+    ``order:<id>`` (staff, or the customer who placed the order) and ``role``
+    (the socket's default feed).
+    """
+    role = (role or "").lower()
+    kind, _, value = str(topic or "").strip().partition(":")
+    kind = kind.lower()
+    value = value.strip()
+    if kind == "firehose":
+        return (FIREHOSE_GROUP, None, "") if role in FIREHOSE_ROLES else (None, None, "forbidden")
+    if kind == "station" and value:
+        return (station_group(value), None, "") if role in STAFF_ROLES else (None, None, "forbidden")
+    if kind == "order" and value:
+        return order_group(value), (None if role in STAFF_ROLES else value), ""
+    if kind == "role":
+        feed = default_feed(role)
+        return (next(iter(feed)), None, "") if feed else (None, None, "forbidden")
+    return None, None, "unknown topic"
+
+
+def _owns_order(user_id: Optional[str], order_id: str) -> bool:
+    if not user_id:
+        return False
+    try:
+        from .models import Order
+        return Order.objects.filter(pk=order_id, placed_by_id=user_id).exists()
+    except Exception:
+        return False
+
+
+async def _latest_event_id():
+    try:
+        return await sync_to_async(latest_event_id, thread_sensitive=True)()
+    except Exception:
+        return None
+
+
 class EventStreamConsumer(AsyncJsonWebsocketConsumer):
-    """Unified websocket for broadcasting realtime events to clients."""
+    """Unified websocket for realtime events.
+
+    Every socket joins ``broadcast`` and its ``user_<id>`` group. Until it
+    subscribes it also gets its role's default feed (admins/managers: the
+    firehose; staff: ``role_staff``). ``{"action": "subscribe", "topics": [...],
+    "mode": "delta"|"full"}`` (or ``?topics=...&mode=...`` on connect) swaps
+    that feed for the chosen topics; see ``resolve_topic``.
+
+    Live events carry a monotonic ``id``. A reconnecting client passes the last
+    one it saw as ``?since=<id>`` (or ``{"action": "resume", "since": <id>}``)
+    and first receives the missed events for its groups, flagged
+    ``"replayed": true``, then ``replay.complete``. When that payload has a
+    ``reset`` reason the gap was too old or too large and the client should
+    refetch ``order_queue`` once instead.
+    """
 
     actor = None
     groups_joined: set[str]
 
     async def connect(self):
         token = self._extract_token()
-        actor = await _resolve_actor(token)
+        actor, safe_actor = await _resolve_actor(token)
         if not actor:
             await self.close(code=4401)
             return
 
         self.actor = actor
-        self.groups_joined = {"broadcast"}
+        self.mode = "full"
+        self.topics = set()
+        self.replayed_ids = set()
 
         user_id = None
         role = "staff"
@@ -61,28 +146,23 @@ class EventStreamConsumer(AsyncJsonWebsocketConsumer):
                 role = (actor.get("role") or "staff").lower()
         except Exception:  # pragma: no cover - defensive only
             logger.exception("Failed to derive websocket groups for actor")
+        self.user_id = user_id
+        self.role = role
 
-        role_group = _sanitize_group(_role_group(role))
-        self.groups_joined.add(role_group)
-
+        # Personal + global groups always; the role feed until topics are chosen
+        self.base_groups = {BROADCAST_GROUP}
         user_group = _user_group(user_id)
         if user_group:
-            self.groups_joined.add(_sanitize_group(user_group))
-
-        for group in self.groups_joined:
-            await self.channel_layer.group_add(group, self.channel_name)
+            self.base_groups.add(_sanitize_group(user_group))
+        self.groups_joined = set()
+        await self._set_groups(self.base_groups | default_feed(role))
 
         await self.accept()
-        safe_actor = None
-        try:
-            if hasattr(actor, "id"):
-                safe_actor = _safe_user_from_db(actor)
-        except Exception:
-            safe_actor = None
         payload = {
             "userId": user_id,
             "role": role,
             "user": safe_actor,
+            "lastEventId": await _latest_event_id(),
         }
         await self.send_json({
             "type": "connection.ack",
@@ -90,6 +170,15 @@ class EventStreamConsumer(AsyncJsonWebsocketConsumer):
             "payload": payload,
         })
 
+        params = self._query_params()
+        mode = (params.get("mode") or [""])[0]
+        topics = [t for raw in params.get("topics") or [] for t in raw.split(",") if t.strip()]
+        if topics or mode:
+            await self._subscribe(topics, mode)
+        since = (params.get("since") or [""])[0]
+        if since:
+            await self._resume(since)
+
     async def disconnect(self, code):
         if getattr(self, "groups_joined", None):
             for group in self.groups_joined:
@@ -108,12 +197,16 @@ class EventStreamConsumer(AsyncJsonWebsocketConsumer):
                 "event": "ping",
                 "payload": {"message": "pong"},
             })
-        elif action == "subscribe":
-            await self.send_json({
-                "type": "connection.ack",
-                "event": "subscribe",
-                "payload": {"status": "ok"},
-            })
+        elif action in {"subscribe", "unsubscribe"}:
+            topics = (content or {}).get("topics") or []
+            if isinstance(topics, str):
+                topics = [topics]
+            if action == "subscribe":
+                await self._subscribe(list(topics), (content or {}).get("mode"))
+            else:
+                await self._unsubscribe(list(topics))
+        elif action == "resume":
+            await self._resume((content or {}).get("since"))
         else:
             await self.send_json({
                 "type": "connection.error",
@@ -122,19 +215,104 @@ class EventStreamConsumer(AsyncJsonWebsocketConsumer):
             })
 
     async def event_message(self, event):
-        await self.send_json({
+        # Live copies of events already sent during replay are skipped
+        if event.get("id") is not None and event["id"] in self.replayed_ids:
+            self.replayed_ids.discard(event["id"])
+            return
+        await self._send_event(event)
+
+    async def _send_event(self, event, replayed=False):
+        delta = event.get("delta") if self.mode == "delta" else None
+        message = {
             "type": "event",
+            "id": event.get("id"),
             "event": event.get("event"),
-            "payload": event.get("payload"),
+            "payload": delta if delta is not None else event.get("payload"),
+            "mode": "delta" if delta is not None else "full",
+        }
+        if replayed:
+            message["replayed"] = True
+        await self.send_json(message)
+
+    async def _resume(self, since):
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            await self.send_json({
+                "type": "connection.error",
+                "event": "invalid_cursor",
+                "payload": {"message": "since must be an event id"},
+            })
+            return
+        try:
+            messages, last_id, reset = await sync_to_async(replay_events, thread_sensitive=True)(
+                since, self.groups_joined
+            )
+        except Exception:
+            logger.exception("Failed to replay events since %s", since)
+            messages, last_id, reset = [], None, "unavailable"
+        for message in messages:
+            self.replayed_ids.add(message["id"])
+            await self._send_event(message, replayed=True)
+        await self.send_json({
+            "type": "replay.complete",
+            "event": "replay",
+            "payload": {"since": since, "count": len(messages), "lastEventId": last_id, "reset": reset or None},
         })
 
-    def _extract_token(self) -> Optional[str]:
+    async def _set_groups(self, wanted: set[str]):
+        for group in self.groups_joined - wanted:
+            try:
+                await self.channel_layer.group_discard(group, self.channel_name)
+            except Exception:
+                continue
+        for group in wanted - self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups_joined = set(wanted)
+
+    async def _subscribe(self, topics: list, mode=None):
+        """Switch from the default feed to explicit topics (accumulating) and/or change mode."""
+        accepted, rejected = [], {}
+        for topic in topics[:MAX_TOPICS]:
+            group, owned_order, error = resolve_topic(topic, self.role)
+            if group and owned_order is not None:
+                if not await sync_to_async(_owns_order, thread_sensitive=True)(self.user_id, owned_order):
+                    group, error = None, "forbidden"
+            if group:
+                self.topics.add(group)
+                accepted.append(topic)
+            else:
+                rejected[str(topic)] = error
+        if mode in MODES:
+            self.mode = mode
+        if self.topics:
+            await self._set_groups(self.base_groups | self.topics)
+        await self.send_json({
+            "type": "connection.ack",
+            "event": "subscribe",
+            "payload": {"status": "ok", "topics": accepted, "rejected": rejected, "mode": self.mode},
+        })
+
+    async def _unsubscribe(self, topics: list):
+        for topic in topics[:MAX_TOPICS]:
+            group, _, _ = resolve_topic(topic, self.role)
+            self.topics.discard(group)
+        feed = self.topics or default_feed(self.role)
+        await self._set_groups(self.base_groups | feed)
+        await self.send_json({
+            "type": "connection.ack",
+            "event": "unsubscribe",
+            "payload": {"status": "ok", "mode": self.mode},
+        })
+
+    def _query_params(self) -> dict:
         query = self.scope.get("query_string", b"") or b""
-        if query:
-            params = parse_qs(query.decode("utf-8"))
-            token = params.get("token")
-            if token:
-                return token[0]
+        return parse_qs(query.decode("utf-8")) if query else {}
+
+    def _extract_token(self) -> Optional[str]:
+        token = self._query_params().get("token")
+        if token:
+            return token[0]
         headers = dict((name.lower(), value) for name, value in (self.scope.get("headers") or []))
         auth_header = headers.get(b"authorization")
         if auth_header:
@@ -1,11 +1,49 @@
+from functools import lru_cache
+from typing import Optional
+
 from django.conf import settings
-from django.core.mail import send_mail, mail_admins
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+
+from .mail_queue import send_async
+
+# HTML bodies; compiled once per process (see precompile_templates)
+EMAIL_TEMPLATES = (
+    "email/login_otp.html",
+    "email/password_reset.html",
+    "email/verify_email.html",
+)
+
+
+@lru_cache(maxsize=None)
+def _template(name: str):
+    return get_template(name)
+
+
+def precompile_templates():
+    for name in EMAIL_TEMPLATES:
+        try:
+            _template(name)
+        except Exception:
+            pass
 
 
-def _safe_send(func, *args, **kwargs):
+def _render(name: str, context: dict) -> Optional[str]:
     try:
-        func(*args, **kwargs)
+        return _template(name).render(context)
+    except Exception:
+        return None
+
+
+def _queue(subject, message, recipients, *, html_message=None, from_email=None):
+    """Build the email now and hand it to the mail queue (sent after commit)."""
+    try:
+        email = EmailMultiAlternatives(
+            subject, message, from_email or settings.DEFAULT_FROM_EMAIL, list(recipients)
+        )
+        if html_message:
+            email.attach_alternative(html_message, "text/html")
+        send_async(email)
     except Exception as e:
         # Log in debug to aid troubleshooting (e.g., SMTP misconfig)
         try:
@@ -15,6 +53,18 @@ def _safe_send(func, *args, **kwargs):
             pass
 
 
+def _queue_admins(subject, message):
+    admins = [a[1] if isinstance(a, (list, tuple)) else a for a in (getattr(settings, "ADMINS", None) or [])]
+    if not admins:
+        return
+    _queue(
+        f"{getattr(settings, 'EMAIL_SUBJECT_PREFIX', '')}{subject}",
+        message,
+        admins,
+        from_email=getattr(settings, "SERVER_EMAIL", None),
+    )
+
+
 def notify_admins_verification_submitted(app_user, access_request=None):
     subject = f"New verification submitted: {app_user.email}"
     message = (
@@ -24,7 +74,7 @@ def notify_admins_verification_submitted(app_user, access_request=None):
         f"Status: {app_user.status}\n"
         f"Role: {app_user.role}\n"
     )
-    _safe_send(mail_admins, subject, message, fail_silently=True)
+    _queue_admins(subject, message)
 
 
 def email_user_verification_received(app_user):
@@ -37,14 +87,7 @@ def email_user_verification_received(app_user):
         "An administrator will review it shortly. You will be notified once approved or if we need more information.\n\n"
         "Thank you."
     )
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [app_user.email],
-        fail_silently=True,
-    )
+    _queue(subject, message, [app_user.email])
 
 
 def email_user_approved(app_user):
@@ -56,14 +99,7 @@ def email_user_approved(app_user):
         "Your account has been approved. You can now sign in and access the system.\n\n"
         "Thank you."
     )
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [app_user.email],
-        fail_silently=True,
-    )
+    _queue(subject, message, [app_user.email])
 
 
 def email_user_rejected(app_user, note: str = ""):
@@ -76,14 +112,7 @@ def email_user_rejected(app_user, note: str = ""):
         "Your access request was not approved at this time." + body_note + "\n\n"
         "You may contact support for more information or resubmit if applicable."
     )
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [app_user.email],
-        fail_silently=True,
-    )
+    _queue(subject, message, [app_user.email])
 
 
 def email_user_password_reset(email: str, reset_link: str, code: str | None = None, expires_minutes: int = 15):
@@ -103,27 +132,16 @@ def email_user_password_reset(email: str, reset_link: str, code: str | None = No
         + "If the link doesn't work on this device, open the app and choose 'I have a code'.\n"
     )
     # HTML body via template
-    try:
-        html = render_to_string(
-            "email/password_reset.html",
-            {
-                "reset_link": reset_link,
-                "expires_minutes": expires_minutes,
-                "code": code,
-                "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
-            },
-        )
-    except Exception:
-        html = None
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=True,
-        html_message=html,
+    html = _render(
+        "email/password_reset.html",
+        {
+            "reset_link": reset_link,
+            "expires_minutes": expires_minutes,
+            "code": code,
+            "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
+        },
     )
+    _queue(subject, message, [email], html_message=html)
 
 def email_user_login_otp(app_user, code: str, expires_minutes: int = 5):
     """Send a login verification code via email."""
@@ -141,27 +159,16 @@ def email_user_login_otp(app_user, code: str, expires_minutes: int = 5):
         f"This code expires in approximately {expires_minutes} minutes.\n\n"
         "If you didn't try to sign in, you can ignore this email."
     )
-    try:
-        html = render_to_string(
-            "email/login_otp.html",
-            {
-                "code": code,
-                "expires_minutes": expires_minutes,
-                "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
-                "user": app_user,
-            },
-        )
-    except Exception:
-        html = None
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=True,
-        html_message=html,
+    html = _render(
+        "email/login_otp.html",
+        {
+            "code": code,
+            "expires_minutes": expires_minutes,
+            "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
+            "user": app_user,
+        },
     )
+    _queue(subject, message, [email], html_message=html)
 
 
 def email_user_email_verification(email: str, verify_link: str):
@@ -175,22 +182,11 @@ def email_user_email_verification(email: str, verify_link: str):
         f"Verify link: {verify_link}\n\n"
         "If you did not create an account, you can ignore this email."
     )
-    try:
-        html = render_to_string(
-            "email/verify_email.html",
-            {
-                "verify_link": verify_link,
-                "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
-            },
-        )
-    except Exception:
-        html = None
-    _safe_send(
-        send_mail,
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=True,
-        html_message=html,
+    html = _render(
+        "email/verify_email.html",
+        {
+            "verify_link": verify_link,
+            "brand": getattr(settings, "EMAIL_SUBJECT_PREFIX", ""),
+        },
     )
+    _queue(subject, message, [email], html_message=html)
@@ -1,35 +1,298 @@
-"""Lightweight event publisher for broadcasting domain events over Channels."""
+"""Lightweight event publisher for broadcasting domain events over Channels.
+
+``publish_event`` targets only interested sockets: the admin ``firehose``, the
+``order_<id>`` and ``station_<code>`` topics derived from the payload, and any
+explicit user/role/audience groups (``broadcast`` is no longer implied). Each
+message carries the full payload and, for order events, a compact ``delta``
+that sockets in delta mode receive instead (see ``api.consumers``).
+
+It never talks to the channel layer on the request thread:
+
+- the event is handed to an in-process bus when the surrounding transaction
+  commits (immediately in autocommit), so rolled-back changes are never
+  announced;
+- the bus is a bounded queue drained by one daemon thread with its own event
+  loop. When the queue is full the event is dropped and counted rather than
+  blocking the caller (``bus_stats()``);
+- each event goes to all its groups in one ``group_send_many`` call when the
+  layer supports it (``api.channel_layers.GroupBatchRedisChannelLayer``),
+  otherwise one ``group_send`` per group;
+- events listed in ``COALESCE_EVENTS`` that repeat for the same key (e.g. one
+  order item's state changes) within ``EVENT_BUS_COALESCE_MS`` are merged
+  into one message carrying the latest payload.
+
+Set ``EVENT_BUS_ASYNC = False`` to send inline (after commit) instead.
+
+Every event is also journaled in ``RealtimeEvent`` once the publishing
+transaction commits, right before it is handed to the bus; its id travels
+with the live message as a monotonic cursor. Journal writes are serialized on
+the ``RealtimeEventSequencer`` row, so ids are handed out and become visible
+in commit order: a reader that has seen id N will never later find a new
+event below N.
+``replay_events`` returns what a reconnecting socket missed after a cursor
+(``?since=<id>``, see ``api.consumers``), or asks it to reload when the gap is
+older than ``EVENT_REPLAY_RETENTION_MINUTES`` or larger than
+``EVENT_REPLAY_MAX_EVENTS``.
+"""
 
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from typing import Iterable, List, Optional, Set, Tuple
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Every socket joins BROADCAST_GROUP (global announcements only); admins and
+# managers get every event through FIREHOSE_GROUP
+BROADCAST_GROUP = "broadcast"
+FIREHOSE_GROUP = "firehose"
 
 _MAX_GROUP_LENGTH = 100
 _ALLOWED_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_.")
 
+# Event type -> payload fields ("a.b" for nested) identifying "the same thing"
+# for coalescing. Only events whose payload (and delta) carries the full
+# current state of that thing belong here, since all but the last payload in a
+# window are discarded. Item events keep one copy per item: their delta holds
+# only the changed item, so collapsing per order would lose the others.
+COALESCE_EVENTS = {
+    "order.item_state_changed": ("orderId", "item.id"),
+}
+
 
 def _normalize_group(name: str) -> str:
     safe = "".join(ch if ch in _ALLOWED_CHARS else "_" for ch in name)
     return safe[:_MAX_GROUP_LENGTH] or "broadcast"
 
 
-def publish_event(
+def _payload_field(payload: dict, path: str):
+    value = payload
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _coalesce_key(event_type: str, payload: dict):
+    fields = COALESCE_EVENTS.get(event_type)
+    if not fields or not isinstance(payload, dict):
+        return None
+    values = [_payload_field(payload, path) for path in fields]
+    if values[0] is None:
+        return None
+    return (event_type, *(None if value is None else str(value) for value in values))
+
+
+async def _send(layer, groups, message) -> None:
+    send_many = getattr(layer, "group_send_many", None)
+    if send_many is not None:
+        await send_many(groups, message)
+        return
+    for group in groups:
+        try:
+            await layer.group_send(group, message)
+        except Exception:
+            continue
+
+
+class EventBus:
+    """Bounded, coalescing queue drained by a background sender thread."""
+
+    def __init__(self, maxsize: int = 1000, coalesce_window: float = 0.1):
+        self.coalesce_window = max(0.0, coalesce_window)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.stats = {"published": 0, "sent": 0, "coalesced": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, groups: set, message: dict, coalesce_key=None) -> bool:
+        with self._lock:
+            self.stats["published"] += 1
+            if coalesce_key is not None and coalesce_key in self._pending:
+                slot = self._pending[coalesce_key]
+                slot[0] |= groups
+                slot[1] = message
+                self.stats["coalesced"] += 1
+                return True
+            due = time.monotonic() + (self.coalesce_window if coalesce_key is not None else 0.0)
+            try:
+                self._queue.put_nowait((coalesce_key, due, groups, message))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                dropped = self.stats["dropped"]
+                if dropped == 1 or dropped % 100 == 0:
+                    logger.warning("Event bus queue full; dropped %d event(s) so far", dropped)
+                return False
+            if coalesce_key is not None:
+                self._pending[coalesce_key] = [groups, message]
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        while True:
+            coalesce_key, due, groups, message = self._queue.get()
+            try:
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                if coalesce_key is not None:
+                    with self._lock:
+                        groups, message = self._pending.pop(coalesce_key, (groups, message))
+                layer = get_channel_layer()
+                if layer is not None:
+                    loop.run_until_complete(_send(layer, sorted(groups), message))
+                with self._lock:
+                    self.stats["sent"] += 1
+            except Exception:
+                with self._lock:
+                    self.stats["failed"] += 1
+                logger.exception("Failed to publish %s", message.get("event"))
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued event was sent (or ``timeout`` passed)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "queued": self._queue.qsize(), "capacity": self._queue.maxsize}
+
+
+_bus: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> EventBus:
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = EventBus(
+                    maxsize=int(getattr(settings, "EVENT_BUS_MAX_QUEUE", 1000)),
+                    coalesce_window=float(getattr(settings, "EVENT_BUS_COALESCE_MS", 100)) / 1000.0,
+                )
+    return _bus
+
+
+def bus_stats() -> dict:
+    """Published/sent/coalesced/dropped/failed counters and current queue depth."""
+    return get_bus().snapshot()
+
+
+def flush_events(timeout: float = 5.0) -> bool:
+    return _bus.flush(timeout) if _bus is not None else True
+
+
+atexit.register(flush_events, 2.0)
+
+
+def _dispatch(groups: set, message: dict, coalesce_key) -> None:
+    if getattr(settings, "EVENT_BUS_ASYNC", True):
+        get_bus().submit(groups, message, coalesce_key)
+        return
+    layer = get_channel_layer()
+    if layer is not None:
+        try:
+            async_to_sync(_send)(layer, sorted(groups), message)
+        except Exception:
+            logger.exception("Failed to publish %s", message.get("event"))
+
+
+# Compact ("delta") fields kept from order/item payloads for sockets in delta mode
+_ORDER_DELTA_FIELDS = (
+    "id", "orderNumber", "status", "canonicalStatus", "updatedAt", "etaSeconds",
+    "promisedTime", "partialReadyItems", "totalItems", "pendingItems", "shelfSlot", "lastStationCode",
+)
+_ITEM_DELTA_FIELDS = ("id", "name", "quantity", "state", "stationCode", "updatedAt", "readyAt")
+
+
+def order_group(order_id) -> str:
+    return _normalize_group(f"order_{order_id}")
+
+
+def station_group(code) -> str:
+    return _normalize_group(f"station_{str(code).lower()}")
+
+
+def topic_groups(payload: dict) -> Set[str]:
+    """Per-order and per-station groups an order event belongs to."""
+    groups: Set[str] = set()
+    if not isinstance(payload, dict):
+        return groups
+    order = payload.get("order") if isinstance(payload.get("order"), dict) else None
+    order_id = (order or {}).get("id") or payload.get("orderId")
+    if order_id:
+        groups.add(order_group(order_id))
+    items = list((order or {}).get("items") or [])
+    if isinstance(payload.get("item"), dict) and order_id:
+        items.append(payload["item"])
+    for item in items:
+        code = item.get("stationCode") if isinstance(item, dict) else None
+        if code:
+            groups.add(station_group(code))
+    return groups
+
+
+def compact_payload(event_type: str, payload: dict) -> Optional[dict]:
+    """Small delta form of an order event payload; None when the event has no compact form."""
+    if not event_type.startswith("order.") or not isinstance(payload, dict):
+        return None
+    delta = {}
+    for key, value in payload.items():
+        if key == "order" and isinstance(value, dict):
+            delta["order"] = {f: value[f] for f in _ORDER_DELTA_FIELDS if f in value}
+        elif key == "item" and isinstance(value, dict):
+            delta["item"] = {f: value[f] for f in _ITEM_DELTA_FIELDS if f in value}
+        elif not isinstance(value, (dict, list)):
+            delta[key] = value
+    return delta
+
+
+def build_message(
     event_type: str,
     payload: dict,
     *,
     audience: Optional[Iterable[str]] = None,
     user_ids: Optional[Iterable[str]] = None,
     roles: Optional[Iterable[str]] = None,
-) -> None:
-    """Broadcast an event to interested websocket subscribers."""
-    layer = get_channel_layer()
-    if not layer:
-        return
-
-    groups = {"broadcast"}
+) -> Tuple[Set[str], dict]:
+    """Target groups and channel-layer message for an event (see ``publish_event``)."""
+    groups = {FIREHOSE_GROUP}
     if audience:
         groups.update(audience)
     if user_ids:
@@ -37,19 +300,163 @@ def publish_event(
     if roles:
         groups.update({f"role_{role.lower()}" for role in roles})
 
-    normalized = {_normalize_group(group) for group in groups}
+    normalized = {_normalize_group(group) for group in groups} | topic_groups(payload)
 
     message = {
         "type": "event.message",
         "event": event_type,
         "payload": payload,
+        "delta": compact_payload(event_type, payload),
     }
+    return normalized, message
 
-    for group in normalized:
-        try:
-            async_to_sync(layer.group_send)(group, message)
-        except Exception:
+
+def _journal(entries: List[Tuple[Set[str], dict]]) -> List[Optional[int]]:
+    """Journal ``(groups, message)`` pairs; returns their ids (None when not journaled)."""
+    if not getattr(settings, "EVENT_REPLAY_ENABLED", True):
+        return [None] * len(entries)
+    from .models import RealtimeEvent, RealtimeEventSequencer
+
+    rows = [
+        RealtimeEvent(event_type=message["event"], groups=sorted(groups), payload=message["payload"])
+        for groups, message in entries
+    ]
+    try:
+        with transaction.atomic():
+            # Held until commit: the next writer's ids are allocated only after
+            # these rows are visible, so the cursor never skips a late commit
+            RealtimeEventSequencer.objects.select_for_update().get_or_create(pk=RealtimeEventSequencer.REALTIME_EVENTS)
+            if len(rows) > 1 and connections[RealtimeEvent.objects.db].features.can_return_rows_from_bulk_insert:
+                RealtimeEvent.objects.bulk_create(rows)
+            else:
+                for row in rows:
+                    row.save()
+        return [row.id for row in rows]
+    except Exception:
+        logger.exception("Failed to journal %d event(s)", len(rows))
+        return [None] * len(rows)
+
+
+def latest_event_id() -> Optional[int]:
+    from .models import RealtimeEvent
+
+    return RealtimeEvent.objects.aggregate(last=Max("id"))["last"]
+
+
+def replay_events(since: int, groups: Iterable[str], *, limit: Optional[int] = None) -> Tuple[List[dict], Optional[int], str]:
+    """Journaled messages after cursor ``since`` for sockets in ``groups``.
+
+    Returns ``(messages, last_id, reset_reason)``; a non-empty reason means the
+    gap cannot be replayed and the client should reload its state instead.
+    Coalescable events (``COALESCE_EVENTS``) are collapsed to their latest copy.
+    """
+    from .models import RealtimeEvent
+
+    limit = max(1, int(limit or getattr(settings, "EVENT_REPLAY_MAX_EVENTS", 500)))
+    bounds = RealtimeEvent.objects.aggregate(first=Min("id"), last=Max("id"))
+    first, last = bounds["first"], bounds["last"]
+    if last is None:
+        return [], None, "cursor expired" if since else ""
+    if since > last:
+        return [], last, "unknown cursor"
+    if since == last:
+        return [], last, ""
+    if since < first - 1:
+        # Events right after the cursor were already pruned
+        return [], last, "cursor expired"
+    rows = list(
+        RealtimeEvent.objects.filter(id__gt=since)
+        .order_by("id")
+        .values_list("id", "event_type", "groups", "payload")[: limit + 1]
+    )
+    if len(rows) > limit:
+        return [], bounds["last"], "too many events"
+
+    wanted = set(groups)
+    matched = [row for row in rows if wanted.intersection(row[2] or ())]
+    latest = {}
+    for event_id, event_type, _, payload in matched:
+        key = _coalesce_key(event_type, payload)
+        if key is not None:
+            latest[key] = event_id
+    messages = []
+    for event_id, event_type, _, payload in matched:
+        key = _coalesce_key(event_type, payload)
+        if key is not None and latest[key] != event_id:
             continue
+        messages.append({
+            "type": "event.message",
+            "id": event_id,
+            "event": event_type,
+            "payload": payload,
+            "delta": compact_payload(event_type, payload),
+        })
+    return messages, rows[-1][0], ""
+
+
+def prune_event_journal(*, now=None) -> int:
+    """Delete journaled events older than ``EVENT_REPLAY_RETENTION_MINUTES``."""
+    from .models import RealtimeEvent
+
+    minutes = int(getattr(settings, "EVENT_REPLAY_RETENTION_MINUTES", 120))
+    cutoff = (now or timezone.now()) - timedelta(minutes=minutes)
+    deleted, _ = RealtimeEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def publish_event(
+    event_type: str,
+    payload: dict,
+    *,
+    audience: Optional[Iterable[str]] = None,
+    user_ids: Optional[Iterable[str]] = None,
+    roles: Optional[Iterable[str]] = None,
+) -> None:
+    """Send an event to interested websocket subscribers once the transaction commits.
+
+    Besides the ``audience``/``user_ids``/``roles`` groups, every event reaches
+    the admin ``firehose`` and order events reach their ``order_<id>`` and
+    ``station_<code>`` topics. Pass ``audience=["broadcast"]`` to reach every
+    connected socket.
+    """
+    publish_events([(event_type, payload, {"audience": audience, "user_ids": user_ids, "roles": roles})])
+
+
+def publish_events(batch: Iterable[Tuple[str, dict, dict]]) -> None:
+    """``publish_event`` for many events with one journal insert.
+
+    Each entry is ``(event_type, payload, targets)`` where ``targets`` holds
+    ``publish_event``'s ``audience``/``user_ids``/``roles`` keywords.
+    """
+    entries = [build_message(event_type, payload, **(targets or {})) for event_type, payload, targets in batch]
+    if not entries:
+        return
+
+    def _dispatch_all():
+        for (_, message), event_id in zip(entries, _journal(entries)):
+            message["id"] = event_id
+        for groups, message in entries:
+            _dispatch(groups, message, _coalesce_key(message["event"], message["payload"]))
+
+    try:
+        transaction.on_commit(_dispatch_all)
+    except Exception:
+        logger.exception("Failed to schedule %d event(s)", len(entries))
 
 
-__all__ = ["publish_event"]
+__all__ = [
+    "BROADCAST_GROUP",
+    "FIREHOSE_GROUP",
+    "build_message",
+    "bus_stats",
+    "compact_payload",
+    "flush_events",
+    "latest_event_id",
+    "order_group",
+    "prune_event_journal",
+    "publish_event",
+    "publish_events",
+    "replay_events",
+    "station_group",
+    "topic_groups",
+]
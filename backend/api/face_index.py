@@ -0,0 +1,222 @@
+"""In-process face embedding index for face login.
+
+Keeps one matrix per DeepFace ``model_name``: a C-contiguous float32 array of
+L2-normalized embeddings with a parallel array of user ids, so a login is a
+single matrix-vector product instead of decoding and comparing every template.
+
+Each worker holds its own copy. ``face_register`` / ``face_unregister`` patch
+the local copy and bump a shared version in the Django cache; other workers
+notice the version change on their next lookup and reload from the database.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "face_index:version:{model}"
+
+
+def pack_embedding(vec) -> bytes:
+    """Serialize an embedding as packed little-endian float32."""
+    return np.ascontiguousarray(vec, dtype="<f4").tobytes()
+
+
+def unpack_embedding(raw) -> Optional[np.ndarray]:
+    if not raw:
+        return None
+    return np.frombuffer(bytes(raw), dtype="<f4").astype(np.float32)
+
+
+def _template_vector(embedding_vector, embedding_json) -> Optional[np.ndarray]:
+    vec = unpack_embedding(embedding_vector)
+    if vec is None and embedding_json:
+        try:
+            vec = np.asarray(json.loads(embedding_json), dtype=np.float32)
+        except Exception:
+            return None
+    return vec
+
+
+def _normalize(vec: np.ndarray) -> Optional[np.ndarray]:
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vec))
+    if not vec.size or norm == 0.0 or not np.isfinite(norm):
+        return None
+    return vec / norm
+
+
+def _shared_version(model_name: str):
+    try:
+        from django.core.cache import cache
+
+        return cache.get(_VERSION_KEY.format(model=model_name))
+    except Exception:
+        return None
+
+
+def _bump_shared_version(model_name: str):
+    try:
+        from django.core.cache import cache
+
+        key = _VERSION_KEY.format(model=model_name)
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+    except Exception:
+        logger.exception("Failed to bump face index version")
+        return None
+
+
+class FaceEmbeddingIndex:
+    """Normalized embedding matrix for one recognition model."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.user_ids = np.array([], dtype=object)
+        self.version = None
+        self.loaded = False
+
+    def load(self) -> None:
+        from .models import FaceTemplate
+
+        version = _shared_version(self.model_name)
+        rows = FaceTemplate.objects.filter(model_name=self.model_name).values_list(
+            "user_id", "embedding_vector", "embedding"
+        )
+        vectors = []
+        user_ids = []
+        dim = 0
+        for user_id, packed, legacy in rows.iterator():
+            vec = _template_vector(packed, legacy)
+            vec = _normalize(vec) if vec is not None else None
+            if vec is None:
+                continue  # Skip corrupted embeddings
+            if not dim:
+                dim = vec.size
+            if vec.size != dim:
+                continue
+            vectors.append(vec)
+            user_ids.append(str(user_id))
+        if vectors:
+            self.matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.user_ids = np.array(user_ids, dtype=object)
+        self.version = version
+        self.loaded = True
+
+    def __len__(self) -> int:
+        return int(self.user_ids.size)
+
+    def upsert(self, user_id: str, vec) -> None:
+        normalized = _normalize(vec)
+        if normalized is None:
+            return
+        self.remove(user_id)
+        if len(self) and self.matrix.shape[1] != normalized.size:
+            # Different dimensionality than the rest of the model; let a reload sort it out
+            self.loaded = False
+            return
+        self.matrix = np.ascontiguousarray(
+            np.vstack([self.matrix, normalized]) if len(self) else normalized[np.newaxis, :],
+            dtype=np.float32,
+        )
+        self.user_ids = np.append(self.user_ids, np.array([str(user_id)], dtype=object))
+
+    def remove(self, user_id: str) -> None:
+        if not len(self):
+            return
+        keep = self.user_ids != str(user_id)
+        if bool(keep.all()):
+            return
+        self.matrix = np.ascontiguousarray(self.matrix[keep], dtype=np.float32)
+        self.user_ids = self.user_ids[keep]
+
+    def best_match(self, query) -> Tuple[Optional[str], float]:
+        """Return (user_id, cosine_distance) of the closest template."""
+        normalized = _normalize(query)
+        if normalized is None or not len(self) or self.matrix.shape[1] != normalized.size:
+            return None, float("inf")
+        similarities = self.matrix @ normalized
+        best = int(np.argmax(similarities))
+        return str(self.user_ids[best]), float(1.0 - similarities[best])
+
+
+_indexes: dict[str, FaceEmbeddingIndex] = {}
+_lock = threading.Lock()
+
+
+def get_face_index(model_name: str) -> FaceEmbeddingIndex:
+    with _lock:
+        index = _indexes.get(model_name)
+        if index is None:
+            index = _indexes[model_name] = FaceEmbeddingIndex(model_name)
+        if not index.loaded or index.version != _shared_version(model_name):
+            index.load()
+        return index
+
+
+def match_face(model_name: str, query) -> Tuple[Optional[str], float, int]:
+    """Return (user_id, distance, candidate_count) for the best template of ``model_name``."""
+    index = get_face_index(model_name)
+    with _lock:
+        user_id, distance = index.best_match(query)
+        return user_id, distance, len(index)
+
+
+def _patched(index: FaceEmbeddingIndex, version) -> None:
+    # Only trust the patch when no other worker changed the model in between
+    if version is not None and index.version is not None and version == index.version + 1:
+        index.version = version
+    else:
+        index.loaded = False
+
+
+def face_template_saved(user_id, model_name: str, vec, previous_model: Optional[str] = None) -> None:
+    """Patch local indexes after a template is created or updated."""
+    with _lock:
+        if previous_model and previous_model != model_name:
+            stale = _indexes.get(previous_model)
+            version = _bump_shared_version(previous_model)
+            if stale is not None and stale.loaded:
+                stale.remove(str(user_id))
+                _patched(stale, version)
+        index = _indexes.get(model_name)
+        version = _bump_shared_version(model_name)
+        if index is not None and index.loaded:
+            index.upsert(str(user_id), vec)
+            _patched(index, version)
+
+
+def face_template_removed(user_id, model_name: str) -> None:
+    with _lock:
+        index = _indexes.get(model_name)
+        version = _bump_shared_version(model_name)
+        if index is not None and index.loaded:
+            index.remove(str(user_id))
+            _patched(index, version)
+
+
+def clear_face_indexes() -> None:
+    with _lock:
+        _indexes.clear()
+
+
+__all__ = [
+    "FaceEmbeddingIndex",
+    "pack_embedding",
+    "unpack_embedding",
+    "get_face_index",
+    "match_face",
+    "face_template_saved",
+    "face_template_removed",
+    "clear_face_indexes",
+]
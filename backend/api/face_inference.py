@@ -0,0 +1,277 @@
+"""DeepFace inference service for face registration and login.
+
+Keeps the recognition model and face detector warm for the lifetime of the
+worker and runs inference off the request thread on a small bounded pool:
+
+- ``warm()`` builds the configured model(s) and detector once; it is scheduled
+  at startup when ``FACE_INFERENCE_PRELOAD`` is enabled.
+- Each request detects once (``DeepFace.extract_faces``) and embeds the aligned
+  crop it returned with ``detector_backend="skip"``, instead of detecting again.
+- At most ``FACE_INFERENCE_WORKERS`` inferences run at once and at most
+  ``FACE_INFERENCE_MAX_QUEUE`` more may wait; beyond that requests are rejected
+  with ``error="busy"``. Callers stop waiting after
+  ``FACE_INFERENCE_TIMEOUT_SECONDS`` and get ``error="timeout"``.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_MODELS = ("Facenet512", "VGG-Face", "ArcFace", "Facenet", "DeepFace")
+DEFAULT_MODEL = "Facenet512"
+MIN_DETECTION_CONFIDENCE = 0.85
+
+# Errors that mean "try again later" rather than "bad image"
+RETRYABLE_ERRORS = {"busy", "timeout"}
+
+
+def _import_deepface():
+    try:
+        from deepface import DeepFace
+        from PIL import Image
+    except ImportError:
+        return None, None
+    return DeepFace, Image
+
+
+def _aligned_crop_to_bgr(face) -> np.ndarray:
+    """Convert an ``extract_faces`` crop (float RGB in [0, 1]) back to uint8 in input channel order."""
+    crop = np.asarray(face)
+    if crop.dtype != np.uint8:
+        crop = np.clip(crop * 255.0 if float(crop.max(initial=0.0)) <= 1.0 else crop, 0, 255).astype(np.uint8)
+    if crop.ndim == 3 and crop.shape[2] == 3:
+        crop = crop[:, :, ::-1]
+    return np.ascontiguousarray(crop)
+
+
+def detect_and_embed(
+    image_bytes: bytes,
+    model_name: str = DEFAULT_MODEL,
+    enforce_detection: bool = True,
+    detector_backend: str = "opencv",
+) -> Tuple[Optional[np.ndarray], Optional[dict]]:
+    """Run detection once and embed the aligned crop. Runs on the calling thread."""
+    if not image_bytes:
+        return None, None
+
+    DeepFace, Image = _import_deepface()
+    if DeepFace is None:
+        return None, None
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img_array = np.array(img)
+
+        faces = DeepFace.extract_faces(
+            img_path=img_array,
+            detector_backend=detector_backend,
+            enforce_detection=enforce_detection,
+            align=True,
+        )
+
+        if not faces:
+            return None, {"error": "no_face_detected", "message": "No face detected in image"}
+
+        if len(faces) > 1:
+            return None, {"error": "multiple_faces", "message": "Multiple faces detected - ensure only one person is visible"}
+
+        face = faces[0]
+        confidence = face.get("confidence", 0)
+
+        if confidence < MIN_DETECTION_CONFIDENCE:
+            return None, {"error": "low_confidence", "message": "Face detection confidence too low - improve lighting or angle"}
+
+        # Reuse the aligned crop; "skip" bypasses a second detection pass
+        embeddings = DeepFace.represent(
+            img_path=_aligned_crop_to_bgr(face.get("face")),
+            model_name=model_name,
+            detector_backend="skip",
+            enforce_detection=False,
+            align=False,
+        )
+
+        if not embeddings:
+            return None, {"error": "embedding_failed", "message": "Failed to generate face embedding"}
+
+        embedding_vec = np.array(embeddings[0]["embedding"])
+
+        metadata = {
+            "confidence": confidence,
+            "face_area": face.get("facial_area", {}),
+            "model": model_name,
+            "embedding_dim": len(embedding_vec),
+        }
+        return embedding_vec, metadata
+
+    except ValueError as e:
+        # DeepFace raises ValueError for no face detected
+        return None, {"error": "no_face_detected", "message": str(e)}
+    except Exception as e:
+        return None, {"error": "processing_failed", "message": f"Image processing failed: {str(e)}"}
+
+
+class FaceInferenceService:
+    """Bounded worker pool around ``detect_and_embed`` with warm models."""
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_queue: int = 4,
+        timeout_seconds: float = 20.0,
+        detector_backend: str = "opencv",
+        runner=None,
+    ):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout_seconds = float(timeout_seconds)
+        self.detector_backend = detector_backend
+        self._runner = runner or detect_and_embed
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="face-infer")
+        # One slot per running or waiting inference
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._warm_lock = threading.Lock()
+        self._warm_models: set[str] = set()
+        self._detector_warm = False
+
+    # -- warm-up --
+
+    def _build_detector(self, DeepFace) -> None:
+        try:
+            DeepFace.build_model(model_name=self.detector_backend, task="face_detector")
+            return
+        except TypeError:
+            pass  # Older DeepFace without ``task``; build it through a throwaway detection
+        except Exception:
+            logger.debug("Detector build via build_model failed", exc_info=True)
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        DeepFace.extract_faces(img_path=blank, detector_backend=self.detector_backend, enforce_detection=False)
+
+    def warm_sync(self, model_names: Optional[Iterable[str]] = None) -> bool:
+        DeepFace, _ = _import_deepface()
+        if DeepFace is None:
+            return False
+        names = list(model_names or [DEFAULT_MODEL])
+        with self._warm_lock:
+            try:
+                if not self._detector_warm:
+                    self._build_detector(DeepFace)
+                    self._detector_warm = True
+                for name in names:
+                    if name in self._warm_models:
+                        continue
+                    started = time.perf_counter()
+                    DeepFace.build_model(name)
+                    self._warm_models.add(name)
+                    logger.info("Face model %s warmed in %.1fs", name, time.perf_counter() - started)
+            except Exception:
+                logger.exception("Face model warm-up failed")
+                return False
+        return True
+
+    def warm(self, model_names: Optional[Iterable[str]] = None):
+        """Warm models on the pool so startup is not blocked."""
+        return self._executor.submit(self.warm_sync, model_names)
+
+    def is_warm(self, model_name: str) -> bool:
+        return self._detector_warm and model_name in self._warm_models
+
+    # -- inference --
+
+    def _run(self, image_bytes, model_name, enforce_detection):
+        if not self.is_warm(model_name):
+            self.warm_sync([model_name])
+        return self._runner(
+            image_bytes,
+            model_name=model_name,
+            enforce_detection=enforce_detection,
+            detector_backend=self.detector_backend,
+        )
+
+    def infer(
+        self,
+        image_bytes: bytes,
+        model_name: str = DEFAULT_MODEL,
+        enforce_detection: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Tuple[Optional[np.ndarray], Optional[dict]]:
+        if not image_bytes:
+            return None, None
+        if not self._slots.acquire(blocking=False):
+            return None, {"error": "busy", "message": "Face recognition is busy - please try again shortly"}
+        try:
+            future = self._executor.submit(self._run, image_bytes, model_name, enforce_detection)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the work actually finishes, not when the caller gives up
+        future.add_done_callback(lambda _f: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout_seconds if timeout is None else timeout)
+        except FuturesTimeout:
+            future.cancel()
+            return None, {"error": "timeout", "message": "Face recognition timed out - please try again"}
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_service: Optional[FaceInferenceService] = None
+_service_lock = threading.Lock()
+
+
+def get_face_inference_service() -> FaceInferenceService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = FaceInferenceService(
+                    workers=int(getattr(settings, "FACE_INFERENCE_WORKERS", 1)),
+                    max_queue=int(getattr(settings, "FACE_INFERENCE_MAX_QUEUE", 4)),
+                    timeout_seconds=float(getattr(settings, "FACE_INFERENCE_TIMEOUT_SECONDS", 20)),
+                    detector_backend=getattr(settings, "FACE_INFERENCE_DETECTOR", "opencv") or "opencv",
+                )
+    return _service
+
+
+def reset_face_inference_service(service: Optional[FaceInferenceService] = None) -> None:
+    """Replace (or drop) the process-wide service, e.g. from tests."""
+    global _service
+    with _service_lock:
+        previous, _service = _service, service
+    if previous is not None and previous is not service:
+        previous.shutdown(wait=False)
+
+
+def preload_face_models() -> None:
+    """Schedule warm-up of the configured models when ``FACE_INFERENCE_PRELOAD`` is on."""
+    if not getattr(settings, "FACE_INFERENCE_PRELOAD", False):
+        return
+    models = [m for m in getattr(settings, "FACE_INFERENCE_MODELS", [DEFAULT_MODEL]) if m in SUPPORTED_MODELS]
+    try:
+        get_face_inference_service().warm(models or [DEFAULT_MODEL])
+    except Exception:
+        logger.exception("Failed to schedule face model preload")
+
+
+__all__ = [
+    "SUPPORTED_MODELS",
+    "DEFAULT_MODEL",
+    "RETRYABLE_ERRORS",
+    "FaceInferenceService",
+    "detect_and_embed",
+    "get_face_inference_service",
+    "reset_face_inference_service",
+    "preload_face_models",
+]
@@ -0,0 +1,125 @@
+"""Local stand-in for a Web Push service, for throughput tests and benchmarks.
+
+``FakePushEndpoint`` runs a threaded HTTP server on 127.0.0.1 that accepts the
+encrypted POSTs ``api.push_delivery`` sends and answers by path prefix:
+
+- ``/gone/...``    -> 410 Gone
+- ``/missing/...`` -> 404 Not Found
+- ``/busy/...``    -> 429 Too Many Requests
+- ``/error/...``   -> 500
+- anything else    -> 201 Created
+
+An optional per-request latency simulates a remote service. Requests are
+counted (``received``) and the peak number in flight is recorded so tests can
+check the concurrency limits.
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+_STATUS_BY_PREFIX = {"/gone/": 410, "/missing/": 404, "/busy/": 429, "/error/": 500}
+
+
+def _b64url(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def generate_vapid_private_key() -> str:
+    """A throwaway VAPID private key in the raw base64url form WEBPUSH_VAPID_PRIVATE_KEY accepts."""
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64url(key.private_numbers().private_value.to_bytes(32, "big"))
+
+
+def generate_subscription_keys() -> Tuple[str, str]:
+    """Browser-style ``(p256dh, auth)`` values so payloads can actually be encrypted."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    public = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return _b64url(public), _b64url(os.urandom(16))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like real push services
+
+    def do_POST(self):
+        endpoint = self.server.endpoint
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        endpoint._enter()
+        try:
+            if endpoint.latency:
+                time.sleep(endpoint.latency)
+            status = next((code for prefix, code in _STATUS_BY_PREFIX.items() if self.path.startswith(prefix)), 201)
+        finally:
+            endpoint._leave(self.path)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePushEndpoint:
+    """Threaded fake push service; use as a context manager or call start()/stop()."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self.received = 0
+        self.peak_in_flight = 0
+        self.paths = []
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.endpoint = self
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def url(self, path: str = "") -> str:
+        return f"http://127.0.0.1:{self.port}/{path.lstrip('/')}"
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+    def _leave(self, path: str):
+        with self._lock:
+            self._in_flight -= 1
+            self.received += 1
+            self.paths.append(path)
+
+    def start(self) -> "FakePushEndpoint":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-push", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,140 @@
+"""Local stand-in for an SMTP server, for mail queue tests and benchmarks.
+
+``FakeSMTPServer`` runs a threaded plain-text SMTP server on 127.0.0.1 that
+speaks enough of RFC 5321 for Django's SMTP backend (EHLO/HELO, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT). Accepted messages are parsed into ``messages``, and
+``connections`` counts the sessions opened so tests can check connection
+reuse. ``fail_next`` answers the next N messages with a temporary 451 error
+to exercise retries. An optional per-message latency simulates a slow relay.
+"""
+
+from __future__ import annotations
+
+import email
+import email.policy
+import socketserver
+import threading
+import time
+from typing import List
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server.smtp
+        server._opened()
+        self._reply("220 localhost fake SMTP ready")
+        recipients: List[str] = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost")
+                self._reply("250-8BITMIME")
+                self._reply("250 SMTPUTF8")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[-1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._take_failure():
+                    self._reply("451 Temporary failure, try again")
+                else:
+                    server._accepted(recipients, b"".join(lines))
+                    self._reply("250 OK queued")
+            elif verb in {"RSET", "NOOP"}:
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    """Threaded fake SMTP relay; use as a context manager or call start()/stop()."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self.connections = 0
+        self.messages = []
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.smtp = self
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def settings(self) -> dict:
+        """Django settings that route the SMTP backend here (for override_settings)."""
+        return {
+            "EMAIL_BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+            "EMAIL_HOST": "127.0.0.1",
+            "EMAIL_PORT": self.port,
+            "EMAIL_HOST_USER": "",
+            "EMAIL_HOST_PASSWORD": "",
+            "EMAIL_USE_TLS": False,
+            "EMAIL_USE_SSL": False,
+        }
+
+    def _opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def _take_failure(self) -> bool:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def _accepted(self, recipients, data: bytes):
+        message = email.message_from_bytes(data, policy=email.policy.default)
+        with self._lock:
+            self.messages.append((recipients, message))
+
+    def start(self) -> "FakeSMTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Iterable, List, Optional, Sequence, Tuple, Dict
 
-from django.db import transaction
-from django.db.models import Sum, Q, F
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone as dj_tz
 
 from .models import (
@@ -16,6 +17,9 @@ from .models import (
     Location,
     ReorderSetting,
     AppUser,
+    StockBalance,
+    StockSnapshot,
+    StockSnapshotLine,
 )
 from .utils_dbtime import db_now
 
@@ -23,6 +27,10 @@ from .utils_dbtime import db_now
 DEC0 = Decimal("0")
 Q2 = Decimal("0.01")
 
+# Snapshots cover movements older than this, so in-flight transactions that
+# already stamped recorded_at but have not committed yet are not missed.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
 
 def get_db_now() -> datetime:
     return db_now()
@@ -44,6 +52,51 @@ def _q2(val) -> Decimal:
         return DEC0
 
 
+def _batch_key(batch_id) -> str:
+    return str(batch_id) if batch_id else ""
+
+
+def _apply_balance_delta(item_id, location_id, batch_id, delta: Decimal) -> None:
+    """Add ``delta`` to the (item, location, batch) balance; call inside the movement's transaction."""
+    if delta == DEC0:
+        return
+    key = _batch_key(batch_id)
+    rows = StockBalance.objects.filter(item_id=item_id, location_id=location_id, batch_key=key)
+    if rows.update(qty=F("qty") + delta, updated_at=dj_tz.now()):
+        return
+    try:
+        with transaction.atomic():
+            StockBalance.objects.create(
+                item_id=item_id,
+                location_id=location_id,
+                batch_id=batch_id or None,
+                batch_key=key,
+                qty=delta,
+            )
+    except IntegrityError:
+        # Another transaction created the row first
+        rows.update(qty=F("qty") + delta, updated_at=dj_tz.now())
+
+
+def _create_movement(**fields) -> StockMovement:
+    """Write a ledger row and fold it into ``StockBalance`` atomically."""
+    with transaction.atomic():
+        mv = StockMovement.objects.create(**fields)
+        _apply_balance_delta(mv.item_id, mv.location_id, mv.batch_id, _as_decimal(mv.qty))
+    return mv
+
+
+def _locked_batch_balances(item_id: str, location_id: str) -> Dict[str, Decimal]:
+    """Lock and return {batch_key: qty} at a location so concurrent consumers cannot oversell."""
+    rows = (
+        StockBalance.objects.select_for_update()
+        .filter(item_id=item_id, location_id=location_id)
+        .order_by("batch_key")
+        .values_list("batch_key", "qty")
+    )
+    return {key: _as_decimal(qty) for key, qty in rows}
+
+
 def _maybe_notify_low_stock(item_ids: Sequence[str]):
     """If any items are below configured low_stock_threshold, notify managers/admins.
 
@@ -63,18 +116,19 @@ def _maybe_notify_low_stock(item_ids: Sequence[str]):
             return
         from .models import InventoryItem, AppUser, Notification
         items = {str(x.id): x for x in InventoryItem.objects.filter(id__in=low)}
-        managers = list(AppUser.objects.filter(role__in=["manager", "admin"]))
+        manager_ids = list(AppUser.objects.filter(role__in=["manager", "admin"]).values_list("id", flat=True))
+        rows = []
         for iid in low:
             it = items.get(iid)
             if not it:
                 continue
             title = f"Low stock: {it.name}"
             msg = f"Item '{it.name}' is at or below threshold. Current: {float(totals.get(iid, DEC0) or 0)}"
-            for u in managers:
-                try:
-                    n = Notification.objects.create(user=u, title=title, message=msg, type="warning")
-                except Exception:
-                    continue
+            rows.extend(Notification(user_id=uid, title=title, message=msg, type="warning") for uid in manager_ids)
+        if rows:
+            Notification.objects.bulk_create(rows, batch_size=500)
+            from .notification_inbox import touch
+            touch(manager_ids)
     except Exception:
         # best-effort
         return
@@ -87,17 +141,18 @@ def get_current_stock(
 ) -> Dict[str, Decimal]:
     """Return current stock per item as a dict {item_id: qty}.
 
-    - Sums StockMovement.qty filtered by item/location/effective_at<=as_of.
+    - Without as_of, reads the materialized StockBalance rows.
+    - With as_of, starts from the latest snapshot at or before as_of and adds the ledger tail.
     - If location_id is None, sums across all locations.
     """
-    qs = StockMovement.objects.all()
+    if as_of:
+        return _stock_as_of(as_of, item_ids=item_ids, location_id=location_id)
+    qs = StockBalance.objects.all()
     if item_ids:
         qs = qs.filter(item_id__in=list(item_ids))
     if location_id:
         qs = qs.filter(location_id=location_id)
-    if as_of:
-        qs = qs.filter(effective_at__lte=as_of)
-    agg = qs.values("item_id").annotate(total=Sum("qty"))
+    agg = qs.values("item_id").annotate(total=Sum("qty")).order_by()
     out: Dict[str, Decimal] = {}
     for row in agg:
         out[str(row["item_id"])] = _as_decimal(row["total"]) or DEC0
@@ -113,20 +168,94 @@ def get_batch_stock_by_location(
 
     Returns {batch_id: qty} considering movements until as_of.
     """
-    qs = StockMovement.objects.filter(item_id=item_id)
+    if as_of:
+        return _stock_as_of(as_of, item_ids=[item_id], location_id=location_id, by_batch=True)
+    qs = StockBalance.objects.filter(item_id=item_id).exclude(batch_key="")
     if location_id:
         qs = qs.filter(location_id=location_id)
-    if as_of:
-        qs = qs.filter(effective_at__lte=as_of)
-    agg = qs.values("batch_id").annotate(total=Sum("qty"))
-    res: Dict[str, Decimal] = {}
-    for row in agg:
-        bid = row["batch_id"]
-        if bid is None:
-            # Unbatched stock not tracked per batch
-            continue
-        res[str(bid)] = _as_decimal(row["total"]) or DEC0
-    return res
+    agg = qs.values("batch_key").annotate(total=Sum("qty")).order_by()
+    return {row["batch_key"]: _as_decimal(row["total"]) or DEC0 for row in agg}
+
+
+def _stock_as_of(
+    as_of: datetime,
+    *,
+    item_ids: Optional[Sequence[str]] = None,
+    location_id: Optional[str] = None,
+    by_batch: bool = False,
+) -> Dict[str, Decimal]:
+    """Historical stock: snapshot lines plus movements the snapshot did not cover.
+
+    Falls back to summing the ledger when no snapshot predates as_of.
+    """
+    movements = StockMovement.objects.filter(effective_at__lte=as_of)
+    if item_ids:
+        movements = movements.filter(item_id__in=list(item_ids))
+    if location_id:
+        movements = movements.filter(location_id=location_id)
+    mv_field = "batch_id" if by_batch else "item_id"
+
+    out: Dict[str, Decimal] = {}
+
+    def _add(key, total):
+        if key is None or key == "":
+            return  # Unbatched stock is not tracked per batch
+        out[str(key)] = out.get(str(key), DEC0) + (_as_decimal(total) or DEC0)
+
+    snapshot = StockSnapshot.objects.filter(as_of__lte=as_of).order_by("-as_of").first()
+    if snapshot is not None:
+        lines = StockSnapshotLine.objects.filter(snapshot=snapshot)
+        if item_ids:
+            lines = lines.filter(item_id__in=list(item_ids))
+        if location_id:
+            lines = lines.filter(location_id=location_id)
+        line_field = "batch_key" if by_batch else "item_id"
+        for row in lines.values(line_field).annotate(total=Sum("qty")).order_by():
+            _add(row[line_field], row["total"])
+        # Movements after the snapshot, or backdated into it after it was taken
+        movements = movements.filter(Q(effective_at__gt=snapshot.as_of) | Q(recorded_at__gt=snapshot.taken_at))
+
+    for row in movements.values(mv_field).annotate(total=Sum("qty")).order_by():
+        _add(row[mv_field], row["total"])
+    return out
+
+
+@transaction.atomic
+def take_stock_snapshot(as_of: Optional[datetime] = None) -> StockSnapshot:
+    """Copy balances (minus movements newer than the cutoff) into a snapshot for as_of reads."""
+    cutoff = as_of or (get_db_now() - SNAPSHOT_LAG)
+    totals: Dict[Tuple[str, str, str], Decimal] = {}
+    for item_id, location_id, key, qty in StockBalance.objects.values_list("item_id", "location_id", "batch_key", "qty"):
+        totals[(str(item_id), str(location_id), key)] = _as_decimal(qty)
+    newer = (
+        StockMovement.objects.filter(Q(effective_at__gt=cutoff) | Q(recorded_at__gt=cutoff))
+        .values("item_id", "location_id", "batch_id")
+        .annotate(total=Sum("qty"))
+        .order_by()
+    )
+    for row in newer:
+        k = (str(row["item_id"]), str(row["location_id"]), _batch_key(row["batch_id"]))
+        totals[k] = totals.get(k, DEC0) - _as_decimal(row["total"])
+    snapshot = StockSnapshot.objects.create(as_of=cutoff, taken_at=cutoff)
+    StockSnapshotLine.objects.bulk_create(
+        [
+            StockSnapshotLine(snapshot=snapshot, item_id=i, location_id=l, batch_key=b, qty=q)
+            for (i, l, b), q in totals.items()
+            if q != DEC0
+        ],
+        batch_size=1000,
+    )
+    return snapshot
+
+
+def prune_stock_snapshots(keep_days: int = 35) -> int:
+    """Delete snapshots older than keep_days, always keeping the newest one."""
+    latest = StockSnapshot.objects.order_by("-as_of").values_list("id", flat=True).first()
+    if latest is None:
+        return 0
+    cutoff = get_db_now() - timedelta(days=max(1, int(keep_days)))
+    deleted, _ = StockSnapshot.objects.filter(as_of__lt=cutoff).exclude(id=latest).delete()
+    return deleted
 
 
 def get_expiring_batches(
@@ -136,16 +265,13 @@ def get_expiring_batches(
 ) -> List[Batch]:
     now = get_db_now().date()
     limit = now + timedelta(days=int(days or 0))
-    qs = Batch.objects.filter(expiry_date__isnull=False, expiry_date__lte=limit)
+    qs = Batch.objects.select_related("item").filter(expiry_date__isnull=False, expiry_date__lte=limit)
     if item_ids:
         qs = qs.filter(item_id__in=list(item_ids))
     # If location provided, keep batches that still have stock at location
     if location_id:
         batch_ids_with_stock = (
-            StockMovement.objects.filter(location_id=location_id)
-            .values("batch_id")
-            .annotate(total=Sum("qty"))
-            .filter(total__gt=0)
+            StockBalance.objects.filter(location_id=location_id, batch__isnull=False, qty__gt=0)
             .values_list("batch_id", flat=True)
         )
         qs = qs.filter(id__in=batch_ids_with_stock)
@@ -171,22 +297,32 @@ def get_stock_ledger(
     return list(qs[:1000])
 
 
-def get_low_stock(item_ids: Optional[Sequence[str]] = None) -> List[Tuple[InventoryItem, Decimal]]:
-    settings_qs = ReorderSetting.objects.select_related("item", "location").all()
+def get_low_stock(
+    item_ids: Optional[Sequence[str]] = None,
+    location_id: Optional[str] = None,
+) -> List[Tuple[InventoryItem, Decimal]]:
+    """Return (item, on_hand) for every reorder setting at or below its reorder point.
+
+    One query: each ReorderSetting is joined to its (item, location) balance in SQL.
+    """
+    on_hand = (
+        StockBalance.objects.filter(item_id=OuterRef("item_id"), location_id=OuterRef("location_id"))
+        .order_by()
+        .values("item_id")
+        .annotate(total=Sum("qty"))
+        .values("total")[:1]
+    )
+    qty_field = DecimalField(max_digits=14, decimal_places=4)
+    settings_qs = (
+        ReorderSetting.objects.select_related("item")
+        .annotate(on_hand=Coalesce(Subquery(on_hand, output_field=qty_field), Value(DEC0, output_field=qty_field)))
+        .filter(on_hand__lte=F("reorder_point"))
+    )
     if item_ids:
         settings_qs = settings_qs.filter(item_id__in=list(item_ids))
-    # Aggregate current stock per (item, location)
-    pairs = list(settings_qs.values_list("item_id", "location_id", "reorder_point"))
-    by_item_loc: Dict[Tuple[str, str], Decimal] = {}
-    for item_id, location_id, _ in pairs:
-        stock_map = get_current_stock([item_id], location_id)
-        by_item_loc[(str(item_id), str(location_id))] = stock_map.get(str(item_id), DEC0)
-    low = []
-    for rs in settings_qs:
-        qty = by_item_loc.get((str(rs.item_id), str(rs.location_id)), DEC0)
-        if qty <= _as_decimal(rs.reorder_point):
-            low.append((rs.item, qty))
-    return low
+    if location_id:
+        settings_qs = settings_qs.filter(location_id=location_id)
+    return [(rs.item, _as_decimal(rs.on_hand)) for rs in settings_qs]
 
 
 def get_last_stock_update(item_id: str, location_id: Optional[str] = None) -> Optional[Tuple[datetime, datetime]]:
@@ -229,7 +365,7 @@ def record_receipt(
             unit_cost=batch_payload.get("unit_cost"),
         )
     now = get_db_now()
-    mv = StockMovement.objects.create(
+    mv = _create_movement(
         item=item,
         location=location,
         batch=batch,
@@ -253,9 +389,15 @@ def record_receipt(
     return mv
 
 
-def _fefo_batches_with_available(item_id: str, location_id: str) -> List[Tuple[Batch, Decimal]]:
+def _fefo_batches_with_available(
+    item_id: str,
+    location_id: str,
+    per_batch: Optional[Dict[str, Decimal]] = None,
+) -> List[Tuple[Batch, Decimal]]:
     # Compute available per batch at location
-    per_batch = get_batch_stock_by_location(item_id=item_id, location_id=location_id)
+    if per_batch is None:
+        per_batch = get_batch_stock_by_location(item_id=item_id, location_id=location_id)
+    per_batch = {k: v for k, v in per_batch.items() if k and v > DEC0}
     if not per_batch:
         return []
     batches = Batch.objects.filter(id__in=list(per_batch.keys())).all()
@@ -265,7 +407,7 @@ def _fefo_batches_with_available(item_id: str, location_id: str) -> List[Tuple[B
         annotated.append((b, per_batch.get(str(b.id), DEC0)))
     annotated.sort(key=lambda t: (
         t[0].expiry_date or datetime.max.date(),
-        t[0].received_at or datetime.max.replace(tzinfo=dj_tz.utc),
+        t[0].received_at or datetime.max.replace(tzinfo=dt_timezone.utc),
         str(t[0].id),
     ))
     return annotated
@@ -287,21 +429,22 @@ def consume_for_order(
     movements: List[StockMovement] = []
     affected_ids = set()
     for item, req_qty in components:
-        # Prevent over-consumption: ensure sufficient stock at location
-        avail_total = get_current_stock([str(item.id)], location_id=str(location.id)).get(str(item.id), DEC0)
+        # Prevent over-consumption: lock the location's balances and check availability
+        per_batch = _locked_batch_balances(str(item.id), str(location.id))
+        avail_total = sum(per_batch.values(), DEC0)
         remaining = _as_decimal(req_qty)
         if remaining <= DEC0:
             continue
         if remaining > avail_total:
             raise ValueError(f"Insufficient stock for item {item.name}: need {remaining}, have {avail_total}")
         if fefo:
-            for batch, avail in _fefo_batches_with_available(str(item.id), str(location.id)):
+            for batch, avail in _fefo_batches_with_available(str(item.id), str(location.id), per_batch):
                 if remaining <= DEC0:
                     break
                 take = min(remaining, avail)
                 if take <= DEC0:
                     continue
-                mv = StockMovement.objects.create(
+                mv = _create_movement(
                     item=item,
                     location=location,
                     batch=batch,
@@ -319,7 +462,7 @@ def consume_for_order(
         # If still remaining (due to no batches), do not over-consume
         if remaining > DEC0:
             # At this point, since avail_total was enough, this path should be rare (unbatched stock)
-            mv = StockMovement.objects.create(
+            mv = _create_movement(
                 item=item,
                 location=location,
                 batch=None,
@@ -363,11 +506,11 @@ def adjust_stock(
     if delta == DEC0:
         raise ValueError("delta_qty cannot be zero")
     # Prevent negative stock if adjustment would make it negative
-    current = get_current_stock([str(item.id)], str(location.id)).get(str(item.id), DEC0)
+    current = sum(_locked_batch_balances(str(item.id), str(location.id)).values(), DEC0)
     if current + delta < DEC0:
         raise ValueError("Adjustment would result in negative stock")
     now = get_db_now()
-    mv = StockMovement.objects.create(
+    mv = _create_movement(
         item=item,
         location=location,
         batch=None,
@@ -408,7 +551,8 @@ def transfer_stock(
     if amount <= DEC0:
         raise ValueError("qty must be positive to transfer")
     # Prevent over-transfer
-    avail_total = get_current_stock([str(item.id)], location_id=str(from_location.id)).get(str(item.id), DEC0)
+    per_batch = _locked_batch_balances(str(item.id), str(from_location.id))
+    avail_total = sum(per_batch.values(), DEC0)
     if amount > avail_total:
         raise ValueError(f"Insufficient stock to transfer: need {amount}, have {avail_total}")
     now = get_db_now()
@@ -416,14 +560,14 @@ def transfer_stock(
     movements: List[StockMovement] = []
     remaining = amount
     # Transfer by batches using FEFO from source
-    for batch, avail in _fefo_batches_with_available(str(item.id), str(from_location.id)):
+    for batch, avail in _fefo_batches_with_available(str(item.id), str(from_location.id), per_batch):
         if remaining <= DEC0:
             break
         take = min(remaining, avail)
         if take <= DEC0:
             continue
         # Out from source
-        mv_out = StockMovement.objects.create(
+        mv_out = _create_movement(
             item=item,
             location=from_location,
             batch=batch,
@@ -437,7 +581,7 @@ def transfer_stock(
             reason="Transfer out",
         )
         # In to destination
-        mv_in = StockMovement.objects.create(
+        mv_in = _create_movement(
             item=item,
             location=to_location,
             batch=batch,
@@ -454,7 +598,7 @@ def transfer_stock(
         remaining -= take
     # If still remaining, transfer unbatched
     if remaining > DEC0:
-        mv_out = StockMovement.objects.create(
+        mv_out = _create_movement(
             item=item,
             location=from_location,
             batch=None,
@@ -467,7 +611,7 @@ def transfer_stock(
             reference_id=f"{from_location.id}->{to_location.id}",
             reason="Transfer out (unbatched)",
         )
-        mv_in = StockMovement.objects.create(
+        mv_in = _create_movement(
             item=item,
             location=to_location,
             batch=None,
@@ -496,6 +640,8 @@ __all__ = [
     "get_db_now",
     "get_current_stock",
     "get_batch_stock_by_location",
+    "take_stock_snapshot",
+    "prune_stock_snapshots",
     "get_expiring_batches",
     "get_stock_ledger",
     "get_low_stock",
@@ -0,0 +1,133 @@
+"""Loyalty points: append-only ``LoyaltyLedger`` plus the running balance.
+
+Every change goes through ``post_entry`` which, in one transaction, locks the
+user row, moves ``AppUser.credit_points`` and appends the ledger entry with
+the resulting ``balance_after``. Balance reads (checkout, the points
+endpoint) are therefore a single primary-key lookup instead of a sum over the
+customer's order history. ``idempotency_key`` makes retried earn/redeem calls
+(payment retries, double taps) a no-op. Points are debited when the order
+is placed; ``refund_order`` credits them back once if the order is later
+cancelled, voided or refunded. ``reconcile_loyalty_balances`` verifies the
+cached balances against the ledger.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal, ROUND_DOWN
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .models import AppUser, LoyaltyLedger
+
+DEC0 = Decimal("0.00")
+# Order statuses that hand the points spent on the order back
+REFUND_STATUSES = {"cancelled", "canceled", "voided", "refunded"}
+Q2 = Decimal("0.01")
+
+
+class InsufficientPoints(ValueError):
+    def __init__(self, available: Decimal):
+        super().__init__("Not enough credit points")
+        self.available = available
+
+
+def _points(val) -> Decimal:
+    return Decimal(str(val or 0)).quantize(Q2, rounding=ROUND_DOWN)
+
+
+def get_balance(user_id) -> Decimal:
+    """Current balance for ``user_id`` (one indexed lookup, no ledger scan)."""
+    value = AppUser.objects.filter(id=user_id).values_list("credit_points", flat=True).first()
+    return value if value is not None else DEC0
+
+
+def post_entry(
+    user_id,
+    points,
+    *,
+    kind: str,
+    order=None,
+    reason: str = "",
+    idempotency_key: Optional[str] = None,
+) -> Optional[LoyaltyLedger]:
+    """Apply ``points`` (signed) to the balance and record it.
+
+    Raises ``InsufficientPoints`` when a debit would take the balance below
+    zero. Returns the existing entry for a repeated ``idempotency_key`` and
+    ``None`` when ``points`` rounds to zero.
+    """
+    from .views_common import invalidate_actor_cache
+
+    points = _points(points)
+    if points == DEC0:
+        return None
+    if idempotency_key:
+        existing = LoyaltyLedger.objects.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+    try:
+        with transaction.atomic():
+            current = (
+                AppUser.objects.select_for_update()
+                .filter(id=user_id)
+                .values_list("credit_points", flat=True)
+                .get()
+            )
+            balance = (current or DEC0) + points
+            if points < DEC0 and balance < DEC0:
+                raise InsufficientPoints(current or DEC0)
+            AppUser.objects.filter(id=user_id).update(credit_points=balance)
+            entry = LoyaltyLedger.objects.create(
+                user_id=user_id,
+                order=order,
+                kind=kind,
+                points=points,
+                balance_after=balance,
+                reason=reason[:255],
+                idempotency_key=idempotency_key or None,
+            )
+    except IntegrityError:
+        # A concurrent retry with the same key won the race
+        if idempotency_key:
+            existing = LoyaltyLedger.objects.filter(idempotency_key=idempotency_key).first()
+            if existing:
+                return existing
+        raise
+    # .update() skips post_save, so drop the cached actor explicitly
+    invalidate_actor_cache(user_id)
+    return entry
+
+
+def earn(user_id, points, *, order=None, reason: str = "", idempotency_key: Optional[str] = None):
+    return post_entry(
+        user_id, abs(_points(points)), kind=LoyaltyLedger.KIND_EARN,
+        order=order, reason=reason, idempotency_key=idempotency_key,
+    )
+
+
+def redeem(user_id, points, *, order=None, reason: str = "", idempotency_key: Optional[str] = None):
+    return post_entry(
+        user_id, -abs(_points(points)), kind=LoyaltyLedger.KIND_REDEEM,
+        order=order, reason=reason, idempotency_key=idempotency_key,
+    )
+
+
+def refund_order(order) -> Optional[LoyaltyLedger]:
+    """Credit back what was redeemed for ``order`` (once per order)."""
+    if not getattr(order, "placed_by_id", None):
+        return None
+    spent = -(
+        LoyaltyLedger.objects.filter(order=order, kind=LoyaltyLedger.KIND_REDEEM).aggregate(total=Sum("points"))["total"]
+        or DEC0
+    )
+    if spent <= DEC0:
+        return None
+    return post_entry(
+        order.placed_by_id, spent, kind=LoyaltyLedger.KIND_ADJUST,
+        order=order, reason="Cancelled order", idempotency_key=f"order:{order.id}:refund",
+    )
+
+
+__all__ = ["InsufficientPoints", "REFUND_STATUSES", "earn", "get_balance", "post_entry", "redeem", "refund_order"]
@@ -0,0 +1,263 @@
+"""In-process mail queue so requests never wait on SMTP.
+
+``send_async(message)`` hands a prepared ``EmailMessage`` to a bounded queue
+once the current transaction commits and returns immediately. One daemon
+thread per process drains it:
+
+- messages are taken in batches of up to ``MAIL_QUEUE_BATCH_SIZE`` and sent
+  over one persistent backend connection that stays open between batches
+  until it has been idle for ``MAIL_QUEUE_IDLE_SECONDS``;
+- a message that fails with a temporary error (4xx, dropped connection) is
+  retried with exponential backoff from ``MAIL_QUEUE_RETRY_SECONDS`` up to
+  ``MAIL_QUEUE_MAX_ATTEMPTS`` times; permanent 5xx rejections are not retried;
+- a broken connection is closed and reopened for the next message.
+
+If the queue is full the message is sent inline instead of being dropped.
+Set ``MAIL_QUEUE_ASYNC = False`` to always send inline (the previous
+behaviour). ``mail_queue_stats()`` reports counters; ``flush_mail`` waits for
+the queue to drain (also run at exit).
+"""
+
+from __future__ import annotations
+
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 500 <= exc.smtp_code < 600
+    return False
+
+
+def _connection_usable(exc: Exception) -> bool:
+    # smtplib resets the session after a rejected message; anything else
+    # (disconnects, socket errors) leaves the connection in an unknown state
+    return isinstance(exc, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+
+
+def _send_now(message) -> None:
+    try:
+        message.connection = get_connection(fail_silently=True)
+        message.send(fail_silently=True)
+    except Exception as exc:
+        logger.warning(f"Email to {message.to} failed: {exc}")
+
+
+class MailQueue:
+    """Bounded queue drained by a background sender thread with connection reuse."""
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        batch_size: int = 50,
+        max_attempts: int = 3,
+        retry_seconds: float = 5.0,
+        idle_seconds: float = 30.0,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = max(0.0, retry_seconds)
+        self.idle_seconds = max(0.0, idle_seconds)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._retry = []  # heap of (due, seq, attempts, message); worker thread only
+        self._seq = itertools.count()
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "overflow": 0, "connections": 0}
+
+    def submit(self, message) -> bool:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self.stats["overflow"] += 1
+            return False
+        with self._lock:
+            self.stats["queued"] += 1
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._connection = None
+            self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        """Up to ``batch_size`` ``(attempts, message, from_queue)`` entries; waits for the first."""
+        batch = []
+        now = time.monotonic()
+        while self._retry and self._retry[0][0] <= now and len(batch) < self.batch_size:
+            _, _, attempts, message = heapq.heappop(self._retry)
+            batch.append((attempts, message, False))
+        if not batch:
+            waits = []
+            if self._retry:
+                waits.append(self._retry[0][0] - now)
+            if self._connection is not None:
+                waits.append(self._last_used + self.idle_seconds - now)
+            timeout = max(0.0, min(waits)) if waits else None
+            try:
+                batch.append((0, self._queue.get(timeout=timeout), True))
+            except queue.Empty:
+                return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append((0, self._queue.get_nowait(), True))
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self):
+        if self._connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._connection = connection
+            with self._lock:
+                self.stats["connections"] += 1
+        return self._connection
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _deliver(self, attempts, message):
+        try:
+            message.connection = self._open()
+            message.send(fail_silently=False)
+            with self._lock:
+                self.stats["sent"] += 1
+        except Exception as exc:
+            if not _connection_usable(exc):
+                self._close()
+            attempts += 1
+            if attempts >= self.max_attempts or _is_permanent(exc):
+                with self._lock:
+                    self.stats["failed"] += 1
+                logger.warning(f"Email to {message.to} failed after {attempts} attempt(s): {exc}")
+                return
+            due = time.monotonic() + self.retry_seconds * (2 ** (attempts - 1))
+            heapq.heappush(self._retry, (due, next(self._seq), attempts, message))
+            with self._lock:
+                self.stats["retried"] += 1
+        finally:
+            self._last_used = time.monotonic()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._connection is not None and time.monotonic() - self._last_used >= self.idle_seconds:
+                    self._close()
+                continue
+            for attempts, message, from_queue in batch:
+                try:
+                    self._deliver(attempts, message)
+                except Exception:
+                    logger.exception("Mail queue delivery crashed")
+                finally:
+                    if from_queue:
+                        self._queue.task_done()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued message was sent or given up (or ``timeout`` passed)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._retry:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "pending": self._queue.qsize(),
+                "retrying": len(self._retry),
+                "connected": self._connection is not None,
+            }
+
+
+_mail_queue: Optional[MailQueue] = None
+_mail_queue_lock = threading.Lock()
+
+
+def get_mail_queue() -> MailQueue:
+    global _mail_queue
+    if _mail_queue is None:
+        with _mail_queue_lock:
+            if _mail_queue is None:
+                _mail_queue = MailQueue(
+                    maxsize=int(_setting("MAIL_QUEUE_MAX_SIZE", 1000)),
+                    batch_size=int(_setting("MAIL_QUEUE_BATCH_SIZE", 50)),
+                    max_attempts=int(_setting("MAIL_QUEUE_MAX_ATTEMPTS", 3)),
+                    retry_seconds=float(_setting("MAIL_QUEUE_RETRY_SECONDS", 5)),
+                    idle_seconds=float(_setting("MAIL_QUEUE_IDLE_SECONDS", 30)),
+                )
+    return _mail_queue
+
+
+def mail_queue_stats() -> dict:
+    return get_mail_queue().snapshot()
+
+
+def flush_mail(timeout: float = 10.0) -> bool:
+    return _mail_queue.flush(timeout) if _mail_queue is not None else True
+
+
+atexit.register(flush_mail, 5.0)
+
+
+def _enqueue(message) -> None:
+    if not get_mail_queue().submit(message):
+        logger.warning("Mail queue full; sending inline")
+        _send_now(message)
+
+
+def send_async(message) -> None:
+    """Queue ``message`` for delivery after the current transaction commits."""
+    if not _setting("MAIL_QUEUE_ASYNC", True):
+        _send_now(message)
+        return
+    try:
+        transaction.on_commit(lambda: _enqueue(message))
+    except Exception:
+        logger.exception("Failed to queue email; sending inline")
+        _send_now(message)
+
+
+__all__ = ["MailQueue", "flush_mail", "get_mail_queue", "mail_queue_stats", "send_async"]
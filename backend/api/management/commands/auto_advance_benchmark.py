@@ -0,0 +1,142 @@
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.auto_advance import _slot_for, advance_due, drain_due
+from api.models import MenuItem, Order, OrderEvent, OrderItem
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentiles(values):
+    if not values:
+        return "n/a"
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return f"p50 {pick(0.5):.2f}s, p95 {pick(0.95):.2f}s, max {ordered[-1]:.2f}s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure auto-advance throughput (batched vs one order at a time) and timer jitter "
+        "(scheduler slots vs the previous 10 s poll). Synthetic orders are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=500, help="Synthetic orders (default: 500)")
+        parser.add_argument("--items", type=int, default=3, help="Items per order (default: 3)")
+        parser.add_argument("--spread", type=float, default=5.0, help="Seconds over which jitter-run timers fall due")
+        parser.add_argument("--poll-interval", type=float, default=10.0, help="Previous beat interval (default: 10)")
+        parser.add_argument("--poll-limit", type=int, default=50, help="Previous per-tick limit (default: 50)")
+
+    def _seed(self, total, items, due_at):
+        tag = uuid4().hex[:8]
+        menu = MenuItem.objects.create(name=f"Auto advance bench {tag}", price=10, available=True)
+        orders = Order.objects.bulk_create(
+            [
+                Order(order_number=f"AB-{tag}-{i}", status="accepted", auto_advance_at=due_at(i), auto_advance_target="in_progress")
+                for i in range(total)
+            ],
+            batch_size=1000,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=o, menu_item=menu, item_name=menu.name, price=10, quantity=1, station_code="grill")
+                for o in orders
+                for _ in range(items)
+            ],
+            batch_size=1000,
+        )
+        return orders
+
+    def _reset(self, orders, due_at):
+        for i, order in enumerate(orders):
+            order.status = "accepted"
+            order.auto_advance_at = due_at(i)
+            order.auto_advance_target = "in_progress"
+        Order.objects.bulk_update(orders, ["status", "auto_advance_at", "auto_advance_target"], batch_size=1000)
+
+    def _throughput(self, orders, items):
+        now = timezone.now()
+        past = lambda i: now - timedelta(seconds=1)  # noqa: E731
+
+        self._reset(orders, past)
+        started = time.perf_counter()
+        totals = drain_due(max_batches=len(orders))
+        batched = time.perf_counter() - started
+
+        self._reset(orders, past)
+        started = time.perf_counter()
+        single = sum(advance_due(order_ids=[o.id])["advanced"] for o in orders)
+        one_at_a_time = time.perf_counter() - started
+
+        total = len(orders)
+        self.stdout.write(
+            f"Throughput ({total} orders x {items} items): batched {totals['advanced']} in {batched:.2f}s "
+            f"({total / batched:.0f}/s, {totals['batches']} batches); one at a time {single} in "
+            f"{one_at_a_time:.2f}s ({total / one_at_a_time:.0f}/s)"
+        )
+        return one_at_a_time / total
+
+    def _jitter(self, orders, spread, per_order_cost, interval, limit):
+        start = timezone.now() + timedelta(seconds=0.5)
+        step = spread / max(1, len(orders))
+        due_at = lambda i: start + timedelta(seconds=i * step)  # noqa: E731
+        self._reset(orders, due_at)
+        OrderEvent.objects.filter(order__in=orders).delete()
+
+        # Scheduler: one drain per armed slot at its ETA (what the Celery ETA tasks do)
+        slots = sorted({_slot_for(due_at(i)) for i in range(len(orders))})
+        from django.conf import settings
+
+        tick_ms = max(1, int(getattr(settings, "AUTO_ADVANCE_TICK_MS", 500)))
+        for slot in slots:
+            wait = slot * tick_ms / 1000.0 - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            drain_due(max_batches=len(orders))
+        fired = dict(
+            OrderEvent.objects.filter(order__in=orders, event_type="order.auto_advanced").values_list("order_id", "created_at")
+        )
+        lateness = [(fired[o.id] - due_at(i)).total_seconds() for i, o in enumerate(orders) if o.id in fired]
+        self.stdout.write(
+            f"Jitter, scheduler ({tick_ms} ms slots, {len(slots)} tasks for {len(orders)} timers): {_percentiles(lateness)}"
+        )
+
+        # Previous poll, modelled with the measured per-order cost: a tick every
+        # `interval` seconds advancing at most `limit` due orders one at a time
+        due = [i * step + 0.5 for i in range(len(orders))]
+        lateness, pending, tick = [], 0, 0.0
+        while pending < len(due):
+            tick += interval
+            clock = tick
+            ready = [d for d in due[pending:] if d <= tick][:limit]
+            for d in ready:
+                clock += per_order_cost
+                lateness.append(clock - d)
+            pending += len(ready)
+        self.stdout.write(
+            f"Jitter, {interval:.0f}s poll with limit {limit} (modelled, {per_order_cost * 1000:.1f} ms/order): "
+            f"{_percentiles(lateness)}"
+        )
+
+    def handle(self, *args, **options):
+        total = max(1, int(options["orders"]))
+        try:
+            with transaction.atomic():
+                orders = self._seed(total, max(1, options["items"]), lambda i: None)
+                per_order_cost = self._throughput(orders, options["items"])
+                self._jitter(orders, options["spread"], per_order_cost, options["poll_interval"], options["poll_limit"])
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Auto advance benchmark complete (synthetic data rolled back)"))
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.face_index import FaceEmbeddingIndex, pack_embedding, unpack_embedding
+from api.face_inference import DEFAULT_MODEL, SUPPORTED_MODELS, get_face_inference_service
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Command(BaseCommand):
+    help = "Benchmark face register/login latency (p50/p95) on sample images using the inference pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("images", nargs="+", help="Image files or directories of sample face images")
+        parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Recognition model (default: {DEFAULT_MODEL})")
+        parser.add_argument("--iterations", type=int, default=10, help="Passes over the sample images (default: 10)")
+        parser.add_argument("--concurrency", type=int, default=1, help="Concurrent requests (default: 1)")
+        parser.add_argument(
+            "--gallery", type=int, default=1000, help="Synthetic registered templates to match against (default: 1000)"
+        )
+
+    def _load_images(self, paths):
+        exts = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+        images = []
+        for raw in paths:
+            path = Path(raw)
+            files = sorted(p for p in path.iterdir() if p.suffix.lower() in exts) if path.is_dir() else [path]
+            for f in files:
+                if not f.is_file():
+                    raise CommandError(f"Not a file: {f}")
+                images.append((f.name, f.read_bytes()))
+        if not images:
+            raise CommandError("No sample images found")
+        return images
+
+    def _report(self, label, samples):
+        if not samples:
+            self.stdout.write(f"{label}: no successful samples")
+            return
+        self.stdout.write(
+            f"{label}: n={len(samples)} p50={_percentile(samples, 50):.1f}ms "
+            f"p95={_percentile(samples, 95):.1f}ms mean={statistics.fmean(samples):.1f}ms max={max(samples):.1f}ms"
+        )
+
+    def handle(self, *args, **options):
+        model_name = options["model"]
+        if model_name not in SUPPORTED_MODELS:
+            raise CommandError(f"Unsupported model {model_name}; choose from {', '.join(SUPPORTED_MODELS)}")
+        iterations = max(1, int(options["iterations"]))
+        concurrency = max(1, int(options["concurrency"]))
+        images = self._load_images(options["images"])
+        service = get_face_inference_service()
+
+        started = time.perf_counter()
+        if not service.warm_sync([model_name]):
+            raise CommandError("DeepFace is not available or failed to load the model")
+        self.stdout.write(f"Warm-up ({model_name}): {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        # Scratch index so login timing includes matching against a realistic gallery
+        index = FaceEmbeddingIndex(model_name)
+        index.loaded = True
+        index_lock = threading.Lock()
+        errors = {}
+
+        def register(name, raw):
+            t0 = time.perf_counter()
+            vec, meta = service.infer(raw, model_name=model_name)
+            if vec is None:
+                return None, (meta or {}).get("error", "failed")
+            with index_lock:
+                index.upsert(f"bench:{name}", unpack_embedding(pack_embedding(vec)))
+            return (time.perf_counter() - t0) * 1000.0, None
+
+        def login(name, raw):
+            t0 = time.perf_counter()
+            vec, meta = service.infer(raw, model_name=model_name)
+            if vec is None:
+                return None, (meta or {}).get("error", "failed")
+            with index_lock:
+                index.best_match(vec)
+            return (time.perf_counter() - t0) * 1000.0, None
+
+        def run(label, fn):
+            samples = []
+            jobs = [img for _ in range(iterations) for img in images]
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for elapsed, error in pool.map(lambda img: fn(*img), jobs):
+                    if error:
+                        errors[f"{label}:{error}"] = errors.get(f"{label}:{error}", 0) + 1
+                    else:
+                        samples.append(elapsed)
+            self._report(label, samples)
+
+        run("register", register)
+
+        dim = index.matrix.shape[1] if len(index) else 0
+        gallery = int(options["gallery"])
+        if dim and gallery > 0:
+            rng = np.random.default_rng(0)
+            synthetic = rng.standard_normal((gallery, dim)).astype(np.float32)
+            synthetic /= np.linalg.norm(synthetic, axis=1, keepdims=True)
+            index.matrix = np.ascontiguousarray(np.vstack([index.matrix, synthetic]), dtype=np.float32)
+            index.user_ids = np.concatenate(
+                [index.user_ids, np.array([f"synthetic:{i}" for i in range(gallery)], dtype=object)]
+            )
+        self.stdout.write(f"Gallery size: {len(index)} templates")
+
+        run("login", login)
+
+        for key, count in sorted(errors.items()):
+            self.stdout.write(self.style.WARNING(f"{key}: {count}"))
+        self.stdout.write(self.style.SUCCESS("Face benchmark complete"))
@@ -0,0 +1,97 @@
+import time
+from decimal import Decimal
+from io import StringIO
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.inventory_services import get_current_stock, get_low_stock
+from api.models import AppUser, InventoryItem, Location, ReorderSetting, StockBalance
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic items/locations inside a transaction, time get_low_stock and inventory_scan "
+        "(query count and wall time), then roll everything back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=5000, help="Synthetic inventory items (default: 5000)")
+        parser.add_argument("--locations", type=int, default=3, help="Synthetic locations (default: 3)")
+        parser.add_argument("--managers", type=int, default=3, help="Synthetic managers to notify (default: 3)")
+        parser.add_argument(
+            "--compare", action="store_true", help="Also time the per-(item, location) lookup this replaced"
+        )
+
+    def _measure(self, label, fn):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            result = fn()
+            elapsed = (time.perf_counter() - started) * 1000.0
+        self.stdout.write(f"{label}: {count[0]} queries, {elapsed:.1f}ms")
+        return result
+
+    def _seed(self, items, locations, managers):
+        tag = uuid4().hex[:8]
+        locs = Location.objects.bulk_create(
+            [Location(name=f"Bench {i}", code=f"bench-{tag}-{i}") for i in range(locations)]
+        )
+        inv = InventoryItem.objects.bulk_create(
+            [InventoryItem(name=f"Bench item {i}", unit="pc") for i in range(items)], batch_size=1000
+        )
+        settings_rows = []
+        balances = []
+        for n, item in enumerate(inv):
+            for loc in locs:
+                settings_rows.append(ReorderSetting(item=item, location=loc, reorder_point=Decimal("10")))
+                # Roughly a third of the pairs end up at or below the reorder point
+                balances.append(StockBalance(item=item, location=loc, qty=Decimal(n % 30)))
+        ReorderSetting.objects.bulk_create(settings_rows, batch_size=1000)
+        StockBalance.objects.bulk_create(balances, batch_size=1000)
+        AppUser.objects.bulk_create(
+            [
+                AppUser(email=f"bench-{tag}-{i}@example.invalid", name=f"Bench manager {i}", role="manager")
+                for i in range(managers)
+            ]
+        )
+
+    def _legacy_low_stock(self):
+        low = []
+        for rs in ReorderSetting.objects.select_related("item", "location"):
+            qty = get_current_stock([rs.item_id], rs.location_id).get(str(rs.item_id), Decimal("0"))
+            if qty <= rs.reorder_point:
+                low.append((rs.item, qty))
+        return low
+
+    def handle(self, *args, **options):
+        items = max(1, int(options["items"]))
+        locations = max(1, int(options["locations"]))
+        managers = max(0, int(options["managers"]))
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self._seed(items, locations, managers)
+                self.stdout.write(
+                    f"Seeded {items} items x {locations} locations in {(time.perf_counter() - started):.1f}s"
+                )
+                low = self._measure("get_low_stock", get_low_stock)
+                self.stdout.write(f"Low-stock pairs: {len(low)}")
+                if options["compare"]:
+                    self._measure("per-pair lookup (previous)", self._legacy_low_stock)
+                self._measure("inventory_scan", lambda: call_command("inventory_scan", stdout=StringIO()))
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Inventory benchmark complete (synthetic data rolled back)"))
@@ -4,6 +4,7 @@ from django.utils import timezone
 
 from api.inventory_services import get_low_stock, get_expiring_batches
 from api.models import Notification, AppUser
+from api.notification_inbox import touch
 
 
 class Command(BaseCommand):
@@ -17,28 +18,34 @@ class Command(BaseCommand):
         days = int(options.get("days") or 7)
         now = timezone.now()
         # Managers
-        managers = list(AppUser.objects.filter(role__in=["manager", "admin"]))
+        manager_ids = list(AppUser.objects.filter(role__in=["manager", "admin"]).values_list("id", flat=True))
+        rows = []
         # Low stock
         low = get_low_stock()
         for item, qty in low:
-            for u in managers:
-                Notification.objects.create(
-                    user=u,
+            rows.extend(
+                Notification(
+                    user_id=uid,
                     title=f"Low stock: {item.name}",
                     message=f"Current stock is {qty}. Reorder point may be reached.",
                     type=Notification.TYPE_WARNING,
                     meta={"itemId": str(item.id), "qty": float(qty)},
                 )
+                for uid in manager_ids
+            )
         # Expiring
         batches = get_expiring_batches(days)
         for b in batches:
-            for u in managers:
-                Notification.objects.create(
-                    user=u,
+            rows.extend(
+                Notification(
+                    user_id=uid,
                     title=f"Expiring soon: {getattr(b.item, 'name', '')}",
                     message=f"Batch {b.lot_code or b.id} expires on {b.expiry_date}",
                     type=Notification.TYPE_WARNING,
                     meta={"batchId": str(b.id), "expiryDate": b.expiry_date.isoformat() if b.expiry_date else None},
                 )
-        self.stdout.write(self.style.SUCCESS("Inventory scan complete"))
-
+                for uid in manager_ids
+            )
+        Notification.objects.bulk_create(rows, batch_size=500)
+        touch({row.user_id for row in rows})
+        self.stdout.write(self.style.SUCCESS(f"Inventory scan complete ({len(rows)} notifications)"))
@@ -0,0 +1,51 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.menu_images import process_menu_image
+from api.models import MenuItem
+
+
+def _run(item_id, force):
+    try:
+        return process_menu_image(item_id, force=force)
+    except Exception as exc:
+        return f"failed: {exc}"
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Generate WebP/JPEG responsive variants for existing menu item photos (menu_items/ media)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Parallel renders (default: 4)")
+        parser.add_argument("--force", action="store_true", help="Re-render items whose variants are up to date")
+        parser.add_argument("--limit", type=int, default=0, help="Process at most N items (default: all)")
+
+    def handle(self, *args, **options):
+        qs = MenuItem.objects.exclude(image="").exclude(image__isnull=True).order_by("name")
+        ids = list(qs.values_list("id", flat=True))
+        if options["limit"]:
+            ids = ids[: options["limit"]]
+        if not ids:
+            self.stdout.write("No menu item photos to process")
+            return
+
+        started = time.perf_counter()
+        results = Counter()
+        # Pillow releases the GIL while resizing and encoding, so threads scale
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            futures = {pool.submit(_run, item_id, options["force"]): item_id for item_id in ids}
+            for future in as_completed(futures):
+                result = future.result()
+                if result.startswith("failed"):
+                    self.stderr.write(f"{futures[future]}: {result}")
+                    result = "failed"
+                results[result] += 1
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name}" for name, count in sorted(results.items()))
+        self.stdout.write(self.style.SUCCESS(f"Menu image variants: {summary} ({len(ids)} items in {elapsed:.1f}s)"))
@@ -0,0 +1,90 @@
+import random
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api.menu_search import MenuSearchIndex, _load_documents
+from api.models import MenuItem
+
+WORDS = [
+    "adobo", "sisig", "sinigang", "kare", "lechon", "lumpia", "pancit", "bistek", "tocino", "longganisa",
+    "chicken", "pork", "beef", "shrimp", "garlic", "rice", "noodles", "soup", "grilled", "crispy",
+    "spicy", "sweet", "sour", "coconut", "mango", "ube", "leche", "flan", "halo", "turon",
+]
+QUERIES = ["chi", "chicken adobo", "sisgi", "pork cri", "mang", "garlc rice", "sweet sour pork", "ub"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return f"p50 {pick(0.5) * 1000:.3f} ms, p95 {pick(0.95) * 1000:.3f} ms"
+
+
+class Command(BaseCommand):
+    help = "Compare index search latency with the previous icontains filter. Synthetic items are rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=2000, help="Synthetic menu items (default: 2000)")
+        parser.add_argument("--rounds", type=int, default=50, help="Rounds over the query set (default: 50)")
+
+    def _seed(self, total):
+        rng = random.Random(7)
+        tag = uuid4().hex[:6]
+        MenuItem.objects.bulk_create(
+            [
+                MenuItem(
+                    name=f"{' '.join(rng.sample(WORDS, 2)).title()} {tag}{i}",
+                    category=rng.choice(["Mains", "Sides", "Desserts", "Drinks"]),
+                    description=" ".join(rng.sample(WORDS, 8)),
+                    ingredients=rng.sample(WORDS, 3),
+                    price=Decimal("100"),
+                )
+                for i in range(total)
+            ],
+            batch_size=1000,
+        )
+
+    def handle(self, *args, **options):
+        rounds = max(1, options["rounds"])
+        try:
+            with transaction.atomic():
+                self._seed(max(1, options["items"]))
+                started = time.perf_counter()
+                index = MenuSearchIndex(_load_documents())
+                build = time.perf_counter() - started
+                self.stdout.write(f"Index build: {len(index.documents)} items, {len(index.vocabulary)} terms in {build:.3f}s")
+
+                indexed, scanned = [], []
+                for _ in range(rounds):
+                    for query in QUERIES:
+                        started = time.perf_counter()
+                        index.search(query, 20)
+                        indexed.append(time.perf_counter() - started)
+                for query in QUERIES:
+                    started = time.perf_counter()
+                    list(
+                        MenuItem.objects.filter(
+                            Q(name__icontains=query) | Q(description__icontains=query) | Q(category__icontains=query)
+                        ).values_list("id", flat=True)[:20]
+                    )
+                    scanned.append(time.perf_counter() - started)
+                self.stdout.write(f"Index search ({len(indexed)} lookups): {_percentiles(indexed)}")
+                self.stdout.write(f"icontains scan ({len(scanned)} queries): {_percentiles(scanned)}")
+                for query in QUERIES[:4]:
+                    top = [index.documents[i]["name"] for i, _ in index.search(query, 3)]
+                    self.stdout.write(f"  {query!r}: {top}")
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Menu search benchmark complete (synthetic data rolled back)"))
@@ -1,38 +1,33 @@
+import json
+
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils import timezone
 
-from api.models import NotificationOutbox
+from api.outbox_dispatcher import dispatch, outbox_metrics, requeue_dead
 
 
 class Command(BaseCommand):
-    help = "Deliver pending notification outbox entries via web push (best-effort)."
+    help = (
+        "Deliver due notification outbox entries (email and web push). Uses the same claim-based "
+        "dispatcher as the Celery task, so it is safe to run alongside workers."
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("--limit", type=int, default=100, help="Max entries to process")
+        parser.add_argument("--limit", type=int, default=100, help="Entries claimed per batch")
+        parser.add_argument("--max-batches", type=int, default=1, help="Batches to drain before exiting")
+        parser.add_argument("--requeue-dead", action="store_true", help="Move dead-lettered entries back to pending first")
+        parser.add_argument("--metrics", action="store_true", help="Only print backlog, lag and throughput metrics")
 
     def handle(self, *args, **options):
-        limit = int(options.get("limit") or 100)
-        qs = NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING).order_by("created_at")[:limit]
-        count = 0
-        for e in qs:
-            try:
-                with transaction.atomic():
-                    from api.utils_notify import send_webpush_to_user
-                    ok = send_webpush_to_user(e.user, title=e.title, message=e.message, data={"url": "/notifications"})
-                    e.attempts = (e.attempts or 0) + 1
-                    e.status = NotificationOutbox.STATUS_SENT if ok else NotificationOutbox.STATUS_FAILED
-                    e.last_error = "" if ok else "send failed"
-                    e.save(update_fields=["attempts", "status", "last_error", "updated_at"])
-                count += 1
-            except Exception as ex:
-                try:
-                    e.attempts = (e.attempts or 0) + 1
-                    e.status = NotificationOutbox.STATUS_FAILED
-                    e.last_error = str(ex)[:500]
-                    e.save(update_fields=["attempts", "status", "last_error", "updated_at"])
-                except Exception:
-                    pass
-                continue
-        self.stdout.write(self.style.SUCCESS(f"Processed {count} outbox entries"))
-
+        if options["metrics"]:
+            self.stdout.write(json.dumps(outbox_metrics(), indent=2, default=str))
+            return
+        if options["requeue_dead"]:
+            self.stdout.write(f"Requeued {requeue_dead()} dead-lettered entries")
+        totals = dispatch(batch_size=options["limit"], max_batches=options["max_batches"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {totals['claimed']} outbox entries "
+                f"({totals['sent']} sent, {totals['retried']} retrying, {totals['dead']} dead) "
+                f"in {totals['seconds']:.2f}s"
+            )
+        )
@@ -0,0 +1,105 @@
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from api import push_delivery
+from api.fake_push import FakePushEndpoint, generate_subscription_keys, generate_vapid_private_key
+from api.models import AppUser, NotificationOutbox, WebPushSubscription
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Push synthetic outbox entries to a local fake push endpoint and report throughput "
+        "(synthetic rows are rolled back). With --serve, only run the fake endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=500, help="Synthetic outbox entries (default: 500)")
+        parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake endpoint latency per push")
+        parser.add_argument("--gone-every", type=int, default=0, help="Make every Nth subscription answer 410")
+        parser.add_argument("--workers", type=int, default=None, help="Override WEBPUSH_WORKERS")
+        parser.add_argument("--per-host", type=int, default=None, help="Override WEBPUSH_PER_HOST_CONCURRENCY")
+        parser.add_argument("--compare", action="store_true", help="Also time one-at-a-time delivery")
+        parser.add_argument("--serve", action="store_true", help="Only run the fake endpoint until interrupted")
+        parser.add_argument("--port", type=int, default=8089, help="Port for --serve (default: 8089)")
+
+    def _serve(self, port, latency_ms):
+        endpoint = FakePushEndpoint(port=port, latency_ms=latency_ms)
+        self.stdout.write(f"Fake push endpoint on {endpoint.url()} (paths /gone/, /missing/, /busy/, /error/)")
+        try:
+            endpoint.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            endpoint.stop()
+        self.stdout.write(f"Received {endpoint.received} pushes")
+
+    def _seed(self, endpoint, entries, gone_every):
+        tag = uuid4().hex[:8]
+        users = AppUser.objects.bulk_create(
+            [AppUser(email=f"push-{tag}-{i}@example.invalid", name=f"Push bench {i}", role="staff") for i in range(entries)],
+            batch_size=1000,
+        )
+        p256dh, auth = generate_subscription_keys()
+        subs = []
+        for i, user in enumerate(users):
+            prefix = "gone" if gone_every and (i + 1) % gone_every == 0 else "ok"
+            subs.append(WebPushSubscription(user=user, endpoint=endpoint.url(f"{prefix}/{tag}-{i}"), p256dh=p256dh, auth=auth))
+        WebPushSubscription.objects.bulk_create(subs, batch_size=1000)
+        return NotificationOutbox.objects.bulk_create(
+            [NotificationOutbox(user=u, title="Benchmark", message="Hello") for u in users], batch_size=1000
+        )
+
+    def _push(self, entries):
+        return sum(1 for error in push_delivery.push_entries(entries).values() if not error)
+
+    def _time(self, label, endpoint, fn, total):
+        before = endpoint.received
+        started = time.perf_counter()
+        sent = fn()
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"{label}: {sent}/{total} sent, {endpoint.received - before} requests, {elapsed:.2f}s "
+            f"({rate:.0f} pushes/s, peak in flight {endpoint.peak_in_flight})"
+        )
+
+    def handle(self, *args, **options):
+        if options["serve"]:
+            return self._serve(options["port"], options["latency_ms"])
+
+        total = max(1, int(options["entries"]))
+        overrides = {"WEBPUSH_VAPID_PRIVATE_KEY": generate_vapid_private_key(), "WEBPUSH_PER_HOST_RATE": 0}
+        if options["workers"]:
+            overrides["WEBPUSH_WORKERS"] = options["workers"]
+        if options["per_host"]:
+            overrides["WEBPUSH_PER_HOST_CONCURRENCY"] = options["per_host"]
+
+        with FakePushEndpoint(latency_ms=options["latency_ms"]) as endpoint, override_settings(**overrides):
+            push_delivery.reset()
+            try:
+                with transaction.atomic():
+                    entries = self._seed(endpoint, total, options["gone_every"])
+                    self._time("push_delivery", endpoint, lambda: self._push(entries), total)
+                    if options["compare"]:
+                        WebPushSubscription.objects.filter(endpoint__startswith=endpoint.url()).update(active=True)
+                        endpoint.peak_in_flight = 0
+                        self._time(
+                            "one at a time (previous)",
+                            endpoint,
+                            lambda: sum(self._push([e]) for e in entries),
+                            total,
+                        )
+                    raise _Rollback()
+            except _Rollback:
+                pass
+            finally:
+                push_delivery.reset()
+        self.stdout.write(self.style.SUCCESS("Push benchmark complete (synthetic data rolled back)"))
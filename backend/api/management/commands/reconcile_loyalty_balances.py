@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from api.models import AppUser, LoyaltyLedger
+
+
+class Command(BaseCommand):
+    help = "Verify AppUser.credit_points against the LoyaltyLedger; optionally repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Post an adjust entry for each mismatched balance")
+        parser.add_argument("--user", default="", help="Only check this user id")
+        parser.add_argument("--limit", type=int, default=50, help="Max mismatches to print (default: 50)")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        fix = bool(options.get("fix"))
+        user_id = options.get("user") or ""
+        limit = max(0, int(options.get("limit") or 0))
+
+        # Lock balances first so writers cannot append entries between the two reads
+        users_qs = AppUser.objects.select_for_update()
+        ledger_qs = LoyaltyLedger.objects.all()
+        if user_id:
+            users_qs = users_qs.filter(id=user_id)
+            ledger_qs = ledger_qs.filter(user_id=user_id)
+
+        balances = {str(uid): points or Decimal("0") for uid, points in users_qs.values_list("id", "credit_points")}
+        ledger = {
+            str(row["user_id"]): row["total"] or Decimal("0")
+            for row in ledger_qs.values("user_id").annotate(total=Sum("points")).order_by().iterator()
+        }
+
+        mismatches = []
+        for uid, actual in balances.items():
+            expected = ledger.get(uid, Decimal("0"))
+            if actual != expected:
+                mismatches.append((uid, actual, expected))
+
+        for uid, actual, expected in sorted(mismatches)[:limit]:
+            self.stdout.write(f"user={uid} balance={actual} ledger={expected}")
+
+        if mismatches and fix:
+            # The balance is what customers have been shown, so the ledger is
+            # brought in line with it rather than the other way round
+            for uid, actual, expected in mismatches:
+                LoyaltyLedger.objects.create(
+                    user_id=uid,
+                    kind=LoyaltyLedger.KIND_ADJUST,
+                    points=actual - expected,
+                    balance_after=actual,
+                    reason="Reconciliation",
+                )
+            self.stdout.write(self.style.SUCCESS(f"Recorded {len(mismatches)} adjustment(s) in the ledger"))
+            return
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} balance(s) out of sync with the ledger (rerun with --fix)")
+        self.stdout.write(self.style.SUCCESS(f"{len(balances)} balance(s) match the ledger"))
@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from api.models import StockBalance, StockMovement
+
+
+class Command(BaseCommand):
+    help = "Verify StockBalance rows against the full StockMovement ledger; optionally repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite mismatched balances from the ledger")
+        parser.add_argument("--item", default="", help="Only check this inventory item id")
+        parser.add_argument("--limit", type=int, default=50, help="Max mismatches to print (default: 50)")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        fix = bool(options.get("fix"))
+        item_id = options.get("item") or ""
+        limit = max(0, int(options.get("limit") or 0))
+
+        # Lock balances first so the ledger read below sees the same state writers left them in
+        balances_qs = StockBalance.objects.select_for_update()
+        ledger_qs = StockMovement.objects.all()
+        if item_id:
+            balances_qs = balances_qs.filter(item_id=item_id)
+            ledger_qs = ledger_qs.filter(item_id=item_id)
+
+        balances = {}
+        for bal in balances_qs.only("id", "item_id", "location_id", "batch_key", "qty"):
+            balances[(str(bal.item_id), str(bal.location_id), bal.batch_key)] = bal
+
+        ledger = {}
+        batch_ids = {}
+        rows = ledger_qs.values("item_id", "location_id", "batch_id").annotate(total=Sum("qty")).order_by()
+        for row in rows.iterator():
+            key = (str(row["item_id"]), str(row["location_id"]), str(row["batch_id"] or ""))
+            ledger[key] = ledger.get(key, Decimal("0")) + (row["total"] or Decimal("0"))
+            batch_ids[key] = row["batch_id"]
+
+        mismatches = []
+        for key in set(balances) | set(ledger):
+            expected = ledger.get(key, Decimal("0"))
+            bal = balances.get(key)
+            actual = bal.qty if bal is not None else Decimal("0")
+            if actual != expected:
+                mismatches.append((key, actual, expected))
+
+        for (item, location, batch), actual, expected in sorted(mismatches)[:limit]:
+            self.stdout.write(
+                f"item={item} location={location} batch={batch or '-'} balance={actual} ledger={expected}"
+            )
+
+        if mismatches and fix:
+            now = timezone.now()
+            for key, _actual, expected in mismatches:
+                bal = balances.get(key)
+                if bal is not None:
+                    StockBalance.objects.filter(id=bal.id).update(qty=expected, updated_at=now)
+                else:
+                    StockBalance.objects.create(
+                        item_id=key[0],
+                        location_id=key[1],
+                        batch_id=batch_ids.get(key),
+                        batch_key=key[2],
+                        qty=expected,
+                    )
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatches)} balance(s) from the ledger"))
+            return
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} balance(s) out of sync with the ledger (rerun with --fix)")
+        self.stdout.write(self.style.SUCCESS(f"{len(balances)} balance(s) match the ledger"))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone as dj_tz
+
+from api.report_rollups import floor_hour, rollup_sales
+
+# Backfills are rolled a week at a time so each pass stays a bounded grouped query
+CHUNK_HOURS = 7 * 24
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute hourly SalesRollup and ItemSalesRollup rows for the trailing window "
+        "(use --days to backfill history)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=0, help="Trailing hours to roll up (default: SALES_ROLLUP_REFRESH_HOURS)")
+        parser.add_argument("--days", type=int, default=0, help="Trailing days to roll up; overrides --hours")
+
+    def handle(self, *args, **options):
+        days = int(options.get("days") or 0)
+        hours = days * 24 if days > 0 else int(options.get("hours") or 0)
+        if hours <= CHUNK_HOURS:
+            written = rollup_sales(hours or None)
+        else:
+            written = 0
+            end = floor_hour(dj_tz.now())
+            while hours > 0:
+                chunk = min(hours, CHUNK_HOURS)
+                written += rollup_sales(chunk, now=end)
+                end -= timedelta(hours=chunk)
+                hours -= chunk
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {written} hour(s) of sales"))
@@ -0,0 +1,240 @@
+"""Versioned menu catalog cache.
+
+The menu changes a few times a day but is read by every client at app open,
+so list responses are rendered once per catalog version and then served from
+process memory:
+
+- ``MenuCatalogVersion`` is a single-row counter. ``bump(item_ids)`` (called
+  from the MenuItem/MenuCategory signals) increments it inside the writing
+  transaction and stamps the changed items' ``catalog_version``. The counter
+  row lock serialises concurrent bumps until commit, so versions become
+  visible in order.
+- ``current_version()`` reads the counter through the shared cache (set after
+  commit, ``MENU_CATALOG_VERSION_TTL`` bounds staleness on per-process caches).
+- ``cached_response(request, scope, build)`` keys the rendered body by
+  ``(scope, version, query string)`` in a small LRU (``MENU_CATALOG_CACHE_ENTRIES``),
+  adds a strong ETag and answers ``If-None-Match`` with 304 without touching
+  the database. Builders mark degraded bodies (e.g. the in-memory demo
+  fallback after a DB error) with ``uncacheable`` so they are never pinned
+  to a version.
+- ``changed_item_ids(since, version)`` backs the ``?since=<version>`` delta
+  feeds: items stamped after ``since`` up to the current version, archived
+  ones included so clients can drop them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "menu:catalog:version"
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _read_version() -> int:
+    from .models import MenuCatalogVersion
+
+    return MenuCatalogVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+def current_version() -> int:
+    try:
+        version = cache.get(VERSION_CACHE_KEY)
+    except Exception:
+        version = None
+    if version is not None:
+        return int(version)
+    version = _read_version()
+    try:
+        # add() so a reader that saw the pre-commit value cannot overwrite a bump
+        cache.add(VERSION_CACHE_KEY, version, int(_setting("MENU_CATALOG_VERSION_TTL", 300)))
+    except Exception:
+        pass
+    return version
+
+
+def bump(item_ids: Iterable = ()) -> int:
+    """Advance the catalog version and stamp ``item_ids`` with it; returns the new version."""
+    from .models import MenuCatalogVersion, MenuItem
+
+    ids = [pk for pk in item_ids if pk]
+    with transaction.atomic():
+        counter = MenuCatalogVersion.objects.filter(pk=1)
+        if not counter.update(version=F("version") + 1, updated_at=timezone.now()):
+            MenuCatalogVersion.objects.get_or_create(pk=1)
+            counter.update(version=F("version") + 1, updated_at=timezone.now())
+        version = counter.values_list("version", flat=True).get()
+        if ids:
+            MenuItem.objects.filter(id__in=ids).update(catalog_version=version)
+
+    # Readers inside this transaction fall through to the counter row; other
+    # processes pick the new version up once it is committed
+    try:
+        cache.delete(VERSION_CACHE_KEY)
+    except Exception:
+        pass
+
+    def _publish():
+        try:
+            cache.set(VERSION_CACHE_KEY, version, int(_setting("MENU_CATALOG_VERSION_TTL", 300)))
+        except Exception:
+            pass
+
+    transaction.on_commit(_publish)
+    return version
+
+
+def changed_item_ids(since: int, version: int) -> List:
+    from .models import MenuItem
+
+    return list(
+        MenuItem.objects.filter(catalog_version__gt=since, catalog_version__lte=version)
+        .order_by("catalog_version")
+        .values_list("id", flat=True)
+    )
+
+
+def parse_since(raw) -> Optional[int]:
+    """Non-negative version from a ``since`` query value; None when absent or malformed."""
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+class _ResponseCache:
+    """LRU of rendered bodies for one catalog version; a different version clears it."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, key):
+        with self._lock:
+            if key[1] != self._version:
+                self._entries.clear()
+                self._version = key[1]
+                return None
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+            return found
+
+    def put(self, key, value):
+        with self._lock:
+            if key[1] != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+_responses: Optional[_ResponseCache] = None
+_responses_lock = threading.Lock()
+
+
+def _response_cache() -> _ResponseCache:
+    global _responses
+    if _responses is None:
+        with _responses_lock:
+            if _responses is None:
+                _responses = _ResponseCache(int(_setting("MENU_CATALOG_CACHE_ENTRIES", 128)))
+    return _responses
+
+
+def catalog_cache_stats() -> dict:
+    responses = _response_cache()
+    with responses._lock:
+        return {**responses.stats, "entries": len(responses._entries), "version": responses._version}
+
+
+def _etag(scope: str, version: int, query: str) -> str:
+    digest = hashlib.sha1(f"{scope}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'"menu-{version}-{digest}"'
+
+
+def _finish(response, etag: str, version: int):
+    response["ETag"] = etag
+    response["X-Menu-Version"] = str(version)
+    response["Cache-Control"] = "public, no-cache"
+    return response
+
+
+def uncacheable(response: HttpResponse) -> HttpResponse:
+    """Mark a built response as not to be cached or tagged by ``cached_response``."""
+    response.menu_cacheable = False
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def cached_response(request, scope: str, build: Callable[[int], HttpResponse]) -> HttpResponse:
+    """Serve ``build(version)`` from memory for the current catalog version.
+
+    Only 200 responses not marked ``uncacheable`` are stored and tagged.
+    """
+    try:
+        version = current_version()
+    except Exception:
+        logger.exception("Menu catalog version unavailable; serving uncached")
+        return build(None)
+
+    query = request.META.get("QUERY_STRING", "")
+    key = (scope, version, query)
+    etag = _etag(scope, version, query)
+    responses = _response_cache()
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        responses.count("not_modified")
+        return _finish(HttpResponseNotModified(), etag, version)
+
+    hit = responses.get(key)
+    if hit is not None:
+        responses.count("hits")
+        body, content_type = hit
+        return _finish(HttpResponse(body, content_type=content_type), etag, version)
+
+    responses.count("misses")
+    response = build(version)
+    if response.status_code == 200 and getattr(response, "menu_cacheable", True):
+        responses.put(key, (response.content, response["Content-Type"]))
+        _finish(response, etag, version)
+    return response
+
+
+__all__ = [
+    "bump",
+    "cached_response",
+    "catalog_cache_stats",
+    "changed_item_ids",
+    "current_version",
+    "parse_since",
+    "uncacheable",
+]
@@ -0,0 +1,195 @@
+"""Responsive derivatives for menu item photos.
+
+Uploads are stored as-is by ``menu_item_image``; list views should never ship
+those originals as thumbnails. After the upload commits, ``schedule(item_id)``
+hands the item to the ``api.tasks.generate_menu_image_variants`` Celery task
+(or a small in-process pool when Celery is unavailable) which:
+
+- applies the EXIF orientation, then re-encodes without EXIF/XMP (only the
+  colour profile is kept);
+- renders every size in ``VARIANTS`` (never upscaling) as WebP and JPEG;
+- stores each file under a content-hashed name (``menu_items/variants/``) so
+  it can be served with a far-future immutable cache header;
+- records the map in ``MenuItem.image_variants`` together with the source
+  digest, so re-running on an unchanged upload is a no-op.
+
+``image_payload(item)`` turns that map into URLs plus ``srcset`` strings for
+``_safe_menu_item``. The ``menu_image_variants`` command backfills existing
+photos in parallel.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# name -> longest edge in pixels
+VARIANTS = {"thumb": 160, "card": 480, "full": 1280}
+FORMATS = ("webp", "jpeg")
+VARIANT_DIR = "menu_items/variants"
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _encode(image, fmt: str, icc_profile=None) -> bytes:
+    out = io.BytesIO()
+    extra = {"icc_profile": icc_profile} if icc_profile else {}
+    if fmt == "jpeg":
+        if image.mode not in ("RGB", "L"):
+            from PIL import Image
+
+            flat = Image.new("RGB", image.size, (255, 255, 255))
+            flat.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+            image = flat
+        image.save(out, "JPEG", quality=int(_setting("MENU_IMAGE_JPEG_QUALITY", 82)), optimize=True, progressive=True, **extra)
+    else:
+        image.save(out, "WEBP", quality=int(_setting("MENU_IMAGE_WEBP_QUALITY", 80)), method=4, **extra)
+    return out.getvalue()
+
+
+def render_variants(data: bytes) -> Dict[str, dict]:
+    """``{variant: {"width", "height", "webp": bytes, "jpeg": bytes}}`` for an uploaded image."""
+    from PIL import Image, ImageOps
+
+    largest = max(VARIANTS.values())
+    with Image.open(io.BytesIO(data)) as opened:
+        icc_profile = opened.info.get("icc_profile")
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale; never below the largest variant
+        opened.draft("RGB", (largest, largest))
+        source = ImageOps.exif_transpose(opened)
+        source.load()
+    if source.mode not in ("RGB", "RGBA", "L"):
+        source = source.convert("RGBA" if "transparency" in source.info or "A" in source.getbands() else "RGB")
+
+    rendered = {}
+    # Largest first, each size resampled from the previous one
+    image = source
+    for name, edge in sorted(VARIANTS.items(), key=lambda pair: -pair[1]):
+        image = image.copy()
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        # Drop EXIF/XMP (camera, GPS); only the colour profile is written back
+        image.info = {}
+        rendered[name] = {"width": image.width, "height": image.height}
+        for fmt in FORMATS:
+            rendered[name][fmt] = _encode(image, fmt, icc_profile)
+    return rendered
+
+
+def _store(content: bytes, variant: str, ext: str) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    name = f"{VARIANT_DIR}/{variant}-{digest}.{ext}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def process_menu_image(item_id, force: bool = False) -> str:
+    """Render and store derivatives for one item; returns "done", "skipped" or "missing"."""
+    from . import menu_catalog
+    from .models import MenuItem
+
+    item = MenuItem.objects.filter(id=item_id).only("id", "image", "image_variants").first()
+    if item is None or not item.image:
+        return "missing"
+    image_name = item.image.name
+    with default_storage.open(image_name, "rb") as fh:
+        data = fh.read()
+    source = hashlib.sha256(data).hexdigest()
+    if not force and (item.image_variants or {}).get("source") == source:
+        return "skipped"
+
+    sizes = {}
+    for variant, rendered in render_variants(data).items():
+        sizes[variant] = {
+            "width": rendered["width"],
+            "height": rendered["height"],
+            **{fmt: _store(rendered[fmt], variant, "jpg" if fmt == "jpeg" else fmt) for fmt in FORMATS},
+        }
+    with transaction.atomic():
+        # Only attach if the photo was not replaced while we were rendering
+        updated = MenuItem.objects.filter(id=item_id, image=image_name).update(
+            image_variants={"source": source, "sizes": sizes}
+        )
+        if updated:
+            menu_catalog.bump([item_id])
+    return "done" if updated else "skipped"
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _local_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = max(1, int(_setting("MENU_IMAGE_WORKERS", 2)))
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="menu-images")
+    return _pool
+
+
+def _process_locally(item_id):
+    from django.db import close_old_connections
+
+    try:
+        process_menu_image(item_id)
+    except Exception:
+        logger.exception(f"Failed to render image variants for menu item {item_id}")
+    finally:
+        close_old_connections()
+
+
+def schedule(item_id) -> None:
+    """Render derivatives for ``item_id`` off the request thread once the upload commits."""
+    from .tasks import CELERY_AVAILABLE, generate_menu_image_variants
+
+    item_id = str(item_id)
+    if not _setting("MENU_IMAGE_ASYNC", True):
+        transaction.on_commit(lambda: _process_locally(item_id))
+        return
+
+    def _enqueue():
+        if CELERY_AVAILABLE:
+            try:
+                generate_menu_image_variants.delay(item_id)
+                return
+            except Exception as exc:
+                logger.warning(f"Failed to enqueue image variants for {item_id}, rendering in process: {exc}")
+        _local_pool().submit(_process_locally, item_id)
+
+    transaction.on_commit(_enqueue)
+
+
+def image_payload(item) -> Dict[str, Optional[dict]]:
+    """``imageVariants`` (per size URLs) and ``imageSrcset`` (per format) for API responses."""
+    sizes = ((getattr(item, "image_variants", None) or {}).get("sizes")) or {}
+    if not sizes:
+        return {"imageVariants": None, "imageSrcset": None}
+    variants, srcset = {}, {}
+    for name in VARIANTS:
+        entry = sizes.get(name)
+        if not entry:
+            continue
+        variants[name] = {"width": entry["width"], "height": entry["height"]}
+        for fmt in FORMATS:
+            url = default_storage.url(entry[fmt])
+            variants[name][fmt] = url
+            srcset.setdefault(fmt, []).append(f"{url} {entry['width']}w")
+    return {"imageVariants": variants, "imageSrcset": {fmt: ", ".join(parts) for fmt, parts in srcset.items()}}
+
+
+__all__ = ["VARIANTS", "image_payload", "process_menu_image", "render_variants", "schedule"]
@@ -0,0 +1,226 @@
+"""In-process menu search index for POS autocomplete and the menu list filter.
+
+``Q(name__icontains) | Q(description__icontains) | Q(category__icontains)`` is a
+leading-wildcard LIKE over three columns that no index can serve. The menu is
+small and changes rarely, so each process keeps an inverted index instead and
+rebuilds it (one query) whenever ``api.menu_catalog.current_version()`` moves:
+
+- text is lower-cased, accents are stripped and split into terms; each term
+  records the best field weight per item (name > category > ingredients >
+  description);
+- a query term matches vocabulary terms exactly, by prefix (the last term of
+  a query is always treated as a prefix while the user is still typing), or,
+  with four or more letters, within a small edit distance. Fuzzy candidates
+  come from a trigram index over the vocabulary, so only a handful of terms
+  are ever compared;
+- every query term must match; items are ranked by the summed
+  ``field weight x match quality`` and then by name.
+
+``search(query, limit)`` returns ``[(item_id, score)]``; ``search_documents``
+also returns the stored fields so the autocomplete endpoint needs no query.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+FIELD_WEIGHTS = {"name": 4.0, "category": 2.0, "ingredients": 1.5, "description": 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.75, 0.5
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def normalize(text) -> str:
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def terms(text) -> List[str]:
+    return _TERM_RE.findall(normalize(text))
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_edits(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def _within(a: str, b: str, limit: int) -> Optional[int]:
+    """Damerau-Levenshtein distance (adjacent swaps count once) when <= ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return None
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class MenuSearchIndex:
+    """Immutable inverted index over a list of menu documents."""
+
+    def __init__(self, documents: List[dict], version=None):
+        self.version = version
+        self.documents = documents
+        self.sort_keys = [normalize(doc.get("name")) for doc in documents]
+        self.archived = {i for i, doc in enumerate(documents) if doc.get("archived")}
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for doc_index, doc in enumerate(documents):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = doc.get(field)
+                text = " ".join(map(str, value)) if isinstance(value, (list, tuple)) else value
+                for term in terms(text):
+                    if postings[term].get(doc_index, 0.0) < weight:
+                        postings[term][doc_index] = weight
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        grams: Dict[str, List[str]] = defaultdict(list)
+        for term in self.vocabulary:
+            for gram in _trigrams(term):
+                grams[gram].append(term)
+        self.trigrams = dict(grams)
+
+    def _prefixed(self, term: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, term)
+        found = []
+        for candidate in self.vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            found.append(candidate)
+        return found
+
+    def _fuzzy(self, term: str, as_prefix: bool) -> Dict[str, float]:
+        limit = _max_edits(term)
+        if not limit:
+            return {}
+        counts: Dict[str, int] = defaultdict(int)
+        for gram in _trigrams(term):
+            for candidate in self.trigrams.get(gram, ()):
+                counts[candidate] += 1
+        # A term within `limit` edits still shares most trigrams with the query
+        needed = max(1, len(_trigrams(term)) - 3 * limit)
+        matches = {}
+        for candidate, shared in counts.items():
+            if shared < needed:
+                continue
+            distance = _within(term, candidate, limit)
+            if distance is None and as_prefix and len(candidate) > len(term):
+                # Still typing: compare against the candidate's prefixes of similar length
+                options = (
+                    _within(term, candidate[:size], limit)
+                    for size in range(len(term) - limit, min(len(candidate), len(term) + limit) + 1)
+                )
+                distance = min((d for d in options if d is not None), default=None)
+            if distance:
+                matches[candidate] = FUZZY / distance
+        return matches
+
+    def _matches(self, term: str, as_prefix: bool) -> Dict[str, float]:
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT
+        if as_prefix or len(term) >= 3:
+            for candidate in self._prefixed(term):
+                matches.setdefault(candidate, PREFIX)
+        for candidate, quality in self._fuzzy(term, as_prefix).items():
+            matches.setdefault(candidate, quality)
+        return matches
+
+    def search(self, query: str, limit: int = 20, include_archived: bool = False) -> List[Tuple[int, float]]:
+        """``[(document index, score)]`` best first; every query term must match."""
+        wanted = terms(query)
+        if not wanted:
+            return []
+        scores: Optional[Dict[int, float]] = None
+        for position, term in enumerate(wanted):
+            per_doc: Dict[int, float] = {}
+            for candidate, quality in self._matches(term, as_prefix=position == len(wanted) - 1).items():
+                for doc_index, weight in self.postings[candidate].items():
+                    score = weight * quality
+                    if score > per_doc.get(doc_index, 0.0):
+                        per_doc[doc_index] = score
+            if scores is None:
+                scores = per_doc
+            else:
+                scores = {d: s + per_doc[d] for d, s in scores.items() if d in per_doc}
+            if not scores:
+                return []
+        if not include_archived and self.archived:
+            scores = {d: s for d, s in scores.items() if d not in self.archived}
+        sort_keys = self.sort_keys
+        order = lambda pair: (-pair[1], sort_keys[pair[0]])  # noqa: E731
+        if limit:
+            return heapq.nsmallest(max(1, limit), scores.items(), key=order)
+        return sorted(scores.items(), key=order)
+
+
+def _load_documents() -> List[dict]:
+    from .models import MenuItem
+
+    rows = MenuItem.objects.values(
+        "id", "name", "category", "description", "ingredients", "price", "available", "archived"
+    )
+    return [{**row, "id": str(row["id"]), "price": float(row["price"] or 0)} for row in rows]
+
+
+_index: Optional[MenuSearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> MenuSearchIndex:
+    """Index for the current catalog version, rebuilt on first use after a menu change."""
+    global _index
+    from .menu_catalog import current_version
+
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = MenuSearchIndex(_load_documents(), version)
+        return _index
+
+
+def search(query: str, limit: Optional[int] = None, include_archived: bool = False) -> List[Tuple[str, float]]:
+    """``[(menu item id, score)]`` for ``query``, best first."""
+    index = get_index()
+    limit = limit if limit is not None else int(_setting("MENU_SEARCH_MAX_RESULTS", 200))
+    return [(index.documents[i]["id"], score) for i, score in index.search(query, limit, include_archived)]
+
+
+def search_documents(query: str, limit: int = 10, include_archived: bool = False) -> List[dict]:
+    """Stored fields plus ``score`` for the best matches (no database query once built)."""
+    index = get_index()
+    return [
+        {**index.documents[i], "score": round(score, 3)}
+        for i, score in index.search(query, limit, include_archived)
+    ]
+
+
+__all__ = ["MenuSearchIndex", "get_index", "normalize", "search", "search_documents", "terms"]
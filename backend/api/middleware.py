@@ -1,5 +1,4 @@
 import re
-import jwt
 from django.http import JsonResponse
 from django.conf import settings
 import time
@@ -115,31 +114,14 @@ class PendingUserGateMiddleware:
         return False
 
     def _user_from_jwt(self, request):
-        auth = request.META.get("HTTP_AUTHORIZATION", "")
-        if not auth.startswith("Bearer "):
-            return None
-        token = auth.split(" ", 1)[1].strip()
-        if not token:
-            return None
-        try:
-            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        except Exception:
-            return None
+        # Decodes once and memoizes the actor on the request for the views
+        from .views_common import _authenticate_request
 
-        user_id = str(payload.get("sub") or "")
-        email = (payload.get("email") or "").lower().strip()
-        try:
-            from .models import AppUser
-            if user_id:
-                u = AppUser.objects.filter(id=user_id).first()
-                if u:
-                    return u
-            if email:
-                u = AppUser.objects.filter(email=email).first()
-                return u
-        except Exception:
+        user = _authenticate_request(request)
+        # In-memory fallback users are not approved accounts
+        if user is None or isinstance(user, dict):
             return None
-        return None
+        return user
 
 
 class VersionHeaderMiddleware:
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0051_alter_offer_menu_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationQueueLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station_code', models.CharField(max_length=32, unique=True)),
+                ('queue_count', models.IntegerField(default=0)),
+                ('active_quantity', models.IntegerField(default=0)),
+                ('ready_quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'station_queue_load',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['created_at'], name='order_event_created_idx'),
+        ),
+    ]
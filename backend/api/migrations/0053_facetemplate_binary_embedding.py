@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:59
+
+import json
+import struct
+
+from django.db import migrations, models
+
+
+def pack_json_embeddings(apps, schema_editor):
+    FaceTemplate = apps.get_model("api", "FaceTemplate")
+    for tpl in FaceTemplate.objects.filter(embedding_vector__isnull=True).iterator():
+        try:
+            values = [float(v) for v in json.loads(tpl.embedding or "[]")]
+        except Exception:
+            continue
+        if not values:
+            continue
+        tpl.embedding_vector = struct.pack(f"<{len(values)}f", *values)
+        tpl.embedding_dim = len(values)
+        tpl.save(update_fields=["embedding_vector", "embedding_dim"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0052_station_queue_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facetemplate',
+            name='embedding_dim',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facetemplate',
+            name='embedding_vector',
+            field=models.BinaryField(blank=True, help_text='Packed little-endian float32 facial embedding vector', null=True),
+        ),
+        migrations.AlterField(
+            model_name='facetemplate',
+            name='embedding',
+            field=models.TextField(blank=True, default='', help_text='DEPRECATED: JSON array of facial embedding vector'),
+        ),
+        migrations.RunPython(pack_json_embeddings, migrations.RunPython.noop),
+    ]
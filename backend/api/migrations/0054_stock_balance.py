@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_balances(apps, schema_editor):
+    StockMovement = apps.get_model("api", "StockMovement")
+    StockBalance = apps.get_model("api", "StockBalance")
+    rows = (
+        StockMovement.objects.values("item_id", "location_id", "batch_id")
+        .annotate(total=Sum("qty"))
+        .order_by()
+    )
+    StockBalance.objects.bulk_create(
+        [
+            StockBalance(
+                item_id=row["item_id"],
+                location_id=row["location_id"],
+                batch_id=row["batch_id"],
+                batch_key=str(row["batch_id"] or ""),
+                qty=row["total"] or 0,
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0053_facetemplate_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField(db_index=True)),
+                ('taken_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'inv_stock_snapshot',
+                'ordering': ['-as_of'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('batch_key', models.CharField(blank=True, default='', max_length=36)),
+                ('qty', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balances', to='api.batch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='api.inventoryitem')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='api.location')),
+            ],
+            options={
+                'db_table': 'inv_stock_balance',
+                'indexes': [models.Index(fields=['location', 'item'], name='inv_stock_b_locatio_1bf51a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'location', 'batch_key'), name='uniq_stock_balance_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('batch_key', models.CharField(blank=True, default='', max_length=36)),
+                ('qty', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.inventoryitem')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.location')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='api.stocksnapshot')),
+            ],
+            options={
+                'db_table': 'inv_stock_snapshot_line',
+                'indexes': [models.Index(fields=['snapshot', 'item'], name='inv_stock_s_snapsho_e80290_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
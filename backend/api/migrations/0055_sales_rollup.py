@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0054_stock_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('bucket_start', models.DateTimeField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'report_sales_rollup',
+                'ordering': ['bucket_start'],
+            },
+        ),
+    ]
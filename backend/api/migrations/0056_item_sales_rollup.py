@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0055_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('bucket_start', models.DateTimeField()),
+                ('item_key', models.CharField(max_length=255)),
+                ('menu_item_id', models.UUIDField(blank=True, null=True)),
+                ('item_name', models.CharField(max_length=255)),
+                ('category', models.CharField(blank=True, max_length=128)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'report_item_sales_rollup',
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['category', 'bucket_start'], name='report_item_categor_d98c50_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket_start', 'item_key', 'category'), name='uniq_item_sales_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:21
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0056_item_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('audience', models.CharField(default='all', max_length=64)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField(blank=True)),
+                ('type', models.CharField(default='info', max_length=16)),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'notification_broadcast',
+                'indexes': [models.Index(fields=['audience', 'created_at'], name='notificatio_audienc_8b7a85_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('dismissed_at', models.DateTimeField(blank=True, null=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='api.broadcastnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notification_broadcast_receipt',
+                'indexes': [models.Index(fields=['user', 'broadcast'], name='notificatio_user_id_0c37f6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('broadcast', 'user'), name='uniq_broadcast_receipt')],
+            },
+        ),
+    ]
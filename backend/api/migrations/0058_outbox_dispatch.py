@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0057_broadcast_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='notificatio_status_7f28bd_idx'),
+        ),
+    ]
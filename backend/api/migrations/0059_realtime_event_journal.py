@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0058_outbox_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealtimeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=64)),
+                ('groups', models.JSONField(blank=True, default=list)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'realtime_event',
+                'indexes': [models.Index(fields=['created_at'], name='realtime_event_created_idx')],
+            },
+        ),
+    ]
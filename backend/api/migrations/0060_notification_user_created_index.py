@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0059_realtime_event_journal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='notificatio_user_id_0ebc01_idx'),
+        ),
+    ]
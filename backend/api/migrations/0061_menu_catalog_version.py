@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    MenuCatalogVersion = apps.get_model("api", "MenuCatalogVersion")
+    MenuCatalogVersion.objects.get_or_create(pk=1, defaults={"version": 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0060_notification_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuCatalogVersion',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'menu_catalog_version',
+            },
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='catalog_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['catalog_version'], name='menuitem_catalog_version_idx'),
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0061_menu_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:00
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+# apply_voucher orders: number is str(uuid4())[:12]; the only checkout path
+# that also deducted credit_points before the ledger existed
+VOUCHER_ORDER_NUMBER = r"^[0-9a-f]{8}-[0-9a-f]{3}$"
+
+
+def open_balances(apps, schema_editor):
+    # credit_points only ever grew for checkout and offer redemptions (they
+    # just stamped Order.credit_points_used), so take those back out before
+    # the balance becomes each user's opening ledger entry. Only Paid orders
+    # counted as spent under the old formula; pending or cancelled ones did not
+    AppUser = apps.get_model("api", "AppUser")
+    LoyaltyLedger = apps.get_model("api", "LoyaltyLedger")
+    Order = apps.get_model("api", "Order")
+    spent = dict(
+        Order.objects.filter(placed_by__isnull=False, status="Paid", credit_points_used__gt=0)
+        .exclude(order_number__regex=VOUCHER_ORDER_NUMBER)
+        .values("placed_by_id")
+        .annotate(total=Sum("credit_points_used"))
+        .values_list("placed_by_id", "total")
+    )
+    rows = AppUser.objects.filter(Q(id__in=list(spent)) | ~Q(credit_points=0)).values_list("id", "credit_points")
+    entries = []
+    for uid, points in list(rows):
+        opening = max((points or Decimal("0")) - (spent.get(uid) or Decimal("0")), Decimal("0"))
+        if opening != points:
+            AppUser.objects.filter(id=uid).update(credit_points=opening)
+        if opening:
+            entries.append(
+                LoyaltyLedger(user_id=uid, kind="opening", points=opening, balance_after=opening, reason="Balance before ledger")
+            )
+    LoyaltyLedger.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0062_menu_item_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoyaltyLedger',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('earn', 'Earn'), ('redeem', 'Redeem'), ('adjust', 'Adjust')], max_length=16)),
+                ('points', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('idempotency_key', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loyalty_entries', to='api.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loyalty_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'loyalty_ledger',
+                'indexes': [models.Index(fields=['user', 'id'], name='loyalty_ledger_user_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('points', 0), _negated=True), name='loyalty_points_nonzero')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0063_loyalty_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['placed_by', 'created_at', 'id'], name='order_placed_by_created_idx'),
+        ),
+    ]
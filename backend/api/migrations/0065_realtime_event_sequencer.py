@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+def create_sequencer(apps, schema_editor):
+    RealtimeEventSequencer = apps.get_model("api", "RealtimeEventSequencer")
+    RealtimeEventSequencer.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0064_order_placed_by_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealtimeEventSequencer',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'realtime_event_sequencer',
+            },
+        ),
+        migrations.RunPython(create_sequencer, migrations.RunPython.noop),
+    ]
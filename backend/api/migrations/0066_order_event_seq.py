@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:39
+
+from django.db import migrations, models
+
+
+def start_sequence(apps, schema_editor):
+    # Existing events predate every queue cursor; park them at 0 so the first
+    # sequencing pass only numbers new rows
+    OrderEvent = apps.get_model("api", "OrderEvent")
+    RealtimeEventSequencer = apps.get_model("api", "RealtimeEventSequencer")
+    OrderEvent.objects.filter(seq__isnull=True).update(seq=0)
+    RealtimeEventSequencer.objects.get_or_create(pk=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0065_realtime_event_sequencer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['seq'], name='order_event_seq_idx'),
+        ),
+        migrations.RunPython(start_sequence, migrations.RunPython.noop),
+    ]
@@ -271,8 +271,20 @@ class FaceTemplate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     user = models.OneToOneField(AppUser, on_delete=models.CASCADE, related_name="face_template")
 
-    # DeepFace embedding (stored as JSON array, typically 512 or 2622 dimensions)
-    embedding = models.TextField(help_text="JSON array of facial embedding vector")
+    # DeepFace embedding as packed little-endian float32 (typically 512 or 2622 dimensions)
+    embedding_vector = models.BinaryField(
+        blank=True,
+        null=True,
+        help_text="Packed little-endian float32 facial embedding vector"
+    )
+    embedding_dim = models.PositiveIntegerField(default=0)
+
+    # Legacy JSON embedding; read only when embedding_vector is empty
+    embedding = models.TextField(
+        blank=True,
+        default="",
+        help_text="DEPRECATED: JSON array of facial embedding vector"
+    )
 
     # Model configuration
     model_name = models.CharField(
@@ -464,10 +476,53 @@ class Notification(models.Model):
         db_table = "notification"
         indexes = [
             models.Index(fields=["user", "read", "created_at"]),
+            models.Index(fields=["user", "created_at", "id"]),
             models.Index(fields=["type", "created_at"]),
         ]
 
 
+class BroadcastNotification(models.Model):
+    """A notification stored once for an audience instead of once per user.
+
+    ``audience`` is ``"all"``, ``"role:<role>"`` or ``"segment:<name>"`` (see
+    ``api.notification_inbox``). Per-user read/dismiss state lives in
+    ``BroadcastReceipt``; users only see broadcasts sent after they joined.
+    """
+
+    AUDIENCE_ALL = "all"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    audience = models.CharField(max_length=64, default=AUDIENCE_ALL)
+    title = models.CharField(max_length=255)
+    message = models.TextField(blank=True)
+    type = models.CharField(max_length=16, default=Notification.TYPE_INFO)
+    meta = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "notification_broadcast"
+        indexes = [
+            models.Index(fields=["audience", "created_at"]),
+        ]
+
+
+class BroadcastReceipt(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name="receipts")
+    user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name="broadcast_receipts")
+    read_at = models.DateTimeField(blank=True, null=True)
+    dismissed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "notification_broadcast_receipt"
+        constraints = [
+            models.UniqueConstraint(fields=["broadcast", "user"], name="uniq_broadcast_receipt"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "broadcast"]),
+        ]
+
+
 class NotificationPreference(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     user = models.OneToOneField(AppUser, on_delete=models.CASCADE, related_name="notification_pref")
@@ -507,8 +562,11 @@ class WebPushSubscription(models.Model):
 
 class NotificationOutbox(models.Model):
     STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
     STATUS_SENT = "sent"
     STATUS_FAILED = "failed"
+    # Dead letter: gave up after NOTIFICATION_OUTBOX_MAX_ATTEMPTS (requeue with process_outbox --requeue-dead)
+    STATUS_DEAD = "dead"
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name="notif_outbox")
     title = models.CharField(max_length=255)
@@ -516,6 +574,9 @@ class NotificationOutbox(models.Model):
     status = models.CharField(max_length=16, default=STATUS_PENDING)
     attempts = models.PositiveIntegerField(default=0)
     last_error = models.TextField(blank=True)
+    # Pending: earliest retry time (backoff). Processing: claim lease expiry,
+    # after which another worker may reclaim the row.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -523,6 +584,7 @@ class NotificationOutbox(models.Model):
         db_table = "notification_outbox"
         indexes = [
             models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["status", "next_attempt_at"]),
         ]
 
 
@@ -827,6 +889,68 @@ class ReorderSetting(models.Model):
         ]
 
 
+class StockBalance(models.Model):
+    """Running on-hand quantity per (item, location, batch).
+
+    Updated in the same transaction as every ``StockMovement`` written by
+    ``api.inventory_services`` so current-stock reads never scan the ledger.
+    ``batch_key`` is the batch id, or "" for unbatched stock, so the unique
+    constraint also covers unbatched rows (NULLs never collide).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="balances")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="balances")
+    batch = models.ForeignKey(Batch, on_delete=models.SET_NULL, null=True, blank=True, related_name="balances")
+    batch_key = models.CharField(max_length=36, blank=True, default="")
+    qty = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "inv_stock_balance"
+        constraints = [
+            models.UniqueConstraint(fields=["item", "location", "batch_key"], name="uniq_stock_balance_key"),
+        ]
+        indexes = [
+            models.Index(fields=["location", "item"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.item_id}@{self.location_id}[{self.batch_key or '-'}]: {self.qty}"
+
+
+class StockSnapshot(models.Model):
+    """Point-in-time copy of balances used to answer ``as_of`` stock queries.
+
+    Lines hold the sum of movements with ``effective_at <= as_of`` that were
+    recorded by ``taken_at``; later movements are read from the ledger tail.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    as_of = models.DateTimeField(db_index=True)
+    taken_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "inv_stock_snapshot"
+        ordering = ["-as_of"]
+
+
+class StockSnapshotLine(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name="lines")
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="+")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="+")
+    batch_key = models.CharField(max_length=36, blank=True, default="")
+    qty = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+
+    class Meta:
+        db_table = "inv_stock_snapshot_line"
+        indexes = [
+            models.Index(fields=["snapshot", "item"]),
+        ]
+
+
 # -----------------------------
 # Menu Management
 # -----------------------------
@@ -865,8 +989,12 @@ class MenuItem(models.Model):
 
     archived_at = models.DateTimeField(blank=True, null=True)
     image = models.ImageField(upload_to="menu_items/", blank=True, null=True)
+    # {"source": sha256, "sizes": {variant: {width, height, webp, jpeg}}} (api.menu_images)
+    image_variants = models.JSONField(default=dict, blank=True)
     ingredients = models.JSONField(default=list, blank=True)
     preparation_time = models.PositiveIntegerField(default=0, help_text="Minutes")
+    # MenuCatalogVersion.version of the last change (api.menu_catalog deltas)
+    catalog_version = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -877,12 +1005,23 @@ class MenuItem(models.Model):
             models.Index(fields=["category"]),
             models.Index(fields=["available"]),
             models.Index(fields=["archived"], name="menuitem_archived_idx"),
+            models.Index(fields=["catalog_version"], name="menuitem_catalog_version_idx"),
         ]
 
     def __str__(self) -> str:
         return f"{self.name} ({self.category})"
 
 
+class MenuCatalogVersion(models.Model):
+    """Single-row counter bumped on every menu change (see api.menu_catalog)."""
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "menu_catalog_version"
+
+
 # -----------------------------
 # Catering Events
 # -----------------------------
@@ -1075,6 +1214,7 @@ class Order(models.Model):
             models.Index(fields=["order_number"]),
             models.Index(fields=["status", "created_at"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["placed_by", "created_at", "id"], name="order_placed_by_created_idx"),
             models.Index(fields=["auto_advance_at"], name="order_auto_advance_at_idx"),
         ]
 
@@ -1151,6 +1291,49 @@ class OrderItem(models.Model):
         return self.state not in {self.STATE_CANCELLED, self.STATE_COMPLETED}
 
 
+class LoyaltyLedger(models.Model):
+    """Append-only history of loyalty point changes.
+
+    ``AppUser.credit_points`` is the running balance; ``api.loyalty_services``
+    updates it in the same transaction as every entry, so balance reads are a
+    primary-key lookup and this table is only summed by
+    ``reconcile_loyalty_balances``.
+    """
+
+    KIND_OPENING = "opening"
+    KIND_EARN = "earn"
+    KIND_REDEEM = "redeem"
+    KIND_ADJUST = "adjust"
+    KIND_CHOICES = [
+        (KIND_OPENING, "Opening balance"),
+        (KIND_EARN, "Earn"),
+        (KIND_REDEEM, "Redeem"),
+        (KIND_ADJUST, "Adjust"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name="loyalty_entries")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name="loyalty_entries")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    points = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    reason = models.CharField(max_length=255, blank=True)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "loyalty_ledger"
+        indexes = [
+            models.Index(fields=["user", "id"], name="loyalty_ledger_user_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(check=~models.Q(points=0), name="loyalty_points_nonzero"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.kind} {self.points} -> {self.balance_after}"
+
+
 class KitchenStation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     code = models.CharField(max_length=32, unique=True)
@@ -1175,6 +1358,26 @@ class KitchenStation(models.Model):
         return f"{self.code} ({self.name})"
 
 
+class StationQueueLoad(models.Model):
+    """Running per-station totals for items on active orders.
+
+    Maintained incrementally by ``record_order_event`` so the KDS delta feed can
+    report station load without rescanning every active order.
+    """
+
+    station_code = models.CharField(max_length=32, unique=True)
+    queue_count = models.IntegerField(default=0)
+    active_quantity = models.IntegerField(default=0)
+    ready_quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "station_queue_load"
+
+    def __str__(self) -> str:
+        return f"{self.station_code}: {self.queue_count} items"
+
+
 class OrderEvent(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="events")
@@ -1186,18 +1389,63 @@ class OrderEvent(models.Model):
     station_code = models.CharField(max_length=32, blank=True)
     payload = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Queue delta cursor: assigned after commit, in commit order (see
+    # api.views_orders.sequence_order_events); NULL until then
+    seq = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         db_table = "order_event"
         indexes = [
             models.Index(fields=["order", "created_at"], name="order_event_order_created_idx"),
             models.Index(fields=["event_type"], name="order_event_type_idx"),
+            models.Index(fields=["created_at"], name="order_event_created_idx"),
+            models.Index(fields=["seq"], name="order_event_seq_idx"),
         ]
 
     def __str__(self) -> str:
         return f"{self.event_type} on {self.order_id}"
 
 
+class RealtimeEvent(models.Model):
+    """Journal of published websocket events so reconnecting sockets can replay.
+
+    ``id`` is the monotonic event cursor sent with every live event. Rows are
+    written after the publishing transaction commits, one writer at a time
+    (``RealtimeEventSequencer``), so ids become visible in id order.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    event_type = models.CharField(max_length=64)
+    groups = models.JSONField(default=list, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "realtime_event"
+        indexes = [
+            models.Index(fields=["created_at"], name="realtime_event_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.id} {self.event_type}"
+
+
+class RealtimeEventSequencer(models.Model):
+    """Row locked while a cursor sequence is handed out, one row per sequence.
+
+    ``REALTIME_EVENTS`` guards ``RealtimeEvent`` journal writes (api.events);
+    ``ORDER_EVENTS`` guards ``OrderEvent.seq`` (api.views_orders).
+    """
+    REALTIME_EVENTS = 1
+    ORDER_EVENTS = 2
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "realtime_event_sequencer"
+
+
 # -----------------------------
 # Cash handling (sessions and movements)
 # -----------------------------
@@ -1237,3 +1485,62 @@ class CashEntry(models.Model):
     class Meta:
         db_table = "cash_entry"
         indexes = [models.Index(fields=["session", "created_at"]) ]
+
+
+# -----------------------------
+# Reporting rollups
+# -----------------------------
+
+
+class SalesRollup(models.Model):
+    """Order totals per hour, filled by ``api.tasks.rollup_sales``.
+
+    ``bucket_start`` is the start of the hour; rows exist for every rolled-up
+    hour, including zero-sales hours, so a missing row means "not rolled up yet".
+    Cancelled and voided orders are excluded, matching the dashboard.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    bucket_start = models.DateTimeField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "report_sales_rollup"
+        ordering = ["bucket_start"]
+
+    def __str__(self) -> str:
+        return f"{self.bucket_start:%Y-%m-%d %H:00}: {self.total_amount}"
+
+
+class ItemSalesRollup(models.Model):
+    """Line-item quantity and revenue per hour, menu item and category.
+
+    Written alongside ``SalesRollup`` (whose rows mark which hours are rolled
+    up); only items with sales get a row. ``item_key`` is the menu item id, or
+    the item name for lines without one.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    bucket_start = models.DateTimeField()
+    item_key = models.CharField(max_length=255)
+    menu_item_id = models.UUIDField(blank=True, null=True)
+    item_name = models.CharField(max_length=255)
+    category = models.CharField(max_length=128, blank=True)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "report_item_sales_rollup"
+        ordering = ["bucket_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bucket_start", "item_key", "category"], name="uniq_item_sales_bucket"
+            ),
+        ]
+        indexes = [models.Index(fields=["category", "bucket_start"])]
+
+    def __str__(self) -> str:
+        return f"{self.bucket_start:%Y-%m-%d %H:00} {self.item_name}: {self.quantity}"
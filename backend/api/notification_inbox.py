@@ -0,0 +1,319 @@
+"""Per-user notification inbox: personal rows merged with audience broadcasts.
+
+Personal notifications are ``Notification`` rows (one per recipient).
+Announcements meant for everyone, a role or a segment are stored once as a
+``BroadcastNotification``; a user's read/dismiss state for it is a
+``BroadcastReceipt`` row that only exists once they act on it. Inbox pages
+are merged by ``(created_at, id)`` from two bounded, indexed keyset queries.
+
+Unread/total counts and the first page of each inbox are cached under a
+per-user version plus a global version. Row saves (``api.signals``) and every
+bulk or queryset write call ``touch`` (one user's inbox changed) or
+``touch_all`` (broadcasts, cleanup), so a bell that polls ``summary`` costs
+two cache reads until something actually changes; the versions also form
+the summary's ETag.
+"""
+
+from __future__ import annotations
+
+import base64
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.utils import timezone as dj_tz
+
+STAFF_ROLES = {"admin", "manager", "staff"}
+
+_VERSION_KEY = "notif:inbox:v:{}"
+_GLOBAL_VERSION_KEY = "notif:inbox:gv"
+
+# Named segments, decided from the user's role
+SEGMENTS = {
+    "staff": lambda role: role in STAFF_ROLES,
+    "customers": lambda role: role not in STAFF_ROLES,
+}
+
+
+def _role(user) -> str:
+    return (getattr(user, "role", "") or "").lower()
+
+
+def audiences_for(user) -> List[str]:
+    """Audience keys a user belongs to: ``all``, ``role:<role>`` and matching ``segment:<name>``."""
+    role = _role(user)
+    keys = ["all"]
+    if role:
+        keys.append(f"role:{role}")
+    keys.extend(f"segment:{name}" for name, matches in SEGMENTS.items() if matches(role))
+    return keys
+
+
+def _valid_audience(audience: str) -> bool:
+    if audience == "all":
+        return True
+    kind, _, value = (audience or "").partition(":")
+    if kind == "role":
+        return bool(value)
+    return kind == "segment" and value in SEGMENTS
+
+
+def broadcast(audience: str, *, title: str, message: str = "", type: str = "info", meta: Optional[dict] = None):
+    """Store one notification for everyone in ``audience`` (a single INSERT)."""
+    from .models import BroadcastNotification
+
+    audience = (audience or "all").strip().lower()
+    if not _valid_audience(audience):
+        raise ValueError(f"Unknown notification audience: {audience}")
+    created = BroadcastNotification.objects.create(
+        audience=audience, title=title, message=message or "", type=type or "info", meta=meta or {}
+    )
+    touch_all()
+    return created
+
+
+def personal_notifications(user):
+    from .models import Notification
+
+    return Notification.objects.filter(user=user)
+
+
+def visible_broadcasts(user):
+    """Broadcasts for the user's audiences since they joined, minus dismissed ones, with read state."""
+    from .models import BroadcastNotification, BroadcastReceipt
+
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef("pk"), user=user)
+    qs = BroadcastNotification.objects.filter(audience__in=audiences_for(user))
+    joined = getattr(user, "created_at", None)
+    if joined:
+        qs = qs.filter(created_at__gte=joined)
+    return qs.exclude(Exists(receipts.filter(dismissed_at__isnull=False))).annotate(
+        receipt_read_at=Subquery(receipts.values("read_at")[:1])
+    )
+
+
+def encode_cursor(item) -> str:
+    raw = f"{item.created_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Optional[Tuple[datetime, UUID]]:
+    """``(created_at, id)`` from an ``encode_cursor`` token; None when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        stamp, _, ident = raw.partition("|")
+        created_at = datetime.fromisoformat(stamp)
+        return created_at, UUID(ident)
+    except Exception:
+        return None
+
+
+def _before(qs, cursor):
+    if cursor is None:
+        return qs
+    created_at, ident = cursor
+    return qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=ident))
+
+
+def inbox_page(user, limit: int = 50, cursor: Optional[Tuple[datetime, UUID]] = None) -> Tuple[list, bool]:
+    """(items, has_more) for the page after ``cursor`` (newest first when None).
+
+    Each source is read with ``(created_at, id) < cursor ... LIMIT limit+1``
+    so any page costs two bounded index range scans and no COUNT.
+    """
+    limit = max(1, int(limit or 50))
+    personal = list(_before(personal_notifications(user), cursor).order_by("-created_at", "-id")[: limit + 1])
+    broadcasts = list(_before(visible_broadcasts(user), cursor).order_by("-created_at", "-id")[: limit + 1])
+    merged = heapq.merge(personal, broadcasts, key=lambda n: (n.created_at, n.id), reverse=True)
+    items = list(islice(merged, limit + 1))
+    return items[:limit], len(items) > limit
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, "NOTIFICATION_INBOX_CACHE_SECONDS", 300))
+
+
+def _bump(keys: List[str]) -> None:
+    def _set():
+        try:
+            cache.set_many({key: uuid4().hex[:12] for key in keys}, None)
+        except Exception:
+            pass
+
+    # Bump now so this request reads its own write, and again after commit so a
+    # concurrent reader that cached the pre-commit state is invalidated too
+    _set()
+    try:
+        transaction.on_commit(_set)
+    except Exception:
+        pass
+
+
+def touch(user_ids: Iterable) -> None:
+    """Invalidate cached counts and recent pages for these users."""
+    keys = list(dict.fromkeys(_VERSION_KEY.format(uid) for uid in user_ids if uid))
+    if keys:
+        _bump(keys)
+
+
+def touch_all() -> None:
+    """Invalidate every user's cached inbox (broadcasts, bulk cleanup)."""
+    _bump([_GLOBAL_VERSION_KEY])
+
+
+def inbox_version(user) -> str:
+    """Opaque token that changes whenever the user's inbox may have changed."""
+    user_key = _VERSION_KEY.format(user.id)
+    try:
+        found = cache.get_many([user_key, _GLOBAL_VERSION_KEY])
+        missing = {k: uuid4().hex[:12] for k in (user_key, _GLOBAL_VERSION_KEY) if k not in found}
+        for key, token in missing.items():
+            # add() so concurrent first readers agree on one token
+            if not cache.add(key, token, None):
+                token = cache.get(key) or token
+            found[key] = token
+        return f"{found[user_key]}.{found[_GLOBAL_VERSION_KEY]}"
+    except Exception:
+        return uuid4().hex
+
+
+def _cached(key: str, compute: Callable):
+    try:
+        hit = cache.get(key)
+    except Exception:
+        hit = None
+    if hit is not None:
+        return hit
+    value = compute()
+    try:
+        cache.set(key, value, _cache_seconds())
+    except Exception:
+        pass
+    return value
+
+
+def summary(user, version: Optional[str] = None) -> dict:
+    """``{"unread", "total"}`` across personal and broadcast items (cached per version)."""
+    version = version or inbox_version(user)
+
+    def compute():
+        personal = personal_notifications(user).aggregate(total=Count("pk"), unread=Count("pk", filter=Q(read=False)))
+        shared = visible_broadcasts(user).aggregate(
+            total=Count("pk"), unread=Count("pk", filter=Q(receipt_read_at__isnull=True))
+        )
+        return {
+            "unread": personal["unread"] + shared["unread"],
+            "total": personal["total"] + shared["total"],
+        }
+
+    return _cached(f"notif:inbox:summary:{user.id}:{version}", compute)
+
+
+def recent_page(user, limit: int, serialize: Callable) -> Tuple[list, Optional[str], bool]:
+    """First page as ``(serialized items, next cursor, has_more)``; cached when ``limit`` fits the window."""
+    window = int(getattr(settings, "NOTIFICATION_INBOX_WINDOW", 20))
+
+    def compute():
+        items, has_more = inbox_page(user, max(limit, window))
+        return [(serialize(n), encode_cursor(n)) for n in items], has_more
+
+    if limit > window:
+        rows, has_more = compute()
+    else:
+        rows, has_more = _cached(f"notif:inbox:recent:{user.id}:{inbox_version(user)}:{window}", compute)
+        has_more = has_more or len(rows) > limit
+    rows = rows[:limit]
+    return [data for data, _ in rows], (rows[-1][1] if rows and has_more else None), has_more
+
+
+def is_broadcast(item) -> bool:
+    return hasattr(item, "audience")
+
+
+def is_read(item) -> bool:
+    if is_broadcast(item):
+        return getattr(item, "receipt_read_at", None) is not None
+    return bool(getattr(item, "read", False))
+
+
+def _receipt(user, broadcast_id):
+    from .models import BroadcastReceipt
+
+    if not visible_broadcasts(user).filter(id=broadcast_id).exists():
+        return None
+    receipt, _ = BroadcastReceipt.objects.get_or_create(broadcast_id=broadcast_id, user=user)
+    return receipt
+
+
+def mark_read(user, notif_id) -> bool:
+    """Mark a personal notification or a visible broadcast read; False if neither matches."""
+    personal = personal_notifications(user).filter(id=notif_id)
+    if personal.exists():
+        if personal.filter(read=False).update(read=True):
+            touch([user.id])
+        return True
+    receipt = _receipt(user, notif_id)
+    if receipt is None:
+        return False
+    if receipt.read_at is None:
+        receipt.read_at = dj_tz.now()
+        receipt.save(update_fields=["read_at"])
+    return True
+
+
+def mark_all_read(user) -> int:
+    """Mark every personal notification and visible broadcast read; returns broadcasts touched."""
+    from .models import BroadcastReceipt
+
+    now = dj_tz.now()
+    changed = personal_notifications(user).filter(read=False).update(read=True)
+    unread = list(visible_broadcasts(user).filter(receipt_read_at__isnull=True).values_list("id", flat=True))
+    if unread:
+        BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast_id=bid, user=user) for bid in unread], ignore_conflicts=True, batch_size=500
+        )
+        BroadcastReceipt.objects.filter(user=user, broadcast_id__in=unread, read_at__isnull=True).update(read_at=now)
+    if changed or unread:
+        touch([user.id])
+    return len(unread)
+
+
+def dismiss(user, notif_id) -> bool:
+    """Delete a personal notification or hide a broadcast for this user only."""
+    deleted, _ = personal_notifications(user).filter(id=notif_id).delete()
+    if deleted:
+        touch([user.id])
+        return True
+    receipt = _receipt(user, notif_id)
+    if receipt is None:
+        return False
+    receipt.dismissed_at = dj_tz.now()
+    receipt.save(update_fields=["dismissed_at"])
+    return True
+
+
+__all__ = [
+    "SEGMENTS",
+    "audiences_for",
+    "broadcast",
+    "decode_cursor",
+    "encode_cursor",
+    "visible_broadcasts",
+    "inbox_page",
+    "inbox_version",
+    "recent_page",
+    "summary",
+    "touch",
+    "touch_all",
+    "is_broadcast",
+    "is_read",
+    "mark_read",
+    "mark_all_read",
+    "dismiss",
+]
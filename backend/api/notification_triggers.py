@@ -4,54 +4,141 @@ These functions create notifications when certain events occur.
 """
 
 import logging
-from typing import List, Optional
+import threading
+import time
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import F, Q
 from django.utils import timezone
 
 from .notification_templates import format_notification
+from .tasks import CELERY_AVAILABLE, fan_out_notification
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 
-# Try to import Celery task, fallback to sync if not available
-try:
-    from .tasks import create_notification
-    USE_CELERY = True
-except ImportError:
-    from .tasks import create_notification_sync
-    create_notification = None
-    USE_CELERY = False
-    logger.warning("Celery not available, using synchronous notification creation")
+def _create_notification(user_id, **notification):
+    """Notify a single user through the same fan-out path as audiences."""
+    return notify_users([user_id], **notification)
 
 
-def _create_notification(**kwargs):
-    """Helper to call create_notification with or without Celery"""
-    if USE_CELERY and create_notification:
-        # Use Celery async
-        return create_notification.delay(**kwargs)
-    else:
-        # Use synchronous version
-        from .tasks import create_notification_sync
-        return create_notification_sync(**kwargs)
+# ========== Audience fan-out ==========
+
+# Named audiences and the roles they cover
+AUDIENCE_ROLES = {
+    'admins': ('admin', 'manager'),
+}
+
+# Per-process cache of audience membership, tagged with a version shared
+# through the Django cache. Role changes (api.signals) bump the version so
+# every process, Celery workers included, reloads on its next lookup; entries
+# otherwise expire after NOTIFICATION_AUDIENCE_CACHE_SECONDS
+_AUDIENCE_CACHE: Dict[str, tuple] = {}
+_AUDIENCE_CACHE_LOCK = threading.Lock()
+_AUDIENCE_VERSION_KEY = 'notif:audience:version'
+
+
+def _audience_version():
+    try:
+        return cache.get(_AUDIENCE_VERSION_KEY)
+    except Exception:
+        return None
+
+
+def _bump_audience_version():
+    try:
+        if not cache.add(_AUDIENCE_VERSION_KEY, 1, timeout=None):
+            cache.incr(_AUDIENCE_VERSION_KEY)
+    except Exception:
+        logger.exception("Failed to bump notification audience version")
+
+
+def invalidate_audience_cache():
+    with _AUDIENCE_CACHE_LOCK:
+        _AUDIENCE_CACHE.clear()
+    # Bump now and again after commit, so a process that reloaded before the
+    # role change committed does not keep the old membership
+    _bump_audience_version()
+    try:
+        transaction.on_commit(_bump_audience_version)
+    except Exception:
+        pass
+
+
+def resolve_audience(audience: str) -> List:
+    """User ids in a named audience (see AUDIENCE_ROLES), one query per cache miss."""
+    roles = AUDIENCE_ROLES.get(audience)
+    if not roles:
+        logger.warning(f"Unknown notification audience: {audience}")
+        return []
+    ttl = float(getattr(settings, 'NOTIFICATION_AUDIENCE_CACHE_SECONDS', 300) or 0)
+    now = time.monotonic()
+    version = _audience_version()
+    with _AUDIENCE_CACHE_LOCK:
+        hit = _AUDIENCE_CACHE.get(audience)
+    if hit and hit[0] > now and hit[1] == version:
+        return list(hit[2])
+    ids = list(User.objects.filter(role__in=roles).values_list('id', flat=True))
+    if ttl > 0:
+        with _AUDIENCE_CACHE_LOCK:
+            _AUDIENCE_CACHE[audience] = (now + ttl, version, tuple(ids))
+    return ids
 
 
 def get_admin_users() -> List[int]:
     """Get all admin and manager user IDs"""
     try:
-        admin_users = User.objects.filter(
-            Q(role='admin') | Q(role='manager')
-        ).values_list('id', flat=True)
-        return list(admin_users)
+        return resolve_audience('admins')
     except Exception as e:
         logger.error(f"Failed to get admin users: {e}")
         return []
 
 
+def _fanout_async() -> bool:
+    return CELERY_AVAILABLE and bool(getattr(settings, 'NOTIFICATION_FANOUT_ASYNC', True))
+
+
+def notify_users(user_ids=None, *, audience: Optional[str] = None, exclude_user_ids=None, **notification):
+    """
+    Create one notification for a set of users with bulk INSERTs.
+
+    Recipients are ``user_ids`` plus the named ``audience``, minus
+    ``exclude_user_ids``. With NOTIFICATION_FANOUT_ASYNC the whole fan-out,
+    audience lookup included, runs in a Celery task enqueued after the
+    current transaction commits; otherwise it is written inline.
+    """
+    kwargs = dict(
+        notification,
+        user_ids=[str(uid) for uid in (user_ids or [])],
+        audience=audience,
+        exclude_user_ids=[str(uid) for uid in (exclude_user_ids or [])],
+    )
+    if not _fanout_async():
+        return fan_out_notification(**kwargs)
+
+    def _enqueue():
+        try:
+            fan_out_notification.delay(**kwargs)
+        except Exception as e:
+            logger.error(f"Failed to enqueue notification fan-out, writing inline: {e}")
+            fan_out_notification(**kwargs)
+
+    transaction.on_commit(_enqueue)
+    return None
+
+
+def notify_admins(**notification):
+    """Notify every admin and manager (see notify_users)."""
+    return notify_users(audience='admins', **notification)
+
+
 # ========== Inventory Triggers ==========
 
 def trigger_low_stock_alert(item):
@@ -72,14 +159,12 @@ def trigger_low_stock_alert(item):
             )
 
             # Notify all admins and managers
-            for user_id in get_admin_users():
-                _create_notification(
-                    user_id=user_id,
-                    title=notification_data['title'],
-                    message=notification_data['message'],
-                    notification_type=notification_data['type'],
-                    meta={'item_id': str(item.id), 'event_type': 'low_stock'}
-                )
+            notify_admins(
+                title=notification_data['title'],
+                message=notification_data['message'],
+                notification_type=notification_data['type'],
+                meta={'item_id': str(item.id), 'event_type': 'low_stock'}
+            )
 
             logger.info(f"Low stock alert triggered for item {item.name}")
 
@@ -102,14 +187,12 @@ def trigger_out_of_stock(item):
             )
 
             # Notify all admins and managers
-            for user_id in get_admin_users():
-                _create_notification(
-                    user_id=user_id,
-                    title=notification_data['title'],
-                    message=notification_data['message'],
-                    notification_type=notification_data['type'],
-                    meta={'item_id': str(item.id), 'event_type': 'out_of_stock'}
-                )
+            notify_admins(
+                title=notification_data['title'],
+                message=notification_data['message'],
+                notification_type=notification_data['type'],
+                meta={'item_id': str(item.id), 'event_type': 'out_of_stock'}
+            )
 
             logger.info(f"Out of stock notification triggered for item {item.name}")
 
@@ -142,14 +225,12 @@ def check_expiring_items():
             )
 
             # Notify all admins and managers
-            for user_id in get_admin_users():
-                _create_notification(
-                    user_id=user_id,
-                    title=notification_data['title'],
-                    message=notification_data['message'],
-                    notification_type=notification_data['type'],
-                    meta={'event_type': 'items_expiring_soon', 'item_count': expiring_items.count()}
-                )
+            notify_admins(
+                title=notification_data['title'],
+                message=notification_data['message'],
+                notification_type=notification_data['type'],
+                meta={'event_type': 'items_expiring_soon', 'item_count': expiring_items.count()}
+            )
 
             logger.info(f"Expiring items notification triggered for {expiring_items.count()} items")
 
@@ -175,14 +256,12 @@ def trigger_new_order(order):
         )
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title=notification_data['title'],
-                message=notification_data['message'],
-                notification_type=notification_data['type'],
-                meta={'order_id': str(order.id), 'event_type': 'new_order'}
-            )
+        notify_admins(
+            title=notification_data['title'],
+            message=notification_data['message'],
+            notification_type=notification_data['type'],
+            meta={'order_id': str(order.id), 'event_type': 'new_order'}
+        )
 
         logger.info(f"New order notification triggered for order {order.id}")
 
@@ -205,14 +284,12 @@ def trigger_order_completed(order):
         )
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title=notification_data['title'],
-                message=notification_data['message'],
-                notification_type=notification_data['type'],
-                meta={'order_id': str(order.id), 'event_type': 'order_completed'}
-            )
+        notify_admins(
+            title=notification_data['title'],
+            message=notification_data['message'],
+            notification_type=notification_data['type'],
+            meta={'order_id': str(order.id), 'event_type': 'order_completed'}
+        )
 
         logger.info(f"Order completed notification triggered for order {order.id}")
 
@@ -240,14 +317,12 @@ def trigger_payment_received(order, amount, payment_method):
         )
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title=notification_data['title'],
-                message=notification_data['message'],
-                notification_type=notification_data['type'],
-                meta={'order_id': str(order.id), 'event_type': 'payment_received', 'amount': str(amount)}
-            )
+        notify_admins(
+            title=notification_data['title'],
+            message=notification_data['message'],
+            notification_type=notification_data['type'],
+            meta={'order_id': str(order.id), 'event_type': 'payment_received', 'amount': str(amount)}
+        )
 
         logger.info(f"Payment received notification triggered for order {order.id}")
 
@@ -275,14 +350,12 @@ def trigger_catering_booking(event):
         )
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title=notification_data['title'],
-                message=notification_data['message'],
-                notification_type=notification_data['type'],
-                meta={'event_id': str(event.id), 'event_type': 'catering_booking'}
-            )
+        notify_admins(
+            title=notification_data['title'],
+            message=notification_data['message'],
+            notification_type=notification_data['type'],
+            meta={'event_id': str(event.id), 'event_type': 'catering_booking'}
+        )
 
         logger.info(f"Catering booking notification triggered for event {event.id}")
 
@@ -316,14 +389,12 @@ def trigger_catering_status_change(event, old_status):
             return  # No notification for other status changes
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title=notification_data['title'],
-                message=notification_data['message'],
-                notification_type=notification_data['type'],
-                meta={'event_id': str(event.id), 'event_type': 'catering_status_change', 'old_status': old_status}
-            )
+        notify_admins(
+            title=notification_data['title'],
+            message=notification_data['message'],
+            notification_type=notification_data['type'],
+            meta={'event_id': str(event.id), 'event_type': 'catering_status_change', 'old_status': old_status}
+        )
 
         logger.info(f"Catering status change notification triggered for event {event.id}")
 
@@ -415,14 +486,12 @@ def trigger_menu_item_added(menu_item):
     """
     try:
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title="New Menu Item Added",
-                message=f"New menu item '{menu_item.name}' has been added to the menu at ₱{menu_item.price:,.2f}.",
-                notification_type='success',
-                meta={'menu_item_id': str(menu_item.id), 'event_type': 'menu_item_added'}
-            )
+        notify_admins(
+            title="New Menu Item Added",
+            message=f"New menu item '{menu_item.name}' has been added to the menu at ₱{menu_item.price:,.2f}.",
+            notification_type='success',
+            meta={'menu_item_id': str(menu_item.id), 'event_type': 'menu_item_added'}
+        )
 
         logger.info(f"Menu item added notification triggered for {menu_item.name}")
 
@@ -441,14 +510,12 @@ def trigger_large_order(order, threshold=5000):
     try:
         if order.total_amount and order.total_amount >= threshold:
             # Notify all admins and managers
-            for user_id in get_admin_users():
-                _create_notification(
-                    user_id=user_id,
-                    title="Large Order Alert",
-                    message=f"Large order #{order.id} placed for ₱{order.total_amount:,.2f}. Please review and prioritize.",
-                    notification_type='warning',
-                    meta={'order_id': str(order.id), 'event_type': 'large_order', 'amount': str(order.total_amount)}
-                )
+            notify_admins(
+                title="Large Order Alert",
+                message=f"Large order #{order.id} placed for ₱{order.total_amount:,.2f}. Please review and prioritize.",
+                notification_type='warning',
+                meta={'order_id': str(order.id), 'event_type': 'large_order', 'amount': str(order.total_amount)}
+            )
 
             logger.info(f"Large order notification triggered for order {order.id}")
 
@@ -467,14 +534,12 @@ def trigger_new_user_registration(user):
     """
     try:
         # Notify all admins
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title="New User Registration",
-                message=f"New user {user.email} has registered and is pending approval.",
-                notification_type='info',
-                meta={'new_user_id': str(user.id), 'event_type': 'new_user_registration'}
-            )
+        notify_admins(
+            title="New User Registration",
+            message=f"New user {user.email} has registered and is pending approval.",
+            notification_type='info',
+            meta={'new_user_id': str(user.id), 'event_type': 'new_user_registration'}
+        )
 
         logger.info(f"New user registration notification triggered for {user.email}")
 
@@ -502,15 +567,13 @@ def trigger_user_role_changed(user, old_role, new_role):
         )
 
         # Notify admins
-        for admin_id in get_admin_users():
-            if admin_id != user.id:
-                _create_notification(
-                    user_id=admin_id,
-                    title="User Role Changed",
-                    message=f"User {user.email}'s role changed from {old_role} to {new_role}.",
-                    notification_type='info',
-                    meta={'affected_user_id': str(user.id), 'event_type': 'role_changed'}
-                )
+        notify_admins(
+            title="User Role Changed",
+            message=f"User {user.email}'s role changed from {old_role} to {new_role}.",
+            notification_type='info',
+            meta={'affected_user_id': str(user.id), 'event_type': 'role_changed'},
+            exclude_user_ids=[user.id],
+        )
 
         logger.info(f"Role change notification triggered for user {user.email}")
 
@@ -546,14 +609,12 @@ def trigger_daily_sales_summary():
         order_count = stats['order_count'] or 0
 
         # Notify all admins and managers
-        for user_id in get_admin_users():
-            _create_notification(
-                user_id=user_id,
-                title="Daily Sales Summary",
-                message=f"Today's sales: ₱{total_sales:,.2f} from {order_count} completed orders.",
-                notification_type='success',
-                meta={'event_type': 'daily_sales_summary', 'date': str(today), 'total_sales': str(total_sales)}
-            )
+        notify_admins(
+            title="Daily Sales Summary",
+            message=f"Today's sales: ₱{total_sales:,.2f} from {order_count} completed orders.",
+            notification_type='success',
+            meta={'event_type': 'daily_sales_summary', 'date': str(today), 'total_sales': str(total_sales)}
+        )
 
         logger.info(f"Daily sales summary notification triggered: ₱{total_sales:,.2f}")
 
@@ -578,14 +639,12 @@ def trigger_low_inventory_report():
             count = low_stock_items.count()
 
             # Notify all admins and managers
-            for user_id in get_admin_users():
-                _create_notification(
-                    user_id=user_id,
-                    title="Low Inventory Report",
-                    message=f"{count} item(s) are currently low on stock. Please review and reorder.",
-                    notification_type='warning',
-                    meta={'event_type': 'low_inventory_report', 'item_count': count}
-                )
+            notify_admins(
+                title="Low Inventory Report",
+                message=f"{count} item(s) are currently low on stock. Please review and reorder.",
+                notification_type='warning',
+                meta={'event_type': 'low_inventory_report', 'item_count': count}
+            )
 
             logger.info(f"Low inventory report notification triggered: {count} items")
 
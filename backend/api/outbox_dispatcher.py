@@ -0,0 +1,256 @@
+"""Notification outbox dispatcher.
+
+The Celery beat task (``api.tasks.process_notification_outbox``) and
+``manage.py process_outbox`` both drain ``NotificationOutbox`` through here:
+
+- ``claim_batch`` locks due rows with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+  flips them to ``processing`` with a lease in ``next_attempt_at`` and commits
+  before anything is sent, so parallel workers never claim the same row and no
+  lock is held during network I/O. A row whose lease ran out (worker died)
+  becomes claimable again.
+- ``process_batch`` loads preferences for the whole batch in one query, sends
+  email over one SMTP connection and push through ``api.push_delivery``, and
+  writes every result back with a single ``bulk_update``.
+- Failed rows are retried with exponential backoff via ``next_attempt_at``;
+  after ``NOTIFICATION_OUTBOX_MAX_ATTEMPTS`` they are dead-lettered
+  (``status="dead"``) until requeued with ``process_outbox --requeue-dead``.
+- ``outbox_metrics`` reports backlog, lag and throughput; the stats of the last
+  run are kept in the cache alongside it.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_CACHE_KEY = "notification_outbox:last_run"
+NO_EMAIL = "no email address"
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _outbox_model():
+    from .models import NotificationOutbox
+    return NotificationOutbox
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Delay before retry number ``attempts`` (1-based): base * 2^(n-1), capped, +<=10% jitter."""
+    base = float(_setting("NOTIFICATION_OUTBOX_BACKOFF_SECONDS", 30))
+    cap = float(_setting("NOTIFICATION_OUTBOX_BACKOFF_MAX_SECONDS", 3600))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return timedelta(seconds=delay * (1.0 + random.random() * 0.1))
+
+
+def claim_batch(limit: Optional[int] = None, *, now=None) -> List:
+    """Claim up to ``limit`` due rows for this worker and return them (with users loaded)."""
+    NotificationOutbox = _outbox_model()
+    now = now or timezone.now()
+    limit = max(1, int(limit or _setting("NOTIFICATION_OUTBOX_BATCH_SIZE", 100)))
+    lease = timedelta(seconds=int(_setting("NOTIFICATION_OUTBOX_LEASE_SECONDS", 300)))
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[NotificationOutbox.STATUS_PENDING, NotificationOutbox.STATUS_PROCESSING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        NotificationOutbox.objects.filter(pk__in=ids).update(
+            status=NotificationOutbox.STATUS_PROCESSING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + lease,
+            updated_at=now,
+        )
+    return list(NotificationOutbox.objects.filter(pk__in=ids).select_related("user").order_by("created_at"))
+
+
+def _channel_preferences(user_ids) -> Dict[object, tuple]:
+    """``{user_id: (email_enabled, push_enabled)}``; users without a row get email and push.
+
+    Push still only reaches users with an active subscription, which is the opt-in.
+    """
+    from .models import NotificationPreference
+
+    prefs = {uid: (True, True) for uid in user_ids}
+    for uid, email_on, push_on in NotificationPreference.objects.filter(user_id__in=prefs).values_list(
+        "user_id", "email_enabled", "push_enabled"
+    ):
+        prefs[uid] = (bool(email_on), bool(push_on))
+    return prefs
+
+
+def _send_emails(entries: Sequence) -> Dict[object, str]:
+    """Send one email per entry over a single connection; returns ``{entry.pk: error}``."""
+    from django.core.mail import EmailMessage, get_connection
+
+    outcome: Dict[object, str] = {}
+    pending = []
+    for e in entries:
+        if getattr(e.user, "email", ""):
+            pending.append(e)
+        else:
+            outcome[e.pk] = NO_EMAIL
+    if not pending:
+        return outcome
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        return {**outcome, **{e.pk: f"email: {exc}"[:500] for e in pending}}
+    try:
+        prefix = _setting("EMAIL_SUBJECT_PREFIX", "")
+        for e in pending:
+            try:
+                EmailMessage(
+                    subject=f"{prefix}{e.title}",
+                    body=e.message,
+                    from_email=_setting("DEFAULT_FROM_EMAIL", None),
+                    to=[e.user.email],
+                    connection=connection,
+                ).send()
+                outcome[e.pk] = ""
+            except Exception as exc:
+                outcome[e.pk] = f"email: {exc}"[:500]
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return outcome
+
+
+def process_batch(entries: Sequence, *, now=None) -> Dict[str, int]:
+    """Deliver claimed rows and write their outcome back in one ``bulk_update``.
+
+    A row counts as sent when any enabled channel delivered it or there was
+    nothing to deliver; it is only retried when every attempted channel failed,
+    so a working channel is never sent twice.
+    """
+    from .push_delivery import SKIPPED_REASONS, push_entries
+
+    NotificationOutbox = _outbox_model()
+    entries = list(entries)
+    stats = {"claimed": len(entries), "sent": 0, "retried": 0, "dead": 0}
+    if not entries:
+        return stats
+
+    prefs = _channel_preferences({e.user_id for e in entries})
+    email_results = _send_emails([e for e in entries if prefs[e.user_id][0]])
+    push_batch = [e for e in entries if prefs[e.user_id][1]]
+    try:
+        push_results = push_entries(push_batch, check_preferences=False) if push_batch else {}
+    except Exception as exc:
+        push_results = {e.pk: f"push: {exc}"[:500] for e in push_batch}
+
+    skipped = SKIPPED_REASONS | {NO_EMAIL}
+    max_attempts = int(_setting("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5))
+    now = now or timezone.now()
+    for e in entries:
+        results = [r for r in (email_results.get(e.pk), push_results.get(e.pk)) if r is not None]
+        errors = [r for r in results if r and r not in skipped]
+        e.last_error = "; ".join(errors)[:500]
+        e.updated_at = now
+        if "" in results or not errors:
+            e.status = NotificationOutbox.STATUS_SENT
+            stats["sent"] += 1
+        elif e.attempts >= max_attempts:
+            e.status = NotificationOutbox.STATUS_DEAD
+            stats["dead"] += 1
+        else:
+            e.status = NotificationOutbox.STATUS_PENDING
+            e.next_attempt_at = now + backoff_delay(e.attempts)
+            stats["retried"] += 1
+    NotificationOutbox.objects.bulk_update(
+        entries, ["status", "last_error", "next_attempt_at", "updated_at"], batch_size=500
+    )
+    return stats
+
+
+def dispatch(*, batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, float]:
+    """Claim and process batches until the due backlog is empty or ``max_batches`` ran."""
+    batch_size = max(1, int(batch_size or _setting("NOTIFICATION_OUTBOX_BATCH_SIZE", 100)))
+    max_batches = max(1, int(max_batches or _setting("NOTIFICATION_OUTBOX_MAX_BATCHES", 10)))
+    totals = {"batches": 0, "claimed": 0, "sent": 0, "retried": 0, "dead": 0}
+    started = time.perf_counter()
+    while totals["batches"] < max_batches:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        totals["batches"] += 1
+        for key, value in process_batch(batch).items():
+            totals[key] += value
+        if len(batch) < batch_size:
+            break
+    elapsed = time.perf_counter() - started
+    totals["seconds"] = round(elapsed, 3)
+    totals["perSecond"] = round(totals["claimed"] / elapsed, 1) if elapsed and totals["claimed"] else 0.0
+    if totals["claimed"]:
+        logger.info(
+            "Outbox: %(claimed)d claimed, %(sent)d sent, %(retried)d retried, %(dead)d dead in %(seconds).2fs", totals
+        )
+        try:
+            cache.set(LAST_RUN_CACHE_KEY, {**totals, "at": timezone.now().isoformat()}, None)
+        except Exception:
+            pass
+    return totals
+
+
+def requeue_dead(*, now=None) -> int:
+    """Move dead-lettered rows back to pending with a fresh attempt budget."""
+    NotificationOutbox = _outbox_model()
+    now = now or timezone.now()
+    return NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_DEAD).update(
+        status=NotificationOutbox.STATUS_PENDING, attempts=0, next_attempt_at=now, updated_at=now
+    )
+
+
+def outbox_metrics(window_minutes: int = 15, *, now=None) -> Dict[str, object]:
+    """Backlog per status, lag of the oldest due row and recent throughput (one query)."""
+    NotificationOutbox = _outbox_model()
+    now = now or timezone.now()
+    since = now - timedelta(minutes=window_minutes)
+    claimable = Q(status__in=[NotificationOutbox.STATUS_PENDING, NotificationOutbox.STATUS_PROCESSING])
+    row = NotificationOutbox.objects.aggregate(
+        pending=Count("pk", filter=Q(status=NotificationOutbox.STATUS_PENDING)),
+        due=Count("pk", filter=claimable & Q(next_attempt_at__lte=now)),
+        processing=Count("pk", filter=Q(status=NotificationOutbox.STATUS_PROCESSING)),
+        dead=Count("pk", filter=Q(status=NotificationOutbox.STATUS_DEAD)),
+        failed=Count("pk", filter=Q(status=NotificationOutbox.STATUS_FAILED)),
+        sent_recent=Count("pk", filter=Q(status=NotificationOutbox.STATUS_SENT, updated_at__gte=since)),
+        oldest_due=Min("created_at", filter=claimable & Q(next_attempt_at__lte=now)),
+    )
+    oldest = row.pop("oldest_due")
+    sent_recent = row.pop("sent_recent")
+    try:
+        last_run = cache.get(LAST_RUN_CACHE_KEY)
+    except Exception:
+        last_run = None
+    return {
+        **row,
+        "lagSeconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        "windowMinutes": window_minutes,
+        "sentInWindow": sent_recent,
+        "sentPerMinute": round(sent_recent / float(window_minutes), 2) if window_minutes else 0.0,
+        "lastRun": last_run,
+    }
+
+
+__all__ = ["backoff_delay", "claim_batch", "dispatch", "outbox_metrics", "process_batch", "requeue_dead"]
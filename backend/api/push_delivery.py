@@ -0,0 +1,324 @@
+"""Batched, concurrent Web Push delivery.
+
+Every sender (``utils_notify.send_webpush_to_user``, the Celery push task and
+the outbox dispatcher) goes through this module so that:
+
+- the VAPID private key is parsed once per process, and the signed VAPID
+  headers are reused per push-service origin until shortly before they expire;
+- requests go out over one pooled ``requests.Session`` (keep-alive) from a
+  bounded thread pool of ``WEBPUSH_WORKERS``;
+- each push-service host gets at most ``WEBPUSH_PER_HOST_CONCURRENCY`` requests
+  in flight and at most ``WEBPUSH_PER_HOST_RATE`` requests per second;
+- subscriptions are loaded for a whole batch in one query and expired ones
+  are deactivated with a single UPDATE;
+- a subscription is deactivated only when the push service says it is gone
+  (404/410). Throttling, 5xx and network errors leave it active.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Push-service answers that mean the subscription will never work again
+GONE_STATUSES = frozenset({404, 410})
+
+# push_entries() reasons meaning "nothing to deliver" rather than a failed send
+PUSH_DISABLED = "push disabled"
+NO_SUBSCRIPTIONS = "no active subscriptions"
+NOT_CONFIGURED = "web push not configured"
+SKIPPED_REASONS = frozenset({PUSH_DISABLED, NO_SUBSCRIPTIONS, NOT_CONFIGURED})
+
+# Re-sign VAPID headers this long before their 12h expiry
+_VAPID_EXP_SECONDS = 12 * 60 * 60
+_VAPID_REFRESH_MARGIN = 10 * 60
+
+
+class PushResult(namedtuple("PushResult", ["subscription", "status", "error"])):
+    """Outcome of one POST to a push service (``status`` is None on network errors)."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+    @property
+    def gone(self) -> bool:
+        return self.status in GONE_STATUSES
+
+
+class _HostGate:
+    """Caps in-flight requests and spaces request starts for one push-service host."""
+
+    def __init__(self, concurrency: int, rate: float):
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        if self._interval:
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_at)
+                self._next_at = start_at + self._interval
+            if start_at > now:
+                time.sleep(start_at - now)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+_lock = threading.Lock()
+_vapid_key = {"raw": None, "vapid": None}
+_vapid_headers: Dict[str, Tuple[int, dict]] = {}
+_host_gates: Dict[str, _HostGate] = {}
+_pool: Dict[str, object] = {"session": None, "executor": None}
+
+
+def _private_key_setting() -> str:
+    return getattr(settings, "WEBPUSH_VAPID_PRIVATE_KEY", None) or getattr(settings, "VAPID_PRIVATE_KEY", None) or ""
+
+
+def _load_vapid():
+    """Return the parsed VAPID key, re-parsing only when the configured key changes."""
+    raw = _private_key_setting()
+    if not raw:
+        return None
+    with _lock:
+        if _vapid_key["raw"] != raw:
+            from py_vapid import Vapid  # ships with pywebpush
+
+            if os.path.isfile(raw):
+                vapid = Vapid.from_file(private_key_file=raw)
+            elif raw.lstrip().startswith("-----BEGIN"):
+                vapid = Vapid.from_pem(raw.encode())
+            else:
+                vapid = Vapid.from_string(private_key=raw)
+            _vapid_key.update(raw=raw, vapid=vapid)
+            _vapid_headers.clear()
+        return _vapid_key["vapid"]
+
+
+def _origin(endpoint: str) -> Tuple[str, str]:
+    parsed = urlparse(endpoint)
+    return f"{parsed.scheme}://{parsed.netloc}", parsed.netloc
+
+
+def _headers_for(vapid, audience: str) -> dict:
+    now = int(time.time())
+    with _lock:
+        cached = _vapid_headers.get(audience)
+        if cached and cached[0] - _VAPID_REFRESH_MARGIN > now:
+            return cached[1]
+    exp = now + _VAPID_EXP_SECONDS
+    subject = getattr(settings, "WEBPUSH_VAPID_SUBJECT", "mailto:admin@example.com")
+    headers = vapid.sign({"sub": subject, "aud": audience, "exp": exp})
+    with _lock:
+        _vapid_headers[audience] = (exp, headers)
+    return headers
+
+
+def _gate(host: str) -> _HostGate:
+    with _lock:
+        gate = _host_gates.get(host)
+        if gate is None:
+            gate = _HostGate(
+                int(getattr(settings, "WEBPUSH_PER_HOST_CONCURRENCY", 8)),
+                float(getattr(settings, "WEBPUSH_PER_HOST_RATE", 0)),
+            )
+            _host_gates[host] = gate
+        return gate
+
+
+def _workers() -> int:
+    return max(1, int(getattr(settings, "WEBPUSH_WORKERS", 16)))
+
+
+def _session_and_executor():
+    with _lock:
+        if _pool["session"] is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=_workers())
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _pool["session"] = session
+            _pool["executor"] = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="webpush")
+        return _pool["session"], _pool["executor"]
+
+
+def reset() -> None:
+    """Drop the cached key, headers, host gates and pool (after settings change)."""
+    with _lock:
+        executor = _pool["executor"]
+        session = _pool["session"]
+        _pool.update(session=None, executor=None)
+        _vapid_key.update(raw=None, vapid=None)
+        _vapid_headers.clear()
+        _host_gates.clear()
+    if executor is not None:
+        executor.shutdown(wait=False)
+    if session is not None:
+        session.close()
+
+
+def _send_one(session, vapid, subscription, data: str) -> PushResult:
+    from pywebpush import WebPusher
+
+    try:
+        audience, host = _origin(subscription.endpoint)
+        headers = dict(_headers_for(vapid, audience))
+        info = {"endpoint": subscription.endpoint, "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth}}
+        with _gate(host):
+            resp = WebPusher(info, requests_session=session).send(
+                data,
+                headers,
+                ttl=int(getattr(settings, "WEBPUSH_TTL_SECONDS", 0)),
+                timeout=float(getattr(settings, "WEBPUSH_TIMEOUT_SECONDS", 10)),
+            )
+        if 200 <= resp.status_code < 300:
+            return PushResult(subscription, resp.status_code, "")
+        return PushResult(subscription, resp.status_code, f"{resp.status_code} {resp.reason}"[:200])
+    except Exception as exc:
+        return PushResult(subscription, None, str(exc)[:200] or exc.__class__.__name__)
+
+
+def send_batch(messages: Iterable[Tuple[object, str]]) -> List[PushResult]:
+    """Send ``(subscription, payload)`` pairs concurrently; results keep input order.
+
+    Subscriptions answered with 404/410 are deactivated in one UPDATE. Returns
+    an empty list when VAPID keys or pywebpush are unavailable.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    try:
+        import pywebpush  # noqa: F401
+    except Exception:
+        logger.warning("pywebpush not installed; skipping web push")
+        return []
+    vapid = _load_vapid()
+    if vapid is None:
+        logger.warning("Missing VAPID keys; skipping web push")
+        return []
+
+    session, executor = _session_and_executor()
+    futures = [executor.submit(_send_one, session, vapid, sub, data) for sub, data in messages]
+    results = [f.result() for f in futures]
+
+    gone = [r.subscription.pk for r in results if r.gone]
+    if gone:
+        from .models import WebPushSubscription
+
+        WebPushSubscription.objects.filter(pk__in=gone).update(active=False, updated_at=timezone.now())
+        logger.info("Deactivated %d expired push subscriptions", len(gone))
+    for r in results:
+        if not r.ok and not r.gone:
+            logger.warning("Web push to %s.. failed: %s", r.subscription.endpoint[:40], r.error)
+    return results
+
+
+def active_subscriptions(user_ids: Sequence) -> Dict[object, list]:
+    """Active subscriptions for many users in one query, keyed by user id."""
+    from .models import WebPushSubscription
+
+    by_user = defaultdict(list)
+    for sub in WebPushSubscription.objects.filter(user_id__in=set(user_ids), active=True):
+        by_user[sub.user_id].append(sub)
+    return by_user
+
+
+def send_to_users(payloads: Dict[object, str]) -> Dict[object, int]:
+    """Push ``payloads[user_id]`` to each user's active subscriptions; returns sent counts."""
+    subs = active_subscriptions(list(payloads))
+    messages = [(sub, payloads[uid]) for uid in payloads for sub in subs.get(uid, [])]
+    sent = {uid: 0 for uid in payloads}
+    for r in send_batch(messages):
+        if r.ok:
+            sent[r.subscription.user_id] += 1
+    return sent
+
+
+def outbox_payload(entry) -> str:
+    return json.dumps({"title": entry.title or "Notification", "body": entry.message or "", "data": {"url": "/notifications"}})
+
+
+def push_entries(entries: Sequence, *, check_preferences: bool = True) -> Dict[object, str]:
+    """Push a batch of NotificationOutbox rows; returns ``{entry.pk: error}`` ("" = delivered).
+
+    Entries that had nothing to send to report one of ``SKIPPED_REASONS``. Pass
+    ``check_preferences=False`` when the caller already filtered on push_enabled.
+    """
+    from .models import NotificationPreference
+
+    entries = list(entries)
+    user_ids = {e.user_id for e in entries}
+    disabled = set()
+    if check_preferences:
+        disabled = set(
+            NotificationPreference.objects.filter(user_id__in=user_ids, push_enabled=False)
+            .values_list("user_id", flat=True)
+        )
+    subs = active_subscriptions([uid for uid in user_ids if uid not in disabled])
+
+    outcome: Dict[object, str] = {}
+    messages: List[Tuple[object, str]] = []
+    owners: List[object] = []
+    for e in entries:
+        if e.user_id in disabled:
+            outcome[e.pk] = PUSH_DISABLED
+            continue
+        targets = subs.get(e.user_id, [])
+        if not targets:
+            outcome[e.pk] = NO_SUBSCRIPTIONS
+            continue
+        data = outbox_payload(e)
+        for sub in targets:
+            messages.append((sub, data))
+            owners.append(e.pk)
+
+    results = send_batch(messages)
+    if messages and not results:
+        for pk in owners:
+            outcome[pk] = NOT_CONFIGURED
+        return outcome
+    errors: Dict[object, List[str]] = defaultdict(list)
+    for pk, r in zip(owners, results):
+        if r.ok:
+            outcome[pk] = ""
+        else:
+            errors[pk].append(r.error)
+    for pk, errs in errors.items():
+        outcome.setdefault(pk, "; ".join(errs)[:500])
+    return outcome
+
+
+__all__ = [
+    "GONE_STATUSES",
+    "SKIPPED_REASONS",
+    "PushResult",
+    "active_subscriptions",
+    "push_entries",
+    "reset",
+    "send_batch",
+    "send_to_users",
+]
@@ -0,0 +1,340 @@
+"""Time-bucketed sales series for reports.
+
+Sales are bucketed per hour. Closed hours come from ``SalesRollup`` rows (and
+per-item ``ItemSalesRollup`` rows) that ``api.tasks.rollup_sales`` keeps
+filled; the current hour (and any hours the job has not reached yet) are
+computed live with one grouped query. Day series are built by summing hours
+into local days in Python, and empty buckets are filled with zero. Orders that
+complete, cancel or void after their hour was rolled up re-roll that hour
+(``api.signals``).
+
+Hours are truncated in the database. When the reporting timezone is a whole
+number of hours from UTC (Asia/Manila is UTC+8 with no DST), UTC hour buckets
+line up with local hours, so truncation runs in UTC and MySQL does not need its
+time zone tables for ``CONVERT_TZ``.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone as dj_tz
+
+HOUR = timedelta(hours=1)
+DEC0 = Decimal("0")
+ROLLUP_TRIGGER_STATUSES = {"completed", "cancelled", "voided", "refunded"}
+
+
+def report_timezone():
+    return dj_tz.get_default_timezone()
+
+
+def _truncation_tz(at: Optional[datetime] = None):
+    tz = report_timezone()
+    offset = (at or dj_tz.now()).astimezone(tz).utcoffset() or timedelta(0)
+    if offset.total_seconds() % 3600 == 0:
+        return dt_timezone.utc
+    return tz
+
+
+def _local(value: datetime) -> datetime:
+    tz = report_timezone()
+    if dj_tz.is_naive(value):
+        return dj_tz.make_aware(value, tz)
+    return dj_tz.localtime(value, tz)
+
+
+def floor_hour(value: datetime) -> datetime:
+    return _local(value).replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value: datetime) -> datetime:
+    return _local(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _counted_orders():
+    from .models import Order
+
+    return Order.objects.exclude(status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED])
+
+
+def live_hourly_sales(start: datetime, end: datetime) -> Dict[datetime, Tuple[int, Decimal]]:
+    """{hour_start: (order_count, total)} for orders created in [start, end), one grouped query."""
+    rows = (
+        _counted_orders()
+        .filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=TruncHour("created_at", tzinfo=_truncation_tz(start)))
+        .values("bucket")
+        .annotate(count=Count("id"), total=Sum("total_amount"))
+        .order_by()
+    )
+    out: Dict[datetime, Tuple[int, Decimal]] = {}
+    for row in rows:
+        if row["bucket"] is None:
+            continue
+        key = floor_hour(row["bucket"])
+        count, total = out.get(key, (0, DEC0))
+        out[key] = (count + int(row["count"] or 0), total + (row["total"] or DEC0))
+    return out
+
+
+def _line_revenue():
+    return ExpressionWrapper(F("price") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _item_key(menu_item_id, item_name) -> str:
+    return str(menu_item_id) if menu_item_id else (item_name or "")[:255]
+
+
+def live_item_sales(start: datetime, end: datetime, *, by_hour: bool = False) -> List[dict]:
+    """Line-item quantity/revenue for orders created in [start, end), one grouped query.
+
+    Rows are per (menu item, name, category), and per hour when ``by_hour``.
+    """
+    from .models import OrderItem, Order
+
+    qs = OrderItem.objects.filter(
+        order__created_at__gte=start, order__created_at__lt=end
+    ).exclude(order__status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED])
+    fields = ["menu_item_id", "item_name", "category"]
+    if by_hour:
+        qs = qs.annotate(bucket=TruncHour("order__created_at", tzinfo=_truncation_tz(start)))
+        fields.append("bucket")
+    rows = []
+    for row in qs.values(*fields).annotate(qty=Sum("quantity"), revenue=Sum(_line_revenue())).order_by():
+        if by_hour:
+            if row["bucket"] is None:
+                continue
+            row["bucket"] = floor_hour(row["bucket"])
+        row["item_key"] = _item_key(row["menu_item_id"], row["item_name"])
+        row["qty"] = int(row["qty"] or 0)
+        row["revenue"] = row["revenue"] or DEC0
+        rows.append(row)
+    return rows
+
+
+def _rollup_coverage(first: datetime, end: datetime):
+    """(rolled-up totals by hour, hour from which to compute live) for [first, end)."""
+    from .models import SalesRollup
+
+    closed_end = min(floor_hour(dj_tz.now()), end)
+    totals: Dict[datetime, Decimal] = {}
+    if first < closed_end:
+        for bucket_start, total in SalesRollup.objects.filter(
+            bucket_start__gte=first, bucket_start__lt=closed_end
+        ).values_list("bucket_start", "total_amount"):
+            totals[floor_hour(bucket_start)] = total or DEC0
+
+    # Live: from the first closed hour without a rollup (or the current hour) onwards
+    live_from = closed_end if closed_end > first else first
+    hour = first
+    while hour < closed_end:
+        if hour not in totals:
+            live_from = hour
+            break
+        hour += HOUR
+    return totals, live_from
+
+
+def hourly_sales(start: datetime, end: datetime) -> Dict[datetime, Decimal]:
+    """{local hour_start: total} for hours overlapping [start, end).
+
+    Reads rollups for closed hours and computes the rest live.
+    """
+    first = floor_hour(start)
+    rolled, live_from = _rollup_coverage(first, end)
+    totals = {hour: total for hour, total in rolled.items() if hour < live_from}
+    if live_from < end:
+        for key, (_count, total) in live_hourly_sales(live_from, end).items():
+            totals[key] = total
+    return totals
+
+
+def item_sales(start: datetime, end: datetime) -> List[dict]:
+    """Quantity and revenue per (item, category) for hours overlapping [start, end).
+
+    Closed, rolled-up hours are summed from ``ItemSalesRollup``; the rest is live.
+    Each row: ``{"itemKey", "menuItemId", "name", "category", "quantity", "revenue"}``.
+    """
+    from .models import ItemSalesRollup
+
+    first = floor_hour(start)
+    _rolled, live_from = _rollup_coverage(first, end)
+    merged: Dict[Tuple[str, str], dict] = {}
+
+    def add(key, menu_item_id, name, category, qty, revenue):
+        row = merged.get((key, category))
+        if row is None:
+            row = merged[(key, category)] = {
+                "itemKey": key,
+                "menuItemId": str(menu_item_id) if menu_item_id else None,
+                "name": name,
+                "category": category,
+                "quantity": 0,
+                "revenue": DEC0,
+            }
+        row["quantity"] += int(qty or 0)
+        row["revenue"] += revenue or DEC0
+
+    if first < live_from:
+        rolled = (
+            ItemSalesRollup.objects.filter(bucket_start__gte=first, bucket_start__lt=live_from)
+            .values("item_key", "category")
+            .annotate(
+                menu_item=Max("menu_item_id"), name=Max("item_name"), qty=Sum("quantity"), revenue=Sum("revenue")
+            )
+            .order_by()
+        )
+        for row in rolled:
+            add(row["item_key"], row["menu_item"], row["name"], row["category"], row["qty"], row["revenue"])
+    if live_from < end:
+        for row in live_item_sales(live_from, end):
+            add(row["item_key"], row["menu_item_id"], row["item_name"], row["category"], row["qty"], row["revenue"])
+    return list(merged.values())
+
+
+def sales_by_category(rows: List[dict]) -> List[dict]:
+    """Revenue per non-empty category from ``item_sales`` rows."""
+    totals: Dict[str, Decimal] = {}
+    for row in rows:
+        category = (row["category"] or "").strip()
+        if category:
+            totals[category] = totals.get(category, DEC0) + row["revenue"]
+    return [{"category": cat, "amount": float(amount)} for cat, amount in totals.items() if amount > 0]
+
+
+def top_items(rows: List[dict], limit: int = 5, by: str = "quantity") -> List[dict]:
+    """Items ranked by ``quantity`` or ``revenue`` (categories merged) from ``item_sales`` rows."""
+    per_item: Dict[str, dict] = {}
+    for row in rows:
+        item = per_item.get(row["itemKey"])
+        if item is None:
+            item = per_item[row["itemKey"]] = {
+                "menuItemId": row["menuItemId"],
+                "name": row["name"],
+                "category": row["category"],
+                "quantity": 0,
+                "revenue": DEC0,
+            }
+        item["quantity"] += row["quantity"]
+        item["revenue"] += row["revenue"]
+    key = "revenue" if by == "revenue" else "quantity"
+    ranked = sorted(per_item.values(), key=lambda r: (-r[key], r["name"] or ""))
+    return [{**r, "revenue": float(r["revenue"])} for r in ranked[: max(0, int(limit))]]
+
+
+def hourly_series(start: datetime, hours: int = 24) -> List[dict]:
+    """``hours`` consecutive hourly buckets starting at the hour containing ``start``."""
+    first = floor_hour(start)
+    end = first + hours * HOUR
+    totals = hourly_sales(first, end)
+    series = []
+    for i in range(hours):
+        bucket = first + i * HOUR
+        series.append({"time": bucket.isoformat(), "amount": float(totals.get(bucket, DEC0))})
+    return series
+
+
+def daily_series(start: datetime, days: int) -> List[dict]:
+    """``days`` consecutive local-day buckets starting at the day containing ``start``."""
+    first = floor_day(start)
+    tz = report_timezone()
+    day_starts = []
+    for i in range(days):
+        naive = (first.replace(tzinfo=None) + timedelta(days=i))
+        day_starts.append(dj_tz.make_aware(naive, tz))
+    end = dj_tz.make_aware(day_starts[-1].replace(tzinfo=None) + timedelta(days=1), tz) if day_starts else first
+    by_day: Dict[datetime, Decimal] = {}
+    for hour, total in hourly_sales(first, end).items():
+        key = floor_day(hour)
+        by_day[key] = by_day.get(key, DEC0) + total
+    return [{"time": d.isoformat(), "amount": float(by_day.get(d, DEC0))} for d in day_starts]
+
+
+def _rollup_window(start: datetime, end: datetime) -> int:
+    """Rewrite ``SalesRollup`` and ``ItemSalesRollup`` for the hours in [start, end)."""
+    from .models import ItemSalesRollup, SalesRollup
+
+    live = live_hourly_sales(start, end)
+    rows = []
+    bucket = start
+    while bucket < end:
+        count, total = live.get(bucket, (0, DEC0))
+        rows.append(SalesRollup(bucket_start=bucket, order_count=count, total_amount=total))
+        bucket += HOUR
+    item_rows: Dict[Tuple[datetime, str, str], ItemSalesRollup] = {}
+    for row in live_item_sales(start, end, by_hour=True):
+        key = (row["bucket"], row["item_key"], row["category"] or "")
+        existing = item_rows.get(key)
+        if existing is None:
+            item_rows[key] = ItemSalesRollup(
+                bucket_start=row["bucket"],
+                item_key=row["item_key"],
+                menu_item_id=row["menu_item_id"],
+                item_name=row["item_name"] or "",
+                category=row["category"] or "",
+                quantity=row["qty"],
+                revenue=row["revenue"],
+            )
+        else:
+            # Same menu item sold under an older name in the same hour
+            existing.quantity += row["qty"]
+            existing.revenue += row["revenue"]
+
+    # MySQL upserts on any unique key and rejects an explicit conflict target
+    target = ["bucket_start"] if connection.features.supports_update_conflicts_with_target else None
+    with transaction.atomic():
+        ItemSalesRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+        ItemSalesRollup.objects.bulk_create(list(item_rows.values()), batch_size=500)
+        SalesRollup.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=target,
+            update_fields=["order_count", "total_amount", "updated_at"],
+        )
+    return len(rows)
+
+
+def rollup_sales(hours: Optional[int] = None, *, now: Optional[datetime] = None) -> int:
+    """Recompute the sales rollups for the closed hours in the trailing window.
+
+    The window is re-rolled every run so late cancellations and voids are picked
+    up; widen ``hours`` to backfill history. Returns the number of hours written.
+    """
+    hours = int(hours or getattr(settings, "SALES_ROLLUP_REFRESH_HOURS", 48) or 48)
+    end = floor_hour(now or dj_tz.now())
+    return _rollup_window(end - max(1, hours) * HOUR, end)
+
+
+def refresh_order_rollup(order) -> int:
+    """Re-roll the (closed) hour an order was placed in; 0 when that hour is still live."""
+    created_at = getattr(order, "created_at", None)
+    if not created_at:
+        return 0
+    hour = floor_hour(created_at)
+    if hour + HOUR > floor_hour(dj_tz.now()):
+        return 0
+    return _rollup_window(hour, hour + HOUR)
+
+
+__all__ = [
+    "floor_hour",
+    "floor_day",
+    "live_hourly_sales",
+    "live_item_sales",
+    "hourly_sales",
+    "item_sales",
+    "sales_by_category",
+    "top_items",
+    "hourly_series",
+    "daily_series",
+    "rollup_sales",
+    "refresh_order_rollup",
+]
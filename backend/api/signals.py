@@ -0,0 +1,78 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import loyalty_services, menu_catalog, notification_inbox
+from .models import AppUser, BroadcastReceipt, MenuCategory, MenuItem, Notification, Order
+from .notification_triggers import invalidate_audience_cache
+from .report_rollups import ROLLUP_TRIGGER_STATUSES, refresh_order_rollup
+from .views_common import invalidate_actor_cache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Order)
+def order_rollup_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Re-roll an already-closed sales hour when one of its orders completes, cancels or voids."""
+    if created or (update_fields is not None and "status" not in update_fields):
+        return
+    if str(instance.status or "").lower() not in ROLLUP_TRIGGER_STATUSES:
+        return
+
+    def _refresh():
+        try:
+            refresh_order_rollup(instance)
+        except Exception:
+            logger.exception("Failed to refresh sales rollup for order %s", instance.pk)
+
+    transaction.on_commit(_refresh)
+
+
+@receiver(post_save, sender=Order)
+def order_points_refund_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Give back the points a cancelled, voided or refunded order spent."""
+    if created or (update_fields is not None and "status" not in update_fields):
+        return
+    if not instance.credit_points_used or str(instance.status or "").lower() not in loyalty_services.REFUND_STATUSES:
+        return
+    loyalty_services.refund_order(instance)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def appuser_actor_cache_invalidate(sender, instance, **kwargs):
+    """Drop the cached actor so role/status/permission changes apply on the next request."""
+    invalidate_actor_cache(instance.pk)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def appuser_audience_cache_invalidate(sender, instance, created=False, update_fields=None, **kwargs):
+    """Drop cached notification audiences when membership may have changed."""
+    if not created and update_fields is not None and "role" not in update_fields:
+        return
+    invalidate_audience_cache()
+    notification_inbox.touch([instance.pk])
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=BroadcastReceipt)
+def notification_inbox_invalidate(sender, instance, **kwargs):
+    """Row-level inbox writes; queryset updates and bulk inserts call ``touch`` themselves."""
+    notification_inbox.touch([instance.user_id])
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def menu_item_catalog_bump(sender, instance, **kwargs):
+    """Create, update, archive, restore, availability and image changes all land here."""
+    instance.catalog_version = menu_catalog.bump([instance.pk] if kwargs.get("signal") is post_save else [])
+
+
+@receiver(post_save, sender=MenuCategory)
+@receiver(post_delete, sender=MenuCategory)
+def menu_category_catalog_bump(sender, instance, **kwargs):
+    """Items serialise their categoryId, so re-stamp the ones filed under this name."""
+    menu_catalog.bump(MenuItem.objects.filter(category__iexact=instance.name).values_list("id", flat=True))
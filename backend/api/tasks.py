@@ -108,17 +108,7 @@ def send_push_notification(self, user_id: int, title: str, message: str, notific
         notification_type: Type of notification (info, warning, success, error)
     """
     try:
-        from pywebpush import webpush, WebPushException
-
-        WebPushSubscription = get_webpush_subscription_model()
-        subscriptions = WebPushSubscription.objects.filter(
-            user_id=user_id,
-            active=True
-        )
-
-        if not subscriptions.exists():
-            logger.info(f"No active push subscriptions for user {user_id}")
-            return 0
+        from .push_delivery import send_to_users
 
         # Check if VAPID keys are configured
         if not settings.WEBPUSH_VAPID_PRIVATE_KEY or not settings.WEBPUSH_VAPID_PUBLIC_KEY:
@@ -132,39 +122,11 @@ def send_push_notification(self, user_id: int, title: str, message: str, notific
             'timestamp': timezone.now().isoformat(),
         })
 
-        sent_count = 0
-        failed_subscriptions = []
-
-        for subscription in subscriptions:
-            try:
-                webpush(
-                    subscription_info={
-                        'endpoint': subscription.endpoint,
-                        'keys': {
-                            'p256dh': subscription.p256dh,
-                            'auth': subscription.auth,
-                        }
-                    },
-                    data=payload,
-                    vapid_private_key=settings.WEBPUSH_VAPID_PRIVATE_KEY,
-                    vapid_claims={
-                        'sub': settings.WEBPUSH_VAPID_SUBJECT,
-                    }
-                )
-                sent_count += 1
-                logger.info(f"Push notification sent to subscription {subscription.id}")
-
-            except WebPushException as e:
-                logger.error(f"Push notification failed for subscription {subscription.id}: {e}")
-                # If subscription is expired or invalid, mark as inactive
-                if e.response and e.response.status_code in [404, 410]:
-                    failed_subscriptions.append(subscription.id)
-
-        # Deactivate failed subscriptions
-        if failed_subscriptions:
-            WebPushSubscription.objects.filter(id__in=failed_subscriptions).update(active=False)
-            logger.info(f"Deactivated {len(failed_subscriptions)} invalid subscriptions")
-
+        # All devices are pushed concurrently; 404/410 subscriptions are
+        # deactivated by push_delivery in one update
+        sent_count = send_to_users({user_id: payload}).get(user_id, 0)
+        if sent_count:
+            logger.info(f"Push notification sent to {sent_count} device(s) of user {user_id}")
         return sent_count
 
     except Exception as exc:
@@ -173,203 +135,51 @@ def send_push_notification(self, user_id: int, title: str, message: str, notific
 
 
 @shared_task
-def auto_advance_orders(limit: int = 50):
+def auto_advance_orders(limit: Optional[int] = None):
     """
-    Automatically advance POS orders whose auto-advance timers have elapsed.
-    Returns the number of orders processed in this run.
-    """
-    from django.utils import timezone as dj_timezone
-
-    try:
-        from .models import Order
-        from .views_orders import (
-            canonical_status,
-            can_transition,
-            _auto_next_status,
-            _start_auto_flow,
-            _clear_auto_flow,
-            _safe_order,
-            recalc_order_counters,
-            record_order_event,
-            publish_event,
-        )
-    except Exception as exc:
-        logger.error(f"Auto advance initialization failed: {exc}")
-        return 0
+    Sweep for POS orders whose auto-advance timers have elapsed.
 
-    now_ts = dj_timezone.now()
-    pending_ids = list(
-        Order.objects.filter(
-            auto_advance_paused=False,
-            auto_advance_at__isnull=False,
-            auto_advance_at__lte=now_ts,
-        )
-        .exclude(status__in={"completed", "cancelled", "voided", "refunded"})
-        .values_list("id", flat=True)[: max(1, int(limit or 50))]
-    )
+    Timers normally fire on their own (advance_auto_flow, scheduled by
+    api.auto_advance.schedule_auto_advance); this catches any that were lost.
+    Returns the number of orders advanced in this run.
+    """
+    from .auto_advance import drain_due
 
-    processed = 0
+    totals = drain_due(limit=limit)
+    if totals["advanced"]:
+        logger.info(f"Auto advance sweep advanced {totals['advanced']} orders")
+    return totals["advanced"]
 
-    for order_id in pending_ids:
-        try:
-            with transaction.atomic():
-                order = (
-                    Order.objects.select_for_update()
-                    .select_related("placed_by")
-                    .prefetch_related("items__menu_item")
-                    .get(id=order_id)
-                )
 
-                if order.auto_advance_paused:
-                    continue
-
-                now_inner = dj_timezone.now()
-                if not order.auto_advance_at or order.auto_advance_at > now_inner:
-                    continue
-
-                target_status = order.auto_advance_target or _auto_next_status(order.status)
-                if not target_status:
-                    clear_fields = _clear_auto_flow(order, reason="auto_no_target")
-                    if clear_fields:
-                        if "updated_at" not in clear_fields:
-                            clear_fields.append("updated_at")
-                        order.save(update_fields=clear_fields)
-                    continue
-
-                current_canonical = canonical_status(order.status)
-                target_canonical = canonical_status(target_status)
-
-                if not can_transition(current_canonical, target_canonical):
-                    clear_fields = _clear_auto_flow(order, reason="auto_invalid_transition")
-                    if clear_fields:
-                        if "updated_at" not in clear_fields:
-                            clear_fields.append("updated_at")
-                        order.save(update_fields=clear_fields)
-                    continue
-
-                previous_status = order.status
-                order.status = target_status
-                update_fields = ["status", "updated_at"]
-
-                if target_canonical == "completed":
-                    order.completed_at = now_inner
-                    update_fields.append("completed_at")
-
-                auto_fields = _start_auto_flow(order, now=now_inner)
-                if auto_fields:
-                    update_fields.extend(auto_fields)
-
-                # Deduplicate update fields while preserving order
-                update_fields = list(dict.fromkeys(update_fields))
-                order.save(update_fields=update_fields)
-
-                try:
-                    recalc_order_counters(order)
-                except Exception:
-                    pass
-
-                order.refresh_from_db()
-                order_payload = _safe_order(order)
-
-                record_order_event(
-                    order,
-                    event_type="order.auto_advanced",
-                    from_state=current_canonical,
-                    to_state=canonical_status(order.status),
-                    actor=None,
-                    payload={
-                        "previousStatus": previous_status,
-                        "nextStatus": order.status,
-                        "autoAdvanceAt": order_payload.get("autoAdvanceAt"),
-                    },
-                )
-
-                publish_event(
-                    "order.status_changed",
-                    {"order": order_payload, "status": canonical_status(order.status)},
-                    roles={"admin", "manager", "staff"},
-                    user_ids=[str(order.placed_by_id)] if getattr(order, "placed_by_id", None) else None,
-                )
+@shared_task(ignore_result=True)
+def advance_auto_flow():
+    """
+    Advance every order that is due now (fired at a scheduler slot's ETA).
 
-                processed += 1
-        except Order.DoesNotExist:
-            continue
-        except Exception as exc:
-            logger.error(f"Failed to auto advance order {order_id}: {exc}")
-            continue
+    Orders left behind (row locked elsewhere, or not yet due by this worker's
+    clock) get a short retry timer rather than waiting for the sweep.
+    """
+    from .auto_advance import drain_due, rearm_pending
 
-    return processed
+    advanced = drain_due()["advanced"]
+    rearm_pending()
+    return advanced
 
 
 @shared_task
 def process_notification_outbox():
     """
-    Process pending notifications in the outbox.
-    Sends notifications via email and/or push based on user preferences.
-    """
-    NotificationOutbox = get_notification_outbox_model()
-    NotificationPreference = get_notification_preference_model()
+    Drain due notifications from the outbox (email and/or push per user preferences).
 
-    # Get pending notifications (max 100 per run to avoid overload)
-    pending = NotificationOutbox.objects.filter(
-        status='pending',
-        attempts__lt=5,  # Max 5 attempts
-    ).order_by('created_at')[:100]
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several workers
+    can run this concurrently; see api.outbox_dispatcher.
+    """
+    from .outbox_dispatcher import dispatch
 
-    if not pending:
+    totals = dispatch()
+    if not totals["claimed"]:
         logger.debug("No pending notifications to process")
-        return 0
-
-    processed_count = 0
-
-    for outbox_item in pending:
-        try:
-            with transaction.atomic():
-                # Update attempts
-                outbox_item.attempts += 1
-                outbox_item.save(update_fields=['attempts', 'updated_at'])
-
-                # Get user preferences
-                try:
-                    prefs = NotificationPreference.objects.get(user_id=outbox_item.user_id)
-                except NotificationPreference.DoesNotExist:
-                    # Create default preferences
-                    prefs = NotificationPreference.objects.create(
-                        user_id=outbox_item.user_id,
-                        email_enabled=True,
-                        push_enabled=False,
-                    )
-
-                # Send email if enabled
-                if prefs.email_enabled:
-                    send_email_notification.delay(
-                        user_id=outbox_item.user_id,
-                        title=outbox_item.title,
-                        message=outbox_item.message,
-                    )
-
-                # Send push if enabled
-                if prefs.push_enabled:
-                    send_push_notification.delay(
-                        user_id=outbox_item.user_id,
-                        title=outbox_item.title,
-                        message=outbox_item.message,
-                        notification_type='info',
-                    )
-
-                # Mark as sent
-                outbox_item.status = 'sent'
-                outbox_item.save(update_fields=['status', 'updated_at'])
-                processed_count += 1
-
-        except Exception as e:
-            logger.error(f"Failed to process outbox item {outbox_item.id}: {e}")
-            outbox_item.status = 'failed'
-            outbox_item.last_error = str(e)
-            outbox_item.save(update_fields=['status', 'last_error', 'updated_at'])
-
-    logger.info(f"Processed {processed_count} notifications from outbox")
-    return processed_count
+    return totals["sent"]
 
 
 @shared_task
@@ -386,11 +196,65 @@ def cleanup_old_notifications():
         read=True,
         created_at__lt=cutoff_date
     ).delete()
+    if deleted_count:
+        from .notification_inbox import touch_all
+        touch_all()
 
     logger.info(f"Cleaned up {deleted_count} old notifications")
     return deleted_count
 
 
+@shared_task
+def prune_realtime_events():
+    """
+    Drop websocket replay journal rows older than EVENT_REPLAY_RETENTION_MINUTES.
+    """
+    from .events import prune_event_journal
+
+    deleted = prune_event_journal()
+    logger.info(f"Pruned {deleted} realtime events")
+    return deleted
+
+
+@shared_task
+def generate_menu_image_variants(item_id: str, force: bool = False):
+    """
+    Render WebP/JPEG thumb, card and full derivatives for a menu item photo.
+    """
+    from .menu_images import process_menu_image
+
+    result = process_menu_image(item_id, force=force)
+    logger.info(f"Menu image variants for {item_id}: {result}")
+    return result
+
+
+@shared_task
+def snapshot_stock_balances(keep_days: int = 35):
+    """
+    Snapshot StockBalance so historical (as_of) stock reads only replay the
+    ledger tail since the snapshot. Old snapshots are pruned.
+    """
+    from .inventory_services import prune_stock_snapshots, take_stock_snapshot
+
+    snapshot = take_stock_snapshot()
+    pruned = prune_stock_snapshots(keep_days)
+    logger.info(f"Stock snapshot {snapshot.id} as of {snapshot.as_of} (pruned {pruned})")
+    return snapshot.id
+
+
+@shared_task
+def rollup_sales(hours: Optional[int] = None):
+    """
+    Refresh hourly SalesRollup/ItemSalesRollup rows for the trailing window
+    (SALES_ROLLUP_REFRESH_HOURS) so dashboards only compute the current hour live.
+    """
+    from .report_rollups import rollup_sales as _rollup_sales
+
+    written = _rollup_sales(hours)
+    logger.info(f"Rolled up sales for {written} hours")
+    return written
+
+
 def create_notification_sync(
     user_id: int,
     title: str,
@@ -470,3 +334,85 @@ def create_notification(
         meta=meta,
         send_immediately=send_immediately
     )
+
+
+def create_notifications_bulk_sync(
+    user_ids: List[Any],
+    title: str,
+    message: str,
+    notification_type: str = 'info',
+    meta: Optional[Dict[str, Any]] = None,
+    send_immediately: bool = True
+) -> int:
+    """
+    Create the same notification for many users with two bulk INSERTs.
+
+    Notification and NotificationOutbox rows are written in one transaction.
+    Duplicate and empty user ids are dropped. Returns the number of recipients.
+    """
+    Notification = get_notification_model()
+    NotificationOutbox = get_notification_outbox_model()
+
+    recipients = list(dict.fromkeys(uid for uid in user_ids or [] if uid))
+    if not recipients:
+        return 0
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user_id=uid,
+                    title=title,
+                    message=message,
+                    type=notification_type,
+                    meta=meta or {},
+                    read=False,
+                )
+                for uid in recipients
+            ],
+            batch_size=500,
+        )
+        if send_immediately:
+            NotificationOutbox.objects.bulk_create(
+                [
+                    NotificationOutbox(user_id=uid, title=title, message=message, status='pending')
+                    for uid in recipients
+                ],
+                batch_size=500,
+            )
+        from .notification_inbox import touch
+        touch(recipients)
+    logger.info(f"Created {len(recipients)} notifications: {title}")
+    return len(recipients)
+
+
+@shared_task
+def fan_out_notification(
+    title: str,
+    message: str,
+    notification_type: str = 'info',
+    meta: Optional[Dict[str, Any]] = None,
+    user_ids: Optional[List[Any]] = None,
+    audience: Optional[str] = None,
+    exclude_user_ids: Optional[List[Any]] = None,
+    send_immediately: bool = True
+):
+    """
+    Create one notification for an explicit list of users and/or a named
+    audience (see notification_triggers.resolve_audience), resolved here in
+    the worker so the caller does not query recipients.
+    """
+    from .notification_triggers import resolve_audience
+
+    recipients = [str(uid) for uid in (user_ids or [])]
+    if audience:
+        recipients.extend(str(uid) for uid in resolve_audience(audience))
+    excluded = {str(uid) for uid in (exclude_user_ids or [])}
+    recipients = [uid for uid in recipients if uid not in excluded]
+    return create_notifications_bulk_sync(
+        recipients,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        meta=meta,
+        send_immediately=send_immediately,
+    )
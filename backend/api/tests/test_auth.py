@@ -0,0 +1,107 @@
+import json
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api import mail_queue
+from api.emails import email_user_login_otp, email_user_password_reset
+from api.fake_smtp import FakeSMTPServer
+from api.models import AppUser
+from api.tests.test_orders import auth_headers
+from api import views_common
+from api.views_common import _actor_from_token, invalidate_actor_cache
+
+
+class ActorCacheTests(TestCase):
+    def setUp(self):
+        invalidate_actor_cache()
+        self.addCleanup(invalidate_actor_cache)
+        self.client = Client()
+        self.admin = AppUser.objects.create(email='admin@example.com', name='Admin', role='admin', status='active')
+        self.staff = AppUser.objects.create(email='staff@example.com', name='Staff', role='staff', status='active')
+
+    def _queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(path, **auth_headers(self.admin))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_hot_endpoints_resolve_the_actor_once_and_then_from_cache(self):
+        for path in ('/api/auth/me', '/api/users'):
+            with override_settings(AUTH_ACTOR_CACHE_SECONDS=0):
+                uncached = self._queries(path)
+            self._queries(path)  # warm
+            cached = self._queries(path)
+            # Uncached: one seed check plus one user lookup shared by middleware and view
+            self.assertEqual(uncached - cached, 2, path)
+
+    def test_role_and_status_changes_invalidate_the_cached_actor(self):
+        self.assertEqual(self.client.get('/api/users', **auth_headers(self.admin)).status_code, 200)
+        self.admin.role = 'manager'
+        self.admin.save(update_fields=['role'])
+        self.assertEqual(self.client.get('/api/users', **auth_headers(self.admin)).status_code, 403)
+
+        self.admin.role = 'admin'
+        self.admin.save(update_fields=['role'])
+        self.assertEqual(self.client.get('/api/auth/me', **auth_headers(self.staff)).status_code, 200)
+        resp = self.client.patch(
+            f'/api/users/{self.staff.id}/status', data=json.dumps({'status': 'deactivated'}),
+            content_type='application/json', **auth_headers(self.admin),
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/me', **auth_headers(self.staff)).status_code, 403)
+
+    def test_cached_actor_is_a_private_copy(self):
+        token = auth_headers(self.staff)['HTTP_AUTHORIZATION'].split(' ', 1)[1]
+        first = _actor_from_token(token)
+        first.name = 'Changed in one request'
+        with self.assertNumQueries(0):
+            second = _actor_from_token(token)
+        self.assertEqual(second.name, 'Staff')
+
+    def test_demotion_in_another_process_drops_this_processes_copy(self):
+        token = auth_headers(self.staff)['HTTP_AUTHORIZATION'].split(' ', 1)[1]
+        self.assertEqual(_actor_from_token(token).role, 'staff')
+        AppUser.objects.filter(pk=self.staff.pk).update(role='customer')
+        # The other worker clears its own process cache and bumps the shared version
+        with mock.patch.dict(views_common._ACTOR_CACHE, {}, clear=True):
+            invalidate_actor_cache(self.staff.pk)
+        self.assertEqual(_actor_from_token(token).role, 'customer')
+
+
+class MailQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer(latency_ms=100).start()
+        self.addCleanup(self.smtp.stop)
+        overrides = override_settings(**self.smtp.settings(), MAIL_QUEUE_ASYNC=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.queue = mail_queue.MailQueue(batch_size=10, retry_seconds=0.05, idle_seconds=0.5)
+        original, mail_queue._mail_queue = mail_queue._mail_queue, self.queue
+        self.addCleanup(setattr, mail_queue, "_mail_queue", original)
+
+    def test_otp_email_is_queued_without_waiting_for_smtp(self):
+        user = AppUser(email="otp@example.com", name="Otp User")
+        started = time.perf_counter()
+        email_user_login_otp(user, "123456")
+        self.assertLess(time.perf_counter() - started, self.smtp.latency)
+        self.assertTrue(mail_queue.flush_mail(5))
+
+        [(recipients, message)] = self.smtp.messages
+        self.assertEqual(recipients, ["otp@example.com"])
+        self.assertEqual(message["Subject"], "Your login verification code")
+        self.assertIn("123456", message.get_body(("html",)).get_content())
+
+    def test_batch_reuses_one_connection_and_retries_temporary_failures(self):
+        self.smtp.fail_next = 2
+        for n in range(12):
+            email_user_password_reset(f"user{n}@example.com", f"https://example.com/reset/{n}")
+        self.assertTrue(mail_queue.flush_mail(10))
+
+        self.assertEqual(sorted(r[0] for r, _ in self.smtp.messages), sorted(f"user{n}@example.com" for n in range(12)))
+        stats = mail_queue.mail_queue_stats()
+        self.assertEqual((stats["sent"], stats["retried"], stats["failed"]), (12, 2, 0))
+        self.assertEqual(self.smtp.connections, 1)
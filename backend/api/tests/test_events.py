@@ -1,28 +1,49 @@
-from asgiref.sync import async_to_sync
-from channels.layers import InMemoryChannelLayer
-from django.test import SimpleTestCase
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from api import events
-from api.events import publish_event
+from api.channel_layers import GroupBatchInMemoryChannelLayer
+from api.consumers import EventStreamConsumer, default_feed, resolve_topic
+from api.events import EventBus, build_message, publish_event
+from api.models import AppUser, Order
+from api.tests.test_orders import auth_headers
+
+
+class _RecordingLayer:
+    def __init__(self):
+        self.calls = []
+
+    async def group_send_many(self, groups, message):
+        self.calls.append((list(groups), message))
+
+
+def _use_layer(test, layer):
+    original = events.get_channel_layer
+    events.get_channel_layer = lambda: layer
+    test.addCleanup(lambda: setattr(events, "get_channel_layer", original))
 
 
+@override_settings(EVENT_REPLAY_ENABLED=False)
 class PublishEventTests(SimpleTestCase):
     def test_publish_event_sends_to_expected_groups(self):
         layer = InMemoryChannelLayer()
-
-        original = events.get_channel_layer
-        events.get_channel_layer = lambda: layer
-        self.addCleanup(lambda: setattr(events, "get_channel_layer", original))
+        _use_layer(self, layer)
 
         manager_channel = async_to_sync(layer.new_channel)()
         user_channel = async_to_sync(layer.new_channel)()
         custom_channel = async_to_sync(layer.new_channel)()
         broadcast_channel = async_to_sync(layer.new_channel)()
+        firehose_channel = async_to_sync(layer.new_channel)()
 
         async_to_sync(layer.group_add)("role_manager", manager_channel)
         async_to_sync(layer.group_add)("user_user-1", user_channel)
         async_to_sync(layer.group_add)("custom", custom_channel)
         async_to_sync(layer.group_add)("broadcast", broadcast_channel)
+        async_to_sync(layer.group_add)("firehose", firehose_channel)
 
         publish_event(
             "order.status_changed",
@@ -31,6 +52,7 @@ class PublishEventTests(SimpleTestCase):
             user_ids=["user-1"],
             audience=["custom"],
         )
+        self.assertTrue(events.flush_events())
 
         manager_msg = async_to_sync(layer.receive)(manager_channel)
         self.assertEqual(manager_msg["event"], "order.status_changed")
@@ -42,5 +64,246 @@ class PublishEventTests(SimpleTestCase):
         custom_msg = async_to_sync(layer.receive)(custom_channel)
         self.assertEqual(custom_msg["event"], "order.status_changed")
 
-        broadcast_msg = async_to_sync(layer.receive)(broadcast_channel)
-        self.assertEqual(broadcast_msg["event"], "order.status_changed")
+        firehose_msg = async_to_sync(layer.receive)(firehose_channel)
+        self.assertEqual(firehose_msg["event"], "order.status_changed")
+        # broadcast is only for explicit announcements now
+        self.assertNotIn(broadcast_channel, layer.channels)
+
+    def test_item_events_for_one_item_coalesce_into_one_batched_send(self):
+        layer = _RecordingLayer()
+        _use_layer(self, layer)
+        for n in range(5):
+            publish_event("order.item_state_changed", {"orderId": "o-1", "item": {"id": "i-1"}, "n": n}, roles={"staff"})
+        # Another item of the same order keeps its own message
+        publish_event("order.item_state_changed", {"orderId": "o-1", "item": {"id": "i-2"}, "n": 0}, roles={"staff"})
+        publish_event("order.item_state_changed", {"orderId": "o-2", "n": 0}, user_ids=["u-9"])
+        self.assertTrue(events.flush_events())
+
+        self.assertEqual(len(layer.calls), 3)
+        groups, message = layer.calls[0]
+        self.assertEqual(groups, ["firehose", "order_o-1", "role_staff"])
+        self.assertEqual(message["payload"], {"orderId": "o-1", "item": {"id": "i-1"}, "n": 4})
+        self.assertEqual(layer.calls[1][1]["delta"]["item"], {"id": "i-2"})
+        self.assertEqual(layer.calls[2][0], ["firehose", "order_o-2", "user_u-9"])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        layer = _RecordingLayer()
+        _use_layer(self, layer)
+        bus = EventBus(maxsize=2, coalesce_window=0)
+        start = bus._ensure_worker
+        bus._ensure_worker = lambda: None
+        results = [bus.submit({"broadcast"}, {"event": f"e{n}"}) for n in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(bus.snapshot()["dropped"], 1)
+
+        start()
+        self.assertTrue(bus.flush())
+        self.assertEqual([m["event"] for _, m in layer.calls], ["e0", "e1"])
+        self.assertEqual(bus.snapshot()["sent"], 2)
+
+
+class PublishAfterCommitTests(TestCase):
+    def test_event_waits_for_commit(self):
+        layer = _RecordingLayer()
+        _use_layer(self, layer)
+        with self.captureOnCommitCallbacks() as callbacks:
+            publish_event("order.created", {"orderId": "o-3"})
+        events.flush_events()
+        self.assertEqual(layer.calls, [])
+        for callback in callbacks:
+            callback()
+        self.assertTrue(events.flush_events())
+        self.assertEqual(len(layer.calls), 1)
+
+    def test_replay_collapses_item_events_per_item(self):
+        _use_layer(self, _RecordingLayer())
+        groups = {events.order_group("o-5")}
+
+        def publish(item_id, state):
+            with self.captureOnCommitCallbacks(execute=True):
+                publish_event("order.item_state_changed", {"orderId": "o-5", "item": {"id": item_id, "state": state}})
+
+        publish("i-0", "queued")
+        cursor = events.latest_event_id()
+        publish("i-1", "cooking")
+        publish("i-2", "ready")
+        publish("i-1", "ready")
+        messages, _, _ = events.replay_events(cursor, groups)
+        self.assertEqual([m["delta"]["item"] for m in messages],
+                         [{"id": "i-2", "state": "ready"}, {"id": "i-1", "state": "ready"}])
+        events.flush_events()
+
+    def test_cursor_follows_commit_order(self):
+        layer = _RecordingLayer()
+        _use_layer(self, layer)
+        groups = {events.order_group("o-a"), events.order_group("o-b")}
+        # A publishes first but commits after B
+        with self.captureOnCommitCallbacks() as first:
+            publish_event("order.status_changed", {"orderId": "o-a", "status": "ready"})
+        with self.captureOnCommitCallbacks() as second:
+            publish_event("order.status_changed", {"orderId": "o-b", "status": "ready"})
+        self.assertIsNone(events.latest_event_id())
+        for callback in second:
+            callback()
+        seen = events.latest_event_id()
+        for callback in first:
+            callback()
+
+        messages, last, reset = events.replay_events(seen, groups)
+        self.assertEqual(([m["payload"]["orderId"] for m in messages], reset), (["o-a"], ""))
+        self.assertGreater(last, seen)
+        self.assertTrue(events.flush_events())
+        live = [message for _, message in layer.calls]
+        self.assertEqual([m["payload"]["orderId"] for m in live], ["o-b", "o-a"])
+        self.assertLess(live[0]["id"], live[1]["id"])
+
+
+def _order_event(order_id, station, status="ready"):
+    payload = {
+        "order": {
+            "id": order_id, "orderNumber": f"N-{order_id}", "status": status, "customerName": "Ana",
+            "items": [{"id": f"{order_id}-1", "name": "Sisig", "stationCode": station, "state": status}],
+        },
+        "status": status,
+    }
+    return build_message("order.status_changed", payload, roles={"admin", "manager", "staff"})
+
+
+class TopicFanOutLoadTests(SimpleTestCase):
+    def test_thousand_sockets_only_receive_their_topics(self):
+        layer = GroupBatchInMemoryChannelLayer(capacity=1000)
+        stations = ["grill", "fryer", "drinks", "expo"]
+        sockets = []
+        for n in range(1000):
+            if n < 5:
+                role, topics = "admin", []
+            elif n < 100:
+                role, topics = "staff", [f"station:{stations[n % 4]}"]
+            else:
+                role, topics = "customer", [f"order:o-{n}"]
+            groups = {"broadcast", f"user_u-{n}"} | ({resolve_topic(t, role)[0] for t in topics} or default_feed(role))
+            channel = async_to_sync(layer.new_channel)()
+            for group in groups:
+                async_to_sync(layer.group_add)(group, channel)
+            sockets.append((channel, role, topics))
+
+        orders = range(100, 300)
+        for k in orders:
+            groups, message = _order_event(f"o-{k}", stations[k % 4])
+            async_to_sync(events._send)(layer, groups, message)
+
+        def received(channel):
+            queue = layer.channels.get(channel)
+            return queue.qsize() if queue is not None else 0
+
+        expected_total = 0
+        for n, (channel, role, topics) in enumerate(sockets):
+            if role == "admin":
+                expected = len(orders)
+            elif role == "staff":
+                expected = sum(1 for k in orders if stations[k % 4] == stations[n % 4])
+            else:
+                expected = 1 if n in orders else 0
+            expected_total += expected
+            self.assertEqual(received(channel), expected, (n, role))
+        # Fan-out follows interest: ~12k deliveries instead of 200 x 1000
+        self.assertEqual(sum(received(c) for c, _, _ in sockets), expected_total)
+        self.assertLess(expected_total, len(orders) * len(sockets) // 10)
+
+
+class _Socket(ApplicationCommunicator):
+    """Minimal websocket client for a consumer (channels.testing needs daphne)."""
+
+    async def send_json_to(self, data):
+        await self.send_input({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json_from(self, timeout=1):
+        return json.loads((await self.receive_output(timeout))["text"])
+
+    async def disconnect(self):
+        await self.send_input({"type": "websocket.disconnect", "code": 1000})
+        await self.wait(1)
+
+
+class EventStreamTopicTests(TestCase):
+    async def _connect(self, user, query=""):
+        token = auth_headers(user)["HTTP_AUTHORIZATION"].split(" ", 1)[1]
+        scope = {
+            "type": "websocket", "path": "/ws/events/", "headers": [], "subprotocols": [],
+            "query_string": f"token={token}{query}".encode(),
+        }
+        socket = _Socket(EventStreamConsumer.as_asgi(), scope)
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+        self.assertEqual((await socket.receive_json_from())["event"], "connection.established")
+        return socket
+
+    async def test_station_feed_in_delta_mode_and_customer_limited_to_own_order(self):
+        staff = await AppUser.objects.acreate(email="kds@example.com", name="KDS", role="staff")
+        customer = await AppUser.objects.acreate(email="phone@example.com", name="Phone", role="customer")
+        mine = await Order.objects.acreate(order_number="WS-1", placed_by=customer)
+        other = await Order.objects.acreate(order_number="WS-2")
+
+        kds = await self._connect(staff, "&topics=station:grill&mode=delta")
+        ack = await kds.receive_json_from()
+        self.assertEqual((ack["payload"]["topics"], ack["payload"]["mode"]), (["station:grill"], "delta"))
+
+        phone = await self._connect(customer)
+        await phone.send_json_to({"action": "subscribe", "topics": [f"order:{mine.id}", f"order:{other.id}", "firehose"]})
+        ack = (await phone.receive_json_from())["payload"]
+        self.assertEqual(ack["topics"], [f"order:{mine.id}"])
+        self.assertEqual(set(ack["rejected"].values()), {"forbidden"})
+
+        layer = get_channel_layer()
+        for order in (mine, other):
+            groups, message = _order_event(str(order.id), "grill")
+            await events._send(layer, groups, message)
+
+        for order in (mine, other):
+            event = await kds.receive_json_from()
+            self.assertEqual((event["mode"], event["payload"]["order"]["id"]), ("delta", str(order.id)))
+            self.assertNotIn("customerName", event["payload"]["order"])
+        event = await phone.receive_json_from()
+        self.assertEqual((event["mode"], event["payload"]["order"]["id"]), ("full", str(mine.id)))
+        self.assertEqual(event["payload"]["order"]["customerName"], "Ana")
+        self.assertTrue(await phone.receive_nothing())
+        await kds.disconnect()
+        await phone.disconnect()
+
+    async def test_reconnect_replays_missed_events_once_then_goes_live(self):
+        customer = await AppUser.objects.acreate(email="resume@example.com", name="Resume", role="customer")
+        mine = await Order.objects.acreate(order_number="WS-3", placed_by=customer)
+        other = await Order.objects.acreate(order_number="WS-4")
+
+        def publish(order, status):
+            payload = {"order": {"id": str(order.id), "status": status}, "status": status}
+            with self.captureOnCommitCallbacks(execute=True):
+                publish_event("order.status_changed", payload, user_ids=[str(customer.id)] if order == mine else None)
+            return events.latest_event_id()
+
+        cursor = await sync_to_async(publish)(mine, "pending")
+        await sync_to_async(publish)(mine, "preparing")
+        await sync_to_async(publish)(other, "preparing")
+        last = await sync_to_async(publish)(mine, "ready")
+
+        phone = await self._connect(customer, f"&topics=order:{mine.id}&since={cursor}")
+        await phone.receive_json_from()  # subscribe ack
+        replayed = [await phone.receive_json_from() for _ in range(2)]
+        self.assertEqual([e["payload"]["status"] for e in replayed], ["preparing", "ready"])
+        self.assertTrue(all(e["replayed"] for e in replayed))
+        self.assertLess(replayed[0]["id"], replayed[1]["id"])
+        done = (await phone.receive_json_from())["payload"]
+        self.assertEqual((done["count"], done["lastEventId"], done["reset"]), (2, last, None))
+
+        # The live copy of a replayed event is not delivered twice
+        layer = get_channel_layer()
+        groups, message = build_message("order.status_changed", {"order": {"id": str(mine.id)}, "status": "ready"})
+        await events._send(layer, groups, {**message, "id": last})
+        await events._send(layer, groups, {**message, "id": last + 1})
+        self.assertEqual((await phone.receive_json_from())["id"], last + 1)
+        self.assertTrue(await phone.receive_nothing())
+
+        with override_settings(EVENT_REPLAY_MAX_EVENTS=1):
+            await phone.send_json_to({"action": "resume", "since": cursor})
+            self.assertEqual((await phone.receive_json_from())["payload"]["reset"], "too many events")
+        await phone.disconnect()
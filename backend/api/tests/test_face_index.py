@@ -0,0 +1,55 @@
+import numpy as np
+from django.test import TestCase
+
+from api import face_index
+from api.models import AppUser, FaceTemplate
+
+
+class FaceIndexTests(TestCase):
+    def setUp(self):
+        face_index.clear_face_indexes()
+        self.addCleanup(face_index.clear_face_indexes)
+        rng = np.random.default_rng(7)
+        self.vectors = rng.normal(size=(3, 128)).astype(np.float32)
+        self.users = []
+        for i, vec in enumerate(self.vectors):
+            user = AppUser.objects.create(email=f"face{i}@example.com", name=f"Face {i}")
+            FaceTemplate.objects.create(
+                user=user,
+                model_name="Facenet512",
+                embedding_vector=face_index.pack_embedding(vec),
+                embedding_dim=vec.size,
+            )
+            self.users.append(user)
+
+    def test_best_match_uses_cached_matrix(self):
+        query = self.vectors[1] * 3.0  # scale must not matter for cosine distance
+        user_id, distance, count = face_index.match_face("Facenet512", query)
+        self.assertEqual(user_id, str(self.users[1].id))
+        self.assertAlmostEqual(distance, 0.0, places=5)
+        self.assertEqual(count, 3)
+
+        index = face_index.get_face_index("Facenet512")
+        self.assertEqual(index.matrix.dtype, np.float32)
+        self.assertTrue(index.matrix.flags["C_CONTIGUOUS"])
+        with self.assertNumQueries(0):
+            face_index.match_face("Facenet512", query)
+
+    def test_register_and_unregister_patch_the_index(self):
+        face_index.match_face("Facenet512", self.vectors[0])
+        replacement = -self.vectors[0]
+        FaceTemplate.objects.filter(user=self.users[0]).update(embedding_vector=face_index.pack_embedding(replacement))
+        face_index.face_template_saved(self.users[0].id, "Facenet512", replacement)
+        self.assertEqual(face_index.match_face("Facenet512", replacement)[0], str(self.users[0].id))
+
+        FaceTemplate.objects.filter(user=self.users[2]).delete()
+        face_index.face_template_removed(self.users[2].id, "Facenet512")
+        user_id, _, count = face_index.match_face("Facenet512", self.vectors[2])
+        self.assertEqual(count, 2)
+        self.assertNotEqual(user_id, str(self.users[2].id))
+
+    def test_legacy_json_embeddings_are_still_read(self):
+        user = AppUser.objects.create(email="legacy@example.com", name="Legacy")
+        legacy = np.ones(128, dtype=np.float32)
+        FaceTemplate.objects.create(user=user, model_name="ArcFace", embedding="[" + ",".join(["1.0"] * 128) + "]")
+        self.assertEqual(face_index.match_face("ArcFace", legacy)[0], str(user.id))
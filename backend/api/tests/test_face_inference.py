@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.face_inference import FaceInferenceService
+
+
+class FaceInferenceServiceTests(SimpleTestCase):
+    def _service(self, runner, **kwargs):
+        service = FaceInferenceService(runner=runner, **kwargs)
+        # Pretend the models are loaded so tests never touch DeepFace
+        service._detector_warm = True
+        service._warm_models.add("Facenet512")
+        self.addCleanup(service.shutdown)
+        return service
+
+    def test_infer_runs_on_pool_thread(self):
+        seen = {}
+
+        def runner(image_bytes, **kwargs):
+            seen["thread"] = threading.current_thread().name
+            seen["kwargs"] = kwargs
+            return np.ones(4), {"model": kwargs["model_name"]}
+
+        service = self._service(runner)
+        vec, meta = service.infer(b"img", model_name="Facenet512")
+        self.assertEqual(vec.tolist(), [1.0] * 4)
+        self.assertTrue(seen["thread"].startswith("face-infer"))
+        self.assertEqual(seen["kwargs"]["detector_backend"], "opencv")
+
+    def test_rejects_when_queue_is_full(self):
+        release = threading.Event()
+
+        def runner(image_bytes, **kwargs):
+            release.wait(5)
+            return np.ones(4), {}
+
+        service = self._service(runner, workers=1, max_queue=0, timeout_seconds=5)
+        worker = threading.Thread(target=service.infer, args=(b"img",))
+        worker.start()
+        try:
+            for _ in range(100):
+                if service._slots._value == 0:
+                    break
+                threading.Event().wait(0.01)
+            vec, meta = service.infer(b"img")
+            self.assertIsNone(vec)
+            self.assertEqual(meta["error"], "busy")
+        finally:
+            release.set()
+            worker.join()
+
+    def test_timeout_frees_slot_when_work_finishes(self):
+        release = threading.Event()
+        done = threading.Event()
+
+        def runner(image_bytes, **kwargs):
+            release.wait(5)
+            done.set()
+            return np.ones(4), {}
+
+        service = self._service(runner, workers=1, max_queue=0, timeout_seconds=0.05)
+        vec, meta = service.infer(b"img")
+        self.assertIsNone(vec)
+        self.assertEqual(meta["error"], "timeout")
+        release.set()
+        done.wait(5)
+        service.shutdown(wait=True)
+        self.assertEqual(service._slots._value, 1)
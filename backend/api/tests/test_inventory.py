@@ -0,0 +1,85 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from api import inventory_services as inv
+from api.models import InventoryItem, Location, StockBalance, StockMovement
+
+
+class StockBalanceTests(TestCase):
+    def setUp(self):
+        self.item = InventoryItem.objects.create(name="Rice", unit="kg")
+        self.main = Location.objects.create(name="Main", code="T-MAIN")
+        self.store = Location.objects.create(name="Store", code="T-STORE")
+
+    def test_movements_keep_balances_in_step(self):
+        inv.record_receipt(
+            item=self.item, qty=Decimal("10"), location=self.main,
+            batch_payload={"lot_code": "A", "expiry_date": timezone.localdate() + timedelta(days=3)},
+        )
+        inv.record_receipt(item=self.item, qty=Decimal("5"), location=self.main)
+        inv.consume_for_order(order_id="o1", components=[(self.item, Decimal("4"))], location=self.main)
+        inv.transfer_stock(item=self.item, qty=Decimal("3"), from_location=self.main, to_location=self.store)
+        inv.adjust_stock(item=self.item, delta_qty=Decimal("-1"), location=self.store)
+
+        with self.assertNumQueries(1):
+            totals = inv.get_current_stock([str(self.item.id)])
+        self.assertEqual(totals[str(self.item.id)], Decimal("10"))
+        self.assertEqual(inv.get_current_stock([str(self.item.id)], str(self.store.id))[str(self.item.id)], Decimal("2"))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, Decimal("10.00"))
+        with self.assertRaises(ValueError):
+            inv.consume_for_order(order_id="o2", components=[(self.item, Decimal("99"))], location=self.main)
+
+        out = StringIO()
+        call_command("reconcile_stock_balances", stdout=out)
+        self.assertIn("match the ledger", out.getvalue())
+
+    def test_as_of_uses_snapshot_plus_ledger_tail(self):
+        now = timezone.now()
+        inv.record_receipt(item=self.item, qty=Decimal("8"), location=self.main, effective_at=now - timedelta(days=3))
+        inv.take_stock_snapshot(as_of=now - timedelta(days=2))
+        inv.record_receipt(item=self.item, qty=Decimal("2"), location=self.main, effective_at=now - timedelta(days=1))
+        # Backdated into the snapshot window after it was taken
+        inv.adjust_stock(item=self.item, delta_qty=Decimal("-3"), location=self.main, effective_at=now - timedelta(days=2, hours=12))
+
+        key = str(self.item.id)
+        self.assertEqual(inv.get_current_stock([key], as_of=now - timedelta(days=2))[key], Decimal("5"))
+        self.assertEqual(inv.get_current_stock([key], as_of=now - timedelta(hours=1))[key], Decimal("7"))
+        self.assertEqual(inv.get_current_stock([key])[key], Decimal("7"))
+
+    def test_reconcile_detects_and_repairs_drift(self):
+        inv.record_receipt(item=self.item, qty=Decimal("6"), location=self.main)
+        StockBalance.objects.filter(item=self.item).update(qty=Decimal("1"))
+        with self.assertRaises(CommandError):
+            call_command("reconcile_stock_balances", stdout=StringIO())
+        call_command("reconcile_stock_balances", "--fix", stdout=StringIO())
+        self.assertEqual(StockBalance.objects.get(item=self.item).qty, Decimal("6"))
+        self.assertEqual(StockMovement.objects.filter(item=self.item).count(), 1)
+
+
+class LowStockTests(TestCase):
+    def test_low_stock_is_one_query_and_scan_bulk_creates(self):
+        from api.models import AppUser, Notification, ReorderSetting
+
+        locations = [Location.objects.create(name=f"L{i}", code=f"T-L{i}") for i in range(2)]
+        items = [InventoryItem.objects.create(name=f"Item {i}") for i in range(4)]
+        for n, item in enumerate(items):
+            for loc in locations:
+                ReorderSetting.objects.create(item=item, location=loc, reorder_point=Decimal("5"))
+                if n % 2:
+                    inv.record_receipt(item=item, qty=Decimal("9"), location=loc)
+        manager = AppUser.objects.create(email="mgr@example.com", name="Mgr", role="manager")
+
+        with self.assertNumQueries(1):
+            low = inv.get_low_stock()
+        self.assertEqual(sorted(item.name for item, _ in low), ["Item 0", "Item 0", "Item 2", "Item 2"])
+        self.assertTrue(all(qty == Decimal("0") for _, qty in low))
+
+        call_command("inventory_scan", stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(user=manager, title__startswith="Low stock").count(), 4)
@@ -0,0 +1,109 @@
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import loyalty_services
+from api.models import AppUser, LoyaltyLedger, Order
+
+
+class LoyaltyLedgerTests(TestCase):
+    def setUp(self):
+        self.user = AppUser.objects.create(email='guest@example.com', name='Guest', role='customer', status='active')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _checkout(self, points):
+        return self.client.post('/api/orders/create_order/', {
+            'total_amount': '100.00',
+            'credit_points_used': points,
+            'customer_name': 'Guest',
+            'promised_time': '2026-10-17T12:30:00Z',
+            'items': [],
+        }, format='json')
+
+    def test_checkout_and_payment_move_the_running_balance(self):
+        loyalty_services.earn(self.user.id, '5.00', reason='Welcome')
+
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/orders/user-credit-points/')
+        self.assertEqual(resp.json()['credit_points'], '5.00')
+
+        self.assertTrue(self._checkout('3').json()['success'])
+        # Requests above the balance are clamped to what is left
+        order_number = self._checkout('10').json()['order_number']
+        self.assertEqual(loyalty_services.get_balance(self.user.id), Decimal('0.00'))
+        self.assertEqual(Order.objects.get(order_number=order_number).credit_points_used, Decimal('2.00'))
+
+        # Confirming the same order twice earns once
+        for _ in range(2):
+            resp = self.client.post(f'/api/orders/orders/{order_number}/confirm_payment/', {'method': 'gcash'}, format='json')
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(loyalty_services.get_balance(self.user.id), Decimal('1.00'))
+
+        entries = list(self.user.loyalty_entries.order_by('id').values_list('kind', 'points', 'balance_after'))
+        self.assertEqual(entries, [
+            ('earn', Decimal('5.00'), Decimal('5.00')),
+            ('redeem', Decimal('-3.00'), Decimal('2.00')),
+            ('redeem', Decimal('-2.00'), Decimal('0.00')),
+            ('earn', Decimal('1.00'), Decimal('1.00')),
+        ])
+        with self.assertRaises(loyalty_services.InsufficientPoints):
+            loyalty_services.redeem(self.user.id, '1.50')
+
+    def test_cancelling_an_order_gives_its_points_back_once(self):
+        loyalty_services.earn(self.user.id, '5.00')
+        order_number = self._checkout('3').json()['order_number']
+        self.assertEqual(loyalty_services.get_balance(self.user.id), Decimal('2.00'))
+
+        order = Order.objects.get(order_number=order_number)
+        for _ in range(2):
+            order.status = 'cancelled'
+            order.save()
+        self.assertEqual(loyalty_services.get_balance(self.user.id), Decimal('5.00'))
+        refund = LoyaltyLedger.objects.get(order=order, kind=LoyaltyLedger.KIND_ADJUST)
+        self.assertEqual((refund.points, refund.balance_after), (Decimal('3.00'), Decimal('5.00')))
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        loyalty_services.earn(self.user.id, '4.00')
+        call_command('reconcile_loyalty_balances', stdout=StringIO())
+
+        AppUser.objects.filter(id=self.user.id).update(credit_points=Decimal('6.50'))
+        with self.assertRaises(CommandError):
+            call_command('reconcile_loyalty_balances', stdout=StringIO())
+        call_command('reconcile_loyalty_balances', '--fix', stdout=StringIO())
+        call_command('reconcile_loyalty_balances', stdout=StringIO())
+        adjust = LoyaltyLedger.objects.get(user=self.user, kind=LoyaltyLedger.KIND_ADJUST)
+        self.assertEqual((adjust.points, adjust.balance_after), (Decimal('2.50'), Decimal('6.50')))
+
+    def test_opening_balance_excludes_points_already_spent_at_checkout(self):
+        migration = import_module('api.migrations.0063_loyalty_ledger')
+        # Pre-ledger state: earned 8.00, spent 3.00 at checkout (never deducted)
+        # and 2.00 on a voucher (already deducted from credit_points)
+        AppUser.objects.filter(id=self.user.id).update(credit_points=Decimal('6.00'))
+        Order.objects.create(order_number='5f0c2a1e9b7d4c3a8e6f1a2b3c4d5e6f', placed_by=self.user, status='Paid',
+                             total_amount=Decimal('50'), credit_points_used=Decimal('3.00'))
+        # Never paid: did not count as spent before the ledger either
+        Order.objects.create(order_number='UNPAID01', placed_by=self.user, status='cancelled',
+                             total_amount=Decimal('40'), credit_points_used=Decimal('1.00'))
+        Order.objects.create(order_number='5f0c2a1e-9b7', placed_by=self.user,
+                             total_amount=0, credit_points_used=Decimal('2.00'))
+        spender = AppUser.objects.create(email='spender@example.com', name='Spender', role='customer',
+                                         credit_points=Decimal('1.00'))
+        Order.objects.create(order_number='OVERSPENT01', placed_by=spender, status='Paid',
+                             total_amount=Decimal('20'), credit_points_used=Decimal('4.00'))
+
+        migration.open_balances(apps, None)
+
+        self.assertEqual(loyalty_services.get_balance(self.user.id), Decimal('3.00'))
+        opening = LoyaltyLedger.objects.get(user=self.user)
+        self.assertEqual((opening.kind, opening.points), (LoyaltyLedger.KIND_OPENING, Decimal('3.00')))
+        self.assertEqual(loyalty_services.get_balance(spender.id), Decimal('0.00'))
+        self.assertFalse(LoyaltyLedger.objects.filter(user=spender).exists())
+        call_command('reconcile_loyalty_balances', stdout=StringIO())
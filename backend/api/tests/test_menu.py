@@ -0,0 +1,167 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from api import menu_catalog
+from api.models import AppUser, MenuItem
+from api.tests.test_orders import auth_headers
+
+
+class MenuCatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        menu_catalog._response_cache().clear()
+        self.admin = AppUser.objects.create(email='chef@example.com', name='Chef', role='admin', status='active')
+        self.adobo = MenuItem.objects.create(name='Adobo', category='Mains', price=Decimal('150'))
+        self.sisig = MenuItem.objects.create(name='Sisig', category='Mains', price=Decimal('180'))
+
+    def test_list_is_served_from_memory_until_the_menu_changes(self):
+        first = self.client.get('/api/menu/items')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([i['name'] for i in first.json()['data']], ['Adobo', 'Sisig'])
+        etag = first['ETag']
+
+        with self.assertNumQueries(0):
+            again = self.client.get('/api/menu/items')
+            self.assertEqual(again.content, first.content)
+            not_modified = self.client.get('/api/menu/items', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+        resp = self.client.patch(
+            f'/api/menu/items/{self.sisig.id}/availability',
+            data=json.dumps({'available': False}),
+            content_type='application/json',
+            **auth_headers(self.admin),
+        )
+        self.assertEqual(resp.status_code, 200)
+        changed = self.client.get('/api/menu/items', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertFalse(changed.json()['data'][1]['available'])
+
+        mobile = self.client.get('/api/menu-items/')
+        self.assertEqual(mobile.status_code, 200)
+        self.assertEqual(mobile['X-Menu-Version'], changed['X-Menu-Version'])
+        self.assertEqual(len(mobile.json()), 2)
+
+    @override_settings(DISABLE_INMEM_FALLBACK=False)
+    def test_fallback_after_a_db_error_is_not_cached(self):
+        from unittest import mock
+        from api import views_menu
+
+        with mock.patch.object(views_menu, '_category_map_for', side_effect=RuntimeError('db down')):
+            degraded = self.client.get('/api/menu/items')
+        self.assertEqual(degraded.status_code, 200)
+        self.assertNotIn('ETag', degraded)
+        self.assertEqual(degraded['Cache-Control'], 'no-store')
+
+        fresh = self.client.get('/api/menu/items')
+        self.assertEqual([i['name'] for i in fresh.json()['data']], ['Adobo', 'Sisig'])
+        self.assertIn('ETag', fresh)
+
+    def test_since_returns_only_items_changed_after_that_version(self):
+        version = menu_catalog.current_version()
+        self.adobo.price = Decimal('160')
+        self.adobo.save()
+        resp = self.client.post(f'/api/menu/items/{self.sisig.id}/archive', **auth_headers(self.admin))
+        self.assertEqual(resp.status_code, 200)
+
+        delta = self.client.get('/api/menu/items', {'since': version}).json()
+        self.assertEqual(delta['version'], menu_catalog.current_version())
+        self.assertFalse(delta['reset'])
+        self.assertEqual([(i['name'], i['archived']) for i in delta['data']], [('Adobo', False), ('Sisig', True)])
+        self.assertEqual(self.client.get('/api/menu/items', {'since': delta['version']}).json()['data'], [])
+
+        mobile = self.client.get('/api/menu-items/', {'since': version}).json()
+        self.assertEqual([i['name'] for i in mobile['items']], ['Adobo', 'Sisig'])
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        menu_catalog._response_cache().clear()
+        MenuItem.objects.create(name='Chicken Adobo', category='Mains', price=Decimal('150'), ingredients=['chicken', 'soy sauce'])
+        MenuItem.objects.create(name='Pork Sisig', category='Mains', price=Decimal('180'), description='Sizzling chopped pork')
+        MenuItem.objects.create(name='Halo-Halo', category='Desserts', price=Decimal('90'), description='Shaved ice with leche flan')
+
+    def _names(self, query):
+        resp = self.client.get('/api/menu/search', {'q': query})
+        self.assertEqual(resp.status_code, 200)
+        return [item['name'] for item in resp.json()['data']]
+
+    def test_prefix_typo_and_ranking(self):
+        self.assertEqual(self._names('chi'), ['Chicken Adobo'])
+        self.assertEqual(self._names('sisgi'), ['Pork Sisig'])
+        self.assertEqual(self._names('desert'), ['Halo-Halo'])
+        # A name match outranks a description match
+        self.assertEqual(self._names('pork'), ['Pork Sisig'])
+        self.assertEqual(self._names('soy chick'), ['Chicken Adobo'])
+        self.assertEqual(self._names('flan ice'), ['Halo-Halo'])
+        self.assertEqual(self._names('xyzzy'), [])
+
+        # The list endpoint uses the same index and picks up menu changes
+        MenuItem.objects.create(name='Chicharon', category='Snacks', price=Decimal('60'))
+        data = self.client.get('/api/menu/items', {'search': 'chic'}).json()['data']
+        self.assertEqual(sorted(i['name'] for i in data), ['Chicharon', 'Chicken Adobo'])
+
+        # The list filter is never cut at MENU_SEARCH_MAX_RESULTS before filtering and paging
+        MenuItem.objects.create(name='Chicken Inasal', category='Mains', price=Decimal('170'), archived=True)
+        with override_settings(MENU_SEARCH_MAX_RESULTS=1):
+            body = self.client.get('/api/menu/items', {'search': 'chic', 'category': 'Mains'}).json()
+        self.assertEqual([i['name'] for i in body['data']], ['Chicken Adobo'])
+        self.assertEqual(body['pagination']['total'], 1)
+
+
+class MenuImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.admin = AppUser.objects.create(email='chef@example.com', name='Chef', role='admin', status='active')
+        self.item = MenuItem.objects.create(name='Halo-Halo', category='Desserts', price=Decimal('90'))
+
+    def _photo(self):
+        from PIL import Image
+
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90 degrees
+        exif[0x010F] = 'PhoneCam'
+        out = io.BytesIO()
+        Image.new('RGB', (2000, 1000), (200, 80, 40)).save(out, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('halo.jpg', out.getvalue(), content_type='image/jpeg')
+
+    def test_upload_renders_exif_free_variants_and_srcset(self):
+        from PIL import Image
+
+        with override_settings(MEDIA_ROOT=self.media, MENU_IMAGE_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(
+                    f'/api/menu/items/{self.item.id}/image', {'image': self._photo()}, **auth_headers(self.admin)
+                )
+            self.assertEqual(resp.status_code, 200)
+            self.item.refresh_from_db()
+            sizes = self.item.image_variants['sizes']
+            # Orientation applied: the 2000x1000 landscape is now portrait
+            self.assertEqual((sizes['thumb']['width'], sizes['thumb']['height']), (80, 160))
+            self.assertEqual(sizes['full']['height'], 1280)
+            for entry in sizes.values():
+                for fmt in ('webp', 'jpeg'):
+                    with Image.open(os.path.join(self.media, entry[fmt])) as im:
+                        self.assertEqual(im.format, fmt.upper())
+                        self.assertFalse(im.getexif())
+
+            data = self.client.get(f'/api/menu/items/{self.item.id}').json()['data']
+            self.assertEqual(data['imageVariants']['card']['width'], 240)
+            self.assertTrue(data['imageSrcset']['webp'].endswith(' 640w'))
+            self.assertEqual(data['imageSrcset']['webp'].count('w,'), 2)
+
+            # Re-running on an unchanged photo is a no-op
+            from api.menu_images import process_menu_image
+
+            self.assertEqual(process_menu_image(self.item.id), 'skipped')
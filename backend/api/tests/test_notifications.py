@@ -0,0 +1,270 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as dj_tz
+
+from api import notification_triggers as triggers
+from api import outbox_dispatcher as outbox
+from api import push_delivery
+from api.fake_push import FakePushEndpoint, generate_subscription_keys, generate_vapid_private_key
+from api.models import AppUser, Notification, NotificationOutbox, NotificationPreference, Order, WebPushSubscription
+
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=False)
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        triggers.invalidate_audience_cache()
+        self.addCleanup(triggers.invalidate_audience_cache)
+        self.order = Order.objects.create(order_number='N-1', total_amount=Decimal('120.00'))
+
+    def _admins(self, start, count):
+        return [
+            AppUser.objects.create(email=f'admin{n}@example.com', name=f'Admin {n}', role='manager')
+            for n in range(start, start + count)
+        ]
+
+    def _trigger_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            triggers.trigger_new_order(self.order)
+        return len(ctx.captured_queries)
+
+    def test_fan_out_is_bulk_and_independent_of_audience_size(self):
+        self._admins(0, 2)
+        few = self._trigger_queries()
+        self._admins(2, 8)
+        many = self._trigger_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(Notification.objects.filter(meta__event_type='new_order').count(), 12)
+        self.assertEqual(NotificationOutbox.objects.count(), 12)
+        # Audience is cached until membership changes
+        self.assertEqual(self._trigger_queries(), many - 1)
+
+    def test_role_change_refreshes_the_audience(self):
+        first, second = self._admins(0, 2)
+        self.assertEqual(len(triggers.get_admin_users()), 2)
+        second.role = 'staff'
+        second.save(update_fields=['role'])
+        self.assertEqual(triggers.get_admin_users(), [first.id])
+
+    def test_role_change_reaches_other_processes(self):
+        first, second = self._admins(0, 2)
+        self.assertEqual(len(triggers.get_admin_users()), 2)
+        # Another process (a Celery worker) holding its own copy of the audience
+        worker_cache = dict(triggers._AUDIENCE_CACHE)
+        second.role = 'staff'
+        second.save(update_fields=['role'])
+        with mock.patch.dict(triggers._AUDIENCE_CACHE, worker_cache, clear=True):
+            self.assertEqual(triggers.get_admin_users(), [first.id])
+
+    def test_role_change_notice_skips_the_affected_admin(self):
+        first, second = self._admins(0, 2)
+        triggers.trigger_user_role_changed(first, 'staff', 'manager')
+        self.assertEqual(Notification.objects.filter(user=first).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=second, title='User Role Changed').count(), 1)
+
+    @override_settings(NOTIFICATION_FANOUT_ASYNC=True)
+    def test_async_fan_out_is_enqueued_once_after_commit(self):
+        self._admins(0, 3)
+        with mock.patch.object(triggers, 'CELERY_AVAILABLE', True), \
+                mock.patch.object(triggers.fan_out_notification, 'delay', create=True) as delay:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                triggers.trigger_large_order(Order(order_number='N-2', total_amount=Decimal('9000')))
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.kwargs['audience'], 'admins')
+        self.assertFalse(Notification.objects.exists())
+
+
+class BroadcastInboxTests(TestCase):
+    def setUp(self):
+        from django.test import Client
+
+        self.client = Client()
+        self.staff = AppUser.objects.create(email='cook@example.com', name='Cook', role='staff', status='active')
+        self.other = AppUser.objects.create(email='cashier@example.com', name='Cashier', role='staff', status='active')
+
+    def _inbox(self, user, **params):
+        from api.tests.test_orders import auth_headers
+
+        resp = self.client.get('/api/notifications', params, **auth_headers(user))
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_menu_announcement_is_stored_once_and_merged_into_inboxes(self):
+        from api.models import BroadcastNotification, MenuItem
+
+        Notification.objects.create(user=self.staff, title='Personal')
+        MenuItem.objects.create(name='Sisig', price=Decimal('120'))
+        self.assertEqual(BroadcastNotification.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        body = self._inbox(self.staff)
+        self.assertEqual(body['pagination']['total'], 2)
+        self.assertEqual(body['data'][0]['title'], 'New Menu Item Added')
+        self.assertTrue(body['data'][0]['broadcast'])
+        first_page = self._inbox(self.staff, limit=1)
+        self.assertTrue(first_page['pagination']['hasMore'])
+        second_page = self._inbox(self.staff, limit=1, cursor=first_page['pagination']['nextCursor'])
+        self.assertEqual([n['title'] for n in second_page['data']], ['Personal'])
+        self.assertFalse(second_page['pagination']['hasMore'])
+        self.assertIsNone(second_page['pagination']['nextCursor'])
+
+        # Users who join later do not inherit old announcements
+        newcomer = AppUser.objects.create(email='new@example.com', name='New', role='staff', status='active')
+        self.assertEqual(self._inbox(newcomer)['pagination']['total'], 0)
+
+    def test_mobile_list_pages_with_a_cursor(self):
+        from rest_framework.test import APIClient
+
+        for n in range(3):
+            Notification.objects.create(user=self.staff, title=f'Note {n}')
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+
+        resp = client.get('/api/notifications/', {'limit': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([n['title'] for n in resp.json()], ['Note 2', 'Note 1'])
+        resp = client.get('/api/notifications/', {'limit': 2, 'cursor': resp['X-Next-Cursor']})
+        self.assertEqual([n['title'] for n in resp.json()], ['Note 0'])
+        self.assertNotIn('X-Next-Cursor', resp)
+        self.assertEqual(client.get('/api/notifications/', {'cursor': 'bogus'}).status_code, 400)
+
+    def test_read_and_dismiss_state_is_per_user(self):
+        from api import notification_inbox as inbox
+        from api.tests.test_orders import auth_headers
+
+        b = inbox.broadcast('segment:staff', title='Shift meeting')
+        customer = AppUser.objects.create(email='buyer@example.com', name='Buyer', role='customer', status='active')
+        self.assertEqual(inbox.inbox_page(customer), ([], False))
+
+        resp = self.client.post(f'/api/notifications/{b.id}/read', **auth_headers(self.staff))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(self._inbox(self.staff)['data'][0]['read'])
+        self.assertFalse(self._inbox(self.other)['data'][0]['read'])
+
+        resp = self.client.delete(f'/api/notifications/{b.id}', **auth_headers(self.staff))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._inbox(self.staff)['pagination']['total'], 0)
+        self.assertEqual(self._inbox(self.other)['pagination']['total'], 1)
+
+        inbox.mark_all_read(self.other)
+        self.assertTrue(self._inbox(self.other)['data'][0]['read'])
+
+    def test_summary_is_cached_until_the_inbox_changes(self):
+        from api import notification_inbox as inbox
+        from api.tasks import create_notifications_bulk_sync
+        from api.tests.test_orders import auth_headers
+
+        Notification.objects.create(user=self.staff, title='First')
+        resp = self.client.get('/api/notifications/summary', **auth_headers(self.staff))
+        self.assertEqual(resp.json()['data'], {'unread': 1, 'total': 1})
+        etag = resp['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.summary(self.staff), {'unread': 1, 'total': 1})
+        resp = self.client.get('/api/notifications/summary', HTTP_IF_NONE_MATCH=etag, **auth_headers(self.staff))
+        self.assertEqual(resp.status_code, 304)
+
+        # New, read and bulk-inserted rows all invalidate the cached counts
+        second = Notification.objects.create(user=self.staff, title='Second')
+        self.client.post(f'/api/notifications/{second.id}/read', **auth_headers(self.staff))
+        create_notifications_bulk_sync([self.staff.id, self.other.id], 'Bulk', 'Hello')
+        resp = self.client.get('/api/notifications/summary', HTTP_IF_NONE_MATCH=etag, **auth_headers(self.staff))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['data'], {'unread': 2, 'total': 3})
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(self._inbox(self.staff)['pagination']['unread'], 2)
+
+
+@override_settings(NOTIFICATION_OUTBOX_BACKOFF_SECONDS=60, NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2)
+class OutboxDispatchTests(TestCase):
+    def setUp(self):
+        self.endpoint = FakePushEndpoint(latency_ms=30).start()
+        self.addCleanup(self.endpoint.stop)
+        settings = override_settings(
+            WEBPUSH_VAPID_PRIVATE_KEY=generate_vapid_private_key(),
+            WEBPUSH_WORKERS=8,
+            WEBPUSH_PER_HOST_CONCURRENCY=4,
+            WEBPUSH_PER_HOST_RATE=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        push_delivery.reset()
+        self.addCleanup(push_delivery.reset)
+        self.p256dh, self.auth = generate_subscription_keys()
+
+    def _entry(self, n, *paths, email=False, push=True):
+        user = AppUser.objects.create(email=f'push{n}@example.com', name=f'Push {n}', role='staff')
+        NotificationPreference.objects.create(user=user, email_enabled=email, push_enabled=push)
+        for path in paths:
+            WebPushSubscription.objects.create(
+                user=user, endpoint=self.endpoint.url(f'{path}/{n}'), p256dh=self.p256dh, auth=self.auth
+            )
+        return NotificationOutbox.objects.create(user=user, title='Order ready', message='Pick up at counter 2')
+
+    def test_batch_is_pushed_concurrently_and_only_gone_subscriptions_are_dropped(self):
+        for n in range(8):
+            self._entry(n, 'ok')
+        self._entry(8, 'gone', 'ok')
+        self._entry(9, 'missing')
+        self._entry(10, 'busy', 'error')
+        self._entry(11, 'ok', push=False)
+
+        with CaptureQueriesContext(connection) as ctx:
+            totals = outbox.dispatch()
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+        self.assertEqual((totals['claimed'], totals['sent'], totals['retried']), (12, 10, 2))
+        self.assertEqual(self.endpoint.received, 13)
+        self.assertGreater(self.endpoint.peak_in_flight, 1)
+        self.assertLessEqual(self.endpoint.peak_in_flight, 4)
+
+        status = dict(NotificationOutbox.objects.values_list('user__email', 'status'))
+        self.assertEqual(status['push8@example.com'], NotificationOutbox.STATUS_SENT)
+        self.assertEqual(status['push9@example.com'], NotificationOutbox.STATUS_PENDING)
+        self.assertEqual(status['push11@example.com'], NotificationOutbox.STATUS_SENT)
+        self.assertEqual(set(NotificationOutbox.objects.values_list('attempts', flat=True)), {1})
+        self.assertEqual(
+            sorted(WebPushSubscription.objects.filter(active=False).values_list('endpoint', flat=True)),
+            [self.endpoint.url('gone/8'), self.endpoint.url('missing/9')],
+        )
+
+    def test_failures_back_off_then_dead_letter_and_metrics_report_them(self):
+        mailed = self._entry(1, email=True, push=False)
+        failing = self._entry(2, 'error')
+        self.assertEqual(outbox.dispatch()['sent'], 1)
+        self.assertEqual([m.to for m in mail.outbox], [[mailed.user.email]])
+
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (NotificationOutbox.STATUS_PENDING, 1))
+        self.assertGreater(failing.next_attempt_at, dj_tz.now() + timedelta(seconds=59))
+        self.assertEqual(outbox.claim_batch(), [])  # not due yet
+
+        NotificationOutbox.objects.filter(pk=failing.pk).update(next_attempt_at=dj_tz.now())
+        self.assertEqual(outbox.dispatch()['dead'], 1)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (NotificationOutbox.STATUS_DEAD, 2))
+        self.assertIn('500', failing.last_error)
+
+        # A stale claim (expired lease) is picked up again; a live one is not
+        stale = self._entry(3, email=True, push=False)
+        live = self._entry(4, email=True, push=False)
+        NotificationOutbox.objects.filter(pk=stale.pk).update(
+            status=NotificationOutbox.STATUS_PROCESSING, next_attempt_at=dj_tz.now() - timedelta(seconds=1)
+        )
+        NotificationOutbox.objects.filter(pk=live.pk).update(
+            status=NotificationOutbox.STATUS_PROCESSING, next_attempt_at=dj_tz.now() + timedelta(minutes=5)
+        )
+        self.assertEqual([e.pk for e in outbox.claim_batch()], [stale.pk])
+
+        metrics = outbox.outbox_metrics()
+        self.assertEqual((metrics['dead'], metrics['processing'], metrics['due']), (1, 2, 0))
+        self.assertEqual(metrics['sentInWindow'], 1)
+        self.assertEqual(outbox.requeue_dead(), 1)
+        self.assertEqual(outbox.outbox_metrics()['due'], 1)
@@ -35,7 +35,7 @@ class OrderFlowTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         data = resp.json()['data']
         oid = data['id']
-        self.assertIn(data['status'], ['pending','in_queue'])
+        self.assertIn(data['status'], ['pending','in_queue','accepted'])
         # Move to in_progress (from in_queue)
         self.client.patch(f'/api/orders/{oid}/status', data=json.dumps({'status': 'in_progress'}), content_type='application/json', **auth_headers(self.user))
         # Move to ready
@@ -61,3 +61,302 @@ class OrderFlowTests(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.credit_points, Decimal('0.01'))
 
+
+
+class OrderBulkCreateTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = AppUser.objects.create(email='pos@example.com', name='POS', role='staff', status='active')
+        self.menu = [MenuItem.objects.create(name=f'Dish {i}', price=5 + i, available=True) for i in range(30)]
+
+    def _post(self, body):
+        return self.client.post('/api/orders', data=json.dumps(body), content_type='application/json', **auth_headers(self.user))
+
+    def _lines(self, count):
+        return [{'menuItemId': str(m.id), 'quantity': 1} for m in self.menu[:count]]
+
+    def test_query_count_does_not_grow_with_line_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._post({'items': self._lines(1)})  # warm caches (stations, rate limiter)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self._post({'items': self._lines(2)}).status_code, 200)
+        with CaptureQueriesContext(connection) as large:
+            resp = self._post({'items': self._lines(30)})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()['data']['items']), 30)
+        self.assertEqual(resp.json()['data']['totalItems'], 30)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertLessEqual(len(large.captured_queries), 20)
+
+    def test_batch_of_orders_with_replayed_order_number(self):
+        body = {'orders': [
+            {'orderNumber': 'W-100001', 'items': self._lines(3)},
+            {'orderNumber': 'W-100002', 'items': [{'menuItemId': 'not-a-uuid', 'quantity': 1}]},
+            {'orderNumber': 'W-100001', 'items': self._lines(3)},
+        ]}
+        resp = self._post(body)
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()['data']
+        self.assertEqual([r['success'] for r in results], [True, False, True])
+        self.assertTrue(results[2]['duplicate'])
+        self.assertEqual(results[0]['data']['id'], results[2]['data']['id'])
+        self.assertEqual(Order.objects.filter(order_number='W-100001').count(), 1)
+        self.assertFalse(Order.objects.filter(order_number='W-100002').exists())
+
+    def test_replay_must_match_the_actor_and_lines(self):
+        other = AppUser.objects.create(email='pos2@example.com', name='POS 2', role='staff', status='active')
+        first = self._post({'orderNumber': 'W-200001', 'items': self._lines(2)})
+        self.assertEqual(first.status_code, 200)
+
+        replay = self._post({'orderNumber': 'W-200001', 'items': self._lines(2)})
+        self.assertTrue(replay.json()['duplicate'])
+        self.assertEqual(replay.json()['data']['id'], first.json()['data']['id'])
+        # Same number, different sale or different terminal: not a replay
+        self.assertEqual(self._post({'orderNumber': 'W-200001', 'items': self._lines(3)}).status_code, 409)
+        resp = self.client.post('/api/orders', data=json.dumps({'orderNumber': 'W-200001', 'items': self._lines(2)}),
+                                content_type='application/json', **auth_headers(other))
+        self.assertEqual(resp.status_code, 409)
+
+    def test_replay_that_loses_the_insert_race_returns_the_stored_order(self):
+        from unittest import mock
+        from api import views_orders
+
+        first = self._post({'orderNumber': 'W-200002', 'items': self._lines(1)}).json()['data']
+        # As if the lookup ran before the other request committed
+        context = views_orders._order_create_context
+        with mock.patch.object(views_orders, '_order_create_context',
+                               side_effect=lambda entries: {**context(entries), 'existing_orders': {}}):
+            resp = self._post({'orderNumber': 'W-200002', 'items': self._lines(1)})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['duplicate'])
+        self.assertEqual(resp.json()['data']['id'], first['id'])
+
+
+class OrderQueueDeltaTests(TestCase):
+    def setUp(self):
+        from api.models import KitchenStation
+
+        self.client = Client()
+        self.user = AppUser.objects.create(email='kds@example.com', name='KDS', role='staff', status='active')
+        self.m1 = MenuItem.objects.create(name='Item A', price=10, available=True)
+        KitchenStation.objects.update_or_create(code='grill', defaults={'name': 'Grill', 'capacity': 4})
+
+    def _place(self, number, qty=2):
+        from api.models import OrderItem
+        from api.views_orders import record_order_event
+
+        order = Order.objects.create(order_number=number, status='accepted')
+        line = OrderItem.objects.create(
+            order=order, menu_item=self.m1, item_name='Item A', price=10,
+            quantity=qty, station_code='grill', station_name='Grill',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            record_order_event(order, event_type='order.created', to_state=order.status, items=[line])
+        return order, line
+
+    def test_delta_returns_only_changed_orders_and_station_loads(self):
+        from api.views_orders import record_order_event
+
+        first, _ = self._place('W-000001')
+        snap = self.client.get('/api/orders/queue', **auth_headers(self.user)).json()['data']
+        self.assertEqual(snap['mode'], 'snapshot')
+        cursor = snap['eventCursor']
+
+        second, line = self._place('W-000002', qty=3)
+        delta = self.client.get('/api/orders/queue', {'since': cursor}, **auth_headers(self.user)).json()['data']
+        self.assertEqual(delta['mode'], 'delta')
+        self.assertEqual([o['id'] for o in delta['orders']], [str(second.id)])
+        self.assertEqual([i['itemId'] for i in delta['items']], [str(line.id)])
+        grill = next(s for s in delta['stations'] if s['code'] == 'grill')
+        self.assertEqual(grill['queueCount'], 2)
+        self.assertEqual(grill['activeQuantity'], 5)
+
+        first.status = 'completed'
+        first.save(update_fields=['status'])
+        with self.captureOnCommitCallbacks(execute=True):
+            record_order_event(first, event_type='order.status_changed', from_state='accepted', to_state='completed')
+        delta2 = self.client.get('/api/orders/queue', {'since': delta['eventCursor']}, **auth_headers(self.user)).json()['data']
+        self.assertEqual(delta2['orders'], [])
+        self.assertEqual(delta2['removedOrderIds'], [str(first.id)])
+        grill = next(s for s in delta2['stations'] if s['code'] == 'grill')
+        self.assertEqual(grill['queueCount'], 1)
+        self.assertEqual(grill['activeQuantity'], 3)
+
+    def test_cursor_follows_commit_order(self):
+        from datetime import timedelta
+        from api.models import OrderEvent
+        from api.views_orders import record_order_event
+
+        first, _ = self._place('W-000003')
+        cursor = self.client.get('/api/orders/queue', **auth_headers(self.user)).json()['data']['eventCursor']
+        second, _ = self._place('W-000004')
+        delta = self.client.get('/api/orders/queue', {'since': cursor}, **auth_headers(self.user)).json()['data']
+        self.assertEqual([o['id'] for o in delta['orders']], [str(second.id)])
+
+        # Stamped before the second order's event but committed after that delta
+        with self.captureOnCommitCallbacks() as late:
+            record_order_event(first, event_type='order.auto_flow')
+        stamped = OrderEvent.objects.filter(order=second).order_by('created_at').first().created_at
+        OrderEvent.objects.filter(order=first, seq__isnull=True).update(created_at=stamped - timedelta(seconds=1))
+        for callback in late:
+            callback()
+
+        delta2 = self.client.get('/api/orders/queue', {'since': delta['eventCursor']}, **auth_headers(self.user)).json()['data']
+        self.assertEqual([o['id'] for o in delta2['orders']], [str(first.id)])
+
+    def test_mobile_order_writes_reach_the_delta(self):
+        from rest_framework.test import APIClient
+
+        customer = AppUser.objects.create(email='app@example.com', name='App', role='customer', status='active')
+        cursor = self.client.get('/api/orders/queue', **auth_headers(self.user)).json()['data']['eventCursor']
+        app = APIClient()
+        app.force_authenticate(user=customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            number = app.post('/api/orders/create_order/', {
+                'total_amount': '20.00', 'customer_name': 'App', 'promised_time': '2026-10-17T12:30:00Z',
+                'items': [{'name': 'Item A', 'price': '10', 'quantity': 2, 'menu_item_id': str(self.m1.id)}],
+            }, format='json').json()['order_number']
+        delta = self.client.get('/api/orders/queue', {'since': cursor}, **auth_headers(self.user)).json()['data']
+        self.assertEqual([o['orderNumber'] for o in delta['orders']], [number])
+        expo = {s['code']: s for s in delta['stations']}
+        self.assertEqual(sum(s['activeQuantity'] for s in expo.values()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/orders/orders/{number}/cancel/')
+        delta2 = self.client.get('/api/orders/queue', {'since': delta['eventCursor']}, **auth_headers(self.user)).json()['data']
+        self.assertEqual(delta2['removedOrderIds'], [str(Order.objects.get(order_number=number).id)])
+        self.assertEqual(sum(s['activeQuantity'] for s in delta2['stations']), 0)
+
+
+class AutoAdvanceSchedulerTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.m1 = MenuItem.objects.create(name='Item A', price=10, available=True)
+
+    def _order(self, number, status, due_in, **extra):
+        from datetime import timedelta
+        from api.models import OrderItem
+
+        order = Order.objects.create(
+            order_number=number, status=status, auto_advance_at=dj_tz.now() + timedelta(seconds=due_in), **extra
+        )
+        OrderItem.objects.create(order=order, menu_item=self.m1, item_name='Item A', price=10, quantity=2, station_code='grill')
+        return order
+
+    def test_due_orders_advance_in_one_batch_and_rearm_their_timers(self):
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from api import tasks
+        from api.auto_advance import advance_due
+        from api.models import OrderEvent
+
+        due = [self._order(f'A-{n}', 'accepted', -5) for n in range(10)]
+        ready = self._order('A-ready', 'ready', -1)
+        paused = self._order('A-paused', 'accepted', -5, auto_advance_paused=True)
+        later = self._order('A-later', 'accepted', 30)
+
+        with mock.patch.object(tasks.advance_auto_flow, 'apply_async') as arm:
+            with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+                stats = advance_due()
+        self.assertEqual(stats, {'due': 11, 'advanced': 11, 'cleared': 0})
+        # Set-based: query count does not depend on the number of due orders
+        self.assertLess(len(queries.captured_queries), 30)
+        # The ten next-phase timers fall in one slot and arm one task
+        self.assertEqual(arm.call_count, 1)
+
+        self.assertEqual(set(Order.objects.filter(id__in=[o.id for o in due]).values_list('status', flat=True)), {'in_progress'})
+        ready.refresh_from_db()
+        self.assertEqual((ready.status, ready.auto_advance_at), ('completed', None))
+        self.assertIsNotNone(ready.completed_at)
+        self.assertEqual(Order.objects.get(id=paused.id).status, 'accepted')
+        self.assertEqual(Order.objects.get(id=later.id).status, 'accepted')
+        self.assertEqual(OrderEvent.objects.filter(event_type='order.auto_advanced').count(), 11)
+
+    def test_orders_a_timer_leaves_behind_get_a_retry_timer(self):
+        from unittest import mock
+        from api import tasks
+
+        # Fired early by this worker's clock (ETA computed on a skewed web host)
+        early = self._order('C-1', 'accepted', 0.4)
+        self._order('C-later', 'accepted', 30)
+
+        with mock.patch('api.auto_advance.scheduler_enabled', return_value=True), \
+                mock.patch.object(tasks.advance_auto_flow, 'apply_async') as arm:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(tasks.advance_auto_flow(), 0)
+            self.assertEqual(arm.call_count, 1)
+            self.assertGreater(arm.call_args.kwargs['eta'], early.auto_advance_at)
+
+            # Nothing pending: no retry
+            Order.objects.filter(id=early.id).update(auto_advance_paused=True)
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.advance_auto_flow()
+            self.assertEqual(arm.call_count, 1)
+
+    def test_paused_or_rescheduled_orders_are_not_advanced_by_stale_timers(self):
+        from datetime import timedelta
+        from api.auto_advance import advance_due
+        from api.views_orders import _pause_auto_flow, _reset_auto_flow
+
+        paused = self._order('B-1', 'accepted', -1)
+        moved = self._order('B-2', 'accepted', -1)
+        paused.save(update_fields=_pause_auto_flow(paused, reason='waiting'))
+        moved.save(update_fields=_reset_auto_flow(moved, duration_seconds=120))
+
+        self.assertEqual(advance_due()['due'], 0)
+        self.assertEqual(advance_due(now=dj_tz.now() + timedelta(seconds=121))['advanced'], 1)
+        self.assertEqual(Order.objects.get(id=moved.id).status, 'in_progress')
+        self.assertEqual(Order.objects.get(id=paused.id).status, 'accepted')
+
+
+class CustomerOrderHistoryTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.user = AppUser.objects.create(email='regular@example.com', name='Regular', role='customer', status='active')
+        other = AppUser.objects.create(email='other@example.com', name='Regular', role='customer', status='active')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.numbers = []
+        for i in range(5):
+            order = Order.objects.create(order_number=f'H{i}', placed_by=self.user, total_amount=Decimal('20'))
+            order.items.create(item_name=f'Dish {i}', quantity=2, price=Decimal('10'), size='Large', customize='No onions')
+            self.numbers.append(order.order_number)
+        # Same display name, different account: must never show up
+        Order.objects.create(order_number='X1', placed_by=other, customer_name='Regular', total_amount=Decimal('5'))
+
+    def test_keyset_pages_summaries_and_owner_only_detail(self):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(2):
+                body = self.client.get('/api/orders/orders/', params).json()
+            seen += [o['order_number'] for o in body['orders']]
+            cursor = body['next_cursor']
+            if not body['has_more']:
+                break
+        self.assertEqual(seen, list(reversed(self.numbers)))
+        self.assertEqual(body['orders'][-1]['item_count'], 2)
+        line = body['orders'][-1]['items'][0]
+        self.assertEqual((line['size'], line['customize'], line['image']), ('Large', 'No onions', None))
+        self.assertEqual(self.client.get('/api/orders/orders/', {'cursor': 'bogus'}).status_code, 400)
+
+        Order.objects.filter(order_number='H0').update(status='completed')
+        Order.objects.filter(order_number='H1').update(status='Cancelled')
+        active = self.client.get('/api/orders/orders/', {'status': 'active'}).json()['orders']
+        self.assertEqual([o['order_number'] for o in active], ['H4', 'H3', 'H2'])
+        done = self.client.get('/api/orders/orders/', {'status': 'completed'}).json()['orders']
+        self.assertEqual([o['order_number'] for o in done], ['H0'])
+        self.assertEqual(self.client.get('/api/orders/orders/', {'status': 'cancelled'}).json()['orders'][0]['status'], 'Cancelled')
+        self.assertEqual(self.client.get('/api/orders/orders/', {'status': 'bogus'}).status_code, 400)
+
+        detail = self.client.get('/api/orders/orders/H1/detail/').json()['order']
+        self.assertEqual(detail['items'][0]['name'], 'Dish 1')
+        self.assertEqual(self.client.get('/api/orders/orders/X1/detail/').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/orders/X1/status/').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/orders/H1/status/').json()['items'][0]['quantity'], 2)
@@ -0,0 +1,96 @@
+import threading
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.http import JsonResponse
+
+from api import utils_ratelimit
+from api.utils_ratelimit import LocalMemoryRateLimitBackend, reset_rate_limit_backend
+from api.views_common import _is_locked, _lockout_check_and_touch, rate_limit
+
+
+class RedisRateLimitBackendTests(SimpleTestCase):
+    def test_each_check_is_one_atomic_script_call(self):
+        client = mock.MagicMock()
+        script = client.register_script.return_value
+        with mock.patch("redis.Redis.from_url", return_value=client):
+            backend = utils_ratelimit.RedisRateLimitBackend("redis://example")
+        script.return_value = [1, 0, 3]
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1050.0):
+            self.assertEqual(backend.hit("k", 3, 60), (True, 0))
+            script.return_value = [0, 4, 3]
+            allowed, retry = backend.hit("k", 3, 60)
+        self.assertFalse(allowed)
+        self.assertGreaterEqual(retry, 1)
+        self.assertEqual(script.call_count, 2)
+        self.assertEqual(script.call_args.kwargs["keys"], ["rl:k:17", "rl:k:16"])
+        self.assertEqual(script.call_args.kwargs["args"][:2], [3, "0.5"])
+        client.mget.assert_not_called()
+        client.pipeline.assert_not_called()
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rl-tests"}})
+class CacheRateLimitBackendTests(SimpleTestCase):
+    def test_concurrent_hits_never_over_admit(self):
+        backend = utils_ratelimit.CacheRateLimitBackend()
+        backend._cache.clear()
+        barrier = threading.Barrier(12)
+        results = []
+
+        def hit():
+            barrier.wait()
+            results.append(backend.hit("burst", 5, 60)[0])
+
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1000.0):
+            threads = [threading.Thread(target=hit) for _ in range(12)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results.count(True), 5)
+            # Rejected hits give their slot back
+            self.assertFalse(backend.hit("burst", 5, 60)[0])
+            index, _elapsed = utils_ratelimit._window_bounds(1000.0, 60)
+            key = utils_ratelimit._safe_key(f"{utils_ratelimit._KEY_PREFIX}:burst") + f":{index}"
+            self.assertEqual(backend._cache.get(key), 5)
+
+
+class LocalRateLimitBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = LocalMemoryRateLimitBackend()
+        reset_rate_limit_backend(self.backend)
+        self.addCleanup(reset_rate_limit_backend, None)
+
+    def test_sliding_window_blocks_then_recovers(self):
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1000.0):
+            results = [self.backend.hit("k", 3, 60)[0] for _ in range(4)]
+            self.assertEqual(results, [True, True, True, False])
+        # Half of the previous window still overlaps: 3 * 0.5 = 1.5 < 3
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1050.0):
+            self.assertTrue(self.backend.hit("k", 3, 60)[0])
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1200.0):
+            self.assertTrue(self.backend.hit("k", 3, 60)[0])
+
+    def test_expired_keys_are_evicted(self):
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=1000.0):
+            for i in range(50):
+                self.backend.hit(f"ip-{i}", 5, 60)
+        with mock.patch.object(utils_ratelimit.time, "time", return_value=2000.0):
+            self.backend.hit("fresh", 5, 60)
+        self.assertEqual(list(self.backend._counters.keys()), ["fresh"])
+
+    def test_decorator_returns_429_with_retry_after(self):
+        view = rate_limit(limit=2, window_seconds=60)(lambda request: JsonResponse({"success": True}))
+        factory = RequestFactory()
+        codes = [view(factory.get("/api/x")).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertGreaterEqual(int(view(factory.get("/api/x"))["Retry-After"]), 1)
+
+    def test_login_lockout_uses_shared_store(self):
+        for _ in range(4):
+            self.assertEqual(_lockout_check_and_touch("a@example.com", "1.2.3.4", success=False), (False, 0))
+        locked, retry = _lockout_check_and_touch("a@example.com", "1.2.3.4", success=False)
+        self.assertTrue(locked)
+        self.assertTrue(_is_locked("a@example.com", "1.2.3.4")[0])
+        self.assertIsNotNone(self.backend.get("lockout:a@example.com:1.2.3.4"))
+        self.assertFalse(_is_locked("b@example.com", "1.2.3.4")[0])
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as dj_tz
+
+from api import report_rollups
+from api.models import AppUser, ItemSalesRollup, Order, OrderItem, PaymentTransaction, SalesRollup
+from api.tests.test_orders import auth_headers
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.now = dj_tz.now()
+
+    def _order(self, number, amount, at, status='completed'):
+        order = Order.objects.create(order_number=number, status=status, total_amount=Decimal(amount))
+        Order.objects.filter(pk=order.pk).update(created_at=at)
+        return order
+
+    def test_closed_hours_come_from_rollup_and_current_hour_is_live(self):
+        three_hours_ago = self.now - timedelta(hours=3)
+        old = self._order('R-1', '100.00', three_hours_ago)
+        self._order('R-2', '40.00', three_hours_ago)
+        self._order('R-3', '999.00', three_hours_ago, status='cancelled')
+        self.assertEqual(report_rollups.rollup_sales(hours=6), 6)
+        row = SalesRollup.objects.get(bucket_start=report_rollups.floor_hour(three_hours_ago))
+        self.assertEqual((row.order_count, row.total_amount), (2, Decimal('140.00')))
+
+        # Closed hours are served from the rollup, not recomputed
+        Order.objects.filter(pk=old.pk).update(total_amount=Decimal('1.00'))
+        self._order('R-4', '25.00', self.now)
+        start = report_rollups.floor_hour(self.now - timedelta(hours=5))
+        with CaptureQueriesContext(connection) as ctx:
+            totals = report_rollups.hourly_sales(start, start + timedelta(hours=6))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(totals[report_rollups.floor_hour(three_hours_ago)], Decimal('140.00'))
+        self.assertEqual(totals[report_rollups.floor_hour(self.now)], Decimal('25.00'))
+
+    def _line(self, order, name, category, price, qty):
+        return OrderItem.objects.create(order=order, item_name=name, category=category, price=Decimal(price), quantity=qty)
+
+    def test_item_rollup_feeds_categories_and_is_refreshed_on_cancel(self):
+        earlier = self._order('R-6', '90.00', self.now - timedelta(hours=3))
+        self._line(earlier, 'Adobo', 'Mains', '50.00', 1)
+        self._line(earlier, 'Iced Tea', 'Drinks', '20.00', 2)
+        current = self._order('R-7', '40.00', self.now)
+        self._line(current, 'Iced Tea', 'Drinks', '20.00', 2)
+        report_rollups.rollup_sales(hours=6)
+        self.assertEqual(ItemSalesRollup.objects.count(), 2)
+
+        start = self.now - timedelta(hours=5)
+        rows = report_rollups.item_sales(start, self.now + timedelta(hours=1))
+        self.assertEqual(report_rollups.top_items(rows, 1)[0]['name'], 'Iced Tea')
+        self.assertEqual(report_rollups.top_items(rows, 1)[0]['quantity'], 4)
+        self.assertEqual(
+            sorted((r['category'], r['amount']) for r in report_rollups.sales_by_category(rows)),
+            [('Drinks', 80.0), ('Mains', 50.0)],
+        )
+
+        earlier.refresh_from_db()
+        earlier.status = Order.STATUS_CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            earlier.save(update_fields=['status'])
+        self.assertFalse(ItemSalesRollup.objects.exists())
+        rows = report_rollups.item_sales(start, self.now + timedelta(hours=1))
+        self.assertEqual([(r['name'], r['quantity']) for r in rows], [('Iced Tea', 2)])
+
+    def test_auto_completed_orders_refresh_their_closed_hour_once(self):
+        from unittest import mock
+        from api.auto_advance import advance_due
+
+        hour_ago = self.now - timedelta(hours=2)
+        for n in range(3):
+            order = self._order(f'R-8{n}', '60.00', hour_ago, status='ready')
+            Order.objects.filter(pk=order.pk).update(auto_advance_at=self.now - timedelta(seconds=1))
+        with mock.patch.object(report_rollups, 'refresh_order_rollup') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(advance_due()['advanced'], 3)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(refresh.call_args.args[0].status, 'completed')
+
+    def test_dashboard_series_use_constant_queries(self):
+        user = AppUser.objects.create(email='boss@example.com', name='Boss', role='admin', status='active')
+        self._order('R-5', '10.00', self.now - timedelta(days=2))
+        for n in range(3):
+            order = self._order(f'R-P{n}', '5.00', self.now - timedelta(minutes=n))
+            self._line(order, 'Halo-halo', 'Desserts', '5.00', 1)
+            PaymentTransaction.objects.create(order_id=order.order_number, amount=Decimal('5.00'), method='gcash')
+        client = Client()
+        client.get('/api/reports/dashboard', **auth_headers(user))  # warm the actor cache
+        with CaptureQueriesContext(connection) as short:
+            resp = client.get('/api/reports/dashboard', {'range': '7d'}, **auth_headers(user))
+        self.assertEqual(resp.status_code, 200)
+        with CaptureQueriesContext(connection) as long:
+            resp = client.get('/api/reports/dashboard', {'range': '30d'}, **auth_headers(user))
+        data = resp.json()['data']
+        self.assertEqual(len(data['salesByTime']), 31)
+        self.assertEqual(sum(p['amount'] for p in data['salesByTime']), 25.0)
+        self.assertEqual(data['popularItems'], [{'name': 'Halo-halo', 'count': 3}])
+        self.assertEqual({s['paymentMethod'] for s in data['recentSales']}, {'gcash', 'cash'})
+        self.assertEqual(len(long.captured_queries), len(short.captured_queries))
+
+        resp = client.get('/api/reports/top-items', {'range': '7d', 'by': 'revenue'}, **auth_headers(user))
+        self.assertEqual(resp.json()['data']['items'][0]['revenue'], 15.0)
@@ -66,6 +66,7 @@ urlpatterns = [
 
     # Menu endpoints
     path("menu/items", menu_views.menu_items, name="menu_items"),
+    path("menu/search", menu_views.menu_search, name="menu_search"),
     path("menu/items/<str:item_id>", menu_views.menu_item_detail, name="menu_item_detail"),
     path("menu/items/<str:item_id>/archive", menu_views.menu_item_archive, name="menu_item_archive"),
     path("menu/items/<str:item_id>/restore", menu_views.menu_item_restore, name="menu_item_restore"),
@@ -93,9 +94,11 @@ urlpatterns = [
 
     # Notifications
     path("notifications", notif_views.notifications, name="notifications"),
+    path("notifications/summary", notif_views.notifications_summary, name="notifications_summary"),
     path("notifications/mark-all-read", notif_views.notifications_mark_all, name="notifications_mark_all"),
     path("notifications/settings", notif_views.notifications_settings, name="notifications_settings"),
     path("notifications/test-trigger", notif_views.notifications_test_trigger, name="notifications_test_trigger"),
+    path("notifications/outbox/metrics", notif_views.notifications_outbox_metrics, name="notifications_outbox_metrics"),
     path("notifications/<str:notif_id>/read", notif_views.notification_read, name="notification_read"),
     path("notifications/<str:notif_id>", notif_views.notification_delete, name="notification_delete"),
     path("notifications/push/public-key", notif_views.notifications_push_public_key, name="notifications_push_public_key"),
@@ -165,6 +168,7 @@ urlpatterns = [
     # Reports
     path("reports/dashboard", rpt_views.reports_dashboard, name="reports_dashboard"),
     path("reports/sales", rpt_views.reports_sales, name="reports_sales"),
+    path("reports/top-items", rpt_views.reports_top_items, name="reports_top_items"),
     path("reports/inventory", rpt_views.reports_inventory, name="reports_inventory"),
     path("reports/orders", rpt_views.reports_orders, name="reports_orders"),
     path("reports/staff-attendance", rpt_views.reports_staff_attendance, name="reports_staff_attendance"),
@@ -178,6 +182,7 @@ urlpatterns = [
 
     # Diagnostics
     path("diagnostics/ping", diag_views.diag_ping, name="diag_ping"),
+    path("diagnostics/events", diag_views.diag_events, name="diag_events"),
     path("diagnostics/cash-drawer", diag_views.diag_cash_drawer, name="diag_cash_drawer"),
     path("diagnostics/receipt", diag_views.diag_receipt, name="diag_receipt"),
 ]
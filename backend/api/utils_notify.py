@@ -23,7 +23,7 @@ def send_webpush_to_user(user, *, title: str, message: str = "", data: Dict[str,
     """Send a Web Push notification to all active subscriptions for a user.
 
     Requires WEBPUSH_VAPID_PUBLIC_KEY and WEBPUSH_VAPID_PRIVATE_KEY in settings.
-    Uses pywebpush if available; no‑ops otherwise.
+    Uses pywebpush (via api.push_delivery) if available; no‑ops otherwise.
     """
     # Skip if not enabled
     try:
@@ -35,53 +35,25 @@ def send_webpush_to_user(user, *, title: str, message: str = "", data: Dict[str,
 
     pub = getattr(settings, "WEBPUSH_VAPID_PUBLIC_KEY", None) or getattr(settings, "VAPID_PUBLIC_KEY", None)
     priv = getattr(settings, "WEBPUSH_VAPID_PRIVATE_KEY", None) or getattr(settings, "VAPID_PRIVATE_KEY", None)
-    subject = getattr(settings, "WEBPUSH_VAPID_SUBJECT", "mailto:admin@example.com")
     if not pub or not priv:
         _debug_log("Missing VAPID keys; skipping webpush")
         return False
 
-    try:
-        from pywebpush import webpush, WebPushException  # type: ignore
-    except Exception:
-        _debug_log("pywebpush not installed; skipping webpush")
-        return False
-
     payload = {
         "title": title or "Notification",
         "body": message or "",
         "data": data or {},
     }
 
-    ok_any = False
+    # Sent concurrently over the shared pooled session; only 404/410
+    # responses deactivate a subscription (see api.push_delivery)
     try:
-        from .models import WebPushSubscription
-        subs = list(WebPushSubscription.objects.filter(user=user, active=True))
-    except Exception:
-        subs = []
-
-    for sub in subs:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {"p256dh": sub.p256dh, "auth": sub.auth},
-                },
-                data=json_dumps(payload),
-                vapid_private_key=priv,
-                vapid_claims={"sub": subject},
-            )
-            ok_any = True
-        except Exception as e:  # includes WebPushException
-            _debug_log(f"webpush failed for endpoint={sub.endpoint[:32]}..: {e}")
-            # soft‑deactivate clearly invalid subscriptions
-            try:
-                sub.active = False
-                sub.save(update_fields=["active"])
-            except Exception:
-                pass
-            continue
-
-    return ok_any
+        from .push_delivery import send_to_users
+        sent = send_to_users({user.pk: json_dumps(payload)})
+    except Exception as e:
+        _debug_log(f"webpush failed for user={getattr(user, 'pk', None)}: {e}")
+        return False
+    return sent.get(user.pk, 0) > 0
 
 
 def json_dumps(data: Dict[str, Any]) -> str:
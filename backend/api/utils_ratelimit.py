@@ -0,0 +1,313 @@
+"""Pluggable rate-limit and lockout store.
+
+Every backend implements a sliding-window counter: two fixed-window counters
+(current and previous) per key, with the previous window weighted by how much
+of it still overlaps the sliding window. Each check is O(1) and keys expire
+after two windows, so memory stays bounded by the number of active clients.
+
+Select the backend with ``settings.RATE_LIMIT_BACKEND`` (dotted path):
+
+- ``api.utils_ratelimit.CacheRateLimitBackend`` (default) uses the Django cache,
+  which is shared across workers when ``CACHES`` points at Redis.
+- ``api.utils_ratelimit.RedisRateLimitBackend`` talks to Redis directly; each
+  check is one atomic Lua script call (read both windows, compare, INCR and
+  EXPIRE), so concurrent workers cannot all pass at ``limit - 1``.
+- ``api.utils_ratelimit.LocalMemoryRateLimitBackend`` is per-process and meant
+  for tests and single-worker development servers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_BACKEND = "api.utils_ratelimit.CacheRateLimitBackend"
+_KEY_PREFIX = "rl"
+
+
+def _window_bounds(now: float, window_seconds: int) -> Tuple[int, float]:
+    index = int(now // window_seconds)
+    elapsed = now - index * window_seconds
+    return index, elapsed
+
+
+def _sliding_estimate(previous: int, current: int, elapsed: float, window_seconds: int) -> float:
+    weight = max(0.0, 1.0 - (elapsed / window_seconds))
+    return previous * weight + current
+
+
+def _retry_after(previous: int, current: int, elapsed: float, limit: int, window_seconds: int) -> int:
+    """Seconds until the sliding estimate drops below ``limit`` again."""
+    remaining = window_seconds - elapsed
+    if current >= limit or previous <= 0:
+        return max(1, int(math.ceil(remaining)))
+    # previous * (1 - t / window) + current < limit  =>  t > window * (1 - (limit - current) / previous)
+    needed = window_seconds * (1.0 - (limit - current) / previous) - elapsed
+    return max(1, int(math.ceil(min(needed, remaining))))
+
+
+def _safe_key(raw: str) -> str:
+    # Cache backends such as memcached reject long keys or keys with spaces
+    if len(raw) <= 200 and all(33 <= ord(ch) < 127 for ch in raw):
+        return raw
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class RateLimitBackend:
+    """Interface for rate-limit stores."""
+
+    def hit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
+        """Record a request for ``key``. Returns (allowed, retry_after_seconds)."""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict, ttl_seconds: int) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop all state; only meaningful for the local backend."""
+
+
+class LocalMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process store with lazy expiry. Suitable for tests and ``runserver``."""
+
+    sweep_interval_seconds = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, list] = {}
+        self._records: dict[str, tuple[float, dict]] = {}
+        self._next_sweep = 0.0
+
+    def _sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval_seconds
+        for key in [k for k, v in self._counters.items() if v[3] <= now]:
+            self._counters.pop(key, None)
+        for key in [k for k, v in self._records.items() if v[0] <= now]:
+            self._records.pop(key, None)
+
+    def hit(self, key, limit, window_seconds):
+        now = time.time()
+        index, elapsed = _window_bounds(now, window_seconds)
+        with self._lock:
+            self._sweep(now)
+            # [window_index, previous_count, current_count, expires_at]
+            entry = self._counters.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0, 0.0]
+            elif entry[0] == index - 1:
+                entry = [index, entry[2], 0, entry[3]]
+            previous, current = entry[1], entry[2]
+            if _sliding_estimate(previous, current, elapsed, window_seconds) >= limit:
+                self._counters[key] = entry
+                return False, _retry_after(previous, current, elapsed, limit, window_seconds)
+            entry[2] = current + 1
+            entry[3] = (index + 2) * window_seconds
+            self._counters[key] = entry
+            return True, 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            found = self._records.get(key)
+            if not found or found[0] <= now:
+                return None
+            return dict(found[1])
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._records[key] = (time.time() + max(1, int(ttl_seconds)), dict(value))
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._records.clear()
+            self._next_sweep = 0.0
+
+
+class CacheRateLimitBackend(RateLimitBackend):
+    """Store counters in a Django cache alias (``RATE_LIMIT_CACHE_ALIAS``, default ``default``)."""
+
+    def __init__(self, alias: Optional[str] = None):
+        from django.core.cache import caches
+
+        self._cache = caches[alias or getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default")]
+
+    def hit(self, key, limit, window_seconds):
+        now = time.time()
+        index, elapsed = _window_bounds(now, window_seconds)
+        base = _safe_key(f"{_KEY_PREFIX}:{key}")
+        current_key = f"{base}:{index}"
+        previous_key = f"{base}:{index - 1}"
+        previous = int(self._cache.get(previous_key) or 0)
+        ttl = int(window_seconds * 2 - elapsed) + 1
+        # Claim a slot first and decide on the count add()/incr() returns, so
+        # concurrent hits each see a distinct position and cannot over-admit
+        if self._cache.add(current_key, 1, timeout=ttl):
+            current = 1
+        else:
+            try:
+                current = int(self._cache.incr(current_key))
+            except ValueError:
+                # Expired between add() and incr(); start a fresh counter
+                self._cache.set(current_key, 1, timeout=ttl)
+                current = 1
+        if _sliding_estimate(previous, current - 1, elapsed, window_seconds) >= limit:
+            try:
+                self._cache.decr(current_key)
+            except ValueError:
+                pass
+            return False, _retry_after(previous, current - 1, elapsed, limit, window_seconds)
+        return True, 0
+
+    def get(self, key):
+        return self._cache.get(_safe_key(f"{_KEY_PREFIX}:rec:{key}"))
+
+    def set(self, key, value, ttl_seconds):
+        self._cache.set(_safe_key(f"{_KEY_PREFIX}:rec:{key}"), value, timeout=max(1, int(ttl_seconds)))
+
+    def delete(self, key):
+        self._cache.delete(_safe_key(f"{_KEY_PREFIX}:rec:{key}"))
+
+
+# KEYS: current window, previous window. ARGV: limit, previous-window weight, ttl.
+# Returns {allowed, previous, current}; the check and INCR run atomically.
+_SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+  return {0, previous, current}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, previous, current}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Talk to Redis directly (``RATE_LIMIT_REDIS_URL``, falling back to ``REDIS_URL``)."""
+
+    def __init__(self, url: Optional[str] = None):
+        import os
+
+        import redis
+
+        url = url or getattr(settings, "RATE_LIMIT_REDIS_URL", "") or os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+        self._redis = redis.Redis.from_url(url)
+        # EVALSHA with a transparent EVAL fallback: one round trip per check
+        self._hit_script = self._redis.register_script(_SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, limit, window_seconds):
+        now = time.time()
+        index, elapsed = _window_bounds(now, window_seconds)
+        base = f"{_KEY_PREFIX}:{key}"
+        weight = max(0.0, 1.0 - (elapsed / window_seconds))
+        allowed, previous, current = self._hit_script(
+            keys=[f"{base}:{index}", f"{base}:{index - 1}"],
+            args=[limit, repr(weight), int(window_seconds * 2 - elapsed) + 1],
+        )
+        if not int(allowed):
+            return False, _retry_after(int(previous), int(current), elapsed, limit, window_seconds)
+        return True, 0
+
+    def get(self, key):
+        raw = self._redis.get(f"{_KEY_PREFIX}:rec:{key}")
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    def set(self, key, value, ttl_seconds):
+        self._redis.set(f"{_KEY_PREFIX}:rec:{key}", json.dumps(value), ex=max(1, int(ttl_seconds)))
+
+    def delete(self, key):
+        self._redis.delete(f"{_KEY_PREFIX}:rec:{key}")
+
+
+_backend: Optional[RateLimitBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, "RATE_LIMIT_BACKEND", "") or DEFAULT_RATE_LIMIT_BACKEND
+                _backend = import_string(path)()
+    return _backend
+
+
+def reset_rate_limit_backend(backend: Optional[RateLimitBackend] = None) -> None:
+    """Replace (or drop) the process-wide backend, e.g. from tests or ``setting_changed``."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def check_rate_limit(key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
+    """Fail open when the shared store is unreachable so an outage does not block logins."""
+    try:
+        return get_rate_limit_backend().hit(key, int(limit), int(window_seconds))
+    except Exception:
+        logger.exception("Rate limit backend unavailable; allowing request")
+        return True, 0
+
+
+def get_record(key: str) -> Optional[Any]:
+    try:
+        return get_rate_limit_backend().get(key)
+    except Exception:
+        logger.exception("Rate limit backend unavailable")
+        return None
+
+
+def set_record(key: str, value: dict, ttl_seconds: int) -> None:
+    try:
+        get_rate_limit_backend().set(key, value, ttl_seconds)
+    except Exception:
+        logger.exception("Rate limit backend unavailable")
+
+
+def delete_record(key: str) -> None:
+    try:
+        get_rate_limit_backend().delete(key)
+    except Exception:
+        logger.exception("Rate limit backend unavailable")
+
+
+__all__ = [
+    "RateLimitBackend",
+    "LocalMemoryRateLimitBackend",
+    "CacheRateLimitBackend",
+    "RedisRateLimitBackend",
+    "get_rate_limit_backend",
+    "reset_rate_limit_backend",
+    "check_rate_limit",
+    "get_record",
+    "set_record",
+    "delete_record",
+]
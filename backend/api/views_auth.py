@@ -19,6 +19,7 @@ logger = logging.getLogger(__name__)
 
 from .views_common import (
     rate_limit,
+    _authenticate_request,
     _login_rate_key,
     _is_locked,
     _lockout_check_and_touch,
@@ -616,6 +617,10 @@ def auth_me(request):
     auth = request.META.get("HTTP_AUTHORIZATION", "")
     if not auth.startswith("Bearer "):
         return JsonResponse({"success": False, "message": "Missing token"}, status=401)
+    # Usually already resolved by PendingUserGateMiddleware
+    actor = _authenticate_request(request)
+    if actor is not None and not isinstance(actor, dict):
+        return JsonResponse({"success": True, "user": _safe_user_from_db(actor)})
     token = auth.split(" ", 1)[1].strip()
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
@@ -1,5 +1,8 @@
+import copy
 import json
 import os
+import logging
+import threading
 import uuid
 import time
 import functools
@@ -14,12 +17,19 @@ import re
 import hashlib
 import secrets
 
+from .utils_ratelimit import check_rate_limit, delete_record, get_record, set_record
+
+logger = logging.getLogger(__name__)
+
 # -----------------------------
 # Rate limit and lockout helpers
 # -----------------------------
+# Counters and lockout records live in the pluggable store from utils_ratelimit
+# (Django cache / Redis / local memory), so every worker shares the same view.
 
-_RATE_BUCKETS = {}
-FAILED_LOGIN_TRACK = {}
+LOGIN_LOCKOUT_WINDOW_SECONDS = 10 * 60
+LOGIN_LOCKOUT_SECONDS = 10 * 60
+LOGIN_LOCKOUT_THRESHOLD = 5
 
 
 def _client_ip(request):
@@ -47,36 +57,41 @@ def _email_rate_key(request):
     return f"{_client_ip(request)}:{email}"
 
 
+def _lockout_key(email: str, ip: str) -> str:
+    return f"lockout:{email or ''}:{ip or ''}"
+
+
 def _lockout_check_and_touch(email: str, ip: str, success: bool):
     now = int(time.time())
-    key = (email or "", ip or "")
-    rec = FAILED_LOGIN_TRACK.get(key)
-    window = 10 * 60
-    lock_seconds = 10 * 60
-    threshold = 5
+    key = _lockout_key(email, ip)
+    rec = get_record(key)
+    window = LOGIN_LOCKOUT_WINDOW_SECONDS
+    lock_seconds = LOGIN_LOCKOUT_SECONDS
+    threshold = LOGIN_LOCKOUT_THRESHOLD
 
     if rec and rec.get("locked_until", 0) > now:
         return True, int(rec["locked_until"] - now)
 
     if success:
         if rec:
-            FAILED_LOGIN_TRACK.pop(key, None)
+            delete_record(key)
         return False, 0
 
     if not rec or now - rec.get("first", now) > window:
-        FAILED_LOGIN_TRACK[key] = {"first": now, "fail": 1, "locked_until": 0}
+        set_record(key, {"first": now, "fail": 1, "locked_until": 0}, window)
         return False, 0
     rec["fail"] = int(rec.get("fail", 0)) + 1
     if rec["fail"] >= threshold:
         rec["locked_until"] = now + lock_seconds
+        set_record(key, rec, lock_seconds)
         return True, lock_seconds
+    set_record(key, rec, max(1, window - (now - int(rec.get("first", now)))))
     return False, 0
 
 
 def _is_locked(email: str, ip: str):
     now = int(time.time())
-    key = (email or "", ip or "")
-    rec = FAILED_LOGIN_TRACK.get(key)
+    rec = get_record(_lockout_key(email, ip))
     if rec and rec.get("locked_until", 0) > now:
         return True, int(rec["locked_until"] - now)
     return False, 0
@@ -86,21 +101,14 @@ def rate_limit(limit=10, window_seconds=60, key_fn=None):
     def decorator(view_func):
         @functools.wraps(view_func)
         def _wrapped(request, *args, **kwargs):
-            now = time.time()
             key_base = key_fn(request) if key_fn else _client_ip(request)
             bucket_key = f"{key_base}:{request.path}:{request.method}:{window_seconds}:{limit}"
-            bucket = _RATE_BUCKETS.get(bucket_key, [])
-            threshold = now - window_seconds
-            bucket = [t for t in bucket if t > threshold]
-            if len(bucket) >= limit:
-                oldest = min(bucket)
-                retry_after = max(1, int(window_seconds - (now - oldest)))
+            allowed, retry_after = check_rate_limit(bucket_key, limit, window_seconds)
+            if not allowed:
                 resp = JsonResponse({"success": False, "message": "Too many requests, slow down."})
                 resp.status_code = 429
                 resp["Retry-After"] = str(retry_after)
                 return resp
-            bucket.append(now)
-            _RATE_BUCKETS[bucket_key] = bucket
             return view_func(request, *args, **kwargs)
 
         return _wrapped
@@ -317,6 +325,120 @@ def _has_permission(user_or_dict, perm_code: str) -> bool:
     return "all" in perms or perm_code in perms
 
 
+# -----------------------------
+# Request authentication
+# -----------------------------
+# A request's bearer token is decoded once and the resolved actor is memoized
+# on the request (PendingUserGateMiddleware resolves it first; views and the
+# websocket consumer reuse it). AppUser rows are also kept in a short-TTL
+# per-process cache keyed by token subject. Each entry is tagged with the
+# user's version counter from the shared cache; saving or deleting the user
+# (api.signals) bumps it, so role/status changes apply on the next request in
+# every process, at the cost of one shared-cache read per cached hit.
+
+_ACTOR_CACHE = {}
+_ACTOR_CACHE_LOCK = threading.Lock()
+_ACTOR_CACHE_MAX = 2048
+_UNRESOLVED = object()
+
+
+def _actor_cache_ttl() -> float:
+    try:
+        return float(getattr(settings, "AUTH_ACTOR_CACHE_SECONDS", 30) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_ACTOR_VERSION_ALL = "auth:actor:version"
+
+
+def _actor_version_key(user_id) -> str:
+    return f"{_ACTOR_VERSION_ALL}:{user_id}"
+
+
+def _actor_versions(user_id):
+    """(all-users version, this user's version) from the shared cache; None when unreachable."""
+    from django.core.cache import cache
+
+    keys = [_ACTOR_VERSION_ALL, _actor_version_key(user_id)]
+    try:
+        found = cache.get_many(keys)
+    except Exception:
+        return None
+    return tuple(found.get(key) for key in keys)
+
+
+def _bump_actor_version(key: str) -> None:
+    from django.core.cache import cache
+
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception:
+        logger.exception("Failed to bump actor cache version")
+
+
+def invalidate_actor_cache(user_id=None):
+    """Forget cached actors for one user (by id), or all of them when ``user_id`` is None.
+
+    Other processes drop theirs on the next lookup (shared version counter).
+    """
+    key = _ACTOR_VERSION_ALL if user_id is None else _actor_version_key(user_id)
+    with _ACTOR_CACHE_LOCK:
+        if user_id is None:
+            _ACTOR_CACHE.clear()
+        else:
+            uid = str(user_id)
+            for cached in [k for k, (_exp, _ver, actor) in _ACTOR_CACHE.items() if str(actor.pk) == uid]:
+                _ACTOR_CACHE.pop(cached, None)
+    # Bump now and again after commit, so a process that reloads the row
+    # before the change commits does not keep the old copy
+    _bump_actor_version(key)
+    try:
+        from django.db import transaction
+
+        transaction.on_commit(lambda: _bump_actor_version(key))
+    except Exception:
+        pass
+
+
+def _clone_actor(actor):
+    # Each request gets its own instance so views can mutate/save it freely
+    clone = copy.copy(actor)
+    clone._state.fields_cache = {}
+    return clone
+
+
+def _db_actor_for_claims(sub: str, email: str):
+    key = f"id:{sub}" if sub else f"email:{email}"
+    ttl = _actor_cache_ttl()
+    now = time.monotonic()
+    if ttl > 0:
+        with _ACTOR_CACHE_LOCK:
+            hit = _ACTOR_CACHE.get(key)
+        if hit and hit[0] > now:
+            versions = _actor_versions(hit[2].pk)
+            if versions is not None and versions == hit[1]:
+                return _clone_actor(hit[2])
+
+    from .models import AppUser
+    _maybe_seed_from_memory()
+    actor = None
+    if sub:
+        actor = AppUser.objects.filter(id=sub).first()
+    if not actor and email:
+        actor = AppUser.objects.filter(email=email).first()
+    if actor and ttl > 0:
+        # Read after the row: a bump racing the query only costs a reload
+        versions = _actor_versions(actor.pk)
+        if versions is not None:
+            with _ACTOR_CACHE_LOCK:
+                if len(_ACTOR_CACHE) >= _ACTOR_CACHE_MAX:
+                    _ACTOR_CACHE.pop(next(iter(_ACTOR_CACHE)), None)
+                _ACTOR_CACHE[key] = (now + ttl, versions, _clone_actor(actor))
+    return actor
+
+
 def _actor_from_token(token: str):
     if not token:
         return None
@@ -327,15 +449,11 @@ def _actor_from_token(token: str):
 
     email = (payload.get("email") or "").lower().strip()
     sub = str(payload.get("sub") or "")
+    if not sub and not email:
+        return None
 
     try:
-        from .models import AppUser
-        _maybe_seed_from_memory()
-        actor = None
-        if sub:
-            actor = AppUser.objects.filter(id=sub).first()
-        if not actor and email:
-            actor = AppUser.objects.filter(email=email).first()
+        actor = _db_actor_for_claims(sub, email)
         if actor:
             return actor
     except Exception:
@@ -351,17 +469,30 @@ def _actor_from_token(token: str):
             return actor
     return None
 
+
+def _bearer_token(request) -> str:
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth.startswith("Bearer "):
+        return ""
+    return auth.split(" ", 1)[1].strip()
+
+
+def _authenticate_request(request):
+    """Resolve the request's actor once; later calls return the memoized result (or None)."""
+    actor = getattr(request, "_api_actor", _UNRESOLVED)
+    if actor is _UNRESOLVED:
+        actor = _actor_from_token(_bearer_token(request))
+        request._api_actor = actor
+    return actor
+
+
 def _actor_from_request(request):
     """Extract the authenticated actor from Authorization header.
 
     Returns (actor, error_response) where actor is either AppUser instance or a
     dict from USERS fallback. If not authorized/invalid, returns (None, JsonResponse).
     """
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return None, JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1].strip()
-    actor = _actor_from_token(token)
+    actor = _authenticate_request(request)
     if actor:
         return actor, None
     return None, JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
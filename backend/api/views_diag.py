@@ -57,6 +57,16 @@ def diag_ping(request):
     return JsonResponse({"success": True, "time": dj_tz.now().isoformat()})
 
 
+@require_http_methods(["GET"])  # /diagnostics/events
+def diag_events(request):
+    """Realtime event bus counters (published/sent/coalesced/dropped/failed, queue depth)."""
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    from .events import bus_stats
+    return JsonResponse({"success": True, "data": bus_stats()})
+
+
 @require_http_methods(["POST"])  # /diagnostics/cash-drawer
 def diag_cash_drawer(request):
     # Placeholder success; actual drawer opening is device-specific via printer kick codes.
@@ -7,10 +7,9 @@ distance metrics, and includes basic validation and anti-spoofing measures.
 Note: First run will download ~100MB of model weights automatically.
 """
 
-import io
 import json
 import numpy as np
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
@@ -24,6 +23,8 @@ from .views_common import (
     _issue_verify_token_from_db,
 )
 from .utils_audit import record_audit
+from .face_index import face_template_removed, face_template_saved, match_face, pack_embedding
+from .face_inference import RETRYABLE_ERRORS, SUPPORTED_MODELS, get_face_inference_service
 
 
 # ------------------
@@ -37,6 +38,9 @@ def _extract_face_and_embedding(
 ) -> Tuple[Optional[np.ndarray], Optional[dict]]:
     """Extract face and generate embedding using DeepFace.
 
+    Runs on the shared inference pool (see ``api.face_inference``) so the model
+    stays warm and detection happens once per image.
+
     Args:
         image_bytes: Raw image bytes
         model_name: DeepFace model to use (Facenet512, VGG-Face, ArcFace, etc.)
@@ -45,138 +49,16 @@ def _extract_face_and_embedding(
     Returns:
         Tuple of (embedding_array, face_metadata) or (None, None) on failure
     """
-    if not image_bytes:
-        return None, None
-
-    try:
-        from deepface import DeepFace
-        from PIL import Image
-    except ImportError:
-        return None, None
-
-    try:
-        # Load image with Pillow
-        img = Image.open(io.BytesIO(image_bytes))
-        img_array = np.array(img)
-
-        # Extract faces first to validate detection
-        faces = DeepFace.extract_faces(
-            img_path=img_array,
-            detector_backend='opencv',  # Fast and reliable
-            enforce_detection=enforce_detection,
-            align=True
-        )
-
-        if not faces or len(faces) == 0:
-            return None, {"error": "no_face_detected", "message": "No face detected in image"}
-
-        if len(faces) > 1:
-            return None, {"error": "multiple_faces", "message": "Multiple faces detected - ensure only one person is visible"}
-
-        face = faces[0]
-        confidence = face.get('confidence', 0)
-
-        # Validate face detection confidence
-        if confidence < 0.85:
-            return None, {"error": "low_confidence", "message": "Face detection confidence too low - improve lighting or angle"}
-
-        # Generate embedding using the specified model
-        embeddings = DeepFace.represent(
-            img_path=img_array,
-            model_name=model_name,
-            detector_backend='opencv',
-            enforce_detection=enforce_detection,
-            align=True
-        )
-
-        if not embeddings or len(embeddings) == 0:
-            return None, {"error": "embedding_failed", "message": "Failed to generate face embedding"}
-
-        # Return the first embedding (should only be one face)
-        embedding_vec = np.array(embeddings[0]['embedding'])
-
-        metadata = {
-            "confidence": confidence,
-            "face_area": face.get('facial_area', {}),
-            "model": model_name,
-            "embedding_dim": len(embedding_vec)
-        }
-
-        return embedding_vec, metadata
-
-    except ValueError as e:
-        # DeepFace raises ValueError for no face detected
-        return None, {"error": "no_face_detected", "message": str(e)}
-    except Exception as e:
-        return None, {"error": "processing_failed", "message": f"Image processing failed: {str(e)}"}
-
-
-def _cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculate cosine similarity between two vectors."""
-    try:
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-
-        return float(dot_product / (norm1 * norm2))
-    except Exception:
-        return 0.0
+    return get_face_inference_service().infer(
+        image_bytes, model_name=model_name, enforce_detection=enforce_detection
+    )
 
 
-def _cosine_distance(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculate cosine distance (1 - cosine_similarity)."""
-    return 1.0 - _cosine_similarity(vec1, vec2)
-
-
-def _euclidean_distance(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculate Euclidean distance between two vectors."""
-    try:
-        return float(np.linalg.norm(vec1 - vec2))
-    except Exception:
-        return float('inf')
-
-
-def _find_best_match(
-    query_embedding: np.ndarray,
-    candidates: List[Tuple[any, np.ndarray]],
-    distance_metric: str = "cosine",
-    threshold: float = 0.4
-) -> Tuple[Optional[any], float]:
-    """Find best matching face template from candidates.
-
-    Args:
-        query_embedding: Query face embedding
-        candidates: List of (template_object, embedding_array) tuples
-        distance_metric: "cosine" or "euclidean"
-        threshold: Maximum distance for a match
-
-    Returns:
-        Tuple of (best_match_template, distance) or (None, inf) if no match
-    """
-    if not candidates:
-        return None, float('inf')
-
-    best_match = None
-    best_distance = float('inf')
-
-    for template, stored_embedding in candidates:
-        if distance_metric == "cosine":
-            distance = _cosine_distance(query_embedding, stored_embedding)
-        else:  # euclidean
-            distance = _euclidean_distance(query_embedding, stored_embedding)
-
-        if distance < best_distance:
-            best_distance = distance
-            best_match = template
-
-    # Check if best match meets threshold
-    if best_distance > threshold:
-        return None, best_distance
-
-    return best_match, best_distance
+def _face_error_status(metadata: Optional[dict]) -> int:
+    """503 when the inference pool is saturated or timed out, 400 for bad images."""
+    if metadata and metadata.get("error") in RETRYABLE_ERRORS:
+        return 503
+    return 400
 
 
 # ------------------
@@ -224,7 +106,7 @@ def face_register(request):
 
     # Optional: specify model (default: Facenet512)
     model_name = data.get("model", "Facenet512")
-    if model_name not in ["Facenet512", "VGG-Face", "ArcFace", "Facenet", "DeepFace"]:
+    if model_name not in SUPPORTED_MODELS:
         model_name = "Facenet512"  # fallback to default
 
     # Extract face and generate embedding
@@ -232,7 +114,7 @@ def face_register(request):
 
     if embedding_vec is None:
         error_msg = metadata.get("message", "Face processing failed") if metadata else "Face processing failed"
-        return JsonResponse({"success": False, "message": error_msg}, status=400)
+        return JsonResponse({"success": False, "message": error_msg}, status=_face_error_status(metadata))
 
     try:
         from .models import AppUser, FaceTemplate
@@ -240,22 +122,28 @@ def face_register(request):
         if not user:
             return JsonResponse({"success": False, "message": "User not found"}, status=404)
 
-        # Convert embedding to JSON string
-        embedding_json = json.dumps(embedding_vec.tolist())
+        # Store embedding as packed float32 instead of JSON text
+        embedding_packed = pack_embedding(embedding_vec)
+        embedding_dim = int(embedding_vec.size)
 
         # Create or update face template
         tpl, created = FaceTemplate.objects.get_or_create(
             user=user,
             defaults={
-                "embedding": embedding_json,
+                "embedding_vector": embedding_packed,
+                "embedding_dim": embedding_dim,
                 "model_name": model_name,
                 "distance_metric": "cosine",
             }
         )
 
+        previous_model = None
         if not created:
             # Update existing template
-            tpl.embedding = embedding_json
+            previous_model = tpl.model_name
+            tpl.embedding_vector = embedding_packed
+            tpl.embedding_dim = embedding_dim
+            tpl.embedding = ""
             tpl.model_name = model_name
             tpl.distance_metric = "cosine"
 
@@ -267,6 +155,7 @@ def face_register(request):
             pass
 
         tpl.save()
+        face_template_saved(user.id, model_name, embedding_vec, previous_model=previous_model)
 
         try:
             record_audit(
@@ -321,7 +210,7 @@ def face_login(request):
 
     # Optional: specify model (must match registered model for best results)
     model_name = data.get("model", "Facenet512")
-    if model_name not in ["Facenet512", "VGG-Face", "ArcFace", "Facenet", "DeepFace"]:
+    if model_name not in SUPPORTED_MODELS:
         model_name = "Facenet512"
 
     # Extract face and generate embedding
@@ -339,7 +228,7 @@ def face_login(request):
             )
         except Exception:
             pass
-        return JsonResponse({"success": False, "message": error_msg}, status=400)
+        return JsonResponse({"success": False, "message": error_msg}, status=_face_error_status(metadata))
 
     # Matching threshold (cosine distance)
     # Lower is more similar: 0 = identical, 1 = completely different
@@ -347,12 +236,12 @@ def face_login(request):
     THRESHOLD = 0.4
 
     try:
-        from .models import FaceTemplate
+        from .models import AppUser
 
-        # Retrieve all face templates (filter by model for better performance)
-        templates = list(FaceTemplate.objects.select_related("user").filter(model_name=model_name))
+        # One matrix-vector product against the cached, pre-normalized templates
+        best_user_id, distance, candidate_count = match_face(model_name, embedding_vec)
 
-        if not templates:
+        if not candidate_count:
             try:
                 record_audit(
                     request,
@@ -365,27 +254,11 @@ def face_login(request):
                 pass
             return JsonResponse({"success": False, "message": "No registered faces found"}, status=404)
 
-        # Prepare candidates (template, embedding_array)
-        candidates = []
-        for tpl in templates:
-            try:
-                stored_embedding = np.array(json.loads(tpl.embedding))
-                candidates.append((tpl, stored_embedding))
-            except Exception:
-                continue  # Skip corrupted embeddings
+        user = None
+        if best_user_id and distance <= THRESHOLD:
+            user = AppUser.objects.filter(id=best_user_id).first()
 
-        if not candidates:
-            return JsonResponse({"success": False, "message": "No valid face templates found"}, status=404)
-
-        # Find best match
-        best_match, distance = _find_best_match(
-            embedding_vec,
-            candidates,
-            distance_metric="cosine",
-            threshold=THRESHOLD
-        )
-
-        if not best_match:
+        if not user:
             try:
                 record_audit(
                     request,
@@ -398,8 +271,6 @@ def face_login(request):
                 pass
             return JsonResponse({"success": False, "message": "Face not recognized"}, status=401)
 
-        user = best_match.user
-
         # Check user status
         status_l = (user.status or "").lower()
         if status_l == "deactivated":
@@ -525,7 +396,9 @@ def face_unregister(request):
         except Exception:
             pass
 
+        model_name = tpl.model_name
         tpl.delete()
+        face_template_removed(user.id, model_name)
 
         try:
             record_audit(
@@ -5,6 +5,10 @@ Production readiness goals:
 - Strong input validation and clear 4xx errors.
 - Bounded pagination and safe sorting fields.
 - Validated image uploads (type/size) using Pillow.
+- List responses cached per catalog version with ETags and ``?since=`` deltas
+  (api.menu_catalog).
+- Search served by the in-process index in api.menu_search (prefix, typo
+  tolerance, relevance order) instead of ``icontains`` scans.
 """
 
 import json
@@ -15,13 +19,15 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Q, Value, When
 from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from django.utils import timezone as dj_tz
 from django.conf import settings
 from .views_common import MENU_ITEMS, _paginate, _actor_from_request, _has_permission
 from .utils_audit import record_audit
+from . import menu_catalog, menu_images
+from . import menu_search as search_index
 
 
 def _resolve_category_id(category_value, category_map=None):
@@ -50,6 +56,34 @@ def _resolve_category_id(category_value, category_map=None):
         return None
 
 
+def _category_map_for(items):
+    from .models import MenuCategory
+
+    category_names = {
+        (getattr(it, "category", "") or "").strip()
+        for it in items
+        if getattr(it, "category", "") and getattr(it, "category", "").strip()
+    }
+    if not category_names:
+        return {}
+    category_lookup = MenuCategory.objects.filter(name__in=category_names).values_list("name", "id")
+    return {name.strip().lower(): str(cat_id) for name, cat_id in category_lookup}
+
+
+def _search_ids(search):
+    """Every matching item id from the search index, best first, or None to fall back to ``icontains``.
+
+    Not truncated: category/availability/archive filters and pagination are
+    applied afterwards, so a cap here would drop rows and skew ``total``.
+    """
+    if not getattr(settings, "MENU_SEARCH_INDEX", True):
+        return None
+    try:
+        return [item_id for item_id, _ in search_index.search(search, limit=0, include_archived=True)]
+    except Exception:
+        return None
+
+
 def _safe_menu_item(mi, category_map=None):
     try:
         category_name = getattr(mi, "category", "")
@@ -65,6 +99,7 @@ def _safe_menu_item(mi, category_map=None):
             "archived": bool(getattr(mi, "archived", False)),
             "archivedAt": mi.archived_at.isoformat() if getattr(mi, "archived_at", None) else None,
             "image": (mi.image.url if getattr(mi, "image", None) else None),
+            **menu_images.image_payload(mi),
             "ingredients": getattr(mi, "ingredients", []) or [],
             "preparationTime": getattr(mi, "preparation_time", 0) or 0,
             "createdAt": mi.created_at.isoformat() if getattr(mi, "created_at", None) else None,
@@ -176,98 +211,156 @@ def _restore_menu_item_fallback(request, actor, item_dict):
         )
     return changed, item_dict
 
+def _menu_items_delta(since, version):
+    """Items changed after catalog version ``since`` (archived ones included)."""
+    from .models import MenuItem
+
+    if since > version:
+        # Cursor from another database or a reset counter: start over
+        items = list(MenuItem.objects.filter(archived=False).order_by("name"))
+        reset = True
+    else:
+        ids = menu_catalog.changed_item_ids(since, version)
+        items = list(MenuItem.objects.filter(id__in=ids).order_by("catalog_version", "name")) if ids else []
+        reset = False
+    category_map = _category_map_for(items)
+    return JsonResponse({
+        "success": True,
+        "data": [_safe_menu_item(it, category_map) for it in items],
+        "version": version,
+        "since": since,
+        "reset": reset,
+    })
+
+
+@require_http_methods(["GET"])
+def menu_search(request):
+    """Autocomplete: best matching active items straight from the search index."""
+    query = (request.GET.get("q") or request.GET.get("search") or "").strip()
+    try:
+        limit = max(1, min(50, int(request.GET.get("limit") or 10)))
+    except (TypeError, ValueError):
+        limit = 10
+    if not query:
+        return JsonResponse({"success": True, "data": []})
+    try:
+        results = search_index.search_documents(query, limit)
+    except Exception:
+        return JsonResponse({"success": False, "message": "Search unavailable"}, status=503)
+    data = [
+        {
+            "id": doc["id"],
+            "name": doc["name"],
+            "category": doc["category"] or "",
+            "price": doc["price"],
+            "available": bool(doc["available"]),
+            "score": doc["score"],
+        }
+        for doc in results
+    ]
+    return JsonResponse({"success": True, "data": data})
+
+
 @require_http_methods(["GET", "POST"]) 
 def menu_items(request):
     if request.method == "GET":
+        return menu_catalog.cached_response(request, "api.menu_items", lambda version: _menu_items_get(request, version))
+    return _menu_items_create(request)
+
+
+def _menu_items_get(request, version):
+    try:
+        from .models import MenuItem
+        since = menu_catalog.parse_since(request.GET.get("since"))
+        if since is not None and version is not None:
+            return _menu_items_delta(since, version)
+        search = (request.GET.get("search") or request.GET.get("q") or "").strip()
+        category = (request.GET.get("category") or "").strip()
+        available = request.GET.get("available")
         try:
-            from .models import MenuItem, MenuCategory
-            search = (request.GET.get("search") or request.GET.get("q") or "").strip()
-            category = (request.GET.get("category") or "").strip()
-            available = request.GET.get("available")
-            try:
-                page = int(request.GET.get("page", 1) or 1)
-            except Exception:
-                page = 1
-            try:
-                limit = int(request.GET.get("limit", 50) or 50)
-            except Exception:
-                limit = 50
-            page = max(1, page)
-            limit = max(1, min(200, limit))
-
-            qs = MenuItem.objects.all()
-            archived_param = request.GET.get("archived")
-            if archived_param is None or archived_param == "":
-                qs = qs.filter(archived=False)
-            else:
-                val = str(archived_param).lower() in {"1", "true", "yes"}
-                qs = qs.filter(archived=val)
-            if search:
-                qs = qs.filter(Q(name__icontains=search) | Q(description__icontains=search) | Q(category__icontains=search))
-            if category:
-                qs = qs.filter(category__iexact=category)
-            if available is not None and available != "":
-                val = str(available).lower() in {"1", "true", "yes"}
-                qs = qs.filter(available=val)
-            sort_by = request.GET.get("sortBy") or "name"
-            sort_dir = (request.GET.get("sortDir") or "asc").lower()
-            order = ("-" if sort_dir == "desc" else "") + (sort_by if sort_by in {"name", "category", "price", "created_at", "updated_at"} else "name")
+            page = int(request.GET.get("page", 1) or 1)
+        except Exception:
+            page = 1
+        try:
+            limit = int(request.GET.get("limit", 50) or 50)
+        except Exception:
+            limit = 50
+        page = max(1, page)
+        limit = max(1, min(200, limit))
+
+        qs = MenuItem.objects.all()
+        archived_param = request.GET.get("archived")
+        if archived_param is None or archived_param == "":
+            qs = qs.filter(archived=False)
+        else:
+            val = str(archived_param).lower() in {"1", "true", "yes"}
+            qs = qs.filter(archived=val)
+        ranked = _search_ids(search) if search else None
+        if ranked is not None:
+            qs = qs.filter(id__in=ranked)
+        elif search:
+            qs = qs.filter(Q(name__icontains=search) | Q(description__icontains=search) | Q(category__icontains=search))
+        if category:
+            qs = qs.filter(category__iexact=category)
+        if available is not None and available != "":
+            val = str(available).lower() in {"1", "true", "yes"}
+            qs = qs.filter(available=val)
+        sort_by = request.GET.get("sortBy") or "name"
+        sort_dir = (request.GET.get("sortDir") or "asc").lower()
+        order = ("-" if sort_dir == "desc" else "") + (sort_by if sort_by in {"name", "category", "price", "created_at", "updated_at"} else "name")
+        if ranked and not request.GET.get("sortBy"):
+            # Relevance order from the index unless the caller picked a sort
+            relevance = Case(*[When(id=pk, then=Value(i)) for i, pk in enumerate(ranked)], output_field=IntegerField())
+            qs = qs.order_by(relevance, "name")
+        else:
             qs = qs.order_by(order)
-            paginator = Paginator(qs, limit)
-            page_obj = paginator.get_page(page)
-            category_names = {
-                (getattr(it, "category", "") or "").strip()
-                for it in page_obj.object_list
-                if getattr(it, "category", "") and getattr(it, "category", "").strip()
-            }
-            category_map = {}
-            if category_names:
-                category_lookup = (
-                    MenuCategory.objects.filter(name__in=category_names)
-                    .values_list("name", "id")
-                )
-                category_map = {name.strip().lower(): str(cat_id) for name, cat_id in category_lookup}
-            items = [_safe_menu_item(it, category_map) for it in page_obj.object_list]
-            pagination = {
-                "page": page_obj.number,
-                "limit": limit,
-                "total": paginator.count,
-                "totalPages": paginator.num_pages,
-            }
-            return JsonResponse({"success": True, "data": items, "pagination": pagination})
+        paginator = Paginator(qs, limit)
+        page_obj = paginator.get_page(page)
+        category_map = _category_map_for(page_obj.object_list)
+        items = [_safe_menu_item(it, category_map) for it in page_obj.object_list]
+        pagination = {
+            "page": page_obj.number,
+            "limit": limit,
+            "total": paginator.count,
+            "totalPages": paginator.num_pages,
+        }
+        return JsonResponse({"success": True, "data": items, "pagination": pagination, "version": version})
+    except Exception:
+        # Fallback to in-memory only allowed in development when explicitly enabled
+        if getattr(settings, "DISABLE_INMEM_FALLBACK", False):
+            return JsonResponse({"success": False, "message": "Failed to load menu items"}, status=500)
+        search = (request.GET.get("search") or request.GET.get("q") or "").lower()
+        category = (request.GET.get("category") or "").lower()
+        available = request.GET.get("available")
+        archived_param = request.GET.get("archived")
+        page = request.GET.get("page", 1)
+        limit = request.GET.get("limit", 50)
+        data = MENU_ITEMS
+        if archived_param is None or archived_param == "":
+            data = [i for i in data if not i.get("archived")]
+        else:
+            val = str(archived_param).lower() in {"1", "true", "yes"}
+            data = [i for i in data if bool(i.get("archived")) == val]
+        if search:
+            data = [i for i in data if search in i.get("name", "").lower() or search in i.get("description", "").lower()]
+        if category:
+            data = [i for i in data if i.get("category", "").lower() == category]
+        if available is not None and available != "":
+            val = str(available).lower() in {"1", "true", "yes"}
+            data = [i for i in data if bool(i.get("available", False)) == val]
+        sort_by = request.GET.get("sortBy") or "name"
+        sort_dir = (request.GET.get("sortDir") or "asc").lower()
+        reverse = sort_dir == "desc"
+        try:
+            data = sorted(data, key=lambda x: str(x.get(sort_by, "")).lower(), reverse=reverse)
         except Exception:
-            # Fallback to in-memory only allowed in development when explicitly enabled
-            if getattr(settings, "DISABLE_INMEM_FALLBACK", False):
-                return JsonResponse({"success": False, "message": "Failed to load menu items"}, status=500)
-            search = (request.GET.get("search") or request.GET.get("q") or "").lower()
-            category = (request.GET.get("category") or "").lower()
-            available = request.GET.get("available")
-            archived_param = request.GET.get("archived")
-            page = request.GET.get("page", 1)
-            limit = request.GET.get("limit", 50)
-            data = MENU_ITEMS
-            if archived_param is None or archived_param == "":
-                data = [i for i in data if not i.get("archived")]
-            else:
-                val = str(archived_param).lower() in {"1", "true", "yes"}
-                data = [i for i in data if bool(i.get("archived")) == val]
-            if search:
-                data = [i for i in data if search in i.get("name", "").lower() or search in i.get("description", "").lower()]
-            if category:
-                data = [i for i in data if i.get("category", "").lower() == category]
-            if available is not None and available != "":
-                val = str(available).lower() in {"1", "true", "yes"}
-                data = [i for i in data if bool(i.get("available", False)) == val]
-            sort_by = request.GET.get("sortBy") or "name"
-            sort_dir = (request.GET.get("sortDir") or "asc").lower()
-            reverse = sort_dir == "desc"
-            try:
-                data = sorted(data, key=lambda x: str(x.get(sort_by, "")).lower(), reverse=reverse)
-            except Exception:
-                pass
-            page_data, pagination = _paginate(data, page, limit)
-            return JsonResponse({"success": True, "data": page_data, "pagination": pagination})
+            pass
+        page_data, pagination = _paginate(data, page, limit)
+        # Demo data after a DB error: never cache it against the catalog version
+        return menu_catalog.uncacheable(JsonResponse({"success": True, "data": page_data, "pagination": pagination}))
+
 
+def _menu_items_create(request):
     # Create item -> require menu.manage permission
     actor, err = _actor_from_request(request)
     if not actor:
@@ -625,11 +718,14 @@ def menu_item_image(request, item_id):
         except Exception:
             return JsonResponse({"success": False, "message": "Invalid image"}, status=400)
         storage_name = mi.image.field.generate_filename(mi, img.name)
+        # Old derivatives belong to the previous photo; new ones follow off-thread
+        mi.image_variants = {}
         if default_storage.exists(storage_name):
             mi.image.name = storage_name
-            mi.save(update_fields=["image", "updated_at"])
+            mi.save(update_fields=["image", "image_variants", "updated_at"])
         else:
             mi.image.save(img.name, img, save=True)
+        menu_images.schedule(mi.id)
         image_url = mi.image.url if getattr(mi, "image", None) else None
     except Exception:
         if getattr(settings, "DISABLE_INMEM_FALLBACK", False):
@@ -755,4 +851,5 @@ __all__ = [
     "menu_item_availability",
     "menu_item_image",
     "menu_categories",
+    "menu_search",
 ]
@@ -1,29 +1,36 @@
-"""Notification endpoints: list, create, mark read, mark all read, delete.
+"""Notification endpoints: list, summary, create, mark read, mark all read, delete.
 
-DB-backed when available; safe fallbacks if DB not yet migrated.
+DB-backed when available; safe fallbacks if DB not yet migrated. The inbox
+merges personal notifications with audience broadcasts (api.notification_inbox).
+The list is keyset-paginated: pass ``pagination.nextCursor`` back as ``cursor``.
 """
 
 import json
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone as dj_timezone
 from django.db.utils import OperationalError, ProgrammingError
 
-from .views_common import _actor_from_request, _has_permission, rate_limit
+from . import notification_inbox as inbox
+from .views_common import _actor_from_request, _has_permission, _require_admin_or_manager, rate_limit
 
 
 NOTIFS_MEM = []
 
 
 def _serialize_db(n):
-    return {
+    data = {
         "id": str(n.id),
         "title": n.title,
         "message": n.message or "",
         "type": n.type or "info",
-        "read": bool(n.read),
+        "read": inbox.is_read(n),
         "createdAt": (n.created_at or dj_timezone.now()).isoformat(),
     }
+    if inbox.is_broadcast(n):
+        data["broadcast"] = True
+        data["audience"] = n.audience
+    return data
 
 
 def _serialize_mem(e):
@@ -46,36 +53,47 @@ def notifications(request):
 
     # GET list
     if request.method == "GET":
-        limit = int(request.GET.get("limit") or 50)
-        page = int(request.GET.get("page") or 1)
         try:
-            from .models import Notification
-            qs = Notification.objects.filter(user=actor).order_by("-created_at")
-            total = qs.count()
-            start = max(0, (page - 1) * max(1, limit))
-            end = start + max(1, limit)
-            items = [_serialize_db(x) for x in qs[start:end]]
+            limit = max(1, min(200, int(request.GET.get("limit") or 50)))
+        except (TypeError, ValueError):
+            limit = 50
+        token = (request.GET.get("cursor") or "").strip()
+        cursor = inbox.decode_cursor(token) if token else None
+        if token and cursor is None:
+            return JsonResponse({"success": False, "message": "Invalid cursor"}, status=400)
+        try:
+            if cursor is None:
+                items, next_cursor, has_more = inbox.recent_page(actor, limit, _serialize_db)
+            else:
+                rows, has_more = inbox.inbox_page(actor, limit, cursor)
+                items = [_serialize_db(x) for x in rows]
+                next_cursor = inbox.encode_cursor(rows[-1]) if rows and has_more else None
+            counts = inbox.summary(actor)
             return JsonResponse({
                 "success": True,
                 "data": items,
                 "pagination": {
-                    "page": page,
                     "limit": limit,
-                    "total": total,
-                    "totalPages": max(1, (total + limit - 1) // limit),
+                    "total": counts["total"],
+                    "unread": counts["unread"],
+                    "nextCursor": next_cursor,
+                    "hasMore": has_more,
                 },
             })
         except (OperationalError, ProgrammingError):
             pass
         # Memory fallback filtered to actor (email match not stored; show all)
         items = [_serialize_mem(x) for x in sorted(NOTIFS_MEM, key=lambda y: y.get("createdAt", ""), reverse=True)]
-        total = len(items)
-        start = max(0, (page - 1) * max(1, limit))
-        end = start + max(1, limit)
         return JsonResponse({
             "success": True,
-            "data": items[start:end],
-            "pagination": {"page": page, "limit": limit, "total": total, "totalPages": max(1, (total + limit - 1) // limit)},
+            "data": items[:limit],
+            "pagination": {
+                "limit": limit,
+                "total": len(items),
+                "unread": sum(1 for x in items if not x["read"]),
+                "nextCursor": None,
+                "hasMore": False,
+            },
         })
 
     # POST create new notification (requires permission)
@@ -93,6 +111,17 @@ def notifications(request):
     message = (data.get("message") or "").strip()
     ntype = (data.get("type") or "info").lower()
     user_id = str(data.get("userId") or "").strip()
+    audience = str(data.get("audience") or "").strip().lower()
+
+    # Audience broadcast: stored once, read state tracked per user
+    if audience and not user_id:
+        try:
+            b = inbox.broadcast(audience, title=title, message=message, type=ntype)
+            return JsonResponse({"success": True, "data": _serialize_db(b)})
+        except ValueError as e:
+            return JsonResponse({"success": False, "message": str(e)}, status=400)
+        except (OperationalError, ProgrammingError):
+            pass
 
     # Resolve recipient
     recip = None
@@ -134,19 +163,35 @@ def notifications(request):
     return JsonResponse({"success": True, "data": _serialize_mem(e)})
 
 
+@require_http_methods(["GET"])  # unread/total counts for the bell; ETag + 304 while unchanged
+def notifications_summary(request):
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    try:
+        etag = f'"{inbox.inbox_version(actor)}"'
+        if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse({"success": True, "data": inbox.summary(actor, etag.strip('"'))})
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+    except (OperationalError, ProgrammingError):
+        pass
+    unread = sum(1 for x in NOTIFS_MEM if "title" in x and not x.get("read"))
+    total = sum(1 for x in NOTIFS_MEM if "title" in x)
+    return JsonResponse({"success": True, "data": {"unread": unread, "total": total}})
+
+
 @require_http_methods(["POST"])  # mark single as read
 def notification_read(request, notif_id: str):
     actor, err = _actor_from_request(request)
     if not actor:
         return err
     try:
-        from .models import Notification
-        n = Notification.objects.filter(id=notif_id, user=actor).first()
-        if not n:
+        if not inbox.mark_read(actor, notif_id):
             return JsonResponse({"success": False, "message": "Not found"}, status=404)
-        if not n.read:
-            n.read = True
-            n.save(update_fields=["read"])
         return JsonResponse({"success": True})
     except (OperationalError, ProgrammingError):
         pass
@@ -164,8 +209,7 @@ def notifications_mark_all(request):
     if not actor:
         return err
     try:
-        from .models import Notification
-        Notification.objects.filter(user=actor, read=False).update(read=True)
+        inbox.mark_all_read(actor)
         return JsonResponse({"success": True})
     except (OperationalError, ProgrammingError):
         pass
@@ -180,11 +224,8 @@ def notification_delete(request, notif_id: str):
     if not actor:
         return err
     try:
-        from .models import Notification
-        n = Notification.objects.filter(id=notif_id, user=actor).first()
-        if not n:
+        if not inbox.dismiss(actor, notif_id):
             return JsonResponse({"success": False, "message": "Not found"}, status=404)
-        n.delete()
         return JsonResponse({"success": True})
     except (OperationalError, ProgrammingError):
         pass
@@ -196,6 +237,7 @@ def notification_delete(request, notif_id: str):
 
 __all__ = [
     "notifications",
+    "notifications_summary",
     "notification_read",
     "notifications_mark_all",
     "notification_delete",
@@ -265,6 +307,24 @@ def notifications_settings(request):
     return JsonResponse({"success": True})
 
 
+@require_http_methods(["GET"])  # outbox backlog, lag and throughput (admin/manager)
+def notifications_outbox_metrics(request):
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    if not _require_admin_or_manager(actor):
+        return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
+    try:
+        window = max(1, min(1440, int(request.GET.get("windowMinutes") or 15)))
+    except (TypeError, ValueError):
+        window = 15
+    try:
+        from .outbox_dispatcher import outbox_metrics
+        return JsonResponse({"success": True, "data": outbox_metrics(window)})
+    except (OperationalError, ProgrammingError):
+        return JsonResponse({"success": False, "message": "Outbox not available"}, status=503)
+
+
 @require_http_methods(["GET"])  # return VAPID public key if configured
 def notifications_push_public_key(request):
     try:
@@ -9,7 +9,7 @@ from __future__ import annotations
 
 import json
 import logging
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from uuid import UUID
 from decimal import Decimal
@@ -18,11 +18,12 @@ from typing import Iterable, Optional
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
-from django.db.models import Avg, Count, F, Q, Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum
 from django.utils import timezone as dj_tz
 from django.utils.crypto import get_random_string
 
+from .auto_advance import schedule_auto_advance
 from .events import publish_event
 from .views_common import _actor_from_request, _has_permission, rate_limit
 
@@ -120,7 +121,16 @@ def ensure_handoff_code(order) -> str:
     return code
 
 
-def recalc_order_counters(order, items: Optional[Iterable] = None):
+ORDER_COUNTER_FIELDS = [
+    "total_items_cached",
+    "partial_ready_items",
+    "last_station_code",
+    "late_by_seconds",
+    "updated_at",
+]
+
+
+def recalc_order_counters(order, items: Optional[Iterable] = None, *, save: bool = True):
     if items is None:
         items = list(order.items.all())
     else:
@@ -154,18 +164,13 @@ def recalc_order_counters(order, items: Optional[Iterable] = None):
             late_seconds = int((now_ts - order.promised_time).total_seconds())
     order.late_by_seconds = late_seconds
 
-    update_fields = [
-        "total_items_cached",
-        "partial_ready_items",
-        "last_station_code",
-        "late_by_seconds",
-        "updated_at",
-    ]
-    order.save(update_fields=update_fields)
+    # save=False leaves the write to the caller (e.g. a bulk_update of ORDER_COUNTER_FIELDS)
+    if save:
+        order.save(update_fields=ORDER_COUNTER_FIELDS)
     return order
 
 
-def record_order_event(order, *, item=None, event_type="", from_state="", to_state="", actor=None, station_code="", payload=None):
+def record_order_event(order, *, item=None, event_type="", from_state="", to_state="", actor=None, station_code="", payload=None, items: Optional[Iterable] = None):
     from .models import OrderEvent  # late import to avoid circular
 
     try:
@@ -181,6 +186,160 @@ def record_order_event(order, *, item=None, event_type="", from_state="", to_sta
         )
     except Exception:
         logger.exception("Failed to record order event")
+        return
+    schedule_order_event_sequencing()
+
+    try:
+        deltas = _station_load_deltas(
+            order,
+            item=item,
+            items=items,
+            event_type=event_type,
+            from_state=from_state,
+            to_state=to_state,
+            payload=payload or {},
+        )
+        _apply_station_load_deltas(deltas)
+    except Exception:
+        logger.exception("Failed to update station queue load")
+
+
+def sequence_order_events() -> int:
+    """
+    Number every committed ``OrderEvent`` that has no ``seq`` yet; returns how
+    many were numbered. Runs after commit under the ``ORDER_EVENTS`` sequencer
+    lock, so a seq is never handed out before every lower one is visible and
+    the queue delta cursor cannot skip a transaction that committed late.
+    """
+    from .models import OrderEvent, RealtimeEventSequencer
+
+    with transaction.atomic():
+        RealtimeEventSequencer.objects.select_for_update().get_or_create(pk=RealtimeEventSequencer.ORDER_EVENTS)
+        rows = list(OrderEvent.objects.filter(seq__isnull=True).order_by("created_at", "id").only("id"))
+        if not rows:
+            return 0
+        last = OrderEvent.objects.aggregate(last=Max("seq"))["last"] or 0
+        for offset, row in enumerate(rows, start=1):
+            row.seq = last + offset
+        OrderEvent.objects.bulk_update(rows, ["seq"], batch_size=500)
+    return len(rows)
+
+
+def schedule_order_event_sequencing() -> None:
+    def _sequence():
+        try:
+            sequence_order_events()
+        except Exception:
+            # The next writer numbers these rows too
+            logger.exception("Failed to sequence order events")
+
+    transaction.on_commit(_sequence)
+
+
+QUEUE_STATUS_EVENT_TYPES = {
+    "order.status_changed",
+    "order.status_auto",
+    "order.auto_advanced",
+}
+
+ITEM_READY_STATES = {"ready", "completed"}
+
+
+def _station_load_deltas(order, *, item=None, items=None, event_type="", from_state="", to_state="", payload=None):
+    """
+    Translate a single order event into per-station load adjustments.
+    Returns {station_code: [queue_count, active_quantity, ready_quantity]}.
+    """
+    deltas: dict[str, list[int]] = defaultdict(lambda: [0, 0, 0])
+
+    def _add(line, sign, code=None, ready=None):
+        code = code or line.station_code or DEFAULT_EXPO_STATION_CODE
+        qty = int(line.quantity or 0)
+        if ready is None:
+            ready = canonical_item_state(line.state) in ITEM_READY_STATES
+        entry = deltas[code]
+        entry[0] += sign
+        entry[1] += sign * qty
+        if ready:
+            entry[2] += sign * qty
+
+    def _lines():
+        return list(items) if items is not None else list(order.items.all())
+
+    # Mobile orders store capitalised statuses ("Pending")
+    status = str(order.status or "").lower()
+    if event_type == "order.created":
+        if status in ORDER_ACTIVE_STATUSES:
+            for line in _lines():
+                _add(line, 1)
+    elif event_type in QUEUE_STATUS_EVENT_TYPES:
+        was_active = (from_state or "").lower() in ORDER_ACTIVE_STATUSES
+        is_active = (to_state or "").lower() in ORDER_ACTIVE_STATUSES
+        if was_active != is_active:
+            sign = 1 if is_active else -1
+            for line in _lines():
+                _add(line, sign)
+    elif event_type == "order.item_state_changed" and item is not None:
+        if status not in ORDER_ACTIVE_STATUSES:
+            return deltas
+        was_ready = canonical_item_state(from_state) in ITEM_READY_STATES
+        is_ready = canonical_item_state(to_state) in ITEM_READY_STATES
+        previous_station = (payload or {}).get("previousStationCode") or ""
+        current_station = item.station_code or DEFAULT_EXPO_STATION_CODE
+        if previous_station and previous_station != current_station:
+            _add(item, -1, code=previous_station, ready=was_ready)
+            _add(item, 1, code=current_station, ready=is_ready)
+        elif was_ready != is_ready:
+            deltas[current_station][2] += int(item.quantity or 0) * (1 if is_ready else -1)
+    return deltas
+
+
+def _apply_station_load_deltas(deltas) -> None:
+    from .models import StationQueueLoad
+
+    for code, (count, qty, ready) in deltas.items():
+        if not (count or qty or ready):
+            continue
+        changes = {
+            "queue_count": F("queue_count") + count,
+            "active_quantity": F("active_quantity") + qty,
+            "ready_quantity": F("ready_quantity") + ready,
+            "updated_at": dj_tz.now(),
+        }
+        if not StationQueueLoad.objects.filter(station_code=code).update(**changes):
+            StationQueueLoad.objects.get_or_create(station_code=code)
+            StationQueueLoad.objects.filter(station_code=code).update(**changes)
+
+
+def _sync_station_loads(totals) -> None:
+    """
+    Overwrite the running station loads with totals taken from a full queue scan.
+    Any drift from missed events is corrected on the next full snapshot.
+    """
+    from .models import StationQueueLoad
+
+    existing = {row.station_code: row for row in StationQueueLoad.objects.all()}
+    for code, (count, qty, ready) in totals.items():
+        row = existing.pop(code, None)
+        if row is None:
+            StationQueueLoad.objects.create(
+                station_code=code,
+                queue_count=count,
+                active_quantity=qty,
+                ready_quantity=ready,
+            )
+        elif (row.queue_count, row.active_quantity, row.ready_quantity) != (count, qty, ready):
+            StationQueueLoad.objects.filter(pk=row.pk).update(
+                queue_count=count,
+                active_quantity=qty,
+                ready_quantity=ready,
+                updated_at=dj_tz.now(),
+            )
+    stale = [row.pk for row in existing.values() if row.queue_count or row.active_quantity or row.ready_quantity]
+    if stale:
+        StationQueueLoad.objects.filter(pk__in=stale).update(
+            queue_count=0, active_quantity=0, ready_quantity=0, updated_at=dj_tz.now()
+        )
 
 
 DEFAULT_EXPO_STATION_CODE = "expo"
@@ -452,6 +611,7 @@ def _reset_auto_flow(
     order.auto_advance_at = now_ts + timedelta(seconds=seconds)
     order.auto_advance_paused = False
     order.auto_advance_pause_reason = ""
+    schedule_auto_advance(order.auto_advance_at)
     update_fields.extend(
         [
             "auto_advance_target",
@@ -468,6 +628,8 @@ def _reset_auto_flow(
     return update_fields
 
 
+# Pausing/clearing needs no timer bookkeeping: an armed timer that fires for a
+# cleared auto_advance_at finds nothing due (see api.auto_advance)
 def _pause_auto_flow(order, *, reason: str = "") -> list[str]:
     order.auto_advance_paused = True
     order.auto_advance_pause_reason = reason or ""
@@ -614,7 +776,7 @@ def _safe_item(i):
     }
 
 
-def _safe_order(o, with_items=True):
+def _safe_order(o, with_items=True, items=None):
     canonical = canonical_status(o.status)
     promised_time = o.promised_time.isoformat() if o.promised_time else None
     time_completed = o.completed_at.isoformat() if o.completed_at else None
@@ -687,7 +849,7 @@ def _safe_order(o, with_items=True):
     }
     if with_items:
         try:
-            items = list(o.items.all())
+            items = list(o.items.all()) if items is None else list(items)
             safe_items = [_safe_item(x) for x in items]
             data["items"] = safe_items
             total_qty = sum(it["quantity"] for it in safe_items)
@@ -764,205 +926,402 @@ def orders(request):
             logger.exception("Failed to list orders")
             return JsonResponse({"success": False, "message": "Unable to fetch orders"}, status=500)
 
-    # POST create (place order)
+    # POST create (place order, or a batch of orders flushed from an offline POS queue)
     if not _has_permission(actor, "order.place"):
         return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
     try:
         payload = json.loads(request.body.decode("utf-8") or "{}")
     except Exception:
         payload = {}
+
+    batch = None
+    if isinstance(payload, list):
+        batch = payload
+    elif isinstance(payload, dict) and isinstance(payload.get("orders"), list):
+        batch = payload["orders"]
+    if batch is not None:
+        if not batch:
+            return JsonResponse({"success": False, "message": "orders is required"}, status=400)
+        if len(batch) > ORDER_BATCH_MAX:
+            return JsonResponse(
+                {"success": False, "message": f"At most {ORDER_BATCH_MAX} orders per request"}, status=400
+            )
+        entries = [entry if isinstance(entry, dict) else {} for entry in batch]
+    else:
+        entries = [payload if isinstance(payload, dict) else {}]
+        items = entries[0].get("items") or []
+        if not isinstance(items, list) or not items:
+            return JsonResponse({"success": False, "message": "items is required"}, status=400)
+
+    try:
+        context = _order_create_context(entries)
+    except Exception:
+        logger.exception("Failed to create order")
+        return JsonResponse({"success": False, "message": "Failed to create order"}, status=500)
+
+    if batch is None:
+        try:
+            with transaction.atomic():
+                o, created_items = _create_order_from_payload(actor, entries[0], context)
+        except _OrderInputError as exc:
+            status = 409 if isinstance(exc, _OrderConflictError) else 400
+            return JsonResponse({"success": False, "message": str(exc)}, status=status)
+        except Exception:
+            logger.exception("Failed to create order")
+            return JsonResponse({"success": False, "message": "Failed to create order"}, status=500)
+        if created_items is None:
+            return JsonResponse({"success": True, "duplicate": True, "data": _safe_order(o)})
+        return JsonResponse({"success": True, "data": _order_created_side_effects(o, created_items, actor)})
+
+    results = []
+    for index, entry in enumerate(entries):
+        try:
+            with transaction.atomic():
+                o, created_items = _create_order_from_payload(actor, entry, context)
+        except _OrderInputError as exc:
+            result = {"index": index, "success": False, "message": str(exc)}
+            if isinstance(exc, _OrderConflictError):
+                result["conflict"] = True
+            results.append(result)
+            continue
+        except Exception:
+            logger.exception("Failed to create order %s of batch", index)
+            results.append({"index": index, "success": False, "message": "Failed to create order"})
+            continue
+        if created_items is None:
+            results.append({"index": index, "success": True, "duplicate": True, "data": _safe_order(o)})
+        else:
+            results.append({"index": index, "success": True, "data": _order_created_side_effects(o, created_items, actor)})
+    created = sum(1 for r in results if r["success"])
+    return JsonResponse(
+        {"success": created > 0, "data": results, "created": created, "failed": len(results) - created},
+        status=200 if created else 400,
+    )
+
+
+ORDER_BATCH_MAX = max(1, int(getattr(settings, "POS_ORDER_BATCH_MAX", 50) or 50))
+
+
+class _OrderInputError(ValueError):
+    """Client error while building an order; reported as a 400."""
+
+
+class _OrderConflictError(_OrderInputError):
+    """Client order number taken by a different order; reported as a 409."""
+
+
+def _menu_item_key(value) -> str:
+    try:
+        return str(UUID(str(value)))
+    except Exception:
+        return ""
+
+
+def _order_create_context(entries) -> dict:
+    """
+    Load everything order creation needs for a whole request up front:
+    stations, current station WIP, every referenced menu item (one ``id__in``
+    query) and any client-supplied order numbers that already exist.
+    """
+    from .models import MenuItem, Order, OrderItem
+
+    station_lookup, _ = _load_station_lookup()
+    wip_rows = (
+        OrderItem.objects.filter(state__in=list(ITEM_ACTIVE_STATES))
+        .values("station_code")
+        .annotate(total_qty=Sum("quantity"))
+    )
+    station_wip = defaultdict(int)
+    for row in wip_rows:
+        code = row.get("station_code") or DEFAULT_EXPO_STATION_CODE
+        station_wip[code] = int(row.get("total_qty") or 0)
+
+    menu_ids = set()
+    numbers = set()
+    for entry in entries:
+        for it in entry.get("items") or []:
+            if not isinstance(it, dict):
+                continue
+            key = _menu_item_key(it.get("menuItemId") or it.get("id"))
+            if key:
+                menu_ids.add(key)
+        number = _normalize_order_number_candidate(entry.get("orderNumber") or entry.get("order_number"))
+        if number:
+            numbers.add(number)
+
+    menu_lookup = {}
+    if menu_ids:
+        menu_lookup = {str(m.id): m for m in MenuItem.objects.filter(id__in=menu_ids, available=True)}
+    existing_orders = {}
+    if numbers:
+        existing_orders = {
+            o.order_number.upper(): o for o in Order.objects.filter(order_number__in=numbers).prefetch_related("items")
+        }
+    return {
+        "station_lookup": station_lookup,
+        "station_wip": station_wip,
+        "menu_lookup": menu_lookup,
+        "existing_orders": existing_orders,
+    }
+
+
+def _replayed_order(actor, order, items, menu_lookup):
+    """
+    ``order`` when it is the same order being sent again: placed by ``actor``
+    with the same menu items and quantities. Raises ``_OrderConflictError``
+    when the number belongs to another actor or another order.
+    """
+    if str(order.placed_by_id or "") != str(getattr(actor, "id", None) or ""):
+        raise _OrderConflictError("Order number already in use")
+    placed = Counter()
+    for line in order.items.all():
+        placed[str(line.menu_item_id or "")] += int(line.quantity or 0)
+    sent = Counter()
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        mid = _menu_item_key(it.get("menuItemId") or it.get("id"))
+        try:
+            qty = int(it.get("quantity") or it.get("qty") or 0)
+        except Exception:
+            qty = 0
+        # Lines the first attempt skipped (unknown or unavailable items) are not compared
+        if mid and qty > 0 and (mid in placed or mid in menu_lookup):
+            sent[mid] += qty
+    if sent != placed:
+        raise _OrderConflictError("Order number already in use by a different order")
+    return order
+
+
+def _create_order_from_payload(actor, payload, context):
+    """
+    Create one order and its lines with a fixed number of queries regardless of
+    line count. Returns (order, created_items); created_items is None when the
+    client-supplied order number already exists for the same actor and lines
+    (an offline queue replaying). Must run inside a transaction.
+    """
+    from .models import Order, OrderItem
+
     items = payload.get("items") or []
+    if not isinstance(items, list) or not items:
+        raise _OrderInputError("items is required")
+
+    number = _normalize_order_number_candidate(payload.get("orderNumber") or payload.get("order_number"))
+    if number and number in context["existing_orders"]:
+        return _replayed_order(actor, context["existing_orders"][number], items, context["menu_lookup"]), None
+
     order_type = (payload.get("type") or "walk-in").lower()
     customer_name = (payload.get("customerName") or "").strip()
-    discount = Decimal(str(payload.get("discount") or 0))
-    if not isinstance(items, list) or not items:
-        return JsonResponse({"success": False, "message": "items is required"}, status=400)
+    try:
+        discount = max(Decimal("0"), Decimal(str(payload.get("discount") or 0)))
+    except Exception:
+        raise _OrderInputError("Invalid discount")
 
+    station_lookup = context["station_lookup"]
+    station_wip = context["station_wip"]
+    menu_lookup = context["menu_lookup"]
+
+    base_quote = (
+        payload.get("quoteMinutes")
+        or payload.get("quotedMinutes")
+        or payload.get("quoted_minutes")
+        or 12
+    )
     try:
-        from .models import Order, OrderItem, MenuItem
-
-        station_lookup, station_list = _load_station_lookup()
-        active_item_states = list(ITEM_ACTIVE_STATES)
-        wip_rows = (
-            OrderItem.objects.filter(state__in=active_item_states)
-            .values("station_code")
-            .annotate(total_qty=Sum("quantity"))
-        )
-        station_wip = defaultdict(int)
-        for row in wip_rows:
-            code = row.get("station_code") or DEFAULT_EXPO_STATION_CODE
-            station_wip[code] = int(row.get("total_qty") or 0)
-
-        base_quote = (
-            payload.get("quoteMinutes")
-            or payload.get("quotedMinutes")
-            or payload.get("quoted_minutes")
-            or 12
-        )
+        base_quote = int(base_quote)
+    except Exception:
+        base_quote = 12
+    base_quote = max(6, min(base_quote, 90))
+    recommended_quote = base_quote
+
+    throttle_reason = (payload.get("throttleReason") or "").strip()
+    requested_priority = (payload.get("priority") or "normal").lower()
+    requested_channel = (payload.get("channel") or order_type or "walk-in").lower()
+    requested_shelf = (payload.get("shelfSlot") or "").upper()
+    bulk_reference = payload.get("bulkReference") or ""
+    is_throttled = bool(payload.get("isThrottled") or False)
+    payment_method = str(payload.get("paymentMethod") or payload.get("payment_method") or "").strip().lower()[:16]
+
+    auto_throttle = []
+    subtotal = Decimal("0")
+    line_blueprints = []
+    sequence_counter = 1
+    wip_added = defaultdict(int)
+    fallback_station = station_lookup.get(DEFAULT_EXPO_STATION_CODE)
+
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        mid = _menu_item_key(it.get("menuItemId") or it.get("id"))
         try:
-            base_quote = int(base_quote)
+            qty = int(it.get("quantity") or it.get("qty") or 0)
         except Exception:
-            base_quote = 12
-        base_quote = max(6, min(base_quote, 90))
-        recommended_quote = base_quote
-
-        throttle_reason = (payload.get("throttleReason") or "").strip()
-        requested_priority = (payload.get("priority") or "normal").lower()
-        requested_channel = (payload.get("channel") or order_type or "walk-in").lower()
-        requested_shelf = (payload.get("shelfSlot") or "").upper()
-        bulk_reference = payload.get("bulkReference") or ""
-        is_throttled = bool(payload.get("isThrottled") or False)
-
-        auto_throttle = []
-        subtotal = Decimal("0")
-        line_blueprints = []
-        sequence_counter = 1
+            qty = 0
+        if not mid or qty <= 0:
+            continue
+        mi = menu_lookup.get(mid)
+        if not mi:
+            continue
+
+        price = Decimal(mi.price or 0)
+        subtotal += price * qty
+
+        explicit_station = (it.get("stationCode") or it.get("station") or "").lower() or None
+        station = resolve_station_for_item(
+            mi, explicit_station=explicit_station, station_lookup=station_lookup
+        )
+        station_code = station.code if station else DEFAULT_EXPO_STATION_CODE
+        station_name = (
+            station.name
+            if station
+            else (fallback_station.name if fallback_station else "Expo")
+        )
 
-        with transaction.atomic():
-            for it in items:
-                mid = it.get("menuItemId") or it.get("id")
-                qty = int(it.get("quantity") or it.get("qty") or 0)
-                if not mid or qty <= 0:
-                    continue
-                mi = MenuItem.objects.filter(id=mid, available=True).first()
-                if not mi:
-                    continue
-
-                price = Decimal(mi.price or 0)
-                subtotal += price * qty
-
-                explicit_station = (it.get("stationCode") or it.get("station") or "").lower() or None
-                station = resolve_station_for_item(
-                    mi, explicit_station=explicit_station, station_lookup=station_lookup
-                )
-                station_code = station.code if station else DEFAULT_EXPO_STATION_CODE
-                fallback_station = station_lookup.get(DEFAULT_EXPO_STATION_CODE)
-                station_name = (
-                    station.name
-                    if station
-                    else (fallback_station.name if fallback_station else "Expo")
-                )
+        wip_added[station_code] += qty
+        current_wip = station_wip[station_code] + wip_added[station_code]
+        capacity = max(1, getattr(station, "capacity", 4) or 1)
+        utilization = current_wip / capacity
+        if utilization > 1:
+            auto_throttle.append((station_code, utilization, capacity))
+            recommended_quote = max(
+                recommended_quote,
+                base_quote + int((current_wip - capacity + 1) * 2),
+            )
 
-                station_wip[station_code] += qty
-                capacity = max(1, getattr(station, "capacity", 4) or 1)
-                utilization = station_wip[station_code] / capacity
-                if utilization > 1:
-                    auto_throttle.append((station_code, utilization, capacity))
-                    recommended_quote = max(
-                        recommended_quote,
-                        base_quote + int((station_wip[station_code] - capacity + 1) * 2),
-                    )
+        prep_minutes = int(getattr(mi, "preparation_time", 0) or 0)
+        line_blueprints.append(
+            {
+                "menu_item": mi,
+                "quantity": qty,
+                "price": price,
+                "category": mi.category or "",
+                "station_code": station_code,
+                "station_name": station_name,
+                "cook_seconds_estimate": int(max(0, prep_minutes * 60)),
+                "priority": (it.get("priority") or requested_priority),
+                "modifiers": it.get("modifiers") or [],
+                "allergens": it.get("allergens") or [],
+                "notes": it.get("notes") or "",
+                "sequence": sequence_counter,
+                "explicit_station": explicit_station,
+            }
+        )
+        sequence_counter += 1
+
+    if not line_blueprints:
+        raise _OrderInputError("No valid items")
+
+    if auto_throttle and not throttle_reason:
+        parts = []
+        for code, util, cap in auto_throttle:
+            station = station_lookup.get(code)
+            name = station.name if station else code.upper()
+            parts.append(f"{name} at {int(util * 100)}% load")
+        throttle_reason = ", ".join(parts)
+        is_throttled = True
+
+    client_number = bool(number)
+    if not number:
+        prefix = (requested_channel or order_type or "walk-in")[:1].upper() or "W"
+        number = generate_unique_order_number(prefix=prefix, order_model=Order)
+    total = max(Decimal("0"), subtotal - discount)
+    promised_time = parse_iso_datetime(payload.get("promisedTime")) or (
+        dj_tz.now() + timedelta(minutes=recommended_quote)
+    )
 
-                prep_minutes = int(getattr(mi, "preparation_time", 0) or 0)
-                cook_seconds_estimate = int(max(0, prep_minutes * 60))
+    # Counters are known up front for a brand-new order: every line starts queued
+    try:
+        with transaction.atomic():
+            o = Order.objects.create(
+                order_number=number,
+                status="accepted",
+                order_type=order_type,
+                channel=requested_channel,
+                customer_name=customer_name,
+                subtotal=subtotal,
+                discount=discount,
+                total_amount=total,
+                payment_method=payment_method or ("cash" if requested_channel == "walk-in" else ""),
+                placed_by=actor if getattr(actor, "id", None) else None,
+                promised_time=promised_time,
+                quoted_minutes=recommended_quote,
+                priority=requested_priority,
+                eta_seconds=recommended_quote * 60,
+                is_throttled=is_throttled,
+                throttle_reason=(throttle_reason or "")[:255],
+                bulk_reference=bulk_reference or "",
+                shelf_slot=requested_shelf,
+                auto_advance_duration_seconds=AUTO_ADVANCE_DEFAULT_SECONDS,
+                total_items_cached=sum(bp["quantity"] for bp in line_blueprints),
+                partial_ready_items=0,
+                last_station_code=line_blueprints[-1]["station_code"],
+                late_by_seconds=0,
+            )
+    except IntegrityError:
+        if not client_number:
+            raise
+        # A concurrent replay of the same order inserted it first
+        existing = Order.objects.filter(order_number=number).prefetch_related("items").first()
+        if existing is None:
+            raise
+        return _replayed_order(actor, existing, items, menu_lookup), None
+    created_items = OrderItem.objects.bulk_create(
+        [
+            OrderItem(
+                order=o,
+                menu_item=blueprint["menu_item"],
+                item_name=blueprint["menu_item"].name,
+                category=blueprint["category"],
+                price=blueprint["price"],
+                quantity=blueprint["quantity"],
+                state="queued",
+                station_code=blueprint["station_code"],
+                station_name=blueprint["station_name"],
+                cook_seconds_estimate=blueprint["cook_seconds_estimate"],
+                priority=blueprint["priority"],
+                sequence=blueprint["sequence"],
+                modifiers=blueprint["modifiers"],
+                allergens=blueprint["allergens"],
+                notes=blueprint["notes"],
+                meta={"stationSuggestion": blueprint["explicit_station"]} if blueprint["explicit_station"] else {},
+            )
+            for blueprint in line_blueprints
+        ]
+    )
 
-                modifiers = it.get("modifiers") or []
-                allergens = it.get("allergens") or []
-                notes = it.get("notes") or ""
-                category = mi.category or ""
-                line_blueprints.append(
-                    {
-                        "menu_item": mi,
-                        "quantity": qty,
-                        "price": price,
-                        "category": category,
-                        "station_code": station_code,
-                        "station_name": station_name,
-                        "cook_seconds_estimate": cook_seconds_estimate,
-                        "priority": (it.get("priority") or requested_priority),
-                        "modifiers": modifiers,
-                        "allergens": allergens,
-                        "notes": notes,
-                        "sequence": sequence_counter,
-                        "explicit_station": explicit_station,
-                    }
-                )
-                sequence_counter += 1
-
-            if not line_blueprints:
-                return JsonResponse({"success": False, "message": "No valid items"}, status=400)
-
-            if auto_throttle and not throttle_reason:
-                parts = []
-                for code, util, cap in auto_throttle:
-                    station = station_lookup.get(code)
-                    name = station.name if station else code.upper()
-                    parts.append(f"{name} at {int(util * 100)}% load")
-                throttle_reason = ", ".join(parts)
-                is_throttled = True
-
-        o = Order.objects.create(
-            order_number=num,
-            status="accepted",
-            order_type=order_type,
-            channel=requested_channel,
-            customer_name=customer_name,
-            subtotal=subtotal,
-            discount=discount,
-            total_amount=total,  # Make sure 'total' is Decimal(subtotal - discount)
-            payment_method=payment_method or ("cash" if requested_channel == "walk-in" else ""),
-            placed_by=actor if getattr(actor, "id", None) else None,  # correct FK to AppUser
-            promised_time=promised_time,
-            quoted_minutes=recommended_quote,
-            priority=requested_priority,
-            eta_seconds=eta_seconds,
-            is_throttled=is_throttled,
-            throttle_reason=throttle_reason or "",
-            bulk_reference=bulk_reference or "",
-            shelf_slot=requested_shelf.upper() if requested_shelf else "",
-            auto_advance_duration_seconds=AUTO_ADVANCE_DEFAULT_SECONDS,
-        )
-        created_items = []
-        for blueprint in line_blueprints:
-                item = OrderItem.objects.create(
-                    order=o,
-                    menu_item=blueprint["menu_item"],
-                    item_name=blueprint["menu_item"].name,
-                    category=blueprint["category"],
-                    price=blueprint["price"],
-                    quantity=blueprint["quantity"],
-                    state="queued",
-                    station_code=blueprint["station_code"],
-                    station_name=blueprint["station_name"],
-                    cook_seconds_estimate=blueprint["cook_seconds_estimate"],
-                    priority=blueprint["priority"],
-                    sequence=blueprint["sequence"],
-                    modifiers=blueprint["modifiers"],
-                    allergens=blueprint["allergens"],
-                    notes=blueprint["notes"],
-                    meta={"stationSuggestion": blueprint["explicit_station"]} if blueprint["explicit_station"] else {},
-                )
-                created_items.append(item)
+    record_order_event(
+        o,
+        event_type="order.created",
+        to_state=o.status,
+        actor=actor if hasattr(actor, "id") else None,
+        items=created_items,
+        payload={
+            "channel": requested_channel,
+            "priority": requested_priority,
+            "isThrottled": is_throttled,
+            "quotedMinutes": recommended_quote,
+        },
+    )
 
-        recalc_order_counters(o, created_items)
+    # Later orders in the same batch see this order's load
+    for code, qty in wip_added.items():
+        station_wip[code] += qty
+    context["existing_orders"][number.upper()] = o
+    return o, created_items
 
-        order_payload = _safe_order(o)
-        record_order_event(
-            o,
-            event_type="order.created",
-            to_state=o.status,
-            actor=actor if hasattr(actor, "id") else None,
-            payload={
-                "channel": requested_channel,
-                "priority": requested_priority,
-                "isThrottled": is_throttled,
-                "quotedMinutes": recommended_quote,
-            },
-        )
-        publish_event("order.created", {"order": order_payload}, roles={"admin", "manager", "staff"}, user_ids=[str(o.placed_by_id)] if getattr(o, "placed_by_id", None) else None)
 
-        # Trigger notifications for new order and large orders
-        try:
-            from .notification_triggers import trigger_new_order, trigger_large_order
-            trigger_new_order(o)
-            trigger_large_order(o)
-        except Exception:
-            pass
+def _order_created_side_effects(o, created_items, actor) -> dict:
+    order_payload = _safe_order(o, items=created_items)
+    publish_event("order.created", {"order": order_payload}, roles={"admin", "manager", "staff"}, user_ids=[str(o.placed_by_id)] if getattr(o, "placed_by_id", None) else None)
 
-        return JsonResponse({"success": True, "data": order_payload})
+    # Trigger notifications for new order and large orders
+    try:
+        from .notification_triggers import trigger_new_order, trigger_large_order
+        trigger_new_order(o)
+        trigger_large_order(o)
     except Exception:
-        logger.exception("Failed to create order")
-        return JsonResponse({"success": False, "message": "Failed to create order"}, status=500)
+        pass
+    return order_payload
 
 
 @require_http_methods(["GET"])
@@ -996,6 +1355,154 @@ def order_generate_number(request):
         return JsonResponse({"success": False, "message": "Unable to generate order number"}, status=500)
 
 
+def _queue_station_entry(safe_order: dict, safe_item: dict) -> dict:
+    canonical = safe_order["canonicalStatus"]
+    return {
+        "itemId": safe_item["id"],
+        "orderId": safe_order["id"],
+        "orderNumber": safe_order["orderNumber"],
+        "stationCode": safe_item["stationCode"] or DEFAULT_EXPO_STATION_CODE,
+        "state": canonical_item_state(safe_item["state"]),
+        "stateDisplay": safe_item["stateDisplay"],
+        "quantity": safe_item["quantity"],
+        "menuItemId": safe_item["menuItemId"],
+        "name": safe_item["name"],
+        "secondsInState": safe_item["secondsInState"],
+        "ageSeconds": safe_item["ageSeconds"],
+        "priority": safe_item["priority"],
+        "channel": safe_order["channel"],
+        "orderStatus": canonical,
+        "promisedTime": safe_order["promisedTime"],
+        "lateBySeconds": safe_order["lateBySeconds"],
+        "isLate": safe_order["lateBySeconds"] > 0 and canonical not in ORDER_TERMINAL_STATUSES,
+        "allergens": safe_item["allergens"],
+        "modifiers": safe_item["modifiers"],
+        "notes": safe_item["notes"],
+        "customerName": safe_order["customerName"],
+    }
+
+
+QUEUE_DELTA_MAX_ORDERS = max(
+    1,
+    int(getattr(settings, "POS_QUEUE_DELTA_MAX_ORDERS", 200) or 200),
+)
+
+
+def _station_load_payload(stations, station_lookup, loads) -> tuple[list, dict]:
+    """Build station aggregates and the capacity snapshot from ``StationQueueLoad`` rows."""
+    station_payload = []
+    throttle_reasons = []
+    max_utilization = 0.0
+
+    def _row(code, name, capacity, load):
+        queue_count = max(0, int(getattr(load, "queue_count", 0) or 0))
+        active_qty = max(0, int(getattr(load, "active_quantity", 0) or 0))
+        ready_qty = max(0, int(getattr(load, "ready_quantity", 0) or 0))
+        utilization = active_qty / max(1, capacity or 1)
+        return utilization, {
+            "code": code,
+            "name": name,
+            "capacity": capacity,
+            "queueCount": queue_count,
+            "activeQuantity": active_qty,
+            "readyQuantity": ready_qty,
+            "pendingQuantity": max(0, active_qty - ready_qty),
+            "utilization": round(utilization, 3),
+            "overCapacity": utilization > 1.0,
+        }
+
+    for station in stations:
+        utilization, row = _row(station.code, station.name, station.capacity, loads.get(station.code))
+        max_utilization = max(max_utilization, utilization)
+        if utilization >= 0.9:
+            throttle_reasons.append(f"{station.name} at {int(utilization * 100)}% load")
+        station_payload.append(row)
+
+    for code, load in loads.items():
+        if code in station_lookup or not load.queue_count:
+            continue
+        _, row = _row(code, code.upper(), max(1, int(load.active_quantity or 0)), load)
+        station_payload.append(row)
+
+    capacity_snapshot = {
+        "shouldThrottle": bool(throttle_reasons),
+        "throttleReasons": throttle_reasons,
+        "peakUtilization": round(max_utilization, 3),
+        "recommendedQuoteMinutes": max(
+            8, int(12 + max(0.0, max_utilization - 0.85) * 20)
+        ),
+    }
+    return station_payload, capacity_snapshot
+
+
+def _order_queue_delta(since: int, *, now_ts):
+    """
+    Return only the orders/items touched by ``OrderEvent`` rows after cursor
+    ``since`` (their commit-ordered ``seq``) plus the incrementally maintained
+    station loads. Returns None when the gap is too large and the caller
+    should send a full snapshot instead.
+    """
+    from .models import Order, OrderEvent, StationQueueLoad
+
+    events = list(
+        OrderEvent.objects.filter(seq__gt=since)
+        .order_by("seq")
+        .values_list("order_id", "item_id", "seq")
+    )
+    changed: dict[str, Optional[set]] = {}
+    for order_id, item_id, _ in events:
+        key = str(order_id)
+        if item_id is None:
+            changed[key] = None
+        elif key not in changed:
+            changed[key] = {str(item_id)}
+        elif changed[key] is not None:
+            changed[key].add(str(item_id))
+    if len(changed) > QUEUE_DELTA_MAX_ORDERS:
+        return None
+
+    cursor = events[-1][2] if events else since
+    orders_payload = []
+    items_payload = []
+    removed = set(changed.keys())
+
+    if changed:
+        qs = (
+            Order.objects.filter(id__in=list(changed.keys()))
+            .prefetch_related("items")
+            .order_by("created_at")
+        )
+        for order in qs:
+            if str(order.status or "").lower() not in ORDER_ACTIVE_STATUSES:
+                continue
+            removed.discard(str(order.id))
+            safe = _safe_order(order)
+            if canonical_status(order.status) in {"staged", "handoff"}:
+                safe["handoffCode"] = ensure_handoff_code(order)
+            orders_payload.append(safe)
+            wanted = changed.get(str(order.id))
+            for safe_item in safe.get("items", []):
+                if wanted is None or safe_item["id"] in wanted:
+                    items_payload.append(_queue_station_entry(safe, safe_item))
+
+    station_lookup, stations = _load_station_lookup()
+    loads = {row.station_code: row for row in StationQueueLoad.objects.all()}
+    station_payload, capacity_snapshot = _station_load_payload(stations, station_lookup, loads)
+    capacity_snapshot["stations"] = station_payload
+
+    return {
+        "mode": "delta",
+        "since": since,
+        "orders": orders_payload,
+        "items": items_payload,
+        "removedOrderIds": sorted(removed),
+        "stations": station_payload,
+        "capacity": capacity_snapshot,
+        "eventCursor": cursor,
+        "generatedAt": now_ts.isoformat(),
+    }
+
+
 @require_http_methods(["GET"])  # queue
 @rate_limit(limit=60, window_seconds=60)
 def order_queue(request):
@@ -1007,9 +1514,19 @@ def order_queue(request):
     try:
         from .models import Order, OrderItem, OrderEvent
 
+        now_ts = dj_tz.now()
+        since_raw = (request.GET.get("since") or request.GET.get("eventCursor") or "").strip()
+        # Anything but an integer cursor (e.g. an old timestamp) gets a snapshot
+        if since_raw.isdigit():
+            delta = _order_queue_delta(int(since_raw), now_ts=now_ts)
+            if delta is not None:
+                return JsonResponse({"success": True, "data": delta})
+
         station_lookup, stations = _load_station_lookup()
         active_statuses = set(ORDER_ACTIVE_STATUSES)
-        now_ts = dj_tz.now()
+
+        # Read the cursor before the scan so events racing the snapshot are replayed by the next delta
+        event_cursor = OrderEvent.objects.aggregate(last=Max("seq"))["last"] or 0
 
         qs = (
             Order.objects.filter(status__in=active_statuses)
@@ -1020,6 +1537,7 @@ def order_queue(request):
         orders_payload = []
         station_items_map: dict[str, list] = defaultdict(list)
         station_quantity: dict[str, int] = defaultdict(int)
+        station_ready_quantity: dict[str, int] = defaultdict(int)
         smart_batch_candidates: dict[tuple[str, str], list] = defaultdict(list)
         status_counts: dict[str, int] = defaultdict(int)
         channel_counts: dict[str, int] = defaultdict(int)
@@ -1077,29 +1595,11 @@ def order_queue(request):
                 station_code = safe_item["stationCode"] or DEFAULT_EXPO_STATION_CODE
                 station_quantity[station_code] += safe_item["quantity"]
 
+                if state in ITEM_READY_STATES:
+                    station_ready_quantity[station_code] += safe_item["quantity"]
+
                 station_items_map[station_code].append(
-                    {
-                        "itemId": safe_item["id"],
-                        "orderId": safe["id"],
-                        "orderNumber": safe["orderNumber"],
-                        "state": state,
-                        "stateDisplay": safe_item["stateDisplay"],
-                        "quantity": safe_item["quantity"],
-                        "menuItemId": safe_item["menuItemId"],
-                        "name": safe_item["name"],
-                        "secondsInState": safe_item["secondsInState"],
-                        "ageSeconds": safe_item["ageSeconds"],
-                        "priority": safe_item["priority"],
-                        "channel": safe["channel"],
-                        "orderStatus": safe["canonicalStatus"],
-                        "promisedTime": safe["promisedTime"],
-                        "lateBySeconds": safe["lateBySeconds"],
-                        "isLate": safe["lateBySeconds"] > 0 and canonical not in ORDER_TERMINAL_STATUSES,
-                        "allergens": safe_item["allergens"],
-                        "modifiers": safe_item["modifiers"],
-                        "notes": safe_item["notes"],
-                        "customerName": safe["customerName"],
-                    }
+                    _queue_station_entry(safe, safe_item)
                 )
 
                 if state in {"queued", "firing"} and item_obj is not None:
@@ -1280,12 +1780,19 @@ def order_queue(request):
             ),
         }
 
-        event_cursor = (
-            OrderEvent.objects.filter(order__status__in=active_statuses)
-            .order_by("-created_at")
-            .values_list("created_at", flat=True)
-            .first()
-        )
+        try:
+            _sync_station_loads(
+                {
+                    code: (
+                        len(entries),
+                        station_quantity.get(code, 0),
+                        station_ready_quantity.get(code, 0),
+                    )
+                    for code, entries in station_items_map.items()
+                }
+            )
+        except Exception:
+            logger.exception("Failed to sync station queue loads")
 
         summary = {
             "totalOrders": len(orders_payload),
@@ -1303,6 +1810,7 @@ def order_queue(request):
             {
                 "success": True,
                 "data": {
+                    "mode": "snapshot",
                     "orders": orders_payload,
                     "stations": station_payload,
                     "summary": summary,
@@ -1312,9 +1820,7 @@ def order_queue(request):
                         "pending": ready_for_handoff,
                         "lateOrders": late_orders,
                     },
-                    "eventCursor": event_cursor.isoformat()
-                    if event_cursor
-                    else None,
+                    "eventCursor": event_cursor,
                     "generatedAt": now_ts.isoformat(),
                 },
             }
@@ -1402,6 +1908,7 @@ def order_item_state(request, oid, item_id):
             return JsonResponse({"success": False, "message": "Invalid item state"}, status=400)
 
         previous_state = canonical_item_state(item.state)
+        previous_station_code = item.station_code or DEFAULT_EXPO_STATION_CODE
         state_changed = False
 
         if new_state_raw:
@@ -1565,6 +2072,7 @@ def order_item_state(request, oid, item_id):
             payload={
                 "manual": payload.get("manual", True),
                 "notes": payload.get("notes") or "",
+                "previousStationCode": previous_station_code,
             },
         )
 
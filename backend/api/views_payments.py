@@ -15,7 +15,6 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone as dj_timezone
 from django.db.utils import OperationalError, ProgrammingError
-from django.db.models import F
 from decimal import Decimal
 
 from .views_common import _actor_from_request, _has_permission, _client_meta, _require_admin_or_manager, rate_limit
@@ -161,6 +160,7 @@ def order_payment(request, order_id: str):
         )
         # Update the order's payment method for consistency
         order_number = ""
+        o = None
         try:
             o = Order.objects.filter(id=order_id).select_related("placed_by").first()
             if o:
@@ -196,9 +196,14 @@ def order_payment(request, order_id: str):
             reward_user_id = getattr(actor, "id", None)
         if reward_user_id:
             try:
-                from .models import AppUser
-                AppUser.objects.filter(id=reward_user_id).update(
-                    credit_points=F("credit_points") + LOYALTY_EARN_PER_PURCHASE
+                from .loyalty_services import earn
+
+                earn(
+                    reward_user_id,
+                    LOYALTY_EARN_PER_PURCHASE,
+                    order=o,
+                    reason="Purchase",
+                    idempotency_key=f"payment:{p.id}",
                 )
             except Exception:
                 logger.exception("Failed to award credit points for purchase")
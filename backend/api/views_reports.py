@@ -7,12 +7,19 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 import logging
-from collections import defaultdict
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone as dj_tz
 from django.db.models import Sum, Count, Q
 
+from .report_rollups import (
+    daily_series,
+    floor_day,
+    hourly_series,
+    item_sales,
+    sales_by_category as sales_by_category_rows,
+    top_items,
+)
 from .views_common import _actor_from_request, _has_permission
 
 
@@ -54,7 +61,7 @@ def reports_dashboard(request):
         return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
 
     try:
-        from .models import Order, OrderItem, PaymentTransaction, MenuItem
+        from .models import Order, PaymentTransaction
 
         r = request.GET.get("range", "today")
         start, end = _parse_range(r)
@@ -131,184 +138,50 @@ def reports_dashboard(request):
             order_count_change = ((order_count - order_count_yesterday) / order_count_yesterday) * 100
 
         # Sales by time - hourly for today, daily for multi-day ranges
-        # Use Order.created_at for accurate sale timing (when order was placed)
-        # Send ISO timestamps to frontend for timezone conversion
-        sales_by_time = []
-        sales_by_time_yesterday = []
-
-        # Determine if this is a single-day or multi-day range
+        # Bucketed by Order.created_at in the local timezone; closed hours come from
+        # SalesRollup and only the current hour is computed live (see report_rollups)
         time_diff = (end - start).total_seconds() / 3600  # hours
 
         if time_diff <= 24:  # Single day - use hourly breakdown
-            for hour in range(0, 24):  # Every 1 hour
-                # Create timezone-aware boundaries for accurate comparison
-                hour_start = start.replace(hour=hour, minute=0, second=0, microsecond=0)
-                hour_end = hour_start + timedelta(hours=1)
-
-                # Aggregate by Order.total_amount for actual sale values
-                # Filter out cancelled/voided orders for accurate reporting
-                hour_total = Order.objects.filter(
-                    created_at__gte=hour_start,
-                    created_at__lt=hour_end
-                ).exclude(
-                    status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-                ).aggregate(total=Sum("total_amount"))["total"] or 0
-
-                # Send ISO timestamp for frontend timezone conversion
-                sales_by_time.append({
-                    "time": hour_start.isoformat(),  # ISO format with timezone info
-                    "amount": float(hour_total)
-                })
-
-            # Yesterday's sales for comparison (same hourly breakdown)
-            for hour in range(0, 24):  # Every 1 hour
-                hour_start = yesterday_start.replace(hour=hour, minute=0, second=0, microsecond=0)
-                hour_end = hour_start + timedelta(hours=1)
-
-                hour_total = Order.objects.filter(
-                    created_at__gte=hour_start,
-                    created_at__lt=hour_end
-                ).exclude(
-                    status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-                ).aggregate(total=Sum("total_amount"))["total"] or 0
-
-                sales_by_time_yesterday.append({
-                    "time": hour_start.isoformat(),
-                    "amount": float(hour_total)
-                })
+            sales_by_time = hourly_series(floor_day(start), 24)
+            sales_by_time_yesterday = hourly_series(floor_day(yesterday_start), 24)
         else:  # Multi-day range - use daily breakdown
-            # Calculate number of days in range
             num_days = int((end - start).total_seconds() / 86400) + 1
+            sales_by_time = daily_series(start, num_days)
+            # For comparison, the previous period (same number of days before)
+            sales_by_time_yesterday = daily_series(start - timedelta(days=num_days), num_days)
 
-            # Get daily sales for the selected range
-            for day_offset in range(num_days):
-                day_start = start + timedelta(days=day_offset)
-                # Ensure we're working with start of day in local timezone
-                local_day_start = dj_tz.localtime(day_start)
-                day_start_normalized = local_day_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_start_aware = dj_tz.make_aware(day_start_normalized.replace(tzinfo=None), dj_tz.get_current_timezone())
-                day_end = day_start_aware + timedelta(days=1)
-
-                day_total = Order.objects.filter(
-                    created_at__gte=day_start_aware,
-                    created_at__lt=day_end
-                ).exclude(
-                    status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-                ).aggregate(total=Sum("total_amount"))["total"] or 0
-
-                sales_by_time.append({
-                    "time": day_start_aware.isoformat(),
-                    "amount": float(day_total)
-                })
-
-            # For comparison, get the previous period (same number of days before)
-            comparison_start = start - timedelta(days=num_days)
-            for day_offset in range(num_days):
-                day_start = comparison_start + timedelta(days=day_offset)
-                local_day_start = dj_tz.localtime(day_start)
-                day_start_normalized = local_day_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_start_aware = dj_tz.make_aware(day_start_normalized.replace(tzinfo=None), dj_tz.get_current_timezone())
-                day_end = day_start_aware + timedelta(days=1)
-
-                day_total = Order.objects.filter(
-                    created_at__gte=day_start_aware,
-                    created_at__lt=day_end
-                ).exclude(
-                    status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-                ).aggregate(total=Sum("total_amount"))["total"] or 0
-
-                sales_by_time_yesterday.append({
-                    "time": day_start_aware.isoformat(),
-                    "amount": float(day_total)
-                })
-
-        # Sales by category (from menu items in orders)
+        # Sales by category and popular items, from the item-sales rollup
         # Include all valid order statuses except cancelled/voided
-        category_sales = defaultdict(float)
-        order_items = OrderItem.objects.filter(
-            order__created_at__gte=start,
-            order__created_at__lte=end
-        ).exclude(
-            order__status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-        ).select_related('menu_item')
-
-        for item in order_items:
-            # Only count items with non-empty categories
-            category = getattr(item, 'category', None)
-            if category and category.strip():
-                category_sales[category] += float(item.price * item.quantity)
-
-        # Convert to list format, filter out any zero amounts
-        sales_by_category = [
-            {"category": cat, "amount": amount}
-            for cat, amount in category_sales.items()
-            if amount > 0
-        ]
-
-        # Yesterday's sales by category for comparison
-        category_sales_yesterday = defaultdict(float)
-        order_items_yesterday = OrderItem.objects.filter(
-            order__created_at__gte=yesterday_start,
-            order__created_at__lte=yesterday_end
-        ).exclude(
-            order__status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-        ).select_related('menu_item')
-
-        for item in order_items_yesterday:
-            category = getattr(item, 'category', None)
-            if category and category.strip():
-                category_sales_yesterday[category] += float(item.price * item.quantity)
-
-        sales_by_category_yesterday = [
-            {"category": cat, "amount": amount}
-            for cat, amount in category_sales_yesterday.items()
-            if amount > 0
-        ]
-
-        # Popular items (most ordered today)
-        # Include all valid orders except cancelled/voided
-        popular_items_data = OrderItem.objects.filter(
-            order__created_at__gte=start,
-            order__created_at__lte=end
-        ).exclude(
-            order__status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-        ).values('item_name').annotate(
-            count=Sum('quantity')
-        ).order_by('-count')[:5]
-
+        items_today = item_sales(start, end)
+        items_yesterday = item_sales(yesterday_start, yesterday_end)
+        sales_by_category = sales_by_category_rows(items_today)
+        sales_by_category_yesterday = sales_by_category_rows(items_yesterday)
         popular_items = [
-            {"name": item["item_name"], "count": item["count"]}
-            for item in popular_items_data
+            {"name": row["name"], "count": row["quantity"]} for row in top_items(items_today, 5)
         ]
-
-        # Yesterday's popular items for comparison
-        popular_items_yesterday_data = OrderItem.objects.filter(
-            order__created_at__gte=yesterday_start,
-            order__created_at__lte=yesterday_end
-        ).exclude(
-            order__status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-        ).values('item_name').annotate(
-            count=Sum('quantity')
-        ).order_by('-count')[:5]
-
         popular_items_yesterday = [
-            {"name": item["item_name"], "count": item["count"]}
-            for item in popular_items_yesterday_data
+            {"name": row["name"], "count": row["quantity"]} for row in top_items(items_yesterday, 5)
         ]
 
         # Recent sales (last 10 completed orders)
-        recent_orders = Order.objects.filter(
+        recent_orders = list(Order.objects.filter(
             created_at__gte=start,
             created_at__lte=end
         ).exclude(
             status__in=[Order.STATUS_CANCELLED, Order.STATUS_VOIDED]
-        ).order_by('-created_at')[:10]
+        ).order_by('-created_at')[:10])
+
+        # Payment method from each order's first payment, in one lookup
+        payment_methods = {}
+        for order_id, method in PaymentTransaction.objects.filter(
+            order_id__in=[o.order_number for o in recent_orders]
+        ).order_by('order_id', 'created_at').values_list('order_id', 'method'):
+            payment_methods.setdefault(order_id, method)
 
         recent_sales = []
         for order in recent_orders:
-            # Get payment method from associated payment
-            payment = PaymentTransaction.objects.filter(order_id=order.order_number).first()
-            payment_method = payment.method if payment else order.payment_method or "cash"
+            payment_method = payment_methods.get(order.order_number) or order.payment_method or "cash"
 
             recent_sales.append({
                 "id": order.order_number,
@@ -362,11 +235,14 @@ def reports_sales(request):
         by_method = (
             qs.values("method").annotate(total=Sum("amount")).order_by()
         )
+        items = item_sales(start, end)
         return JsonResponse({
             "success": True,
             "data": {
                 "total": float(total or 0),
                 "byMethod": {row["method"]: float(row["total"] or 0) for row in by_method},
+                "byCategory": sales_by_category_rows(items),
+                "topItems": top_items(items, 10),
                 "range": {"from": start.isoformat(), "to": end.isoformat()},
             },
         })
@@ -375,6 +251,38 @@ def reports_sales(request):
         return JsonResponse({"success": False, "message": "Unable to generate sales report"}, status=500)
 
 
+@require_http_methods(["GET"])  # /reports/top-items
+def reports_top_items(request):
+    """Best-selling menu items for a range: ?range=&limit=&by=quantity|revenue&category=."""
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    if not _has_permission(actor, "reports.sales.view"):
+        return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
+    try:
+        start, end = _parse_range(request.GET.get("range"))
+        try:
+            limit = max(1, min(100, int(request.GET.get("limit") or 10)))
+        except (TypeError, ValueError):
+            limit = 10
+        by = "revenue" if (request.GET.get("by") or "").lower() == "revenue" else "quantity"
+        rows = item_sales(start, end)
+        category = (request.GET.get("category") or "").strip()
+        if category:
+            rows = [row for row in rows if (row["category"] or "").strip().lower() == category.lower()]
+        return JsonResponse({
+            "success": True,
+            "data": {
+                "items": top_items(rows, limit, by),
+                "by": by,
+                "range": {"from": start.isoformat(), "to": end.isoformat()},
+            },
+        })
+    except Exception:
+        logger.exception("Failed to generate top items report")
+        return JsonResponse({"success": False, "message": "Unable to generate top items report"}, status=500)
+
+
 @require_http_methods(["GET"])  # /reports/inventory
 def reports_inventory(request):
     actor, err = _actor_from_request(request)
@@ -7,10 +7,17 @@ from django.views.decorators.http import require_http_methods
 from django.db.utils import OperationalError, ProgrammingError
 from django.db import transaction
 from django.conf import settings
-import jwt
 from django.contrib.auth.hashers import make_password
 
-from .views_common import USERS, _paginate, _maybe_seed_from_memory, _safe_user_from_db, _now_iso, DEFAULT_ROLE_PERMISSIONS
+from .views_common import (
+    USERS,
+    _actor_from_request,
+    _paginate,
+    _maybe_seed_from_memory,
+    _safe_user_from_db,
+    _now_iso,
+    DEFAULT_ROLE_PERMISSIONS,
+)
 
 
 ROLES = {
@@ -35,25 +42,19 @@ ROLES = {
 }
 
 
+def _actor_role(actor) -> str:
+    if isinstance(actor, dict):
+        return (actor.get("role") or "").lower()
+    return (getattr(actor, "role", "") or "").lower()
+
+
 @require_http_methods(["GET", "POST"]) 
 def users(request):
     # For any access to the users collection, require Admin role
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1].strip()
-    try:
-        tp = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except Exception:
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    # Determine actor role (from DB if available; otherwise rely on token claims if present)
-    actor_role = None
-    try:
-        from .models import AppUser
-        current = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        actor_role = (current.role or "").lower() if current else None
-    except Exception:
-        actor_role = (tp.get("role") or "").lower()
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    actor_role = _actor_role(actor)
     if actor_role != "admin":
         return JsonResponse(
             {
@@ -141,14 +142,8 @@ def users(request):
     except Exception:
         payload = {}
     try:
-        # Authorization: only admin can create users
-        # (Auth already decoded above; tp set. Verify actor is admin.)
-        try:
-            from .models import AppUser
-            current = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        except Exception:
-            current = None
-        if not current or (current.role or "").lower() != "admin":
+        # Authorization: only admin can create users (actor resolved above)
+        if actor_role != "admin":
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
 
         from .models import AppUser
@@ -222,16 +217,10 @@ def user_detail(request, user_id):
         from .models import AppUser
         _maybe_seed_from_memory()
         # Require admin for all operations in user management, including viewing details
-        auth = request.META.get("HTTP_AUTHORIZATION", "")
-        if not auth.startswith("Bearer "):
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            tp = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        except Exception:
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        actor = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        if not actor or (actor.role or "").lower() != "admin":
+        actor, err = _actor_from_request(request)
+        if not actor:
+            return err
+        if _actor_role(actor) != "admin":
             return JsonResponse(
                 {
                     "success": False,
@@ -309,16 +298,10 @@ def user_status(request, user_id):
         from .models import AppUser
         _maybe_seed_from_memory()
         # Only admin can change status
-        auth = request.META.get("HTTP_AUTHORIZATION", "")
-        if not auth.startswith("Bearer "):
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            tp = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        except Exception:
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        actor = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        if not actor or (actor.role or "").lower() != "admin":
+        actor, err = _actor_from_request(request)
+        if not actor:
+            return err
+        if _actor_role(actor) != "admin":
             return JsonResponse(
                 {
                     "success": False,
@@ -369,16 +352,10 @@ def user_role(request, user_id):
         from .models import AppUser
         _maybe_seed_from_memory()
         # Admin only
-        auth = request.META.get("HTTP_AUTHORIZATION", "")
-        if not auth.startswith("Bearer "):
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            tp = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        except Exception:
-            return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-        actor = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        if not actor or (actor.role or "").lower() != "admin":
+        actor, err = _actor_from_request(request)
+        if not actor:
+            return err
+        if _actor_role(actor) != "admin":
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
         db_user = AppUser.objects.filter(id=user_id).first()
         if not db_user:
@@ -427,18 +404,11 @@ def user_role_config(request, value):
     except Exception:
         payload = {}
     # Admin only can change role configs
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    try:
-        token = auth.split(" ", 1)[1].strip()
-        tp = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        from .models import AppUser
-        actor = AppUser.objects.filter(email=(tp.get("email") or "").lower()).first()
-        if not actor or (actor.role or "").lower() != "admin":
-            return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
-    except Exception:
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
+    actor, err = _actor_from_request(request)
+    if not actor:
+        return err
+    if _actor_role(actor) != "admin":
+        return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
     role_value = (value or payload.get("value") or "").lower()
     if not role_value:
         return JsonResponse({"success": False, "message": "Missing role value"}, status=400)
@@ -3,10 +3,8 @@
 import json
 from django.http import JsonResponse, FileResponse
 from django.views.decorators.http import require_http_methods
-from django.conf import settings
 from django.db.utils import OperationalError, ProgrammingError
 from django.utils import timezone as dj_timezone
-import jwt
 
 from .views_common import (
     _decode_verify_token,
@@ -18,6 +16,7 @@ from .views_common import (
     USERS,
     _require_admin_or_manager,
     _actor_from_request,
+    _authenticate_request,
     _has_permission,
 )
 from .emails import (
@@ -154,20 +153,14 @@ def verify_resend_token(request):
 
 @require_http_methods(["GET"]) 
 def verify_requests(request):
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except Exception:
+    reviewer = _authenticate_request(request)
+    if not reviewer:
         return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
 
     try:
         from .models import AppUser, AccessRequest
-        reviewer = AppUser.objects.filter(email=(payload.get("email") or "").lower()).first()
         # Require manager/admin role and explicit permission
-        if not reviewer or not _require_admin_or_manager(reviewer) or not _has_permission(reviewer, "verify.review"):
+        if isinstance(reviewer, dict) or not _require_admin_or_manager(reviewer) or not _has_permission(reviewer, "verify.review"):
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
 
         status_q = (request.GET.get("status") or "pending").lower()
@@ -222,20 +215,14 @@ def verify_requests(request):
 
 @require_http_methods(["GET"]) 
 def verify_headshot(request, request_id):
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except Exception:
+    reviewer = _authenticate_request(request)
+    if not reviewer:
         return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
 
     try:
         from .models import AppUser, AccessRequest
-        reviewer = AppUser.objects.filter(email=(payload.get("email") or "").lower()).first()
         # Require manager/admin role and explicit permission
-        if not reviewer or not _require_admin_or_manager(reviewer) or not _has_permission(reviewer, "verify.review"):
+        if isinstance(reviewer, dict) or not _require_admin_or_manager(reviewer) or not _has_permission(reviewer, "verify.review"):
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
 
         ar = AccessRequest.objects.filter(id=request_id).first()
@@ -261,13 +248,8 @@ def verify_approve(request):
     except Exception:
         data = {}
 
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except Exception:
+    reviewer = _authenticate_request(request)
+    if not reviewer:
         return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
 
     request_id = (data.get("requestId") or "").strip()
@@ -280,8 +262,7 @@ def verify_approve(request):
 
     try:
         from .models import AppUser, AccessRequest
-        reviewer = AppUser.objects.filter(email=(payload.get("email") or "").lower()).first()
-        if not reviewer or not _require_admin_or_manager(reviewer):
+        if isinstance(reviewer, dict) or not _require_admin_or_manager(reviewer):
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
         ar = AccessRequest.objects.filter(id=request_id).select_related("user").first()
         if not ar:
@@ -323,19 +304,13 @@ def verify_reject(request):
     request_id = (data.get("requestId") or "").strip()
     note = (data.get("note") or "").strip()
 
-    auth = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth.startswith("Bearer "):
-        return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
-    token = auth.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-    except Exception:
+    reviewer = _authenticate_request(request)
+    if not reviewer:
         return JsonResponse({"success": False, "message": "Unauthorized"}, status=401)
 
     try:
         from .models import AppUser, AccessRequest
-        reviewer = AppUser.objects.filter(email=(payload.get("email") or "").lower()).first()
-        if not reviewer or not _require_admin_or_manager(reviewer):
+        if isinstance(reviewer, dict) or not _require_admin_or_manager(reviewer):
             return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
         ar = AccessRequest.objects.filter(id=request_id).select_related("user").first()
         if not ar:
@@ -36,16 +36,32 @@ app.conf.update(
 app.conf.beat_schedule = {
     'process-notification-outbox': {
         'task': 'api.tasks.process_notification_outbox',
-        'schedule': crontab(minute='*/2'),  # Every 2 minutes
+        # Seconds; runs may overlap safely (rows are claimed with SKIP LOCKED)
+        'schedule': float(os.getenv('DJANGO_NOTIFICATION_OUTBOX_INTERVAL_SECONDS', '30')),
     },
     'auto-advance-orders': {
         'task': 'api.tasks.auto_advance_orders',
-        'schedule': 10.0,  # Every 10 seconds
+        # Safety sweep for lost timers only; timers fire on their own and re-arm
+        # for rows they skip (api.auto_advance). Use 10 with
+        # DJANGO_AUTO_ADVANCE_SCHEDULER=0 to poll as before
+        'schedule': float(os.getenv('DJANGO_AUTO_ADVANCE_SWEEP_SECONDS', '60')),
+    },
+    'prune-realtime-events': {
+        'task': 'api.tasks.prune_realtime_events',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
     },
     'cleanup-old-notifications': {
         'task': 'api.tasks.cleanup_old_notifications',
         'schedule': crontab(hour=2, minute=0),  # Daily at 2 AM
     },
+    'rollup-sales': {
+        'task': 'api.tasks.rollup_sales',
+        'schedule': crontab(minute='*/10'),  # Every 10 minutes
+    },
+    'snapshot-stock-balances': {
+        'task': 'api.tasks.snapshot_stock_balances',
+        'schedule': crontab(hour=3, minute=0),  # Daily at 3 AM
+    },
 }
 
 
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from .settings_components import get_database, get_cors, get_jwt, get_email, get_channel_layers
+from .settings_components import get_database, get_cors, get_jwt, get_email, get_channel_layers, get_caches
 try:
     from dotenv import load_dotenv  # type: ignore
 except Exception:
@@ -101,6 +101,63 @@ DATABASES = get_database(BASE_DIR)
 ASGI_APPLICATION = "config.asgi.application"
 CHANNEL_LAYERS = get_channel_layers()
 
+# Cache (shared across workers when REDIS_URL is set)
+CACHES = get_caches()
+
+# Rate limiting / login lockouts (see api.utils_ratelimit for available backends)
+RATE_LIMIT_BACKEND = os.getenv("DJANGO_RATE_LIMIT_BACKEND", "api.utils_ratelimit.CacheRateLimitBackend")
+RATE_LIMIT_CACHE_ALIAS = os.getenv("DJANGO_RATE_LIMIT_CACHE_ALIAS", "default")
+RATE_LIMIT_REDIS_URL = os.getenv("DJANGO_RATE_LIMIT_REDIS_URL", "")
+
+# Reports: hours of SalesRollup re-computed by each api.tasks.rollup_sales run
+SALES_ROLLUP_REFRESH_HOURS = int(os.getenv("DJANGO_SALES_ROLLUP_REFRESH_HOURS", "48"))
+
+# Notifications: run admin fan-outs in a Celery task after commit (falls back
+# to inline bulk writes if enqueueing fails) and cache role audiences per process
+# until a role change bumps the shared version in the Django cache
+NOTIFICATION_FANOUT_ASYNC = os.getenv("DJANGO_NOTIFICATION_FANOUT_ASYNC", "1").lower() in {"1", "true", "yes", "on"}
+NOTIFICATION_AUDIENCE_CACHE_SECONDS = int(os.getenv("DJANGO_NOTIFICATION_AUDIENCE_CACHE_SECONDS", "300"))
+# Inbox cache (api.notification_inbox): unread/total counts and the newest
+# NOTIFICATION_INBOX_WINDOW items per user, invalidated by version bumps on writes
+NOTIFICATION_INBOX_CACHE_SECONDS = int(os.getenv("DJANGO_NOTIFICATION_INBOX_CACHE_SECONDS", "300"))
+NOTIFICATION_INBOX_WINDOW = int(os.getenv("DJANGO_NOTIFICATION_INBOX_WINDOW", "20"))
+
+# Realtime events (see api.events): publish after commit through a bounded
+# background queue; repeated per-order item events within the window are merged
+EVENT_BUS_ASYNC = os.getenv("DJANGO_EVENT_BUS_ASYNC", "1").lower() in {"1", "true", "yes", "on"}
+EVENT_BUS_MAX_QUEUE = int(os.getenv("DJANGO_EVENT_BUS_MAX_QUEUE", "1000"))
+EVENT_BUS_COALESCE_MS = int(os.getenv("DJANGO_EVENT_BUS_COALESCE_MS", "100"))
+
+# Replay journal for reconnecting websockets (?since=<event id>); older or larger
+# gaps make the client reload. Pruned by the prune-realtime-events beat task
+EVENT_REPLAY_ENABLED = os.getenv("DJANGO_EVENT_REPLAY_ENABLED", "1").lower() in {"1", "true", "yes", "on"}
+EVENT_REPLAY_MAX_EVENTS = int(os.getenv("DJANGO_EVENT_REPLAY_MAX_EVENTS", "500"))
+EVENT_REPLAY_RETENTION_MINUTES = int(os.getenv("DJANGO_EVENT_REPLAY_RETENTION_MINUTES", "120"))
+
+# Order auto-advance timers (see api.auto_advance): one Celery ETA task per
+# tick-sized slot, due orders advanced in batches. The fallback sweep interval
+# is read from DJANGO_AUTO_ADVANCE_SWEEP_SECONDS in config/celery.py
+AUTO_ADVANCE_SCHEDULER = os.getenv("DJANGO_AUTO_ADVANCE_SCHEDULER", "1").lower() in {"1", "true", "yes", "on"}
+AUTO_ADVANCE_TICK_MS = int(os.getenv("DJANGO_AUTO_ADVANCE_TICK_MS", "500"))
+AUTO_ADVANCE_BATCH_SIZE = int(os.getenv("DJANGO_AUTO_ADVANCE_BATCH_SIZE", "200"))
+
+# Notification outbox dispatcher (see api.outbox_dispatcher). The beat interval
+# itself is read from DJANGO_NOTIFICATION_OUTBOX_INTERVAL_SECONDS in config/celery.py
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_BATCH_SIZE", "100"))
+NOTIFICATION_OUTBOX_MAX_BATCHES = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_MAX_BATCHES", "10"))
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
+NOTIFICATION_OUTBOX_BACKOFF_SECONDS = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_BACKOFF_SECONDS", "30"))
+NOTIFICATION_OUTBOX_BACKOFF_MAX_SECONDS = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+NOTIFICATION_OUTBOX_LEASE_SECONDS = int(os.getenv("DJANGO_NOTIFICATION_OUTBOX_LEASE_SECONDS", "300"))
+
+# Face recognition inference pool (see api.face_inference)
+FACE_INFERENCE_PRELOAD = os.getenv("DJANGO_FACE_PRELOAD", "0").lower() in {"1", "true", "yes", "on"}
+FACE_INFERENCE_MODELS = [m.strip() for m in os.getenv("DJANGO_FACE_MODELS", "Facenet512").split(",") if m.strip()]
+FACE_INFERENCE_DETECTOR = os.getenv("DJANGO_FACE_DETECTOR", "opencv")
+FACE_INFERENCE_WORKERS = int(os.getenv("DJANGO_FACE_WORKERS", "1"))
+FACE_INFERENCE_MAX_QUEUE = int(os.getenv("DJANGO_FACE_MAX_QUEUE", "4"))
+FACE_INFERENCE_TIMEOUT_SECONDS = float(os.getenv("DJANGO_FACE_TIMEOUT_SECONDS", "20"))
+
 # Static files (optional for API-only)
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -157,11 +214,29 @@ JWT_EXP_SECONDS = _jwt["JWT_EXP_SECONDS"]
 JWT_REMEMBER_EXP_SECONDS = _jwt["JWT_REMEMBER_EXP_SECONDS"]
 JWT_REFRESH_EXP_SECONDS = _jwt["JWT_REFRESH_EXP_SECONDS"]
 JWT_REFRESH_REMEMBER_EXP_SECONDS = _jwt["JWT_REFRESH_REMEMBER_EXP_SECONDS"]
+# Per-process cache of resolved request actors (0 disables); saves drop entries immediately
+AUTH_ACTOR_CACHE_SECONDS = int(os.getenv("DJANGO_AUTH_ACTOR_CACHE_SECONDS", "30"))
 
 # Google OAuth
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "").strip()
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "").strip()
 
+# Menu catalog cache (api.menu_catalog): rendered list responses kept per
+# process for the current catalog version; the version itself is cached for
+# MENU_CATALOG_VERSION_TTL seconds (bounds staleness without a shared cache)
+MENU_CATALOG_CACHE_ENTRIES = int(os.getenv("DJANGO_MENU_CATALOG_CACHE_ENTRIES", "128"))
+MENU_CATALOG_VERSION_TTL = int(os.getenv("DJANGO_MENU_CATALOG_VERSION_TTL", "300"))
+# Menu search (api.menu_search): in-process index rebuilt on catalog version
+# change; set MENU_SEARCH_INDEX off to fall back to icontains filters
+MENU_SEARCH_INDEX = os.getenv("DJANGO_MENU_SEARCH_INDEX", "1").lower() in {"1", "true", "yes", "on"}
+MENU_SEARCH_MAX_RESULTS = int(os.getenv("DJANGO_MENU_SEARCH_MAX_RESULTS", "200"))
+# Menu photo derivatives (api.menu_images): rendered by a Celery task after the
+# upload commits, or by MENU_IMAGE_WORKERS threads when Celery is unavailable
+MENU_IMAGE_ASYNC = os.getenv("DJANGO_MENU_IMAGE_ASYNC", "1").lower() in {"1", "true", "yes", "on"}
+MENU_IMAGE_WORKERS = int(os.getenv("DJANGO_MENU_IMAGE_WORKERS", "2"))
+MENU_IMAGE_WEBP_QUALITY = int(os.getenv("DJANGO_MENU_IMAGE_WEBP_QUALITY", "80"))
+MENU_IMAGE_JPEG_QUALITY = int(os.getenv("DJANGO_MENU_IMAGE_JPEG_QUALITY", "82"))
+
 # Media (public) and Private Media (not served directly)
 # At the bottom of settings.py
 MEDIA_URL = '/media/'
@@ -215,6 +290,15 @@ EMAIL_USE_SSL = _email["EMAIL_USE_SSL"]
 ADMINS = _email["ADMINS"]
 EMAIL_SUBJECT_PREFIX = _email["EMAIL_SUBJECT_PREFIX"]
 
+# api.emails queue messages in-process and send them after commit from one
+# background thread over a reused connection (see api.mail_queue)
+MAIL_QUEUE_ASYNC = os.getenv("DJANGO_MAIL_QUEUE_ASYNC", "1").lower() in {"1", "true", "yes", "on"}
+MAIL_QUEUE_MAX_SIZE = int(os.getenv("DJANGO_MAIL_QUEUE_MAX_SIZE", "1000"))
+MAIL_QUEUE_BATCH_SIZE = int(os.getenv("DJANGO_MAIL_QUEUE_BATCH_SIZE", "50"))
+MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("DJANGO_MAIL_QUEUE_MAX_ATTEMPTS", "3"))
+MAIL_QUEUE_RETRY_SECONDS = float(os.getenv("DJANGO_MAIL_QUEUE_RETRY_SECONDS", "5"))
+MAIL_QUEUE_IDLE_SECONDS = float(os.getenv("DJANGO_MAIL_QUEUE_IDLE_SECONDS", "30"))
+
 # Frontend base URL for building links in emails (password reset, verification)
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:8080")
 
@@ -222,6 +306,13 @@ FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:8080")
 WEBPUSH_VAPID_PUBLIC_KEY = os.getenv("WEBPUSH_VAPID_PUBLIC_KEY", "").strip()
 WEBPUSH_VAPID_PRIVATE_KEY = os.getenv("WEBPUSH_VAPID_PRIVATE_KEY", "").strip()
 WEBPUSH_VAPID_SUBJECT = os.getenv("WEBPUSH_VAPID_SUBJECT", "mailto:josephformentera2@gmail.com")
+# Delivery pool (see api.push_delivery): worker threads sharing one keep-alive
+# session, per push-service host in-flight cap and req/s limit (0 = unlimited)
+WEBPUSH_WORKERS = int(os.getenv("DJANGO_WEBPUSH_WORKERS", "16"))
+WEBPUSH_PER_HOST_CONCURRENCY = int(os.getenv("DJANGO_WEBPUSH_PER_HOST_CONCURRENCY", "8"))
+WEBPUSH_PER_HOST_RATE = float(os.getenv("DJANGO_WEBPUSH_PER_HOST_RATE", "0"))
+WEBPUSH_TIMEOUT_SECONDS = float(os.getenv("DJANGO_WEBPUSH_TIMEOUT_SECONDS", "10"))
+WEBPUSH_TTL_SECONDS = int(os.getenv("DJANGO_WEBPUSH_TTL_SECONDS", "0"))
 
 # Optional: simple guard to fail early if you forget the keys in prod
 if not DEBUG:
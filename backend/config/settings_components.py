@@ -148,9 +148,29 @@ def get_channel_layers():
     redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
     return {
         "default": {
-            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            # RedisChannelLayer plus group_send_many, used by api.events to send an event to all its groups at once
+            "BACKEND": "api.channel_layers.GroupBatchRedisChannelLayer",
             "CONFIG": {
                 "hosts": [redis_url],
             },
         }
     }
+
+
+def get_caches():
+    """Use Redis for the shared cache when configured; otherwise a per-process cache."""
+    redis_url = os.getenv("DJANGO_CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+    if redis_url:
+        return {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": redis_url,
+                "KEY_PREFIX": "technomart",
+            }
+        }
+    return {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "technomart",
+        }
+    }
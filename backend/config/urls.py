@@ -4,9 +4,15 @@ from django.views.generic import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api import views_orders as api_order_views
+
 urlpatterns = [
     path('api/feedback/', include('feedback.urls')),
 
+    # POS status transitions (JWT, data envelope) must win over the legacy
+    # session-only orders.urls route mounted under the same api/orders/ prefix
+    path('api/orders/<uuid:oid>/status', api_order_views.order_status),
+
      path('api/orders/', include('orders.urls')),  # current working route
     path('orders/', include('orders.urls')),      # optional, add this for /orders/
      path('api/orders/', include('orders.urls')),  # 👈 this is key
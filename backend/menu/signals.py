@@ -1,12 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import MenuItem
-from notifications.models import Notification  # make sure you have this model
+from api.notification_inbox import broadcast
 
 @receiver(post_save, sender=MenuItem)
 def notify_menu_change(sender, instance, created, **kwargs):
     title = "New Menu Item" if created else "Menu Updated"
     status = "added" if created else ("sold out" if not instance.available else "updated")
     message = f"{instance.name} was {status}."
-    
-    Notification.objects.create(title=title, message=message)
+
+    broadcast("all", title=title, message=message, meta={"menu_item_id": str(instance.id)})
@@ -1,16 +1,30 @@
+from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from api import menu_catalog
 from .models import MenuItem
 from .serializers import MenuItemSerializer
 
 
+def _menu_items_body(request, version):
+    # Rendered once per catalog version by api.menu_catalog; ?since=<version>
+    # returns {"version", "items"} with only the items changed since then
+    since = menu_catalog.parse_since(request.GET.get('since'))
+    if since is not None and version is not None and since <= version:
+        ids = menu_catalog.changed_item_ids(since, version)
+        position = {pk: i for i, pk in enumerate(ids)}
+        items = sorted(MenuItem.objects.filter(id__in=ids), key=lambda item: position[item.id])
+        data = {'version': version, 'since': since, 'items': MenuItemSerializer(items, many=True).data}
+        return JsonResponse(data)
+    items = MenuItem.objects.filter(archived=False)
+    return JsonResponse(MenuItemSerializer(items, many=True).data, safe=False)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def menu_items(request):
-    items = MenuItem.objects.filter(archived=False)
-    serializer = MenuItemSerializer(items, many=True)
-    return Response(serializer.data)
+    return menu_catalog.cached_response(request, 'menu.menu_items', lambda version: _menu_items_body(request, version))
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def menu_item_detail(request, item_id):
@@ -1,41 +1,41 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth import get_user_model
-from api.models import Notification
 from api.models import MenuItem  # assuming MenuItem is in api.models
+from api.notification_inbox import broadcast
 
-User = get_user_model()
+# Menu announcements go to everyone: stored once as a broadcast, with per-user
+# read state, instead of one Notification row per user
 
 # MenuItem created or updated
 @receiver(post_save, sender=MenuItem)
 def menuitem_post_save(sender, instance, created, **kwargs):
     if created:
         # New menu item added
-        for user in User.objects.all():
-            Notification.objects.create(
-                user=user,
-                title="New Menu Item Added",
-                message=f"{instance.name} is now available!",
-                type="new"
-            )
+        broadcast(
+            "all",
+            title="New Menu Item Added",
+            message=f"{instance.name} is now available!",
+            type="new",
+            meta={"menu_item_id": str(instance.id)},
+        )
     else:
         # Item sold out
-        if instance.quantity == 0:
-            for user in User.objects.all():
-                Notification.objects.create(
-                    user=user,
-                    title="Menu Item Sold Out",
-                    message=f"{instance.name} is now sold out!",
-                    type="soldout"
-                )
+        if getattr(instance, "quantity", None) == 0:
+            broadcast(
+                "all",
+                title="Menu Item Sold Out",
+                message=f"{instance.name} is now sold out!",
+                type="soldout",
+                meta={"menu_item_id": str(instance.id)},
+            )
 
 # MenuItem deleted
 @receiver(post_delete, sender=MenuItem)
 def menuitem_post_delete(sender, instance, **kwargs):
-    for user in User.objects.all():
-        Notification.objects.create(
-            user=user,
-            title="Menu Item Removed",
-            message=f"{instance.name} has been removed from the menu.",
-            type="deleted"
-        )
+    broadcast(
+        "all",
+        title="Menu Item Removed",
+        message=f"{instance.name} has been removed from the menu.",
+        type="deleted",
+        meta={"menu_item_id": str(instance.id)},
+    )
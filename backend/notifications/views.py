@@ -1,12 +1,34 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from api.models import Notification
+from api import notification_inbox as inbox
 from notifications.serializers import NotificationSerializer
 
+
+def _serialize(n):
+    return dict(NotificationSerializer(n).data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notifications_list(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    # Personal notifications merged with broadcasts for the user's audiences,
+    # newest first; pass X-Next-Cursor back as ?cursor= for the next page
+    try:
+        limit = max(1, min(200, int(request.query_params.get('limit') or 100)))
+    except (TypeError, ValueError):
+        limit = 100
+    token = (request.query_params.get('cursor') or '').strip()
+    cursor = inbox.decode_cursor(token) if token else None
+    if token and cursor is None:
+        return Response({'detail': 'Invalid cursor'}, status=400)
+    if cursor is None:
+        items, next_cursor, has_more = inbox.recent_page(request.user, limit, _serialize)
+    else:
+        rows, has_more = inbox.inbox_page(request.user, limit, cursor)
+        items = [_serialize(n) for n in rows]
+        next_cursor = inbox.encode_cursor(rows[-1]) if rows and has_more else None
+    response = Response(items)
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,137 @@
+"""Customer order history for the mobile app.
+
+Pages are read newest first with a keyset on ``(created_at, id)`` for the
+signed-in user, served by the ``order_placed_by_created_idx`` index on
+``(placed_by, created_at, id)``: each page is one bounded range scan plus one
+query for the page's items, however many orders the customer has placed.
+The list carries per-order summaries with their item lines (what the order
+tracking screen renders); ``order_detail`` adds payment and pricing fields
+for a single order when the customer opens it. ``status`` narrows a page to
+one tab of the tracking screen, so polling the active tab does not read the
+customer's completed history.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from django.db.models import Prefetch, Q
+
+from api.models import Order, OrderItem
+from api.notification_inbox import decode_cursor, encode_cursor
+from .utils import map_order_status
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Tabs of the tracking screen; "active" is everything else
+STATUS_GROUPS = {
+    "completed": ("completed",),
+    "cancelled": ("cancelled", "voided", "refunded"),
+}
+CLOSED_STATUSES = tuple(status for group in STATUS_GROUPS.values() for status in group)
+
+
+def _status_q(statuses) -> Q:
+    # Mobile and POS orders disagree on case ("Pending" vs "pending")
+    q = Q()
+    for status in statuses:
+        q |= Q(status__iexact=status)
+    return q
+
+
+def user_orders(user):
+    return Order.objects.filter(placed_by=user)
+
+
+def get_user_order(user, order_number: str) -> Optional[Order]:
+    """The user's order by number (unique index) with its items, or None."""
+    return user_orders(user).filter(order_number=order_number).prefetch_related("items__menu_item").first()
+
+
+def history_page(
+    user,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[Tuple[datetime, UUID]] = None,
+    status: str = "",
+) -> Tuple[List[Order], Optional[str], bool]:
+    """(orders, next_cursor, has_more) for the page after ``cursor``.
+
+    ``status`` is "active", a ``STATUS_GROUPS`` key, or empty for all orders.
+    """
+    limit = max(1, min(MAX_PAGE_SIZE, int(limit or DEFAULT_PAGE_SIZE)))
+    qs = user_orders(user)
+    if status == "active":
+        qs = qs.exclude(_status_q(CLOSED_STATUSES))
+    elif status:
+        qs = qs.filter(_status_q(STATUS_GROUPS[status]))
+    if cursor is not None:
+        created_at, ident = cursor
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=ident))
+    lines = (
+        OrderItem.objects.select_related("menu_item")
+        .only("id", "order_id", "item_name", "quantity", "price", "size", "customize", "menu_item", "menu_item__image")
+        .order_by("id")
+    )
+    rows = list(
+        qs.only("id", "order_number", "status", "total_amount", "order_type", "created_at")
+        .prefetch_related(Prefetch("items", queryset=lines))
+        .order_by("-created_at", "-id")[: limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]) if rows and has_more else None
+    return rows, next_cursor, has_more
+
+
+def _line(item) -> dict:
+    menu_item = item.menu_item
+    return {
+        "name": item.item_name,
+        "quantity": item.quantity,
+        "price": float(item.price),
+        "size": item.size,
+        "customize": item.customize,
+        "image": menu_item.image.url if menu_item is not None and menu_item.image else None,
+    }
+
+
+def order_summary(order: Order) -> dict:
+    items = list(order.items.all())
+    return {
+        "order_number": order.order_number,
+        "status": map_order_status(order.status),
+        "order_type": order.order_type,
+        "total_amount": float(order.total_amount),
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "item_count": sum(item.quantity for item in items),
+        "items": [_line(item) for item in items],
+    }
+
+
+def order_detail(order: Order) -> dict:
+    return {
+        **order_summary(order),
+        "payment_method": order.payment_method,
+        "promised_time": order.promised_time.isoformat() if order.promised_time else None,
+        "subtotal": float(order.subtotal or 0),
+        "discount": float(order.discount or 0),
+        "credit_points_used": float(order.credit_points_used or 0),
+        "items": [
+            {"menu_item_id": str(item.menu_item_id) if item.menu_item_id else None, **_line(item)}
+            for item in order.items.all()
+        ],
+    }
+
+
+__all__ = [
+    "STATUS_GROUPS",
+    "decode_cursor",
+    "get_user_order",
+    "history_page",
+    "order_detail",
+    "order_summary",
+    "user_orders",
+]
@@ -14,6 +14,7 @@ urlpatterns = [
 
     path('orders/<str:order_number>/', views.get_order, name='get-order'),
     path('orders/<str:order_number>/status/', views.order_status, name='order-status'),
+    path('orders/<str:order_number>/detail/', views.order_detail, name='order-detail'),
     path('orders/<str:order_number>/gcash_qr/', views.fetch_gcash_qr, name='fetch-gcash-qr'),
     path('orders/<str:order_number>/gcash_link/', views.gcash_link, name='gcash-link'),
     path('orders/<str:order_number>/confirm_payment/', views.confirm_payment, name='confirm-payment'),
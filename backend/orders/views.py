@@ -3,16 +3,20 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from decimal import Decimal, ROUND_DOWN
 from .utils import map_order_status  # if you put it in utils.py
+from . import history
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 
 from rest_framework import status
 from api.models import Order, OrderItem
+from api.loyalty_services import InsufficientPoints, earn, get_balance, redeem
+from api.views_orders import record_order_event
 from .serializers import CreditPointsSerializer  
 from rest_framework import serializers
 from decimal import Decimal
 
 from django.http import JsonResponse
+from django.db import transaction
 from api.models import Order, OrderItem, MenuItem
 from .serializers import OrderSerializer
 from notifications.models import Notification
@@ -35,30 +39,35 @@ from api.models import Order, OrderItem, MenuItem
 # Serializer for credit points
 class CreditPointsSerializer(serializers.Serializer):
     credit_points = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def _record_status_change(order, previous, actor=None):
+    # Same OrderEvent trail as the POS so queue deltas and station loads follow
+    record_order_event(order, event_type='order.status_changed', from_state=previous,
+                       to_state=order.status, actor=actor)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def order_status(request, order_number):
-    try:
-        order = Order.objects.get(order_number=order_number, customer_name=request.user.name)
-        items = [
-            {
-                "name": item.item_name,
-                "quantity": item.quantity,
-                "price": float(item.price),
-            } for item in order.items.all()
-        ]
-
-        return JsonResponse({
-            "success": True,
-            "status": map_order_status(order.status),
-            "items": items
-        })
-
-    except Order.DoesNotExist:
+    order = history.get_user_order(request.user, order_number)
+    if order is None:
         return JsonResponse(
             {"success": False, "message": "Order not found or not yours"},
             status=404
         )
+    items = [
+        {
+            "name": item.item_name,
+            "quantity": item.quantity,
+            "price": float(item.price),
+        } for item in order.items.all()
+    ]
+
+    return JsonResponse({
+        "success": True,
+        "status": map_order_status(order.status),
+        "items": items
+    })
 
 
 # api/views.py
@@ -72,8 +81,10 @@ import traceback
 def cancel_order(request, order_number):
     # Fetch order without checking user
     order = get_object_or_404(Order, order_number=order_number)
+    previous = order.status
     order.status = 'cancelled'
     order.save()
+    _record_status_change(order, previous)
     return JsonResponse({'message': f'Order {order_number} cancelled successfully.'})
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -110,77 +121,65 @@ def create_order(request):
         # 1️⃣ Parse credit points requested
         requested_points = Decimal(data.get('credit_points_used', 0)).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
 
-        # 2️⃣ Fetch Paid orders to calculate earned points
-        paid_orders = Order.objects.filter(placed_by=user, status='Paid')
+        # 2️⃣ Read the running loyalty balance
+        available_points = get_available_points(user)
 
-        total_earned_points = sum(
-            (order.total_amount * Decimal('0.01')).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
-            for order in paid_orders
-        )
-
-        total_used_points = sum(
-            (order.credit_points_used or Decimal('0.0')).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
-            for order in paid_orders
-        )
-
-        # 3️⃣ Compute available points
-        available_points = max(total_earned_points - total_used_points, Decimal('0.0'))
-
-        # 4️⃣ Clamp requested points to available points and order total
+        # 3️⃣ Clamp requested points to available points and order total
         order_total = Decimal(data['total_amount']).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
-        requested_points = min(requested_points, available_points, order_total)
-
-        # 5️⃣ Check if requested points exceed available points
-        if requested_points > available_points:
-            return Response(
-                {'success': False, 'message': 'Insufficient backend points'},
-                status=400
-            )
+        requested_points = max(min(requested_points, available_points, order_total), Decimal('0.00'))
 
-        # 6️⃣ Generate unique order number
+        # 4️⃣ Generate unique order number
 
         order_number = str(uuid.uuid4())[:32]  # unique, max 32 chars
 
-        # 7️⃣ Create the order
-        order = Order.objects.create(
-            order_number=order_number,
-            placed_by=user,
-            total_amount=order_total,
-            credit_points_used=requested_points,
-            status='Pending',
-            customer_name=data['customer_name'],
-            promised_time=data['promised_time'],
-            order_type=data.get('order_type', 'pickup')
-        )
-
-        # 8️⃣ Create order items
-        for item in data.get('items', []):
-            OrderItem.objects.create(
-                order=order,
-                item_name=item['name'],
-                price=Decimal(item['price']).quantize(Decimal('0.01'), rounding=ROUND_DOWN),
-                quantity=int(item['quantity']),
-                menu_item_id=item['menu_item_id'],
-                size=item.get('size'),
-                customize=item.get('customize')
+        with transaction.atomic():
+            # 5️⃣ Create the order
+            order = Order.objects.create(
+                order_number=order_number,
+                placed_by=user,
+                total_amount=order_total,
+                credit_points_used=requested_points,
+                credit_points_before=available_points,
+                use_credit_points=requested_points > 0,
+                status='Pending',
+                customer_name=data['customer_name'],
+                promised_time=data['promised_time'],
+                order_type=data.get('order_type', 'pickup')
             )
 
+            # 6️⃣ Debit the points; fails if a concurrent checkout spent them first
+            redeem(user.id, requested_points, order=order, reason='Checkout',
+                   idempotency_key=f'order:{order.id}:redeem')
+
+            # 7️⃣ Create order items
+            lines = [
+                OrderItem.objects.create(
+                    order=order,
+                    item_name=item['name'],
+                    price=Decimal(item['price']).quantize(Decimal('0.01'), rounding=ROUND_DOWN),
+                    quantity=int(item['quantity']),
+                    menu_item_id=item['menu_item_id'],
+                    size=item.get('size'),
+                    customize=item.get('customize')
+                )
+                for item in data.get('items', [])
+            ]
+            record_order_event(order, event_type='order.created', to_state=order.status, actor=user, items=lines)
+
         return Response({'success': True, 'order_number': order.order_number})
 
+    except InsufficientPoints:
+        return Response(
+            {'success': False, 'message': 'Insufficient backend points'},
+            status=400
+        )
     except Exception as e:
         return Response({'success': False, 'message': str(e)}, status=500)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    user = request.user
-    customer_name = user.get_full_name() or user.username  # fallback
-
-    orders = Order.objects.filter(customer_name=customer_name)
-
-    if not orders.exists():
-        return Response({"orders": []}, status=200)
-
-    serializer = OrderSerializer(orders, many=True)
+    orders = history.user_orders(request.user).prefetch_related('items__menu_item').order_by('-created_at', '-id')
+    serializer = OrderSerializer(orders[:history.MAX_PAGE_SIZE], many=True)
     return Response({"orders": serializer.data}, status=200)
 
 # ------------------------------
@@ -215,16 +214,16 @@ def confirm_payment(request, order_number):
         order = Order.objects.get(order_number=order_number)
 
         order.payment_method = method
+        previous = order.status
         order.status = "pending"  # start at pending
         order.save()
+        _record_status_change(order, previous, actor=request.user)
 
-        # Optionally, add credit points if needed
-        user = order.placed_by
-        earned_points = order.total_amount * Decimal('0.01')
-        if not hasattr(user, 'credit_points'):
-            user.credit_points = Decimal('0.0')
-        user.credit_points += earned_points
-        user.save()
+        # Earn 1% of the order total, once per order even if confirmed twice
+        earned_points = (order.total_amount * Decimal('0.01')).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        if order.placed_by_id:
+            earn(order.placed_by_id, earned_points, order=order, reason='Order payment',
+                 idempotency_key=f'order:{order.id}:earn')
 
         return Response({
             "success": True,
@@ -257,30 +256,36 @@ def fetch_gcash_qr(request, order_number):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_orders(request):
-    orders = Order.objects.filter(placed_by=request.user).order_by('-created_at')
-    orders_data = []
-
-    for order in orders:
-        items = [
-            {
-                "name": item.item_name,
-                "quantity": item.quantity,
-                "price": float(item.price),
-                "size": getattr(item, "size", None),
-                "customize": getattr(item, "customize", None),
-                "image": getattr(item, "image", None),
-            } 
-            for item in order.items.all()
-        ]
+    # Keyset paging: pass next_cursor back as ?cursor= for older orders;
+    # ?status=active|completed|cancelled limits the page to one tab
+    try:
+        limit = int(request.GET.get('limit') or history.DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = history.DEFAULT_PAGE_SIZE
+    token = (request.GET.get('cursor') or '').strip()
+    cursor = history.decode_cursor(token) if token else None
+    if token and cursor is None:
+        return Response({"success": False, "message": "Invalid cursor"}, status=400)
+    status_group = (request.GET.get('status') or '').strip().lower()
+    if status_group and status_group != 'active' and status_group not in history.STATUS_GROUPS:
+        return Response({"success": False, "message": "Invalid status"}, status=400)
+
+    orders, next_cursor, has_more = history.history_page(request.user, limit, cursor, status_group)
+    return Response({
+        "success": True,
+        "orders": [history.order_summary(order) for order in orders],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    })
 
-        orders_data.append({
-            "order_number": order.order_number,
-            "status": order.status,
-            "total_amount": float(order.total_amount),
-            "items": items,
-        })
 
-    return Response({"success": True, "orders": orders_data})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_detail(request, order_number):
+    order = history.get_user_order(request.user, order_number)
+    if order is None:
+        return Response({"success": False, "message": "Order not found or not yours"}, status=404)
+    return Response({"success": True, "order": history.order_detail(order)})
 from menu.models import MenuItem  # make sure this is your menu_item model
 from api.models import Offer, AppUser
 @api_view(['POST'])
@@ -292,45 +297,53 @@ def redeem_offer(request):
 
     offer = get_object_or_404(Offer, id=offer_id)
 
-    # ✅ Calculate available points dynamically
+    # ✅ Current loyalty balance
     available_points = get_available_points(user)
     if points_to_use > available_points:
         return Response({"success": False, "message": "Not enough credit points"}, status=400)
 
-    # Generate order
-    order_number = str(uuid.uuid4())[:32]
-    order = Order.objects.create(
-        order_number=order_number,
-        placed_by=user,
-        customer_name=user.get_full_name() or user.username,
-        order_type=request.data.get('order_type', 'pickup'),
-        promised_time=request.data.get('promised_time'),
-        subtotal=Decimal('0.00'),
-        discount=Decimal('0.00'),
-        total_amount=Decimal('0.00'),
-        credit_points_used=points_to_use,
-        use_credit_points=True,
-        credit_points_before=available_points,
-        status='Pending',
-    )
-
-    subtotal = Decimal('0.00')
-    item_names = []
-    for menu_item in offer.menu_items.all():
-        OrderItem.objects.create(
-            order=order,
-            item_name=menu_item.name,
-            price=menu_item.price,
-            quantity=1,
-            menu_item=menu_item
-        )
-        subtotal += menu_item.price
-        item_names.append(menu_item.name)
-
-    # Update totals after deduction
-    order.subtotal = subtotal
-    order.total_amount = subtotal - points_to_use
-    order.save(update_fields=['subtotal', 'total_amount'])
+    try:
+        with transaction.atomic():
+            # Generate order
+            order_number = str(uuid.uuid4())[:32]
+            order = Order.objects.create(
+                order_number=order_number,
+                placed_by=user,
+                customer_name=user.get_full_name() or user.username,
+                order_type=request.data.get('order_type', 'pickup'),
+                promised_time=request.data.get('promised_time'),
+                subtotal=Decimal('0.00'),
+                discount=Decimal('0.00'),
+                total_amount=Decimal('0.00'),
+                credit_points_used=points_to_use,
+                use_credit_points=True,
+                credit_points_before=available_points,
+                status='Pending',
+            )
+            redeem(user.id, points_to_use, order=order, reason=f'Offer {offer.id}',
+                   idempotency_key=f'order:{order.id}:redeem')
+
+            subtotal = Decimal('0.00')
+            item_names = []
+            lines = []
+            for menu_item in offer.menu_items.all():
+                lines.append(OrderItem.objects.create(
+                    order=order,
+                    item_name=menu_item.name,
+                    price=menu_item.price,
+                    quantity=1,
+                    menu_item=menu_item
+                ))
+                subtotal += menu_item.price
+                item_names.append(menu_item.name)
+
+            # Update totals after deduction
+            order.subtotal = subtotal
+            order.total_amount = subtotal - points_to_use
+            order.save(update_fields=['subtotal', 'total_amount'])
+            record_order_event(order, event_type='order.created', to_state=order.status, actor=user, items=lines)
+    except InsufficientPoints:
+        return Response({"success": False, "message": "Not enough credit points"}, status=400)
 
     return Response({
         "success": True,
@@ -342,16 +355,8 @@ def redeem_offer(request):
         "remaining_points": available_points - points_to_use
     }, status=201)
 def get_available_points(user):
-    all_orders = Order.objects.filter(placed_by=user)
-    earned_points = sum(
-        Decimal(order.total_amount) * Decimal('0.01')
-        for order in all_orders
-    )
-    used_points = sum(
-        Decimal(order.credit_points_used or 0)
-        for order in all_orders
-    )
-    return max(earned_points - used_points, Decimal('0.00')).quantize(Decimal('0.01'), ROUND_DOWN)
+    # Running balance kept by api.loyalty_services; no order-history scan
+    return max(get_balance(user.id), Decimal('0.00'))
 
 
 @api_view(['POST'])
@@ -360,38 +365,41 @@ def apply_voucher(request):
     try:
         user = request.user
         voucher_points = int(request.data.get('points', 0))
-
-        if voucher_points > user.credit_points:
-            return Response({"success": False, "message": "Not enough points"}, status=400)
-
-        # Deduct points
-        user.credit_points -= voucher_points
-        user.save()
-
-        # Create a “free order” with total_amount = 0
-        order = Order.objects.create(
-            order_number=str(uuid.uuid4())[:12],
-            placed_by=user,
-            total_amount=0,
-            credit_points_used=voucher_points,
-            status='Pending',
-            customer_name=user.get_full_name() or user.username,
-            promised_time=request.data.get('promised_time', None),
-            order_type=request.data.get('order_type', 'pickup')
-        )
-
-        # Optionally add order items
-        for item in request.data.get('items', []):
-            OrderItem.objects.create(
-                order=order,
-                item_name=item['name'],
-                price=0,
-                quantity=int(item.get('quantity', 1)),
-                menu_item_id=item.get('menu_item_id'),
-                size=item.get('size'),
-                customize=item.get('customize')
+        if voucher_points < 0:
+            return Response({"success": False, "message": "Invalid points"}, status=400)
+
+        with transaction.atomic():
+            # Create a “free order” with total_amount = 0
+            order = Order.objects.create(
+                order_number=str(uuid.uuid4())[:12],
+                placed_by=user,
+                total_amount=0,
+                credit_points_used=voucher_points,
+                status='Pending',
+                customer_name=user.get_full_name() or user.username,
+                promised_time=request.data.get('promised_time', None),
+                order_type=request.data.get('order_type', 'pickup')
             )
 
+            # Deduct points
+            redeem(user.id, voucher_points, order=order, reason='Voucher',
+                   idempotency_key=f'order:{order.id}:redeem')
+
+            # Optionally add order items
+            lines = [
+                OrderItem.objects.create(
+                    order=order,
+                    item_name=item['name'],
+                    price=0,
+                    quantity=int(item.get('quantity', 1)),
+                    menu_item_id=item.get('menu_item_id'),
+                    size=item.get('size'),
+                    customize=item.get('customize')
+                )
+                for item in request.data.get('items', [])
+            ]
+            record_order_event(order, event_type='order.created', to_state=order.status, actor=user, items=lines)
+
         return Response({
             "success": True,
             "message": "Voucher applied and order created",
@@ -399,6 +407,8 @@ def apply_voucher(request):
             "points_deducted": voucher_points
         })
 
+    except InsufficientPoints:
+        return Response({"success": False, "message": "Not enough points"}, status=400)
     except Exception as e:
         return Response({"success": False, "message": str(e)}, status=500)
 from django.shortcuts import get_object_or_404
@@ -416,47 +426,55 @@ def redeem_offer(request):
     # Get the offer
     offer = get_object_or_404(Offer, id=offer_id)
 
-    # Calculate available points dynamically
+    # Current loyalty balance
     available_points = get_available_points(user)
     if points_to_use > available_points:
         return Response({"success": False, "message": "Not enough credit points"}, status=400)
 
-    # Create unique order number
-    order_number = str(uuid.uuid4())[:32]
-
-    # Create the order
-    order = Order.objects.create(
-        order_number=order_number,
-        placed_by=user,
-        customer_name=getattr(user, "full_name", str(user)),   
-        promised_time=request.data.get('promised_time'),
-        subtotal=Decimal('0.00'),
-        discount=Decimal('0.00'),
-        total_amount=Decimal('0.00'),
-        credit_points_used=points_to_use,
-        use_credit_points=True,
-        credit_points_before=available_points,
-        status='Pending',
-    )
-
-    # Add menu items from the offer
-    subtotal = Decimal('0.00')
-    item_names = []
-    for menu_item in offer.menu_items.all():
-        OrderItem.objects.create(
-            order=order,
-            item_name=menu_item.name,
-            price=menu_item.price,
-            quantity=1,
-            menu_item=menu_item
-        )
-        subtotal += menu_item.price
-        item_names.append(menu_item.name)
-
-    # Update totals after deduction
-    order.subtotal = subtotal
-    order.total_amount = max(subtotal - points_to_use, Decimal('0.00'))
-    order.save(update_fields=['subtotal', 'total_amount'])
+    try:
+        with transaction.atomic():
+            # Create unique order number
+            order_number = str(uuid.uuid4())[:32]
+
+            # Create the order
+            order = Order.objects.create(
+                order_number=order_number,
+                placed_by=user,
+                customer_name=getattr(user, "full_name", str(user)),   
+                promised_time=request.data.get('promised_time'),
+                subtotal=Decimal('0.00'),
+                discount=Decimal('0.00'),
+                total_amount=Decimal('0.00'),
+                credit_points_used=points_to_use,
+                use_credit_points=True,
+                credit_points_before=available_points,
+                status='Pending',
+            )
+            redeem(user.id, points_to_use, order=order, reason=f'Offer {offer.id}',
+                   idempotency_key=f'order:{order.id}:redeem')
+
+            # Add menu items from the offer
+            subtotal = Decimal('0.00')
+            item_names = []
+            lines = []
+            for menu_item in offer.menu_items.all():
+                lines.append(OrderItem.objects.create(
+                    order=order,
+                    item_name=menu_item.name,
+                    price=menu_item.price,
+                    quantity=1,
+                    menu_item=menu_item
+                ))
+                subtotal += menu_item.price
+                item_names.append(menu_item.name)
+
+            # Update totals after deduction
+            order.subtotal = subtotal
+            order.total_amount = max(subtotal - points_to_use, Decimal('0.00'))
+            order.save(update_fields=['subtotal', 'total_amount'])
+            record_order_event(order, event_type='order.created', to_state=order.status, actor=user, items=lines)
+    except InsufficientPoints:
+        return Response({"success": False, "message": "Not enough credit points"}, status=400)
 
     remaining_points = available_points - points_to_use
 
@@ -516,6 +534,8 @@ def update_order_status(request, order_id):
     if new_status not in valid_statuses:
         return Response({'error': f'Invalid status: {new_status}'}, status=status.HTTP_400_BAD_REQUEST)
 
+    previous = order.status
     order.status = new_status
     order.save()
+    _record_status_change(order, previous)
     return Response({'status': order.status})
\ No newline at end of file
@@ -694,21 +694,21 @@ export const removeCartItem = async (itemId) => {
 };
 // Fetch orders for a specific user
 // api/api.js
-export const fetchUserOrders = async () => {
+export const fetchUserOrders = async ({ status, cursor, limit = 20 } = {}) => {
+  // One keyset page, newest first; pass nextCursor back for older orders.
+  // status: 'active' | 'completed' | 'cancelled' (omit for every order)
   try {
-    const res = await api.get(`/orders/`);
-    // If backend just returns a list of orders, return it directly
-    if (Array.isArray(res.data)) {
-      return res.data;
-    }
-    // Optional: handle wrapped response like { orders: [...] }
-    if (res.data.orders) {
-      return res.data.orders;
-    }
-    return [];
+    const params = { limit };
+    if (status) params.status = status;
+    if (cursor) params.cursor = cursor;
+    const res = await api.get(`/orders/`, { params });
+    return {
+      orders: res.data.orders || [],
+      nextCursor: res.data.has_more ? res.data.next_cursor : null,
+    };
   } catch (err) {
     console.error('fetchUserOrders error:', err.response?.data || err.message);
-    return [];
+    return { orders: [], nextCursor: null };
   }
 };
 
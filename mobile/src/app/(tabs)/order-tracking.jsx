@@ -46,23 +46,44 @@ export default function OrderTrackingScreen() {
   const translateY = useRef(new Animated.Value(0)).current;
   const panResponderRef = useRef(null);
 
+  // Polled: only the active tab, which stays small however long the history is
   const loadOrders = async () => {
     try {
-      const data = await fetchUserOrders();
-      const list = Array.isArray(data) ? data : [];
-      setOrders(list.filter(o => (o.status ?? '').toLowerCase() !== 'completed' && (o.status ?? '').toLowerCase() !== 'cancelled'));
-      setCompletedOrders(list.filter(o => (o.status ?? '').toLowerCase() === 'completed'));
-      setCancelledOrders(list.filter(o => (o.status ?? '').toLowerCase() === 'cancelled'));
+      const { orders: active } = await fetchUserOrders({ status: 'active', limit: 100 });
+      setOrders(active);
     } catch (err) {
       console.error('Error fetching orders:', err);
       setOrders([]);
-      setCompletedOrders([]);
-      setCancelledOrders([]);
     } finally {
       setLoading(false);
     }
   };
 
+  // Completed / cancelled history: first page when the list opens, more on scroll
+  const historyCursors = useRef({ completed: null, cancelled: null });
+  const historyLoading = useRef(false);
+  const historySetters = { completed: setCompletedOrders, cancelled: setCancelledOrders };
+
+  const loadHistory = async (status, more = false) => {
+    if (historyLoading.current || (more && !historyCursors.current[status])) return;
+    historyLoading.current = true;
+    try {
+      const { orders: page, nextCursor } = await fetchUserOrders({
+        status,
+        cursor: more ? historyCursors.current[status] : null,
+      });
+      historyCursors.current[status] = nextCursor;
+      historySetters[status]((prev) => (more ? [...prev, ...page] : page));
+    } finally {
+      historyLoading.current = false;
+    }
+  };
+
+  const openHistory = (status) => {
+    loadHistory(status);
+    (status === 'completed' ? setShowCompleted : setShowCancelled)(true);
+  };
+
   useEffect(() => {
     loadOrders();
     const interval = setInterval(loadOrders, 5000);
@@ -278,10 +299,10 @@ export default function OrderTrackingScreen() {
             <Ionicons name="arrow-back" size={26} color="black" />
             <Text style={styles.headerTitle}>My Orders</Text>
             <View style={{ flexDirection: 'row', gap: 12 }}>
-              <TouchableOpacity onPress={() => setShowCompleted(true)}>
+              <TouchableOpacity onPress={() => openHistory('completed')}>
                 <Ionicons name="list-outline" size={26} color="black" />
               </TouchableOpacity>
-              <TouchableOpacity onPress={() => setShowCancelled(true)}>
+              <TouchableOpacity onPress={() => openHistory('cancelled')}>
                 <Ionicons name="trash-outline" size={26} color="black" />
               </TouchableOpacity>
             </View>
@@ -315,6 +336,8 @@ export default function OrderTrackingScreen() {
                 data={completedOrders}
                 keyExtractor={(order) => (order.order_number || order.id || Math.random()).toString()}
                 renderItem={({ item }) => renderOrderItem(item)}
+                onEndReached={() => loadHistory('completed', true)}
+                onEndReachedThreshold={0.5}
                 contentContainerStyle={{ padding: 16 }}
               />
             ) : (
@@ -346,6 +369,8 @@ export default function OrderTrackingScreen() {
                 data={cancelledOrders}
                 keyExtractor={(order) => (order.order_number || order.id || Math.random()).toString()}
                 renderItem={({ item }) => renderOrderItem(item)}
+                onEndReached={() => loadHistory('cancelled', true)}
+                onEndReachedThreshold={0.5}
                 contentContainerStyle={{ padding: 16 }}
               />
             ) : (
@@ -63,22 +63,27 @@ export default function OrderHistoryScreen() {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
 
-  // Fetch orders from backend on mount
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Map backend status to color
+  const withColor = (order) => ({
+    ...order,
+    statusColor:
+      order.status === 'Delivered'
+        ? '#10B981'
+        : order.status === 'Pending'
+          ? '#F59E0B'
+          : '#EF4444',
+  });
+
+  // First page on mount; older pages as the list is scrolled
   useEffect(() => {
     const loadOrders = async () => {
       try {
-        const data = await fetchUserOrders();
-        // Map backend status to color
-        const mapped = data.map((order) => ({
-          ...order,
-          statusColor:
-            order.status === 'Delivered'
-              ? '#10B981'
-              : order.status === 'Pending'
-                ? '#F59E0B'
-                : '#EF4444',
-        }));
-        setOrders(mapped);
+        const { orders: page, nextCursor: cursor } = await fetchUserOrders();
+        setOrders(page.map(withColor));
+        setNextCursor(cursor);
       } catch (err) {
         console.error('Failed to fetch orders:', err);
       } finally {
@@ -89,6 +94,25 @@ export default function OrderHistoryScreen() {
     loadOrders();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const { orders: page, nextCursor: cursor } = await fetchUserOrders({ cursor: nextCursor });
+      setOrders((prev) => [...prev, ...page.map(withColor)]);
+      setNextCursor(cursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleScroll = ({ nativeEvent }) => {
+    const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+    if (layoutMeasurement.height + contentOffset.y >= contentSize.height - 200) {
+      loadMore();
+    }
+  };
+
   const repeatOrder = (orderItems) => {
     router.push({
       pathname: '/customer-cart',
@@ -131,7 +155,11 @@ export default function OrderHistoryScreen() {
       </View>
 
       {/* Orders List */}
-      <ScrollView contentContainerStyle={{ paddingBottom: 40, paddingTop: 16 }}>
+      <ScrollView
+        contentContainerStyle={{ paddingBottom: 40, paddingTop: 16 }}
+        onScroll={handleScroll}
+        scrollEventThrottle={200}
+      >
         {orders.length === 0 ? (
           <View style={styles.emptyWrapper}>
             <MaterialCommunityIcons name="cart-off" size={36} color="#C6C6C6" />
@@ -148,6 +176,7 @@ export default function OrderHistoryScreen() {
             />
           ))
         )}
+        {loadingMore && <ActivityIndicator style={{ marginTop: 12 }} color="#F07F13" />}
       </ScrollView>
     </View>
   );
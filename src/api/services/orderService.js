@@ -325,7 +325,8 @@ const normalizeQueuePayload = (payload) => {
     batches,
     handoff,
     generatedAt: toISO(payload.generatedAt) || toISO(new Date()),
-    eventCursor: toISO(payload.eventCursor),
+    // Opaque integer cursor; send it back as ?since= for a delta
+    eventCursor: payload.eventCursor ?? null,
   };
 };
 